@@ -0,0 +1,226 @@
+import gc
+import importlib
+import os
+import platform
+import sys
+import time
+from typing import Dict, List, Optional
+
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import DATA_SRC, KL_TYPE
+from Common.profiler import PROFILER, disable_profile, enable_profile
+
+from .BenchData import random_walk_api_cls, random_walk_frames
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None  # type: ignore
+
+# 分阶段计时的函数：阶段名 -> (模块, 类, 方法)；阶段之间有嵌套（如回放模式下 add_single_klu 包含 cal_seg_and_zs）
+STAGE_LST = [
+    ("add_single_klu", "KLine.KLine_List", "CKLine_List", "add_single_klu"),
+    ("combine", "KLine.KLine_List", "CKLine_List", "flush_combine"),
+    ("update_bi", "Bi.BiList", "CBiList", "update_bi"),
+    ("metric_batch", "KLine.KLine_List", "CKLine_List", "cal_metric_batch"),
+    ("cal_seg_and_zs", "KLine.KLine_List", "CKLine_List", "cal_seg_and_zs"),
+    ("bsp_cal", "BuySellPoint.BSPointList", "CBSPointList", "cal"),
+    ("plot", "Plot.PlotDriver", "CPlotDriver", "__init__"),
+]
+
+MACD_ALGO_LST = ["peak", "area", "full_area", "diff", "slope", "amp", "volumn", "amount", "volumn_avg", "amount_avg", "rsi"]
+
+
+class CStageTimer:
+    '''
+    在 with 块内替换 STAGE_LST 中的方法，累计各阶段的调用次数和耗时（同一阶段递归调用只计最外层）
+    '''
+    def __init__(self, stage_lst=None):
+        self.stage_lst = STAGE_LST if stage_lst is None else stage_lst
+        self.stat: Dict[str, Dict[str, float]] = {}
+        self.__patched: list = []
+
+    def wrap(self, name, func):
+        stat = self.stat.setdefault(name, {"calls": 0, "seconds": 0.0})
+        depth = [0]
+
+        def wrapper(*args, **kwargs):
+            stat["calls"] += 1
+            if depth[0]:
+                return func(*args, **kwargs)
+            depth[0] += 1
+            begin = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stat["seconds"] += time.perf_counter() - begin
+                depth[0] -= 1
+        return wrapper
+
+    def __enter__(self):
+        for name, module_name, cls_name, method in self.stage_lst:
+            try:
+                cls = getattr(importlib.import_module(module_name), cls_name)
+            except ImportError:
+                continue  # 例如没有安装 matplotlib
+            func = cls.__dict__[method]
+            self.__patched.append((cls, method, func))
+            setattr(cls, method, self.wrap(name, func))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for cls, method, func in self.__patched:
+            setattr(cls, method, func)
+        self.__patched = []
+
+
+class CBenchCase:
+    '''
+    一个基准用例
+    data: "rw" 随机游走（同一条 5 分钟序列合成各级别），"csv" 为 Data/sh.000001_day.csv
+    n_days: 随机游走的交易日数（会乘以 run_case 的 scale）
+    '''
+    def __init__(self, name: str, data: str, lv_list: List[KL_TYPE], step: bool = False, macd_algo: str = "peak", plot: bool = False, n_days: int = 0, seed: int = 1):
+        self.name = name
+        self.data = data
+        self.lv_list = lv_list
+        self.step = step
+        self.macd_algo = macd_algo
+        self.plot = plot
+        self.n_days = n_days
+        self.seed = seed
+
+    def get_config(self) -> CChanConfig:
+        return CChanConfig({
+            "trigger_step": self.step,
+            "macd_algo": self.macd_algo,
+            "cal_rsi": self.macd_algo == "rsi",
+            "print_warning": False,
+        })
+
+    def prepare(self, scale: float):
+        # 数据准备不计入耗时
+        if self.data == "csv":
+            return "sh.000001", DATA_SRC.CSV
+        n_days = max(int(self.n_days * scale), 10)
+        random_walk_frames(self.seed, n_days)
+        return "random_walk", random_walk_api_cls(self.seed, n_days)
+
+    def make_chan(self, code, data_src) -> CChan:
+        chan = CChan(code=code, data_src=data_src, lv_list=list(self.lv_list), config=self.get_config())
+        if self.step:
+            for _ in chan.step_load():
+                pass
+        if self.plot:
+            from Plot.PlotDriver import CPlotDriver
+            CPlotDriver(chan, plot_config={"plot_kline": True, "plot_kline_combine": True, "plot_bi": True, "plot_seg": True, "plot_zs": True, "plot_bsp": True})
+        return chan
+
+
+def get_bench_cases() -> List[CBenchCase]:
+    lv_1 = [KL_TYPE.K_30M]
+    lv_3 = [KL_TYPE.K_DAY, KL_TYPE.K_30M, KL_TYPE.K_5M]
+    case_lst = [
+        CBenchCase("csv-day-batch", "csv", [KL_TYPE.K_DAY]),
+        CBenchCase("csv-day-step", "csv", [KL_TYPE.K_DAY], step=True),
+        CBenchCase("rw-1lv-batch", "rw", lv_1, n_days=2000),
+        CBenchCase("rw-1lv-step", "rw", lv_1, step=True, n_days=500),
+        CBenchCase("rw-3lv-batch", "rw", lv_3, n_days=300),
+        CBenchCase("rw-3lv-step", "rw", lv_3, step=True, n_days=80),
+    ]
+    case_lst += [CBenchCase(f"rw-1lv-batch-macd_{algo}", "rw", lv_1, macd_algo=algo, n_days=2000) for algo in MACD_ALGO_LST if algo != "peak"]
+    case_lst.append(CBenchCase("rw-1lv-batch-plot", "rw", lv_1, plot=True, n_days=500))
+    return case_lst
+
+
+def get_max_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux 单位为 KB，macOS 为字节
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+def run_case(case: CBenchCase, repeat: int = 3, scale: float = 1.0) -> dict:
+    '''
+    跑 repeat 轮取最快一轮的耗时算 bars/sec，再跑一轮带阶段计时（同时打开 Common/profiler）的得到各阶段耗时和计数
+    峰值内存是整个进程的峰值，需要每个用例单独一个进程才有意义（run_bench.py 默认如此）
+    '''
+    if case.plot:
+        try:
+            import matplotlib
+            matplotlib.use("Agg")
+        except ImportError:
+            return {"skipped": "matplotlib not installed"}
+    code, data_src = case.prepare(scale)
+    rss_before = get_max_rss_mb()
+    best = float("inf")
+    bar_cnt = 0
+    for _ in range(repeat):
+        gc.collect()
+        begin = time.perf_counter()
+        chan = case.make_chan(code, data_src)
+        best = min(best, time.perf_counter() - begin)
+        bar_cnt = sum(chan[lv].last_klu().idx + 1 for lv in chan.lv_list)
+        del chan
+    gc.collect()
+    enable_profile()
+    try:
+        with CStageTimer() as timer:
+            case.make_chan(code, data_src)
+    finally:
+        disable_profile()
+    rss_peak = get_max_rss_mb()
+    return {
+        "bars": bar_cnt,
+        "seconds": best,
+        "bars_per_sec": bar_cnt / best,
+        "peak_rss_mb": rss_peak,
+        "rss_growth_mb": None if rss_peak is None or rss_before is None else rss_peak - rss_before,
+        "stages": timer.stat,
+        "profile": PROFILER.to_dict(),
+    }
+
+
+def bench_meta() -> dict:
+    import numpy
+    return {
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+        "machine": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def compare_result(result: dict, baseline: dict, tolerance: float = 0.2, rss_tolerance: float = 0.3) -> List[str]:
+    '''
+    与基线比较，返回退化项的描述，空列表表示没有退化
+    bars/sec 低于基线 (1-tolerance) 倍，或峰值内存高于基线 (1+rss_tolerance) 倍视为退化；基线中没有的用例不比较
+    '''
+    regression_lst = []
+    for name, cur in result["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None or "skipped" in cur or "skipped" in base:
+            continue
+        if cur["bars_per_sec"] < base["bars_per_sec"] * (1 - tolerance):
+            regression_lst.append(f"{name}: bars/sec {cur['bars_per_sec']:.0f} < baseline {base['bars_per_sec']:.0f} * {1 - tolerance:.2f}")
+        if cur["peak_rss_mb"] is not None and base["peak_rss_mb"] is not None and cur["peak_rss_mb"] > base["peak_rss_mb"] * (1 + rss_tolerance):
+            regression_lst.append(f"{name}: peak rss {cur['peak_rss_mb']:.1f}MB > baseline {base['peak_rss_mb']:.1f}MB * {1 + rss_tolerance:.2f}")
+    return regression_lst
+
+
+def format_result(result: dict, baseline: Optional[dict] = None) -> str:
+    lines = [f"{'case':<32}{'bars':>8}{'sec':>9}{'bars/sec':>11}{'vs base':>9}{'rss(MB)':>9}  stages(sec)"]
+    for name, cur in result["cases"].items():
+        if "skipped" in cur:
+            lines.append(f"{name:<32}skipped: {cur['skipped']}")
+            continue
+        base = None if baseline is None else baseline["cases"].get(name)
+        ratio = f"{cur['bars_per_sec'] / base['bars_per_sec']:.2f}x" if base and "skipped" not in base else "-"
+        rss = "-" if cur["peak_rss_mb"] is None else f"{cur['peak_rss_mb']:.1f}"
+        stages = " ".join(f"{stage}={stat['seconds']:.3f}" for stage, stat in cur["stages"].items() if stat["calls"])
+        lines.append(f"{name:<32}{cur['bars']:>8}{cur['seconds']:>9.3f}{cur['bars_per_sec']:>11.0f}{ratio:>9}{rss:>9}  {stages}")
+    return "\n".join(lines)
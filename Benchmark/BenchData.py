@@ -0,0 +1,125 @@
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+from Common.CEnum import DATA_FIELD, KL_TYPE
+from Common.ChanException import CChanException, ErrCode
+from DataAPI.BulkLoader import CBarFrame
+from DataAPI.CommonStockAPI import CCommonStockApi
+from KLine.KLine_Unit import CKLine_Unit
+
+# 随机游走数据以 5 分钟K线为最小级别，每天 48 根（9:35~11:30，13:05~15:00）
+BARS_PER_DAY = 48
+SLOT_MINUTE = np.concatenate([9*60+30 + 5*np.arange(1, 25), 13*60 + 5*np.arange(1, 25)])
+
+# 各级别由多少根 5 分钟K线合成，均不跨越午休
+LV_GROUP_SIZE: Dict[KL_TYPE, int] = {
+    KL_TYPE.K_5M: 1,
+    KL_TYPE.K_15M: 3,
+    KL_TYPE.K_30M: 6,
+    KL_TYPE.K_60M: 12,
+    KL_TYPE.K_DAY: BARS_PER_DAY,
+}
+
+_FRAME_CACHE: Dict[Tuple[int, int], Dict[KL_TYPE, CBarFrame]] = {}
+
+
+def business_dates(n_days: int, begin: str = "2010-01-04") -> np.ndarray:
+    # 返回 YYYYMMDD 整数
+    days = np.busday_offset(np.datetime64(begin), np.arange(n_days), roll="forward")
+    year = days.astype("datetime64[Y]").astype(np.int64) + 1970
+    month = days.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    day = (days - days.astype("datetime64[M]")).astype(np.int64) + 1
+    return year * 10000 + month * 100 + day
+
+
+def random_walk_base(seed: int, n_days: int, start_price: float = 3000.0, sigma: float = 0.002) -> Dict[str, np.ndarray]:
+    '''
+    生成 5 分钟级别的随机游走 OHLCV，价格保留两位小数，同一个 seed 结果固定
+    '''
+    rng = np.random.default_rng(seed)
+    size = n_days * BARS_PER_DAY
+    close = np.round(start_price * np.exp(np.cumsum(rng.normal(0, sigma, size))), 2)
+    _open = np.concatenate([[start_price], close[:-1]])
+    high = np.round(np.maximum(_open, close) * (1 + np.abs(rng.normal(0, sigma / 2, size))), 2)
+    low = np.round(np.minimum(_open, close) * (1 - np.abs(rng.normal(0, sigma / 2, size))), 2)
+    volume = rng.integers(1000, 100000, size).astype(np.float64)
+    slot_time = (SLOT_MINUTE // 60 * 100 + SLOT_MINUTE % 60) * 100
+    time_key = (business_dates(n_days)[:, None] * 1000000 + slot_time[None, :]).reshape(-1)
+    return {
+        DATA_FIELD.FIELD_TIME: time_key,
+        DATA_FIELD.FIELD_OPEN: _open,
+        DATA_FIELD.FIELD_HIGH: high,
+        DATA_FIELD.FIELD_LOW: low,
+        DATA_FIELD.FIELD_CLOSE: close,
+        DATA_FIELD.FIELD_VOLUME: volume,
+        DATA_FIELD.FIELD_TURNOVER: volume * close,
+    }
+
+
+def aggregate_bars(base: Dict[str, np.ndarray], group_size: int) -> Dict[str, np.ndarray]:
+    # 每 group_size 根合成一根，时间取最后一根；日线时间为当天 00:00
+    if group_size == 1:
+        return dict(base)
+    begin = np.arange(0, len(base[DATA_FIELD.FIELD_TIME]), group_size)
+    end = begin + group_size - 1
+    time_key = base[DATA_FIELD.FIELD_TIME][end]
+    if group_size == BARS_PER_DAY:
+        time_key = time_key // 1000000 * 1000000
+    return {
+        DATA_FIELD.FIELD_TIME: time_key,
+        DATA_FIELD.FIELD_OPEN: base[DATA_FIELD.FIELD_OPEN][begin],
+        DATA_FIELD.FIELD_HIGH: np.maximum.reduceat(base[DATA_FIELD.FIELD_HIGH], begin),
+        DATA_FIELD.FIELD_LOW: np.minimum.reduceat(base[DATA_FIELD.FIELD_LOW], begin),
+        DATA_FIELD.FIELD_CLOSE: base[DATA_FIELD.FIELD_CLOSE][end],
+        DATA_FIELD.FIELD_VOLUME: np.add.reduceat(base[DATA_FIELD.FIELD_VOLUME], begin),
+        DATA_FIELD.FIELD_TURNOVER: np.add.reduceat(base[DATA_FIELD.FIELD_TURNOVER], begin),
+    }
+
+
+def random_walk_frames(seed: int, n_days: int) -> Dict[KL_TYPE, CBarFrame]:
+    '''
+    同一条 5 分钟随机游走合成出的各级别K线，父子级别天然对齐
+    '''
+    key = (seed, n_days)
+    if key not in _FRAME_CACHE:
+        base = random_walk_base(seed, n_days)
+        _FRAME_CACHE[key] = {
+            lv: CBarFrame(aggregate_bars(base, group_size), time_auto=(lv == KL_TYPE.K_DAY))
+            for lv, group_size in LV_GROUP_SIZE.items()
+        }
+    return _FRAME_CACHE[key]
+
+
+class CRandomWalkApi(CCommonStockApi):
+    '''
+    随机游走数据源，code 不影响数据；通过 random_walk_api_cls 设置 seed 和天数
+    '''
+    thread_safe = True
+    seed = 0
+    n_days = 250
+
+    def __init__(self, code, k_type=KL_TYPE.K_DAY, begin_date=None, end_date=None, autype=None):
+        if k_type not in LV_GROUP_SIZE:
+            raise CChanException(f"random walk data not support {k_type}", ErrCode.SRC_DATA_NOT_FOUND)
+        super(CRandomWalkApi, self).__init__(code, k_type, begin_date, end_date, autype)
+
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        yield from random_walk_frames(self.seed, self.n_days)[self.k_type].slice_time(self.begin_date, self.end_date).klu_iter()
+
+    def SetBasciInfo(self):
+        self.name = f"random_walk_{self.seed}"
+        self.is_stock = False
+
+    @classmethod
+    def do_init(cls):
+        pass
+
+    @classmethod
+    def do_close(cls):
+        pass
+
+
+def random_walk_api_cls(seed: int, n_days: int):
+    return type("CRandomWalkApi", (CRandomWalkApi,), {"seed": seed, "n_days": n_days})
+
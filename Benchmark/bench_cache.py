@@ -0,0 +1,115 @@
+import argparse
+import gc
+import os
+import sys
+import timeit
+import types
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Common.cache import init_cache, make_cache  # noqa: E402
+
+
+class legacy_make_cache:
+    '''
+    原来的 make_cache 实现（每次访问创建绑定方法、按 str(func) 查字典、clean_cache 重建字典），仅用于对比
+    '''
+    def __init__(self, func):
+        self.func = func
+        self.func_key = str(func)
+
+    def __get__(self, instance, cls):
+        if not hasattr(instance, "_legacy_cache"):
+            setattr(instance, "_legacy_cache", {})
+        return types.MethodType(self, instance)
+
+    def __call__(self, *args, **kwargs):
+        cache = args[0]._legacy_cache
+        if self.func_key in cache:
+            return cache[self.func_key]
+        result = self.func(*args, **kwargs)
+        cache[self.func_key] = result
+        return result
+
+
+class CDemo:
+    __slots__ = ("val", "_memoize_cache", "_memoize_gen", "_legacy_cache")
+
+    def __init__(self):
+        self.val = 1.0
+        init_cache(self)
+        self._legacy_cache = {}
+
+    def plain(self):
+        return self.val
+
+    @make_cache
+    def cached(self):
+        return self.val
+
+    @legacy_make_cache
+    def legacy(self):
+        return self.val
+
+    def clean_cache(self):
+        self._memoize_gen += 1
+
+    def legacy_clean_cache(self):
+        self._legacy_cache = {}
+
+
+def bi_lookup(bi_list):
+    # 笔上最常用的几个缓存方法各取一次
+    for bi in bi_list:
+        bi.get_begin_val()
+        bi.get_end_val()
+        bi._high()
+        bi._low()
+        bi.is_up()
+
+
+def run(number: int):
+    obj = CDemo()
+    getter = obj.cached
+    case_lst = [
+        ("plain method", "obj.plain()"),
+        ("make_cache hit", "obj.cached()"),
+        ("legacy hit", "obj.legacy()"),
+        ("make_cache held getter", "getter()"),
+        ("make_cache clean+miss", "obj.clean_cache(); obj.cached()"),
+        ("legacy clean+miss", "obj.legacy_clean_cache(); obj.legacy()"),
+        ("make_cache new obj+miss", "CDemo().cached()"),
+        ("legacy new obj+miss", "CDemo().legacy()"),
+    ]
+    print(f"{'case':<28}{'ns/call':>10}")
+    for name, stmt in case_lst:
+        seconds = min(timeit.repeat(stmt, globals={"obj": obj, "getter": getter, "CDemo": CDemo}, number=number, repeat=5))
+        print(f"{name:<28}{seconds / number * 1e9:>10.1f}")
+
+    # 实际的笔：上证日线算完之后每一笔的 get_begin_val/get_end_val/_high/_low/is_up（全部命中）
+    from Chan import CChan
+    from ChanConfig import CChanConfig
+    from Common.CEnum import DATA_SRC, KL_TYPE
+    bi_list = CChan("sh.000001", data_src=DATA_SRC.CSV, lv_list=[KL_TYPE.K_DAY], config=CChanConfig({"print_warning": False}))[0].bi_list
+    bi_lookup(bi_list)
+    call_cnt = len(bi_list) * 5
+    bi_number = max(number // call_cnt, 1)
+    seconds = min(timeit.repeat("bi_lookup(bi_list)", globals={"bi_lookup": bi_lookup, "bi_list": bi_list}, number=bi_number, repeat=5))
+    print(f"{'CBi hit (5 methods)':<28}{seconds / bi_number / call_cnt * 1e9:>10.1f}")
+
+    # 缓存不引用实例：关闭循环垃圾回收时实例也能随引用计数释放
+    gc.disable()
+    try:
+        gc.collect()
+        before = len(gc.get_objects())
+        for _ in range(1000):
+            CDemo().cached()
+        print(f"{'objects left after 1000 new obj+miss (gc off)':<48}{len(gc.get_objects()) - before:>6}")
+    finally:
+        gc.enable()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="@make_cache 查找开销")
+    parser.add_argument("--number", type=int, default=1000000)
+    run(parser.parse_args().number)
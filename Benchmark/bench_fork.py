@@ -0,0 +1,55 @@
+import argparse
+import copy
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Chan import CChan  # noqa: E402
+from ChanConfig import CChanConfig  # noqa: E402
+from Common.CEnum import DATA_SRC, KL_TYPE  # noqa: E402
+from DataAPI.csvAPI import CSV_API  # noqa: E402
+
+
+def run(branch_len: int, number: int, demark: bool):
+    # 上证日线：2015 年之前批量加载，之后的K线作为试算分支喂入
+    config = CChanConfig({"print_warning": False, "cal_demark": demark})
+    chan = CChan("sh.000001", end_time="2015-01-01", data_src=DATA_SRC.CSV, lv_list=[KL_TYPE.K_DAY], config=config)
+    klu_lst = list(CSV_API("sh.000001", begin_date="2015-01-01").get_kl_data())[:branch_len]
+
+    def fork_branch():
+        with chan.fork():
+            for klu in klu_lst:
+                chan.feed(klu)
+
+    def deepcopy_branch():
+        branch = copy.deepcopy(chan)
+        for klu in klu_lst:
+            branch.feed(klu)
+
+    def fork_only():
+        chan.fork().discard()
+
+    def deepcopy_only():
+        copy.deepcopy(chan)
+
+    print(f"history {len(chan[0])} klu, branch {len(klu_lst)} klu, cal_demark={demark}")
+    print(f"{'case':<24}{'ms/branch':>10}")
+    for name, func in [
+        ("fork+feed+discard", fork_branch),
+        ("deepcopy+feed", deepcopy_branch),
+        ("fork+discard", fork_only),
+        ("deepcopy", deepcopy_only),
+    ]:
+        seconds = min(timeit.repeat(func, number=number, repeat=5))
+        print(f"{name:<24}{seconds / number * 1e3:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CChan.fork() 与 copy.deepcopy 分支试算的耗时对比")
+    parser.add_argument("--branch", type=int, default=1, help="每个分支喂入的K线数")
+    parser.add_argument("--number", type=int, default=20)
+    parser.add_argument("--demark", action="store_true", help="打开 cal_demark")
+    args = parser.parse_args()
+    run(args.branch, args.number, args.demark)
@@ -0,0 +1,49 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Chan import CChan  # noqa: E402
+from ChanConfig import CChanConfig  # noqa: E402
+from Common.CEnum import DATA_SRC, KL_TYPE  # noqa: E402
+
+
+def replay(step: bool) -> CChan:
+    chan = CChan("sh.000001", data_src=DATA_SRC.CSV, lv_list=[KL_TYPE.K_DAY], config=CChanConfig({"print_warning": False, "trigger_step": step}))
+    if step:
+        for _ in chan.step_load():
+            pass
+    return chan
+
+
+def run(repeat: int):
+    # 上证日线：从头重算（回放/非回放）与从快照恢复的耗时对比，各取最快一次
+    print(f"{'case':<24}{'s':>8}")
+    for step in (True, False):
+        best = float("inf")
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            chan = replay(step)
+            best = min(best, time.perf_counter() - begin)
+        mode = "step" if step else "batch"
+        print(f"{'recompute ' + mode:<24}{best:>8.3f}")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "chan.snap")
+            begin = time.perf_counter()
+            CChan.save_snapshot(chan, path)
+            print(f"{'save_snapshot ' + mode:<24}{time.perf_counter() - begin:>8.3f}")
+            best = float("inf")
+            for _ in range(repeat):
+                begin = time.perf_counter()
+                CChan.load_snapshot(path)
+                best = min(best, time.perf_counter() - begin)
+            print(f"{'load_snapshot ' + mode:<24}{best:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="快照恢复与重新计算的耗时对比")
+    parser.add_argument("--repeat", type=int, default=3)
+    run(parser.parse_args().repeat)
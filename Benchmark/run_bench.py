@@ -0,0 +1,78 @@
+import argparse
+import fnmatch
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Benchmark.Bench import bench_meta, compare_result, format_result, get_bench_cases, run_case  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CChan 性能基准")
+    parser.add_argument("--case", nargs="*", default=["*"], help="用例名通配符，默认全部")
+    parser.add_argument("--list", action="store_true", help="只列出用例")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例跑几轮取最快")
+    parser.add_argument("--scale", type=float, default=1.0, help="随机游走数据天数的缩放比例")
+    parser.add_argument("--output", default=None, help="本次结果保存的 json 路径")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线 json 路径")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线，不做比较")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="bars/sec 允许下降的比例")
+    parser.add_argument("--rss-tolerance", type=float, default=0.3, help="峰值内存允许上升的比例")
+    parser.add_argument("--in-process", action="store_true", help="所有用例在当前进程跑（峰值内存不再按用例区分）")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    case_lst = [case for case in get_bench_cases() if any(fnmatch.fnmatch(case.name, pattern) for pattern in args.case)]
+    if args.list:
+        for case in case_lst:
+            print(case.name)
+        return 0
+
+    result = {"meta": bench_meta(), "repeat": args.repeat, "scale": args.scale, "cases": {}}
+    print(format_result({"cases": {}}), flush=True)
+    for case in case_lst:
+        if args.in_process:
+            result["cases"][case.name] = run_case(case, args.repeat, args.scale)
+        else:
+            # 每个用例一个新进程，峰值内存互不影响
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                result["cases"][case.name] = executor.submit(run_case, case, args.repeat, args.scale).result()
+        print(format_result({"cases": {case.name: result["cases"][case.name]}}).split("\n")[-1], flush=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.save_baseline:
+        # 只跑了部分用例时保留基线中的其他用例
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r") as f:
+                result["cases"] = {**json.load(f)["cases"], **result["cases"]}
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"baseline saved: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline: {args.baseline}, run with --save-baseline first")
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    if baseline.get("scale") != args.scale:
+        print(f"[WARNING] baseline scale={baseline.get('scale')} != {args.scale}, bars/sec may not be comparable")
+    print("\n" + format_result(result, baseline))
+    regression_lst = compare_result(result, baseline, args.tolerance, args.rss_tolerance)
+    for regression in regression_lst:
+        print(f"[REGRESSION] {regression}")
+    return 1 if regression_lst else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,22 @@
 from typing import List, Optional
 
-from Common.cache import make_cache
+from Common.cache import init_cache, make_cache
 from Common.CEnum import BI_DIR, BI_TYPE, DATA_FIELD, FX_TYPE, MACD_ALGO
 from Common.ChanException import CChanException, ErrCode
 from KLine.KLine import CKLine
+from KLine.KLine_MetricIndex import CKLine_MetricIndex
 from KLine.KLine_Unit import CKLine_Unit
 from Common.CTime import CTime
-from Common.func_util import logger
+from Common.trace import get_tracer
+
+TRACE = get_tracer("Bi.Bi")
 
 class CBi:
+    __slots__ = (
+        "__begin_klc", "__end_klc", "__dir", "__idx", "__type", "__is_sure", "__sure_end", "__seg_idx",
+        "parent_seg", "bsp", "next", "pre", "metric_index", "klu_lst", "_memoize_cache", "_memoize_gen",
+    )
+
     def __init__(self, begin_klc: CKLine, end_klc: CKLine, idx: int, is_sure: bool):
         """
         Initialize a CBi instance.
@@ -20,6 +28,7 @@ class CBi:
         """
         # self.__begin_klc = begin_klc
         # self.__end_klc = end_klc
+        init_cache(self)
         self.__dir = None
         self.__idx = idx
         self.__type = BI_TYPE.STRICT
@@ -40,11 +49,16 @@ class CBi:
         self.next: Optional[CBi] = None
         self.pre: Optional[CBi] = None
 
+        # 所在级别的指标区间索引，由 CBiList 设置；为 None 时逐根K线计算
+        self.metric_index: Optional[CKLine_MetricIndex] = None
+        # 所在级别按 idx 排列的单位K线列表，由 CBiList 设置；为 None 时沿合并K线链表取K线
+        self.klu_lst: Optional[List[CKLine_Unit]] = None
+
     def clean_cache(self):
         """
         Clean the memoization cache.
         """
-        self._memoize_cache = {}
+        self._memoize_gen += 1
 
     @property
     def begin_klc(self): return self.__begin_klc
@@ -85,6 +99,37 @@ class CBi:
             if not klc or klc.idx < self.begin_klc.idx:
                 break
 
+    def klu_slice(self, begin: int, end: int) -> List[CKLine_Unit]:
+        """
+        所在级别 idx 在 [begin, end] 之间的单位K线，按 idx 升序，begin 不能早于笔的第一根K线
+        级别K线列表可用时直接切片，否则从笔的第一根合并K线沿链表收集
+        """
+        if self.klu_lst is not None and end < len(self.klu_lst):
+            return self.klu_lst[begin:end+1]
+        klu_lst: List[CKLine_Unit] = []
+        klc = self.begin_klc
+        while klc is not None and klc.lst[0].idx <= end:
+            klu_lst.extend(klu for klu in klc.lst if begin <= klu.idx <= end)
+            klc = klc.next
+        return klu_lst
+
+    def klu_values(self, name: str, begin: int, end: int) -> List[Optional[float]]:
+        """
+        idx 在 [begin, end] 之间的单位K线的 macd 红绿柱、rsi 或成交量等（TRADE_INFO_LST）数值，按 idx 升序
+        """
+        klu_lst = self.klu_slice(begin, end)
+        if name == "macd":
+            return [klu.macd.macd for klu in klu_lst]
+        if name == "rsi":
+            return [klu.rsi for klu in klu_lst]
+        return [klu.trade_info.metric[name] for klu in klu_lst]
+
+    def get_klu_lst(self) -> List[CKLine_Unit]:
+        """
+        笔覆盖的全部单位K线，即 klu_idx_range 对应的区间
+        """
+        return self.klu_slice(*self.klu_idx_range())
+
     @property
     def seg_idx(self): return self.__seg_idx
 
@@ -235,7 +280,8 @@ class CBi:
         self.update_new_end(new_klc)
         self.__is_sure = False
         # print bi_list
-        logger.info(f"[Bi] update_virtual_end -->bi_list: {self}")
+        if TRACE.on:
+            TRACE.info(f"[Bi] update_virtual_end -->bi_list: {self}")
 
     def restore_from_virtual_end(self, sure_end: CKLine):
         """
@@ -244,7 +290,8 @@ class CBi:
         self.__is_sure = True
         self.update_new_end(new_klc=sure_end)
         self.__sure_end = []
-        logger.info(f"[Bi] restore_from_virtual_end -->bi_list: {self}")
+        if TRACE.on:
+            TRACE.info(f"[Bi] restore_from_virtual_end -->bi_list: {self}")
 
     def append_sure_end(self, klc: CKLine):
         """
@@ -296,11 +343,29 @@ class CBi:
         else:
             raise CChanException(f"unsupport macd_algo={macd_algo}, should be one of area/full_area/peak/diff/slope/amp", ErrCode.PARA_ERROR)
 
+    def klu_idx_range(self):
+        """
+        笔所覆盖的合并K线中，第一根和最后一根K线的 idx
+        """
+        return self.begin_klc.lst[0].idx, self.end_klc.lst[-1].idx
+
+    def get_metric_index(self) -> Optional[CKLine_MetricIndex]:
+        """
+        指标区间索引可用（已覆盖到笔的最后一根K线）时返回，否则返回 None
+        """
+        if self.metric_index is not None and self.metric_index.covers(self.end_klc.lst[-1].idx):
+            return self.metric_index
+        return None
+
     @make_cache
     def Cal_Rsi(self):
-        rsi_lst: List[float] = []
-        for klc in self.klc_lst:
-            rsi_lst.extend(klu.rsi for klu in klc.lst)
+        metric_index = self.get_metric_index()
+        if metric_index is not None and metric_index.has_rsi:
+            begin, end = self.klu_idx_range()
+            if self.is_down():
+                return 10000.0/(metric_index.rsi_extreme(begin, end, is_max=False)+1e-7)
+            return metric_index.rsi_extreme(begin, end, is_max=True)
+        rsi_lst = self.klu_values("rsi", *self.klu_idx_range())
         return 10000.0/(min(rsi_lst)+1e-7) if self.is_down() else max(rsi_lst)
 
     @make_cache
@@ -308,24 +373,26 @@ class CBi:
         _s = 1e-7
         begin_klu = self.get_begin_klu()
         end_klu = self.get_end_klu()
-        for klc in self.klc_lst:
-            for klu in klc.lst:
-                if klu.idx < begin_klu.idx or klu.idx > end_klu.idx:
-                    continue
-                if (self.is_down() and klu.macd.macd < 0) or (self.is_up() and klu.macd.macd > 0):
-                    _s += abs(klu.macd.macd)
+        metric_index = self.get_metric_index()
+        if metric_index is not None:
+            return _s + metric_index.macd_area(begin_klu.idx, end_klu.idx, self.is_up())
+        for macd in self.klu_values("macd", begin_klu.idx, end_klu.idx):
+            if (self.is_down() and macd < 0) or (self.is_up() and macd > 0):
+                _s += abs(macd)
         return _s
 
     @make_cache
     def Cal_MACD_peak(self):
         peak = 1e-7
-        for klc in self.klc_lst:
-            for klu in klc.lst:
-                if abs(klu.macd.macd) > peak:
-                    if self.is_down() and klu.macd.macd < 0:
-                        peak = abs(klu.macd.macd)
-                    elif self.is_up() and klu.macd.macd > 0:
-                        peak = abs(klu.macd.macd)
+        metric_index = self.get_metric_index()
+        if metric_index is not None:
+            return max(peak, metric_index.macd_peak(*self.klu_idx_range(), self.is_up()))
+        for macd in self.klu_values("macd", *self.klu_idx_range()):
+            if abs(macd) > peak:
+                if self.is_down() and macd < 0:
+                    peak = abs(macd)
+                elif self.is_up() and macd > 0:
+                    peak = abs(macd)
         return peak
 
     def Cal_MACD_half(self, is_reverse):
@@ -338,36 +405,32 @@ class CBi:
     def Cal_MACD_half_obverse(self):
         _s = 1e-7
         begin_klu = self.get_begin_klu()
-        peak_macd = begin_klu.macd.macd
-        for klc in self.klc_lst:
-            for klu in klc.lst:
-                if klu.idx < begin_klu.idx:
-                    continue
-                if klu.macd.macd*peak_macd > 0:
-                    _s += abs(klu.macd.macd)
-                else:
-                    break
-            else:  # 没有被break，继续找写一个KLC
-                continue
-            break
+        metric_index = self.get_metric_index()
+        if metric_index is not None:
+            return _s + metric_index.macd_run_sum(begin_klu.idx, *self.klu_idx_range(), forward=True)
+        macd_lst = self.klu_values("macd", begin_klu.idx, self.klu_idx_range()[1])
+        peak_macd = macd_lst[0]
+        for macd in macd_lst:
+            if macd*peak_macd > 0:
+                _s += abs(macd)
+            else:
+                break
         return _s
 
     @make_cache
     def Cal_MACD_half_reverse(self):
         _s = 1e-7
         begin_klu = self.get_end_klu()
-        peak_macd = begin_klu.macd.macd
-        for klc in self.klc_lst_re:
-            for klu in klc[::-1]:
-                if klu.idx > begin_klu.idx:
-                    continue
-                if klu.macd.macd*peak_macd > 0:
-                    _s += abs(klu.macd.macd)
-                else:
-                    break
-            else:  # 没有被break，继续找写一个KLC
-                continue
-            break
+        metric_index = self.get_metric_index()
+        if metric_index is not None:
+            return _s + metric_index.macd_run_sum(begin_klu.idx, *self.klu_idx_range(), forward=False)
+        macd_lst = self.klu_values("macd", self.klu_idx_range()[0], begin_klu.idx)
+        peak_macd = macd_lst[-1]
+        for macd in reversed(macd_lst):
+            if macd*peak_macd > 0:
+                _s += abs(macd)
+            else:
+                break
         return _s
 
     @make_cache
@@ -375,14 +438,15 @@ class CBi:
         """
         macd红绿柱最大值最小值之差
         """
+        metric_index = self.get_metric_index()
+        if metric_index is not None:
+            return metric_index.macd_diff(*self.klu_idx_range())
         _max, _min = float("-inf"), float("inf")
-        for klc in self.klc_lst:
-            for klu in klc.lst:
-                macd = klu.macd.macd
-                if macd > _max:
-                    _max = macd
-                if macd < _min:
-                    _min = macd
+        for macd in self.klu_values("macd", *self.klu_idx_range()):
+            if macd > _max:
+                _max = macd
+            if macd < _min:
+                _min = macd
         return _max-_min
 
     @make_cache
@@ -404,13 +468,17 @@ class CBi:
             return (end_klu.high-begin_klu.low)/begin_klu.low
 
     def Cal_MACD_trade_metric(self, metric: str, cal_avg=False) -> float:
+        metric_index = self.get_metric_index()
+        if metric_index is not None:
+            _s = metric_index.trade_metric_sum(metric, *self.klu_idx_range())
+            if _s is None:
+                return 0.0
+            return _s / self.get_klu_cnt() if cal_avg else _s
         _s = 0
-        for klc in self.klc_lst:
-            for klu in klc.lst:
-                metric_res = klu.trade_info.metric[metric]
-                if metric_res is None:
-                    return 0.0
-                _s += metric_res
+        for metric_res in self.klu_values(metric, *self.klu_idx_range()):
+            if metric_res is None:
+                return 0.0
+            _s += metric_res
         return _s / self.get_klu_cnt() if cal_avg else _s
 
     # def set_klc_lst(self, lst):
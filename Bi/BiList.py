@@ -1,11 +1,17 @@
+import time
 from typing import List, Optional, Union, overload
 
 from Common.CEnum import FX_TYPE, KLINE_DIR
 from KLine.KLine import CKLine
+from KLine.KLine_MetricIndex import CKLine_MetricIndex
+from KLine.KLine_Unit import CKLine_Unit
+from Common.profiler import PROFILER
 
 from .Bi import CBi
 from .BiConfig import CBiConfig
-from Common.func_util import logger
+from Common.trace import get_tracer
+
+TRACE = get_tracer("Bi.BiList")
 
 class CBiList:
     def __init__(self, bi_conf=CBiConfig()):
@@ -15,6 +21,11 @@ class CBiList:
 
         self.free_klc_lst = []  # 仅仅用作第一笔未画出来之前的缓存，为了获得更精准的结果而已，不加这块逻辑其实对后续计算没太大影响
 
+        # 所在级别的指标区间索引，新建的笔共享该索引计算 MACD 等背驰指标
+        self.metric_index: Optional[CKLine_MetricIndex] = None
+        # 所在级别按 idx 排列的单位K线列表，由 CKLine_List 设置
+        self.klu_lst: Optional[List[CKLine_Unit]] = None
+
     def __str__(self):
         return "\n".join([str(bi) for bi in self.bi_list])
 
@@ -41,7 +52,8 @@ class CBiList:
                 continue
             # 如果可以生成笔，则添加新笔
             if self.can_make_bi(klc, exist_free_klc):
-                logger.info(f"[Bi]### \nTry_Create first bi:\nstart={exist_free_klc.time_begin.to_str()},\nend={klc.time_begin.to_str()}, start_fx={exist_free_klc.fx}, end_fx={klc.fx}\n")
+                if TRACE.on:
+                    TRACE.info(f"[Bi]### \nTry_Create first bi:\nstart={exist_free_klc.time_begin.to_str()},\nend={klc.time_begin.to_str()}, start_fx={exist_free_klc.fx}, end_fx={klc.fx}\n")
                 self.add_new_bi(exist_free_klc, klc)
                 self.last_end = klc
                 return True
@@ -57,46 +69,59 @@ class CBiList:
         cal_virtual: 是否计算虚拟笔
         更新笔
         """
+        begin = time.perf_counter() if PROFILER.on else 0.0
         # 寻找确定结束的笔
         flag1 = self.update_bi_sure(klc)
         # 如果需要计算虚拟笔，则计算虚拟笔
         if cal_virtual:
-            logger.info(f"[Bi] Try add virtual bi after update_bi_sure --->: {last_klc}") 
+            if TRACE.on:
+                TRACE.info(f"[Bi] Try add virtual bi after update_bi_sure --->: {last_klc}")
             flag2 = self.try_add_virtual_bi(last_klc)
-            logger.info(f"[Bi] Try add virtual bi after update_bi_sure <---: {last_klc}, flag2: {flag2}")
-            return flag1 or flag2
-        else:
-            return flag1
+            if TRACE.on:
+                TRACE.info(f"[Bi] Try add virtual bi after update_bi_sure <---: {last_klc}, flag2: {flag2}")
+            flag1 = flag1 or flag2
+        if PROFILER.on:
+            PROFILER.add_time("bi.update_bi", begin)
+        return flag1
 
     # 判断是否可以更新笔的极值点
     def can_update_peak(self, klc: CKLine):
         if self.config.bi_allow_sub_peak or len(self.bi_list) < 2:
-            logger.info(f"[Bi] u0 - Cannot update peak: bi_allow_sub_peak is enabled or not enough bi elements")
+            if TRACE.on:
+                TRACE.info(f"[Bi] u0 - Cannot update peak: bi_allow_sub_peak is enabled or not enough bi elements")
             return False
         if self.bi_list[-1].is_down() and klc.high < self.bi_list[-1].get_begin_val():
-            logger.info(f"[Bi] u1 - Cannot update peak: down bi with klc.high({klc.high}) < begin_val({self.bi_list[-1].get_begin_val()})")
+            if TRACE.on:
+                TRACE.info(f"[Bi] u1 - Cannot update peak: down bi with klc.high({klc.high}) < begin_val({self.bi_list[-1].get_begin_val()})")
             return False
         if self.bi_list[-1].is_up() and klc.low > self.bi_list[-1].get_begin_val():
-            logger.info(f"[Bi] u2 - Cannot update peak: up bi with klc.low({klc.low}) > begin_val({self.bi_list[-1].get_begin_val()})")
+            if TRACE.on:
+                TRACE.info(f"[Bi] u2 - Cannot update peak: up bi with klc.low({klc.low}) > begin_val({self.bi_list[-1].get_begin_val()})")
             return False
         if not end_is_peak(self.bi_list[-2].begin_klc, klc):
-            logger.info(f"[Bi] u3 - Cannot update peak: end is not a peak between bi_list[-2].begin_klc and klc")
+            if TRACE.on:
+                TRACE.info(f"[Bi] u3 - Cannot update peak: end is not a peak between bi_list[-2].begin_klc and klc")
             return False
         if self[-1].is_down() and self[-1].get_end_val() < self[-2].get_begin_val():
-            logger.info(f"[Bi] u4 - Cannot update peak: down bi with end_val({self[-1].get_end_val()}) < previous begin_val({self[-2].get_begin_val()})")    
+            if TRACE.on:
+                TRACE.info(f"[Bi] u4 - Cannot update peak: down bi with end_val({self[-1].get_end_val()}) < previous begin_val({self[-2].get_begin_val()})")
             return False
         if self[-1].is_up() and self[-1].get_end_val() > self[-2].get_begin_val():
-            logger.info(f"[Bi] u5 - Cannot update peak: up bi with end_val({self[-1].get_end_val()}) > previous begin_val({self[-2].get_begin_val()})")
+            if TRACE.on:
+                TRACE.info(f"[Bi] u5 - Cannot update peak: up bi with end_val({self[-1].get_end_val()}) > previous begin_val({self[-2].get_begin_val()})")
             return False
-        logger.info(f"[Bi] u6 - Can update peak: all conditions passed")
+        if TRACE.on:
+            TRACE.info(f"[Bi] u6 - Can update peak: all conditions passed")
         return True
 
     # 更新笔的极值点
     def update_peak(self, klc: CKLine, for_virtual=False):
-        logger.info(f"[Bi] update_peak --> : {klc}")
+        if TRACE.on:
+            TRACE.info(f"[Bi] update_peak --> : {klc}")
         # 判断是否可以更新笔的极值点
         if not self.can_update_peak(klc):
-            logger.info(f"[Bi] update_peak <--: cannot update peak")
+            if TRACE.on:
+                TRACE.info(f"[Bi] update_peak <--: cannot update peak")
             return False
         assert len(self.bi_list) > 0
         # 删除最后一笔
@@ -106,13 +131,15 @@ class CBiList:
         if not self.try_update_end(klc, for_virtual=for_virtual):
             # 如果不能更新笔的结束K线，则恢复最后一笔
             self.bi_list.append(_tmp_last_bi)
-            logger.info(f"[Bi] update_peak <--: cannot update end")
+            if TRACE.on:
+                TRACE.info(f"[Bi] update_peak <--: cannot update end")
             return False
         else:
             # 如果可以更新笔的结束K线，则添加确定结束K线
             if for_virtual:
                 self.bi_list[-1].append_sure_end(_tmp_last_bi.end_klc)
-            logger.info(f"[Bi] update_peak <--: update end success")
+            if TRACE.on:
+                TRACE.info(f"[Bi] update_peak <--: update end success")
             return True
 
     # 更新笔的确定结束K线
@@ -124,35 +151,43 @@ class CBiList:
         _tmp_end = self.get_last_klu_of_last_bi()
         # 删除虚拟笔，更新 self.last_end 和 self[-1].next 属性
         self.delete_virtual_bi()
-        logger.info(f"[Bi] update_bi_sure --->: {klc}, _tmp_end: {_tmp_end}")
+        if TRACE.on:
+            TRACE.info(f"[Bi] update_bi_sure --->: {klc}, _tmp_end: {_tmp_end}")
         '''
         下面的if case顺序不能打乱，必须先处理 未知分型 的情况，否则会出错
         '''
         # 如果当前K线返回的fx为未知，在删除虚拟笔后，判断 之前最后一笔的结束K线 是否与 删除虚拟笔后的最后一笔的结束K线 相同
         if klc.fx == FX_TYPE.UNKNOWN:
             if len(self.bi_list) > 0:
-                logger.info(f"[Bi] u0- fx is unknown, it has new peak: {self[-1].get_end_val()}, last_end: {self.last_end}")
+                if TRACE.on:
+                    TRACE.info(f"[Bi] u0- fx is unknown, it has new peak: {self[-1].get_end_val()}, last_end: {self.last_end}")
             return _tmp_end != self.get_last_klu_of_last_bi()  # 虚笔是否有变
         if self.last_end is None or len(self.bi_list) == 0:
             # 如果最后一笔的结束K线为None，或者笔列表为空，则尝试创建第一笔
-            logger.info(f"[Bi] u1 - Try create first bi: {klc}")
+            if TRACE.on:
+                TRACE.info(f"[Bi] u1 - Try create first bi: {klc}")
             return self.try_create_first_bi(klc)
         if klc.fx == self.last_end.fx:
             # 如果当前K线的分型类型与最后一笔的结束K线的分型类型相同，则尝试更新最后一笔的结束K线
-            logger.info(f"[Bi] u2 - Try update end: {klc}")
+            if TRACE.on:
+                TRACE.info(f"[Bi] u2 - Try update end: {klc}")
             return self.try_update_end(klc)
         elif self.can_make_bi(klc, self.last_end):
             # 如果可以生成笔，则添加新笔
-            logger.info(f"[Bi] u3 - It's a new bi: {klc}")
+            if TRACE.on:
+                TRACE.info(f"[Bi] u3 - It's a new bi: {klc}")
             self.add_new_bi(self.last_end, klc)
             self.last_end = klc
-            logger.info(f"[Bi] u4 - Add New bi: {self[-1]} , last_end: {self.last_end}")
+            if TRACE.on:
+                TRACE.info(f"[Bi] u4 - Add New bi: {self[-1]} , last_end: {self.last_end}")
             return True
         elif self.update_peak(klc):
             # 如果可以更新笔的 极值点，则返回True
-            logger.info(f"[Bi] u5 - Updated peak done: {self[-1]} , peak: {self[-1].get_end_val()}")
+            if TRACE.on:
+                TRACE.info(f"[Bi] u5 - Updated peak done: {self[-1]} , peak: {self[-1].get_end_val()}")
             return True
-        logger.info(f"[Bi] u6 - check _tmp_end != self.get_last_klu_of_last_bi(): {_tmp_end != self.get_last_klu_of_last_bi()}")
+        if TRACE.on:
+            TRACE.info(f"[Bi] u6 - check _tmp_end != self.get_last_klu_of_last_bi(): {_tmp_end != self.get_last_klu_of_last_bi()}")
         return _tmp_end != self.get_last_klu_of_last_bi()
 
     def delete_virtual_bi(self):
@@ -161,6 +196,8 @@ class CBiList:
         """
         # 如果笔列表不为空，且最后一笔为未确定笔
         if len(self) > 0 and not self.bi_list[-1].is_sure:
+            if PROFILER.on:
+                PROFILER.incr("bi.virtual_bi_delete")
             # 获取最后一笔的确定结束K线列表
             sure_end_list = [klc for klc in self.bi_list[-1].sure_end]
             if len(sure_end_list):
@@ -189,16 +226,19 @@ class CBiList:
         @param klc: 当前Klc
         @param need_del_end: 是否需要删除最后一笔
         """
-        logger.info(f"[Bi] try_add_virtual_bi --->: {klc}, need_del_end: {need_del_end}")
+        if TRACE.on:
+            TRACE.info(f"[Bi] try_add_virtual_bi --->: {klc}, need_del_end: {need_del_end}")
         if need_del_end:
             self.delete_virtual_bi()
         if len(self) == 0:
             # 当前没有确定的笔，没必要添加虚拟笔
-            logger.info(f"[Bi] u0 - Try add virtual bi failed: {klc}")
+            if TRACE.on:
+                TRACE.info(f"[Bi] u0 - Try add virtual bi failed: {klc}")
             return False
         if klc.idx == self[-1].end_klc.idx:
             # 当前Klc与最后一笔的结束K线相同，没必要添加虚拟笔
-            logger.info(f"[Bi] u1 - Try add virtual bi failed: {klc}")
+            if TRACE.on:
+                TRACE.info(f"[Bi] u1 - Try add virtual bi failed: {klc}")
             return False
         if (self[-1].is_up() and klc.high >= self[-1].end_klc.high) or \
             (self[-1].is_down() and klc.low <= self[-1].end_klc.low):
@@ -209,7 +249,10 @@ class CBiList:
             # 2. 更新 确定结束K线
             # 3. 设置 是否确定笔 为 False
             self.bi_list[-1].update_virtual_end(klc)
-            logger.info(f"[Bi] u2 - Try update end of virtual bi success: {klc}")
+            if PROFILER.on:
+                PROFILER.incr("bi.virtual_bi_update_end")
+            if TRACE.on:
+                TRACE.info(f"[Bi] u2 - Try update end of virtual bi success: {klc}")
             return True
         # 保存临时 klc
         _tmp_klc = klc
@@ -218,24 +261,36 @@ class CBiList:
             if self.can_make_bi(_tmp_klc, self[-1].end_klc, for_virtual=True):
                 # 新增一笔
                 self.add_new_bi(self.last_end, _tmp_klc, is_sure=False)
-                logger.info(f"[Bi] u3 - <<<Try add new bi success>>>: {self[-1]}")
+                if PROFILER.on:
+                    PROFILER.incr("bi.virtual_bi_add")
+                if TRACE.on:
+                    TRACE.info(f"[Bi] u3 - <<<Try add new bi success>>>: {self[-1]}")
                 return True
             elif self.update_peak(_tmp_klc, for_virtual=True):
-                logger.info(f"[Bi] u4 - Try update peak of virtual bi success: {self[-1]}")
+                if PROFILER.on:
+                    PROFILER.incr("bi.virtual_bi_update_peak")
+                if TRACE.on:
+                    TRACE.info(f"[Bi] u4 - Try update peak of virtual bi success: {self[-1]}")
                 return True
             # 继续遍历前一笔
             _tmp_klc = _tmp_klc.pre
-        logger.info(f"[Bi] u5 - Try add virtual bi failed: {klc}")
+        if TRACE.on:
+            TRACE.info(f"[Bi] u5 - Try add virtual bi failed: {klc}")
         return False
 
     # 添加新笔， 主要是操作 bi_list 的 next 和 pre 属性
     def add_new_bi(self, pre_klc, cur_klc, is_sure=True):
         # 添加新笔
         self.bi_list.append(CBi(pre_klc, cur_klc, idx=len(self.bi_list), is_sure=is_sure))
+        self.bi_list[-1].metric_index = self.metric_index
+        self.bi_list[-1].klu_lst = self.klu_lst
         # 如果笔列表长度大于等于2，则设置前一笔的下一个笔为当前笔，当前笔的前一笔为前前笔
         if len(self.bi_list) >= 2:
             self.bi_list[-2].next = self.bi_list[-1]
             self.bi_list[-1].pre = self.bi_list[-2]
+        if TRACE.on:
+            bi = self.bi_list[-1]
+            TRACE.event("add_bi", idx=bi.idx, dir=bi.dir, is_sure=is_sure, begin=bi.get_begin_klu().time, end=bi.get_end_klu().time)
 
     def satisfy_bi_span(self, klc: CKLine, last_end: CKLine):
         # 判断是否满足笔的跨度
@@ -275,20 +330,24 @@ class CBiList:
         2. 判断是否满足笔的顶点
         3. 判断是否满足笔的结束
         '''
-        logger.info(f"[Bi] can_make_bi: {klc}, {last_end}, for_virtual: {for_virtual}")
+        if TRACE.on:
+            TRACE.info(f"[Bi] can_make_bi: {klc}, {last_end}, for_virtual: {for_virtual}")
         # 判断是否满足笔的跨度
         satisify_span = True if self.config.bi_algo == 'fx' else self.satisfy_bi_span(klc, last_end)
         if not satisify_span:   
             return False
         # 判断是否满足笔的顶点
         if not last_end.check_fx_valid(klc, self.config.bi_fx_check, for_virtual):
-            logger.info(f"[Bi] can_make_bi: False, not last_end.check_fx_valid")
+            if TRACE.on:
+                TRACE.info(f"[Bi] can_make_bi: False, not last_end.check_fx_valid")
             return False
         # 判断是否满足笔的结束
         if self.config.bi_end_is_peak and not end_is_peak(last_end, klc):
-            logger.info(f"[Bi] can_make_bi: False, not end_is_peak")
+            if TRACE.on:
+                TRACE.info(f"[Bi] can_make_bi: False, not end_is_peak")
             return False
-        logger.info(f"[Bi] can_make_bi: True")
+        if TRACE.on:
+            TRACE.info(f"[Bi] can_make_bi: True")
         return True
 
     def try_update_end(self, klc: CKLine, for_virtual=False) -> bool:
@@ -311,10 +370,12 @@ class CBiList:
            (last_bi.is_down() and check_bottom(klc, for_virtual) and klc.low <= last_bi.get_end_val()):
             last_bi.update_virtual_end(klc) if for_virtual else last_bi.update_new_end(klc)
             self.last_end = klc
-            logger.info(f"Updated {'virtual' if for_virtual else 'new'} end of bi: {last_bi}, new end: {klc}")
+            if TRACE.on:
+                TRACE.info(f"Updated {'virtual' if for_virtual else 'new'} end of bi: {last_bi}, new end: {klc}")
             return True
         else:
-            logger.info(f"keep end of bi: {last_bi}, candidate: {klc}, for_virtual: {for_virtual}")
+            if TRACE.on:
+                TRACE.info(f"keep end of bi: {last_bi}, candidate: {klc}, for_virtual: {for_virtual}")
             return False
 
     def get_last_klu_of_last_bi(self) -> Optional[int]:
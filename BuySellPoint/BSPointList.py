@@ -1,9 +1,11 @@
+import time
 from typing import Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
 
 from Bi.Bi import CBi
 from Bi.BiList import CBiList
 from Common.CEnum import BSP_TYPE
 from Common.func_util import has_overlap
+from Common.profiler import PROFILER
 from Seg.Seg import CSeg
 from Seg.SegListComm import CSegListComm
 from ZS.ZS import CZS
@@ -66,6 +68,7 @@ class CBSPointList(Generic[LINE_TYPE, LINE_LIST_TYPE]):
         return len(self.bsp_store_flat_dict)
 
     def cal(self, bi_list: LINE_LIST_TYPE, seg_list: CSegListComm[LINE_TYPE]):
+        begin = time.perf_counter() if PROFILER.on else 0.0
         self.clear_store_end()
         self.clear_bsp1_end()
         self.cal_seg_bs1point(seg_list, bi_list)
@@ -73,6 +76,8 @@ class CBSPointList(Generic[LINE_TYPE, LINE_LIST_TYPE]):
         self.cal_seg_bs3point(seg_list, bi_list)
 
         self.update_last_pos(seg_list)
+        if PROFILER.on:
+            PROFILER.add_time("bsp.cal" if isinstance(bi_list, CBiList) else "seg_bsp.cal", begin)
 
     def update_last_pos(self, seg_list: CSegListComm):
         self.last_sure_pos = -1
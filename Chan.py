@@ -1,7 +1,9 @@
 import copy
 import datetime
+import threading
+import time
 from collections import defaultdict
-from typing import Dict, Iterable, List, Optional, Union
+from typing import Dict, Iterable, List, Optional, Type, Union
 
 from BuySellPoint.BS_Point import CBS_Point
 from ChanConfig import CChanConfig
@@ -9,10 +11,43 @@ from Common.CEnum import AUTYPE, DATA_SRC, KL_TYPE
 from Common.ChanException import CChanException, ErrCode
 from Common.CTime import CTime
 from Common.func_util import check_kltype_order, kltype_lte_day
+from Common.profiler import PROFILER
 from DataAPI.CommonStockAPI import CCommonStockApi
 from KLine.KLine_List import CKLine_List
 from KLine.KLine_Unit import CKLine_Unit
-import dill  # Add this import at the top of the file
+
+
+def GetStockAPICls(data_src: Union[DATA_SRC, str, Type[CCommonStockApi]]) -> Type[CCommonStockApi]:
+    '''
+    根据 data_src 获取数据源类：DATA_SRC 枚举、"custom:模块名.类名"、"store:K线库目录" 或者直接传入 CCommonStockApi 子类
+    '''
+    if isinstance(data_src, type) and issubclass(data_src, CCommonStockApi):
+        return data_src
+    _dict = {}
+    if data_src == DATA_SRC.BAO_STOCK:
+        from DataAPI.BaoStockAPI import CBaoStock
+        _dict[DATA_SRC.BAO_STOCK] = CBaoStock
+    elif data_src == DATA_SRC.CCXT:
+        from DataAPI.ccxt import CCXT
+        _dict[DATA_SRC.CCXT] = CCXT
+    elif data_src == DATA_SRC.CSV:
+        from DataAPI.csvAPI import CSV_API
+        _dict[DATA_SRC.CSV] = CSV_API
+    elif data_src == DATA_SRC.BAR_STORE:
+        from DataAPI.BarStore import get_bar_store_api_cls
+        _dict[DATA_SRC.BAR_STORE] = get_bar_store_api_cls()
+    if data_src in _dict:
+        return _dict[data_src]
+    assert isinstance(data_src, str)
+    if data_src.startswith("store:"):
+        from DataAPI.BarStore import get_bar_store_api_cls
+        return get_bar_store_api_cls(data_src[len("store:"):])
+    if data_src.find("custom:") < 0:
+        raise CChanException("load src type error", ErrCode.SRC_DATA_TYPE_ERR)
+    package_info = data_src.split(":")[1]
+    package_name, cls_name = package_info.split(".")
+    exec(f"from DataAPI.{package_name} import {cls_name}")
+    return eval(cls_name)
 
 
 class CChan:
@@ -21,7 +56,7 @@ class CChan:
         code,
         begin_time=None,
         end_time=None,
-        data_src: Union[DATA_SRC, str] = DATA_SRC.BAO_STOCK,
+        data_src: Union[DATA_SRC, str, Type[CCommonStockApi]] = DATA_SRC.BAO_STOCK,
         lv_list=None,
         config=None,
         autype: AUTYPE = AUTYPE.QFQ,
@@ -45,6 +80,10 @@ class CChan:
         self.kl_inconsistent_detail = defaultdict(list)
         # 存储每个级别K线迭代器
         self.g_kl_iter = defaultdict(list)
+        # 后台预取线程（kl_prefetch 配置）
+        self.prefetch_iter_lst = []
+        # feed_resample 用的K线合成器
+        self.resampler = None
         # 初始化
         self.do_init()
         # 如果非回放模式，则加载所有K线
@@ -66,6 +105,9 @@ class CChan:
         obj.kl_misalign_cnt = self.kl_misalign_cnt
         obj.kl_inconsistent_detail = copy.deepcopy(self.kl_inconsistent_detail, memo)
         obj.g_kl_iter = copy.deepcopy(self.g_kl_iter, memo)
+        obj.prefetch_iter_lst = []
+        obj.resampler = copy.deepcopy(self.resampler, memo)
+        obj.session_calendar = copy.deepcopy(self.session_calendar, memo)
         if hasattr(self, 'klu_cache'):
             obj.klu_cache = copy.deepcopy(self.klu_cache, memo)
         if hasattr(self, 'klu_last_t'):
@@ -80,9 +122,14 @@ class CChan:
                     if klu.sup_kl:
                         memo[id(klu)].sup_kl = memo[id(klu.sup_kl)]
                     memo[id(klu)].sub_kl_list = [memo[id(sub_kl)] for sub_kl in klu.sub_kl_list]
+        if hasattr(self, 'feed_orphan_klu'):
+            obj.feed_orphan_klu = copy.deepcopy(self.feed_orphan_klu, memo)
         return obj
 
     def do_init(self):
+        from DataAPI.Resample import get_session_calendar
+        # kl_resample/feed_resample 合成K线的交易时段，after_parent 对每根父级别K线都要用到，只在这里解析一次
+        self.session_calendar = get_session_calendar(self.conf.kl_session)
         self.kl_datas: Dict[KL_TYPE, CKLine_List] = {}
         for idx in range(len(self.lv_list)):
             self.kl_datas[self.lv_list[idx]] = CKLine_List(self.lv_list[idx], conf=self.conf)
@@ -121,22 +168,18 @@ class CChan:
     def get_next_lv_klu(self, lv_idx):
         '''
         获取当前级别K线迭代器，如果当前级别K线迭代器为空，则抛出StopIteration异常
+        当前迭代器取完后依次换用该级别的下一个迭代器
         '''
         if isinstance(lv_idx, int):
             lv_idx = self.lv_list[lv_idx]
-        if len(self.g_kl_iter[lv_idx]) == 0:
-            raise StopIteration
-        try:
-            # 获取当前级别K线迭代器的下一个K线
-            return self.g_kl_iter[lv_idx][0].__next__()
-        except StopIteration:
-            # 用当前级别K线迭代器中的下一个K线替换当前级别K线迭代器
-            self.g_kl_iter[lv_idx] = self.g_kl_iter[lv_idx][1:]
-            if len(self.g_kl_iter[lv_idx]) != 0:
-                # 如果当前级别K线迭代器不为空，则递归获取下一个K线
-                return self.get_next_lv_klu(lv_idx)
-            else:
-                raise
+        iter_lst = self.g_kl_iter[lv_idx]
+        while iter_lst:
+            try:
+                # 获取当前级别K线迭代器的下一个K线
+                return iter_lst[0].__next__()
+            except StopIteration:
+                iter_lst.pop(0)
+        raise StopIteration
 
     def step_load(self):
         assert self.conf.trigger_step
@@ -150,12 +193,18 @@ class CChan:
         if not yielded:
             yield self
 
+    def init_klu_cache(self):
+        # 初始化每个级别K线缓存
+        self.klu_cache: List[Optional[CKLine_Unit]] = [None for _ in self.lv_list]
+        # 初始化每个级别K线时间
+        self.klu_last_t = [CTime(1980, 1, 1, 0, 0) for _ in self.lv_list]
+        # feed 模式下每个级别尚未找到父级别K线的K线
+        self.feed_orphan_klu: List[List[CKLine_Unit]] = [[] for _ in self.lv_list]
+
     def trigger_load(self, inp):
         # {type: [klu, ...]}
         if not hasattr(self, 'klu_cache'):
-            self.klu_cache: List[Optional[CKLine_Unit]] = [None for _ in self.lv_list]
-        if not hasattr(self, 'klu_last_t'):
-            self.klu_last_t = [CTime(1980, 1, 1, 0, 0) for _ in self.lv_list]
+            self.init_klu_cache()
         for lv_idx, lv in enumerate(self.lv_list):
             if lv not in inp:
                 if lv_idx == 0:
@@ -171,10 +220,59 @@ class CChan:
             for lv in self.lv_list:
                 self.kl_datas[lv].cal_seg_and_zs()
 
+    def feed(self, klu: CKLine_Unit, lv: Optional[Union[KL_TYPE, int]] = None) -> None:
+        '''
+        流式喂入单根K线，只做这根K线涉及的增量计算，不会重放历史
+        lv: K线所属级别，默认为最高级别
+        多级别时按 load 的顺序喂入（父级别K线先于其包含的次级别K线），结果与一次性 load 完全一致；
+        次级别K线先到时会先完成本级别计算，父子关系等父级别K线到达后再补上
+        每根的开销：回放模式（trigger_step=True）只在笔变化时计算线段中枢；
+        非回放模式每根都对当前级别调用一次 cal_seg_and_zs（补虚笔后计算线段、中枢、买卖点），
+        这些步骤都从上一次确定的位置增量计算，开销不随历史长度增长，但新K线没有改变笔时也要走一遍，
+        上证日线上每根约 0.45ms，回放模式约 0.3ms
+        '''
+        if not hasattr(self, 'klu_cache'):
+            self.init_klu_cache()
+        if lv is None:
+            lv_idx = 0
+        elif isinstance(lv, KL_TYPE):
+            lv_idx = self.lv_list.index(lv)
+        else:
+            lv_idx = lv
+        cur_lv = self.lv_list[lv_idx]
+        klu.kl_type = cur_lv
+        self.try_set_klu_idx(lv_idx, klu)
+        if not klu.time > self.klu_last_t[lv_idx]:
+            raise CChanException(f"kline time err, cur={klu.time}, last={self.klu_last_t[lv_idx]}", ErrCode.KL_NOT_MONOTONOUS)
+        self.klu_last_t[lv_idx] = klu.time
+
+        pre_klu = self[lv_idx].last_klu()
+        klu.set_pre_klu(pre_klu)
+        self.add_new_kl(cur_lv, klu)
+        if not self.conf.trigger_step:
+            # 非回放模式 add_single_klu 不会计算线段中枢，这里只对当前级别补算一次
+            self.kl_datas[cur_lv].cal_seg_and_zs()
+
+        if lv_idx != len(self.lv_list) - 1:
+            # 新的父级别K线到来，上一根父级别K线的次级别K线已经齐全
+            if pre_klu is not None:
+                self.check_kl_align(pre_klu, lv_idx)
+            orphan_lst = self.feed_orphan_klu[lv_idx+1]
+            while orphan_lst and not self.after_parent(orphan_lst[0], klu, lv_idx+1):
+                self.set_klu_parent_relation(klu, orphan_lst.pop(0), self.lv_list[lv_idx+1], lv_idx+1)
+        if lv_idx != 0:
+            parent_klu = self[lv_idx-1].last_klu()
+            if parent_klu is not None and not self.after_parent(klu, parent_klu, lv_idx) and not self.feed_orphan_klu[lv_idx]:
+                self.set_klu_parent_relation(parent_klu, klu, cur_lv, lv_idx)
+            else:
+                self.feed_orphan_klu[lv_idx].append(klu)
+
     def init_lv_klu_iter(self, stockapi_cls):
         '''
         初始化每个级别K线迭代器
         '''
+        if self.conf.kl_resample:
+            return self.init_resample_klu_iter(stockapi_cls)
         # 为了跳过一些获取数据失败的级别
         lv_klu_iter = []
         valid_lv_list = []
@@ -194,34 +292,77 @@ class CChan:
                     continue
                 raise e
         self.lv_list = valid_lv_list
+        if self.conf.kl_prefetch > 0:
+            # 所有级别的数据源实例构造完之后再启动预取线程，非线程安全的数据源各级别共用一把锁轮流读取
+            from DataAPI.Prefetch import CPrefetchIter
+            lock = None if stockapi_cls.thread_safe else threading.Lock()
+            lv_klu_iter = [CPrefetchIter(klu_iter, maxsize=self.conf.kl_prefetch, lock=lock) for klu_iter in lv_klu_iter]
+            self.prefetch_iter_lst.extend(lv_klu_iter)
         return lv_klu_iter
 
+    def init_resample_klu_iter(self, stockapi_cls):
+        '''
+        kl_resample 模式：只读取最小级别的K线，其他级别由它合成
+        '''
+        from DataAPI.Resample import CResampleFeed
+        base_iter = self.get_load_stock_iter(stockapi_cls, self.lv_list[-1])
+        if self.conf.kl_prefetch > 0:
+            from DataAPI.Prefetch import CPrefetchIter
+            base_iter = CPrefetchIter(base_iter, maxsize=self.conf.kl_prefetch)
+            self.prefetch_iter_lst.append(base_iter)
+        resample_feed = CResampleFeed(base_iter, self.lv_list, self.session_calendar)
+        return [resample_feed.lv_iter(lv_idx) for lv_idx in range(len(self.lv_list))]
+
+    def feed_resample(self, klu: CKLine_Unit) -> None:
+        '''
+        流式喂入一根最小级别（lv_list 最后一个）K线，更大级别的K线按 kl_session 的交易时段合成，走完一根就喂入一根
+        尚未走完的K线不会加入当前对象，需要时用 forming_view() 查看
+        '''
+        if self.resampler is None:
+            from DataAPI.Resample import CKLineResampler
+            self.resampler = CKLineResampler(self.lv_list, self.session_calendar)
+        for lv, sup_klu in self.resampler.update(klu):
+            self.feed(sup_klu, lv)
+        self.feed(klu, len(self.lv_list) - 1)
+
+    def forming_view(self) -> 'CChan':
+        '''
+        feed_resample 时，返回一个额外加入了各级别尚未走完的K线的分支，当前对象不受影响
+        '''
+        chan = copy.deepcopy(self)
+        if chan.resampler is not None:
+            for lv, sup_klu in chan.resampler.forming():
+                chan.feed(sup_klu, lv)
+        return chan
+
+    def fork(self):
+        '''
+        临时分支：只保存当前尚未确定的尾部，之后 feed 的K线在 discard（或 with 块结束）时全部撤销，用于试算假设的K线，见 ChanFork.py
+        已经确定的K线、笔、线段等不复制；需要长期保留两个互不影响的对象时用 copy.deepcopy
+        '''
+        from ChanFork import CChanFork
+        return CChanFork(self)
+
+    def close_prefetch(self):
+        for prefetch_iter in self.prefetch_iter_lst:
+            prefetch_iter.close()
+        self.prefetch_iter_lst = []
+
     def GetStockAPI(self):
-        _dict = {}
-        if self.data_src == DATA_SRC.BAO_STOCK:
-            from DataAPI.BaoStockAPI import CBaoStock
-            _dict[DATA_SRC.BAO_STOCK] = CBaoStock
-        elif self.data_src == DATA_SRC.CCXT:
-            from DataAPI.ccxt import CCXT
-            _dict[DATA_SRC.CCXT] = CCXT
-        elif self.data_src == DATA_SRC.CSV:
-            from DataAPI.csvAPI import CSV_API
-            _dict[DATA_SRC.CSV] = CSV_API
-        if self.data_src in _dict:
-            return _dict[self.data_src]
-        assert isinstance(self.data_src, str)
-        if self.data_src.find("custom:") < 0:
-            raise CChanException("load src type error", ErrCode.SRC_DATA_TYPE_ERR)
-        package_info = self.data_src.split(":")[1]
-        package_name, cls_name = package_info.split(".")
-        exec(f"from DataAPI.{package_name} import {cls_name}")
-        return eval(cls_name)
+        return GetStockAPICls(self.data_src)
 
     def load(self, step=False):
         '''
         加载K线
         step: 是否是回放模式
         '''
+        if not step and self.conf.parallel_lv and not self.conf.kl_resample and len(self.lv_list) > 1:
+            # 各级别在单独的 worker 中计算，最后补上父子级别关系
+            from ChanParallel import parallel_load
+            parallel_load(self)
+            if len(self[0]) == 0:
+                raise CChanException("最高级别没有获得任何数据", ErrCode.NO_DATA)
+            return
         stockapi_cls = self.GetStockAPI()
         try:
             # 初始化数据源
@@ -230,10 +371,7 @@ class CChan:
             for lv_idx, klu_iter in enumerate(self.init_lv_klu_iter(stockapi_cls)):
                 # 将每个级别K线迭代器添加到g_kl_iter中
                 self.add_lv_iter(lv_idx, klu_iter)
-            # 初始化每个级别K线缓存
-            self.klu_cache: List[Optional[CKLine_Unit]] = [None for _ in self.lv_list]
-            # 初始化每个级别K线时间
-            self.klu_last_t = [CTime(1980, 1, 1, 0, 0) for _ in self.lv_list]
+            self.init_klu_cache()
             # 计算入口
             yield from self.load_iterator(lv_idx=0, parent_klu=None, step=step)
             if not step:
@@ -243,7 +381,8 @@ class CChan:
         except Exception:
             raise
         finally:
-            # 关闭数据源
+            # 先停止预取线程再关闭数据源
+            self.close_prefetch()
             stockapi_cls.do_close()
         if len(self[0]) == 0:
             raise CChanException("最高级别没有获得任何数据", ErrCode.NO_DATA)
@@ -273,71 +412,98 @@ class CChan:
         if kline_unit.idx >= 0:
             return
         # 如果当前级别K线列表为空，则设置K线索引为0
-        if len(self[lv_idx]) == 0:
+        last_klu = self[lv_idx].last_klu()
+        if last_klu is None:
             kline_unit.set_idx(0)
         else:
             # 如果当前级别K线列表不为空，则设置K线索引为最后一个K线的索引加1
-            kline_unit.set_idx(self[lv_idx][-1][-1].idx + 1)
+            kline_unit.set_idx(last_klu.idx + 1)
 
     # 加载K线迭代器
     def load_iterator(self, lv_idx, parent_klu, step):
+        '''
+        多级别K线按时间合并的非递归调度，处理顺序与逐级递归一致：
+        每根K线加入后，先处理完它在次级别包含的所有K线（时间不晚于它的），再检查对齐、取本级别下一根
+        open_klu[i] 为第 i 级别当前正在处理次级别的K线；超过父级别K线时间的K线放回 klu_cache 留给下一根父级别K线
+        '''
         # K线时间天级别以下描述的是结束时间，如60M线，每天第一根是10点30的
         # 天以上是当天日期
-
-        # 获取当前级别
-        cur_lv = self.lv_list[lv_idx]
-        # Retrieve the last CKLine_Unit from the last CKLine in the list at level lv_idx.
-        # This is done by first checking if there are any CKLines at the specified level (self[lv_idx])
-        # and then ensuring that the last CKLine itself contains any CKLine_Units.
-        # If both conditions are met, access the last CKLine_Unit; otherwise, set pre_klu to None.
-        pre_klu = self[lv_idx][-1][-1] if len(self[lv_idx]) > 0 and len(self[lv_idx][-1]) > 0 else None
+        last_lv_idx = len(self.lv_list) - 1
+        open_klu: List[Optional[CKLine_Unit]] = [None] * len(self.lv_list)
+        cur_idx = lv_idx
         while True:
-            # klu缓存非None, 则使用该lv_idx的缓存
-            if self.klu_cache[lv_idx]:
-                kline_unit = self.klu_cache[lv_idx]
-                assert kline_unit is not None
-                # 缓存置空
-                self.klu_cache[lv_idx] = None
-            else:
-                try:
-                    # 获取下一个K线
-                    kline_unit = self.get_next_lv_klu(lv_idx)
-                    # 设置K线索引
-                    self.try_set_klu_idx(lv_idx, kline_unit)
-                    # 检查K线时间是否单调
-                    if not kline_unit.time > self.klu_last_t[lv_idx]:
-                        raise CChanException(f"kline time err, cur={kline_unit.time}, last={self.klu_last_t[lv_idx]},"
-                                             f"or refer to quick_guide.md, try set auto=False in the CTime returned by your data source class",
-                                             ErrCode.KL_NOT_MONOTONOUS)
-                    # 更新前一个K线时间
-                    self.klu_last_t[lv_idx] = kline_unit.time
-                except StopIteration:
-                    # 如果当前级别K线迭代器为空，则退出
+            cur_parent = parent_klu if cur_idx == lv_idx else open_klu[cur_idx-1]
+            kline_unit = self.fetch_lv_klu(cur_idx)
+            # 本级别没有数据了，或者超出了父级别K线的时间：当前父级别K线的次级别K线已经齐全
+            if kline_unit is None or (cur_parent and self.after_parent(kline_unit, cur_parent, cur_idx)):
+                if kline_unit is not None:
+                    self.klu_cache[cur_idx] = kline_unit
+                if cur_idx == lv_idx:
                     break
-            # 如果父级别存在，并且当前K线时间大于父级别K线时间
-            if parent_klu and kline_unit.time > parent_klu.time:
-                # 缓存当前K线
-                self.klu_cache[lv_idx] = kline_unit
-                break
+                cur_idx -= 1
+                # 检查 不同周期的K线是否对齐
+                self.check_kl_align(open_klu[cur_idx], cur_idx)
+                if cur_idx == 0 and step:
+                    # 如果是最高级别，并且是回放模式，则返回缠论计算结果
+                    yield self
+                continue
             # 设置当前K线的前一个K线
-            kline_unit.set_pre_klu(pre_klu)
-            # 更新前一个K线
-            pre_klu = kline_unit
-            # 添加当前级别 lv_idx 的新K线 并且进行缠论的逐根计算
-            self.add_new_kl(cur_lv, kline_unit)
+            kline_unit.set_pre_klu(self[cur_idx].last_klu())
+            # 添加当前级别的新K线 并且进行缠论的逐根计算
+            self.add_new_kl(self.lv_list[cur_idx], kline_unit)
             # 设置当前K线的父级别
-            if parent_klu:
-                self.set_klu_parent_relation(parent_klu, kline_unit, cur_lv, lv_idx)
-            # 递归处理下一级别
-            if lv_idx != len(self.lv_list)-1:
-                for _ in self.load_iterator(lv_idx+1, kline_unit, step):
-                    ...
-                # 检查 不同周期的K线是否对齐
-                self.check_kl_align(kline_unit, lv_idx)
-            if lv_idx == 0 and step:
-                # 如果是最高级别，并且是回放模式，则返回缠论计算结果
+            if cur_parent:
+                self.set_klu_parent_relation(cur_parent, kline_unit, self.lv_list[cur_idx], cur_idx)
+            if cur_idx != last_lv_idx:
+                # 接着处理次级别
+                open_klu[cur_idx] = kline_unit
+                cur_idx += 1
+            elif cur_idx == 0 and step:
                 yield self
 
+    def fetch_lv_klu(self, lv_idx) -> Optional[CKLine_Unit]:
+        '''
+        取本级别下一根K线：优先取 klu_cache 中放回的K线；新取到的K线设置 idx 并检查时间单调；没有数据时返回 None
+        '''
+        kline_unit = self.klu_cache[lv_idx]
+        if kline_unit is not None:
+            self.klu_cache[lv_idx] = None
+            return kline_unit
+        try:
+            # 获取下一个K线
+            begin = time.perf_counter() if PROFILER.on else 0.0
+            kline_unit = self.get_next_lv_klu(lv_idx)
+            if PROFILER.on:
+                PROFILER.add_time("chan.data_source", begin)
+                PROFILER.incr(f"chan.klu.{self.lv_list[lv_idx].name}")
+        except StopIteration:
+            return None
+        # 设置K线索引
+        self.try_set_klu_idx(lv_idx, kline_unit)
+        # 检查K线时间是否单调
+        self.check_klu_time(kline_unit, self.klu_last_t[lv_idx])
+        # 更新前一个K线时间
+        self.klu_last_t[lv_idx] = kline_unit.time
+        return kline_unit
+
+    @staticmethod
+    def check_klu_time(kline_unit, last_t: CTime):
+        if not kline_unit.time > last_t:
+            raise CChanException(f"kline time err, cur={kline_unit.time}, last={last_t},"
+                                 f"or refer to quick_guide.md, try set auto=False in the CTime returned by your data source class",
+                                 ErrCode.KL_NOT_MONOTONOUS)
+
+    def after_parent(self, kline_unit: CKLine_Unit, parent_klu: CKLine_Unit, lv_idx: int) -> bool:
+        '''
+        lv_idx 级别的K线是否已经超出父级别K线 parent_klu，属于之后的父级别K线
+        K线时间为结束时间时直接比较时间；合成的K线时间为开始时间时（kl_session 的 label_end=False）按交易时段比较所属的父级别K线
+        '''
+        if self.conf.kl_resample or self.resampler is not None:
+            calendar = self.session_calendar
+            if not calendar.label_end:
+                return calendar.after_bucket(kline_unit.time, self.lv_list[lv_idx], parent_klu.time, self.lv_list[lv_idx-1])
+        return kline_unit.time > parent_klu.time
+
     def check_kl_consitent(self, parent_klu, sub_klu):
         # 检查 父级别和子级别K线时间是否一致
         if parent_klu.time.year != sub_klu.time.year or \
@@ -383,41 +549,15 @@ class CChan:
     @staticmethod
     def save_snapshot(chan: 'CChan', filepath: str) -> None:
         """
-        Save Chan instance to file using dill
-        
-        Args:
-            chan: CChan instance to save
-            filepath: File path to save the snapshot
+        保存成二进制快照（K线列 + 合并K线/笔/线段/中枢/买卖点表 + 继续计算所需的状态 + 配置），格式见 ChanSnapshot.py
         """
-        try:
-            with open(filepath, 'wb') as f:
-                # Print object info before dumping
-                print(f"Saving Chan object:")
-                print(f"Code: {chan.code}")
-                print(f"Begin time: {chan.begin_time}")
-                print(f"End time: {chan.end_time}")
-                print(f"Data source: {chan.data_src}")
-                print(f"Level list: {chan.lv_list}")
-                print(f"Config: {chan.conf}")
-                # Dump the object
-                dill.dump(chan, f)  # Use dill instead of pickle
-        except Exception as e:
-            print(f"Failed to save snapshot: {e}")
-
-    @staticmethod 
+        from ChanSnapshot import save_chan_snapshot
+        save_chan_snapshot(chan, filepath)
+
+    @staticmethod
     def load_snapshot(filepath: str) -> 'CChan':
         """
-        Load Chan instance from dill file
-        
-        Args:
-            filepath: File path to load the snapshot from
-            
-        Returns:
-            CChan instance loaded from file
+        从快照恢复 CChan（不重放K线），可以直接继续 feed/trigger_load；只需要读取结果时使用 ChanSnapshot.CChanSnapshot 更快
         """
-        try:
-            with open(filepath, 'rb') as f:
-                return dill.load(f)  # Use dill instead of pickle
-        except Exception as e:
-            print(f"Failed to load snapshot: {e}")
-            return None
\ No newline at end of file
+        from ChanSnapshot import load_chan_snapshot
+        return load_chan_snapshot(filepath)
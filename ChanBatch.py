@@ -0,0 +1,361 @@
+import math
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from multiprocessing import util as mp_util
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+from Chan import CChan, GetStockAPICls
+from ChanConfig import CChanConfig
+from Common.CEnum import AUTYPE, BI_DIR, DATA_SRC, KL_TYPE
+from Common.ChanException import CChanException, ErrCode
+from Common.CTime import CTime
+from DataAPI.CommonStockAPI import CCommonStockApi
+from DataAPI.Prefetch import preloaded_stockapi_cls
+from KLine.KLine_List import CKLine_List
+from KLine.KLine_Unit import CKLine_Unit
+
+
+@dataclass
+class CLineSummary:
+    # 笔/线段摘要
+    idx: int
+    dir: BI_DIR
+    is_sure: bool
+    begin_time: CTime
+    end_time: CTime
+    begin_klu_idx: int
+    end_klu_idx: int
+    begin_val: float
+    end_val: float
+
+
+@dataclass
+class CZSSummary:
+    begin_time: CTime
+    end_time: CTime
+    begin_bi_idx: int
+    end_bi_idx: int
+    low: float
+    high: float
+    peak_low: float
+    peak_high: float
+    is_sure: bool
+
+
+@dataclass
+class CBSPSummary:
+    time: CTime
+    klu_idx: int
+    bi_idx: int
+    is_buy: bool
+    type: str  # 如 "1,2s"
+
+
+@dataclass
+class CLevelSummary:
+    kl_type: KL_TYPE
+    klu_cnt: int
+    last_time: Optional[CTime]
+    bi_list: List[CLineSummary] = field(default_factory=list)
+    seg_list: List[CLineSummary] = field(default_factory=list)
+    zs_list: List[CZSSummary] = field(default_factory=list)
+    bsp_list: List[CBSPSummary] = field(default_factory=list)
+    seg_bsp_list: List[CBSPSummary] = field(default_factory=list)
+
+
+@dataclass
+class CChanBatchResult:
+    code: str
+    ok: bool
+    levels: Dict[KL_TYPE, CLevelSummary] = field(default_factory=dict)
+    error: Optional[str] = None
+    traceback: Optional[str] = None
+    elapsed: float = 0.0
+
+
+def summarize_line(line) -> CLineSummary:
+    return CLineSummary(
+        idx=line.idx,
+        dir=line.dir,
+        is_sure=line.is_sure,
+        begin_time=line.get_begin_klu().time,
+        end_time=line.get_end_klu().time,
+        begin_klu_idx=line.get_begin_klu().idx,
+        end_klu_idx=line.get_end_klu().idx,
+        begin_val=line.get_begin_val(),
+        end_val=line.get_end_val(),
+    )
+
+
+def summarize_zs(zs) -> CZSSummary:
+    return CZSSummary(
+        begin_time=zs.begin.time,
+        end_time=zs.end.time,
+        begin_bi_idx=zs.begin_bi.idx,
+        end_bi_idx=zs.end_bi.idx,
+        low=zs.low,
+        high=zs.high,
+        peak_low=zs.peak_low,
+        peak_high=zs.peak_high,
+        is_sure=zs.is_sure,
+    )
+
+
+def summarize_bsp_list(bsp_list) -> List[CBSPSummary]:
+    return [
+        CBSPSummary(time=bsp.klu.time, klu_idx=bsp.klu.idx, bi_idx=bsp.bi.idx, is_buy=bsp.is_buy, type=bsp.type2str())
+        for bsp in bsp_list.getSortedBspList()
+    ]
+
+
+def summarize_level(kl_list: CKLine_List) -> CLevelSummary:
+    last_klu = kl_list.lst[-1].lst[-1] if kl_list.lst else None
+    return CLevelSummary(
+        kl_type=kl_list.kl_type,
+        klu_cnt=last_klu.idx+1 if last_klu else 0,
+        last_time=last_klu.time if last_klu else None,
+        bi_list=[summarize_line(bi) for bi in kl_list.bi_list],
+        seg_list=[summarize_line(seg) for seg in kl_list.seg_list],
+        zs_list=[summarize_zs(zs) for zs in kl_list.zs_list],
+        bsp_list=summarize_bsp_list(kl_list.bs_point_lst),
+        seg_bsp_list=summarize_bsp_list(kl_list.seg_bs_point_lst),
+    )
+
+
+def summarize_chan(chan: CChan) -> Dict[KL_TYPE, CLevelSummary]:
+    '''
+    默认的结果摘要：只保留笔/线段/中枢/买卖点的关键字段，可以低成本地在进程间传递
+    '''
+    return {lv: summarize_level(chan[lv]) for lv in chan.lv_list}
+
+
+class CBatchTask:
+    '''
+    所有 symbol 共用的计算参数，每个 worker 进程只传递一次
+    '''
+    def __init__(self, begin_time, end_time, data_src, lv_list, config, autype, summarize):
+        self.begin_time = begin_time
+        self.end_time = end_time
+        self.data_src = data_src
+        self.lv_list = lv_list
+        self.config = config
+        self.autype = autype
+        self.summarize = summarize
+
+
+def session_stockapi_cls(stockapi_cls: Type[CCommonStockApi]) -> Type[CCommonStockApi]:
+    # 数据源连接由 worker 统一 do_init/do_close，CChan.load 内不再逐个 symbol 登录/登出
+    return type(stockapi_cls.__name__, (stockapi_cls,), {
+        "do_init": classmethod(lambda cls: None),
+        "do_close": classmethod(lambda cls: None),
+    })
+
+
+_worker_task: Optional[CBatchTask] = None
+_worker_stockapi_cls: Optional[Type[CCommonStockApi]] = None
+
+
+def _init_worker(task: CBatchTask, register_close=True):
+    global _worker_task, _worker_stockapi_cls
+    stockapi_cls = GetStockAPICls(task.data_src)
+    stockapi_cls.do_init()
+    if register_close:
+        # worker 进程退出时关闭数据源
+        mp_util.Finalize(None, stockapi_cls.do_close, exitpriority=10)
+    _worker_task = task
+    _worker_stockapi_cls = session_stockapi_cls(stockapi_cls)
+
+
+def _close_worker():
+    global _worker_task, _worker_stockapi_cls
+    if _worker_task is not None:
+        GetStockAPICls(_worker_task.data_src).do_close()
+    _worker_task = _worker_stockapi_cls = None
+
+
+def _run_one(code: str) -> CChanBatchResult:
+    task = _worker_task
+    start = time.time()
+    try:
+        chan = CChan(
+            code=code,
+            begin_time=task.begin_time,
+            end_time=task.end_time,
+            data_src=_worker_stockapi_cls,
+            lv_list=list(task.lv_list),
+            config=task.config,
+            autype=task.autype,
+        )
+        if task.config.trigger_step:
+            for _ in chan.step_load():
+                pass
+        return CChanBatchResult(code=code, ok=True, levels=task.summarize(chan), elapsed=time.time()-start)
+    except Exception as e:
+        return CChanBatchResult(code=code, ok=False, error=repr(e), traceback=traceback.format_exc(), elapsed=time.time()-start)
+
+
+def _run_chunk(chunk: List[Tuple[int, str]]) -> List[Tuple[int, CChanBatchResult]]:
+    return [(pos, _run_one(code)) for pos, code in chunk]
+
+
+class CChanBatch:
+    '''
+    多 symbol 并行计算：
+    - code_list 按 chunk_size 切块后提交到进程池，每个 worker 进程只初始化/关闭一次数据源
+    - 单个 symbol 出错不影响其他 symbol，错误信息记录在对应的 CChanBatchResult 中
+    - 返回结果的顺序与 code_list 一致
+    max_workers=0 时在当前进程内串行计算（方便调试）
+    '''
+    def __init__(
+        self,
+        code_list: Iterable[str],
+        begin_time=None,
+        end_time=None,
+        data_src: Union[DATA_SRC, str, Type[CCommonStockApi]] = DATA_SRC.BAO_STOCK,
+        lv_list=None,
+        config: Optional[CChanConfig] = None,
+        autype: AUTYPE = AUTYPE.QFQ,
+        max_workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        summarize: Callable[[CChan], Dict[KL_TYPE, CLevelSummary]] = summarize_chan,
+        mp_context=None,
+    ):
+        self.code_list: List[str] = list(code_list)
+        if lv_list is None:
+            lv_list = [KL_TYPE.K_DAY, KL_TYPE.K_60M]
+        if config is None:
+            config = CChanConfig()
+        self.task = CBatchTask(begin_time, end_time, data_src, lv_list, config, autype, summarize)
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.mp_context = mp_context
+
+    def get_chunks(self, worker_cnt: int) -> List[List[Tuple[int, str]]]:
+        chunk_size = self.chunk_size or max(1, math.ceil(len(self.code_list) / (worker_cnt * 4)))
+        items = list(enumerate(self.code_list))
+        return [items[i:i+chunk_size] for i in range(0, len(items), chunk_size)]
+
+    def run(self, on_progress: Optional[Callable[[int, int, CChanBatchResult], None]] = None) -> List[CChanBatchResult]:
+        '''
+        on_progress(已完成数量, 总数, 本次完成的结果)，在主进程中按完成顺序回调
+        '''
+        total = len(self.code_list)
+        res: List[Optional[CChanBatchResult]] = [None] * total
+        done_cnt = 0
+
+        def collect(pos: int, result: CChanBatchResult):
+            nonlocal done_cnt
+            res[pos] = result
+            done_cnt += 1
+            if on_progress is not None:
+                on_progress(done_cnt, total, result)
+
+        if total == 0:
+            return []
+        if self.max_workers == 0:
+            _init_worker(self.task, register_close=False)
+            try:
+                for chunk in self.get_chunks(1):
+                    for pos, result in _run_chunk(chunk):
+                        collect(pos, result)
+            finally:
+                _close_worker()
+            return res  # type: ignore
+
+        worker_cnt = self.max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=worker_cnt, mp_context=self.mp_context, initializer=_init_worker, initargs=(self.task,)) as executor:
+            future_dict = {executor.submit(_run_chunk, chunk): chunk for chunk in self.get_chunks(worker_cnt)}
+            for future in as_completed(future_dict):
+                try:
+                    chunk_res = future.result()
+                except Exception as e:
+                    # worker 进程异常退出等情况，整块 symbol 记为失败
+                    tb = traceback.format_exc()
+                    chunk_res = [(pos, CChanBatchResult(code=code, ok=False, error=repr(e), traceback=tb)) for pos, code in future_dict[future]]
+                for pos, result in chunk_res:
+                    collect(pos, result)
+        return res  # type: ignore
+
+
+def fetch_symbol_data(stockapi_cls: Type[CCommonStockApi], code: str, task: CBatchTask, lock) -> Tuple[Dict[KL_TYPE, List[CKLine_Unit]], Dict[KL_TYPE, CChanException]]:
+    '''
+    拉取一个 symbol 全部级别的K线；某个级别数据源报 SRC_DATA_NOT_FOUND 时记下异常，
+    构造 CChan 时由 CPreloadedStockApi 原样抛出，是否跳过（auto_skip_illegal_sub_lv）与直接读取数据源一致
+    '''
+    kl_data: Dict[KL_TYPE, List[CKLine_Unit]] = {}
+    kl_error: Dict[KL_TYPE, CChanException] = {}
+    for lv in task.lv_list:
+        try:
+            with lock or nullcontext():
+                stockapi = stockapi_cls(code=code, k_type=lv, begin_date=task.begin_time, end_date=task.end_time, autype=task.autype)
+                kl_data[lv] = list(stockapi.get_kl_data())
+        except CChanException as e:
+            if e.errcode != ErrCode.SRC_DATA_NOT_FOUND:
+                raise
+            kl_error[lv] = e
+    return kl_data, kl_error
+
+
+def iter_chan(
+    code_list: Iterable[str],
+    begin_time=None,
+    end_time=None,
+    data_src: Union[DATA_SRC, str, Type[CCommonStockApi]] = DATA_SRC.BAO_STOCK,
+    lv_list=None,
+    config: Optional[CChanConfig] = None,
+    autype: AUTYPE = AUTYPE.QFQ,
+    prefetch_cnt: int = 4,
+) -> Iterable[Tuple[str, Union[CChan, Exception]]]:
+    '''
+    在当前进程内逐个 symbol 计算，同时用 prefetch_cnt 个线程提前拉取后面 symbol 的全部级别K线，网络等待与计算重叠
+    按 code_list 的顺序返回 (code, CChan)，拉取或计算出错时返回 (code, 异常)
+    数据源类 thread_safe 为 False 时同一时刻只有一个线程在拉取，但仍然与计算重叠
+    trigger_step=True 时返回的 CChan 尚未加载，需要自行调用 step_load；CChan 的数据源是已经拉取好的数据（CPreloadedStockApi，原数据源见 origin_data_src），step_load 不会再访问原数据源
+    '''
+    if lv_list is None:
+        lv_list = [KL_TYPE.K_DAY, KL_TYPE.K_60M]
+    if config is None:
+        config = CChanConfig()
+    task = CBatchTask(begin_time, end_time, data_src, lv_list, config, autype, summarize_chan)
+    stockapi_cls = GetStockAPICls(data_src)
+    lock = None if stockapi_cls.thread_safe else threading.Lock()
+    code_iter = iter(code_list)
+    stockapi_cls.do_init()
+    executor = ThreadPoolExecutor(max_workers=max(1, prefetch_cnt))
+    try:
+        pending: Deque = deque()
+
+        def submit_next():
+            code = next(code_iter, None)
+            if code is not None:
+                pending.append((code, executor.submit(fetch_symbol_data, stockapi_cls, code, task, lock)))
+
+        for _ in range(max(1, prefetch_cnt)):
+            submit_next()
+        while pending:
+            code, future = pending.popleft()
+            submit_next()
+            try:
+                kl_data, kl_error = future.result()
+                chan = CChan(
+                    code=code,
+                    begin_time=begin_time,
+                    end_time=end_time,
+                    data_src=preloaded_stockapi_cls(kl_data, data_src, kl_error),
+                    lv_list=list(lv_list),
+                    config=config,
+                    autype=autype,
+                )
+                res: Union[CChan, Exception] = chan
+            except Exception as e:
+                res = e
+            yield code, res
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        stockapi_cls.do_close()
@@ -1,3 +1,4 @@
+import copy
 from typing import List
 
 from Bi.BiConfig import CBiConfig
@@ -19,6 +20,8 @@ class CChanConfig:
     def __init__(self, conf=None):
         if conf is None:
             conf = {}
+        # 构造时传入的原始配置，保存快照时使用
+        self.conf_dict = copy.deepcopy(conf)
         conf = ConfigWithCheck(conf)
         # 笔的各项配置
         self.bi_conf = CBiConfig(
@@ -57,6 +60,20 @@ class CChanConfig:
         self.print_warning = conf.get("print_warning", True)
         # 打印错误时间的各项配置
         self.print_err_time = conf.get("print_err_time", True)
+        # 非回放模式下是否批量计算单根K线指标：窗口均值/方差/最值用 numpy 整段计算，MACD/RSI/KDJ 的递推仍逐根计算
+        self.vectorize_metric = conf.get("vectorize_metric", True)
+        # 非回放模式下是否批量计算K线合并（包含关系处理）
+        self.kl_batch_combine = conf.get("kl_batch_combine", True)
+        # 是否为笔的 MACD 等背驰指标建立区间索引（前缀和/ST表），区间和与逐根累加可能差在浮点末位，默认关闭
+        self.bi_metric_index = conf.get("bi_metric_index", False)
+        # 每个级别后台预取K线的队列长度，0 表示不预取
+        self.kl_prefetch = conf.get("kl_prefetch", 0)
+        # 非回放模式下各级别是否并行计算，以及并行方式（thread/process）
+        self.parallel_lv = conf.get("parallel_lv", False)
+        self.parallel_lv_backend = conf.get("parallel_lv_backend", "thread")
+        # 是否只读取最小级别K线，其他级别按交易时段（a_share/crypto 或 CSessionCalendar）合成
+        self.kl_resample = conf.get("kl_resample", False)
+        self.kl_session = conf.get("kl_session", "a_share")
 
         # 计算基于单根K线驱动的指标模型列表的各项配置
         self.mean_metrics: List[int] = conf.get("mean_metrics", [])
@@ -77,6 +94,8 @@ class CChanConfig:
             'countdown_cmp2close': True,
         })
         self.boll_n = conf.get("boll_n", 20)
+        # MACD/RSI 指标模型内部保留的历史序列长度，None 表示全部保留
+        self.metric_history_len = conf.get("metric_history_len", 0)
         # 买卖点的各项配置
         self.set_bsp_config(conf)
 
@@ -92,6 +111,7 @@ class CChanConfig:
                 fastperiod=self.macd_config['fast'],
                 slowperiod=self.macd_config['slow'],
                 signalperiod=self.macd_config['signal'],
+                history_len=self.metric_history_len,
             )
         ]
         res.extend(CTrendModel(TREND_TYPE.MEAN, mean_T) for mean_T in self.mean_metrics)
@@ -111,7 +131,7 @@ class CChanConfig:
                 countdown_cmp2close=self.demark_config['countdown_cmp2close'],
             ))
         if self.cal_rsi:
-            res.append(RSI(self.rsi_cycle))
+            res.append(RSI(self.rsi_cycle, history_len=self.metric_history_len))
         if self.cal_kdj:
             res.append(KDJ(self.kdj_cycle))
         return res
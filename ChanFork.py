@@ -0,0 +1,187 @@
+from typing import Generic, List, TypeVar
+
+from Bi.Bi import CBi
+from Bi.BiList import CBiList
+from BuySellPoint.BS_Point import CBS_Point
+from BuySellPoint.BSPointList import CBSPointList
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.ChanException import CChanException, ErrCode
+from Common.rollback import CRollback
+from KLine.KLine import CKLine
+from KLine.KLine_List import CKLine_List
+from KLine.KLine_MetricIndex import CKLine_MetricIndex
+from KLine.KLine_Unit import CKLine_Unit
+from Seg.Seg import CSeg
+from Seg.SegListChan import CSegListChan
+from Seg.SegListComm import CSegListComm
+from ZS.ZS import CZS
+from ZS.ZSList import CZSList
+
+# 保存尾部对象时不展开的类型：这些对象要么属于已经确定的前缀，要么按位置单独保存
+STOP_TYPES = (
+    CChan, CChanConfig, CKLine_List, CKLine, CKLine_Unit, CBi, CBiList, CSeg, CSegListComm,
+    CZS, CZSList, CBS_Point, CBSPointList, CKLine_MetricIndex,
+)
+
+LINE_TYPE = TypeVar('LINE_TYPE', CBi, CSeg)
+
+
+def last_sure_line_idx(line_lst: List[CSeg]) -> int:
+    idx = len(line_lst) - 1
+    while idx >= 0 and not line_lst[idx].is_sure:
+        idx -= 1
+    return idx
+
+
+def unsettled_seg_begin(seg_list: CSegListComm) -> int:
+    '''
+    之后的K线可能改动的第一个线段下标：
+    - update 会删掉末尾不确定的线段，以及最后一个确定线段（特征序列分型含不确定笔时），它前一个线段的 next 会重新设置
+    - update_zs_in_seg 从最后一个线段往前，重算到 ele_inside_is_sure 的线段为止
+    只有 chan 算法是从最后一个确定线段接着算的，其他线段算法每次全部重算
+    '''
+    if not isinstance(seg_list, CSegListChan):
+        return 0
+    idx = len(seg_list) - 1
+    while idx >= 0 and not seg_list[idx].ele_inside_is_sure:
+        idx -= 1
+    return max(0, min(idx + 1, last_sure_line_idx(seg_list.lst) - 1))
+
+
+def unsettled_zs_begin(zs_list: CZSList, seg_list: CSegListComm, seg_begin: int) -> int:
+    '''
+    之后的K线可能改动的第一个中枢下标：起点不早于 last_sure_pos 的中枢会被删掉重算，之前的最后一个中枢可能被延伸或合并；
+    与需要重算的线段有重叠的中枢会更新进出笔
+    '''
+    klu_begin = seg_list[seg_begin].start_bi.get_begin_klu().idx if seg_begin < len(seg_list) else -1
+    zs_lst = zs_list.zs_lst
+    pos = len(zs_lst)
+    while pos > 0 and (zs_lst[pos-1].end.idx >= klu_begin or zs_lst[pos-1].begin_bi.idx >= zs_list.last_sure_pos):
+        pos -= 1
+    return max(0, pos - 1)
+
+
+class CLineTail(Generic[LINE_TYPE]):
+    '''
+    笔（或线段）这一层及其上面的线段、中枢、买卖点中尚未确定的部分：
+    line_begin 之后的笔、seg_begin 之后的线段、zs_begin 之后的中枢，以及笔下标不小于 line_begin 的买卖点
+    '''
+    def __init__(self, line_lst: List[LINE_TYPE], seg_list: CSegListComm, zs_list: CZSList, bsp_list: CBSPointList):
+        self.line_lst = line_lst
+        self.seg_list = seg_list
+        self.zs_list = zs_list
+        self.bsp_list = bsp_list
+        self.seg_begin = unsettled_seg_begin(seg_list)
+        line_begin = seg_list[self.seg_begin].start_bi.idx if self.seg_begin < len(seg_list) else 0
+        # 笔列表末尾两笔会随新K线延伸、删除（虚笔、更新峰值）
+        self.line_begin = max(0, min(line_begin, len(line_lst) - 3))
+        self.zs_begin = unsettled_zs_begin(zs_list, seg_list, self.seg_begin)
+
+    def save_lists(self, rollback: CRollback):
+        rollback.save_tail(self.seg_list.lst, self.seg_begin)
+        rollback.save_tail(self.seg_list.sig_lst, self.seg_begin)
+        rollback.save_tail(self.zs_list.zs_lst, self.zs_begin)
+        bsp_list, line_begin = self.bsp_list, self.line_begin
+        for bsp_pair in bsp_list.bsp_store_dict.values():
+            for bsp_lst in bsp_pair:
+                rollback.save_tail(bsp_lst, first_bsp_pos(bsp_lst, line_begin))
+        rollback.save_tail(bsp_list.bsp1_list, first_bsp_pos(bsp_list.bsp1_list, line_begin))
+        # 新出现的买卖点类型在字典末尾，恢复时删掉
+        rollback.save_dict_tail(bsp_list.bsp_store_dict, lambda bsp_type: False)
+        rollback.save_dict_tail(bsp_list.bsp_store_flat_dict, lambda idx: idx >= line_begin)
+        rollback.save_dict_tail(bsp_list.bsp1_dict, lambda idx: idx >= line_begin)
+
+    def save_objects(self, rollback: CRollback):
+        for seg in self.seg_list[self.seg_begin:]:
+            rollback.save(seg, deep=True)
+        for zs in self.zs_list.zs_lst[self.zs_begin:]:
+            rollback.save(zs, deep=True)
+        for bsp in self.bsp_list.bsp_store_flat_dict.values():
+            if bsp.bi.idx >= self.line_begin:
+                rollback.save(bsp, deep=True)
+        for bsp in self.bsp_list.bsp1_list[first_bsp_pos(self.bsp_list.bsp1_list, self.line_begin):]:
+            rollback.save(bsp, deep=True)
+        rollback.save(self.seg_list)
+        rollback.save(self.zs_list)
+        rollback.save(self.bsp_list)
+
+
+def first_bsp_pos(bsp_lst: List[CBS_Point], line_begin: int) -> int:
+    # 买卖点列表按笔下标递增
+    pos = len(bsp_lst)
+    while pos > 0 and bsp_lst[pos-1].bi.idx >= line_begin:
+        pos -= 1
+    return pos
+
+
+def save_level_tail(kl_list: CKLine_List, rollback: CRollback):
+    '''
+    保存一个级别中后续K线可能改动的部分；长列表只保存尾部，列表中更早的对象与分支共用
+    '''
+    # 等待中的批量合并、批量指标先算完，与之后逐根计算的结果相同
+    kl_list.flush_combine()
+    kl_list.cal_metric_batch()
+    bi_tail = CLineTail(kl_list.bi_list.bi_list, kl_list.seg_list, kl_list.zs_list, kl_list.bs_point_lst)
+    seg_tail = CLineTail(kl_list.seg_list.lst, kl_list.segseg_list, kl_list.segzs_list, kl_list.seg_bs_point_lst)
+    # 线段既是笔这一层的线段，也是线段这一层的“笔”，两边可能改动的范围取并集
+    seg_tail.line_begin = bi_tail.seg_begin = min(bi_tail.seg_begin, seg_tail.line_begin)
+
+    klc_begin = max(0, len(kl_list.lst) - 3)
+    rollback.save_tail(kl_list.lst, klc_begin)
+    if kl_list.klu_lst is not None:
+        rollback.save_tail(kl_list.klu_lst, len(kl_list.klu_lst))
+    rollback.save_tail(kl_list.bi_list.bi_list, bi_tail.line_begin)
+    bi_tail.save_lists(rollback)
+    seg_tail.save_lists(rollback)
+
+    for klc in kl_list.lst[klc_begin:]:
+        rollback.save(klc)
+    if (last_klu := kl_list.last_klu()) is not None:
+        rollback.save(last_klu, deep=True)
+    for bi in kl_list.bi_list.bi_list[bi_tail.line_begin:]:
+        rollback.save(bi)
+    bi_tail.save_objects(rollback)
+    seg_tail.save_objects(rollback)
+    for model in kl_list.metric_model_lst:
+        rollback.save(model, deep=True)
+    rollback.save(kl_list.metric_index, deep=True)
+    rollback.save(kl_list.bi_list)
+    rollback.save(kl_list)
+
+
+class CChanFork:
+    '''
+    CChan.fork() 返回的临时分支：之后在原对象上 feed/feed_resample 的K线只是试算，discard（或 with 块结束）时全部撤销
+        with chan.fork():
+            chan.feed(hypothetical_klu)
+            bsp_lst = chan.get_bsp()
+        # chan 回到 fork 之前的状态，可以继续 feed 真实的K线
+    - fork 时只保存之后的计算可能改动的尾部：每个级别最后几根合并K线和最后一根单位K线、最后一个确定线段附近开始的笔/线段/中枢/买卖点、
+      线段的线段一层同样的部分，以及指标模型的递推状态；已经确定的前缀对象由分支直接使用，不复制
+    - 撤销时原地恢复这些对象，外部持有的K线、笔、线段等对象依然有效；分支中新产生的对象丢弃
+    - 分支期间原对象就是分支，不能同时按原状态使用；需要长期保留、互不影响的两个对象时用 copy.deepcopy
+    '''
+    def __init__(self, chan: CChan):
+        self.chan = chan
+        self.rollback = CRollback(stop_types=STOP_TYPES)
+        self.active = True
+        for lv in chan.lv_list:
+            save_level_tail(chan[lv], self.rollback)
+        for orphan_lst in getattr(chan, "feed_orphan_klu", []):
+            for klu in orphan_lst:
+                self.rollback.save(klu, deep=True)
+        self.rollback.save(chan.resampler, deep=True)
+        self.rollback.save(chan)
+
+    def __enter__(self) -> CChan:
+        return self.chan
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.discard()
+
+    def discard(self):
+        if not self.active:
+            raise CChanException("fork already discarded", ErrCode.COMMON_ERROR)
+        self.rollback.restore()
+        self.active = False
@@ -0,0 +1,361 @@
+import io
+import multiprocessing
+import pickle
+import queue
+import sys
+import threading
+import traceback
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple, Type
+
+import numpy as np
+
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.ChanException import CChanException, ErrCode
+from Common.CTime import CTime
+from DataAPI.CommonStockAPI import CCommonStockApi
+from KLine.KLine_List import CKLine_List
+from KLine.KLine_Unit import CKLine_Unit
+
+
+class CLvTask:
+    '''
+    一个级别的计算参数
+    '''
+    def __init__(self, code, begin_time, end_time, stockapi_cls: Type[CCommonStockApi], autype, lv, conf: CChanConfig):
+        self.code = code
+        self.begin_time = begin_time
+        self.end_time = end_time
+        # 由 CChan.GetStockAPI 取得，子类重载的数据源在 worker 中同样生效
+        self.stockapi_cls = stockapi_cls
+        self.autype = autype
+        self.lv = lv
+        self.conf = conf
+
+
+class CQueueConn:
+    '''
+    线程模式下与 multiprocessing.Connection 同样用法的单向收/发端，对象直接传递不做 pickle
+    '''
+    def __init__(self, recv_queue: queue.Queue, send_queue: queue.Queue):
+        self.__recv_queue = recv_queue
+        self.__send_queue = send_queue
+
+    def send(self, obj):
+        self.__send_queue.put(obj)
+
+    def recv(self):
+        return self.__recv_queue.get()
+
+    def close(self):
+        pass
+
+
+def queue_pipe() -> Tuple[CQueueConn, CQueueConn]:
+    q1: queue.Queue = queue.Queue()
+    q2: queue.Queue = queue.Queue()
+    return CQueueConn(q1, q2), CQueueConn(q2, q1)
+
+
+def check_backend(backend: str) -> str:
+    if backend not in ("process", "thread"):
+        raise CChanException(f"unknown parallel_lv_backend={backend}, should be one of process/thread", ErrCode.PARA_ERROR)
+    return backend
+
+
+def config_objects(conf: CChanConfig) -> Dict[str, object]:
+    '''
+    配置对象及其下属的子配置（bi_conf、bs_point_conf.b_conf 等）：路径 -> 对象
+    worker 的结果 pickle 时这些对象只记路径，主进程还原成 chan.conf 中对应的对象，和串行时一样各级别共用同一份配置
+    '''
+    res: Dict[str, object] = {"": conf}
+    for name, val in vars(conf).items():
+        if not hasattr(val, "__dict__"):
+            continue
+        res[name] = val
+        for sub_name, sub_val in vars(val).items():
+            if hasattr(sub_val, "__dict__"):
+                res[f"{name}.{sub_name}"] = sub_val
+    return res
+
+
+def conf_ref(path: str):
+    # 只作为 pickle 中的占位，由 CResultUnpickler.find_class 替换成取 chan.conf 中对应对象的函数
+    raise CChanException(f"conf_ref({path}) should be loaded by CResultUnpickler", ErrCode.COMMON_ERROR)
+
+
+class CResultPickler(pickle.Pickler):
+    def __init__(self, file, conf: CChanConfig):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        conf_path = {id(obj): path for path, obj in config_objects(conf).items()}
+
+        def reduce_conf(obj):
+            path = conf_path.get(id(obj))
+            if path is None:
+                return obj.__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+            return conf_ref, (path,)
+        # 按类型分派只对配置类生效；persistent_id 会对每个对象都回调一次，pickle 慢一倍
+        self.dispatch_table = {type(obj): reduce_conf for obj in config_objects(conf).values()}
+
+
+class CResultUnpickler(pickle.Unpickler):
+    def __init__(self, file, conf: CChanConfig):
+        super().__init__(file)
+        self.__conf_obj = config_objects(conf)
+
+    def find_class(self, module, name):
+        if module == __name__ and name == "conf_ref":
+            return self.__conf_obj.__getitem__
+        return super().find_class(module, name)
+
+
+def dump_result(result, conf: CChanConfig, klu_cnt: int) -> bytes:
+    '''
+    K线/笔之间是 pre/next 链表，pickle 的递归深度与K线数量成正比（每根K线约 8 层），在单独的大栈线程里做
+    '''
+    res: List = []
+
+    def run():
+        try:
+            buf = io.BytesIO()
+            CResultPickler(buf, conf).dump(result)
+            res.append(buf.getvalue())
+        except BaseException as e:
+            res.append(e)
+
+    old_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(old_limit, 16 * klu_cnt + 10000))
+    old_stack_size = threading.stack_size(max(64 << 20, klu_cnt * (4 << 10)))
+    try:
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(old_stack_size)
+        sys.setrecursionlimit(old_limit)
+    if isinstance(res[0], BaseException):
+        raise res[0]
+    return res[0]
+
+
+def load_result(data: bytes, conf: CChanConfig):
+    return CResultUnpickler(io.BytesIO(data), conf).load()
+
+
+def read_lv_klu(task: CLvTask, lock) -> Optional[List[CKLine_Unit]]:
+    '''
+    读取一个级别的全部K线，数据源不存在且配置了 auto_skip_illegal_sub_lv 时返回 None
+    '''
+    with lock or nullcontext():
+        try:
+            stockapi = task.stockapi_cls(code=task.code, k_type=task.lv, begin_date=task.begin_time, end_date=task.end_time, autype=task.autype)
+        except CChanException as e:
+            if e.errcode == ErrCode.SRC_DATA_NOT_FOUND and task.conf.auto_skip_illegal_sub_lv:
+                return None
+            raise
+        klu_lst = list(stockapi.get_kl_data())
+    for idx, klu in enumerate(klu_lst):
+        klu.set_idx(idx)
+        klu.kl_type = task.lv
+    return klu_lst
+
+
+def cal_lv(task: CLvTask, klu_lst: List[CKLine_Unit], load_cnt: int, fetch_cnt: int) -> Tuple[CKLine_List, List[CKLine_Unit]]:
+    '''
+    串行加载时本级别会取到前 fetch_cnt 根K线（检查时间单调），其中前 load_cnt 根参与计算，多取的一根留在 klu_cache
+    返回 (本级别计算结果, 多取的K线)
+    '''
+    last_t = CTime(1980, 1, 1, 0, 0)
+    for klu in klu_lst[:fetch_cnt]:
+        CChan.check_klu_time(klu, last_t)
+        last_t = klu.time
+    kl_list = CKLine_List(task.lv, conf=task.conf)
+    pre_klu = None
+    for klu in klu_lst[:load_cnt]:
+        klu.set_pre_klu(pre_klu)
+        try:
+            kl_list.add_single_klu(klu)
+        except Exception:
+            if task.conf.print_err_time:
+                print(f"[ERROR-{task.code}]在计算{klu.time}K线时发生错误!")
+            raise
+        pre_klu = klu
+    kl_list.cal_seg_and_zs()
+    return kl_list, klu_lst[load_cnt:fetch_cnt]
+
+
+def lv_worker(conn, task: CLvTask, is_process: bool, lock=None):
+    '''
+    worker 与主进程的交互：
+    -> ("ts", 时间戳数组 或 None(跳过该级别))
+    <- (load_cnt, fetch_cnt) 或 None(放弃计算)
+    -> ("result", 结果)
+    出错时发送 ("error", 异常, traceback 文本)
+    '''
+    try:
+        if is_process:
+            task.stockapi_cls.do_init()
+            try:
+                klu_lst = read_lv_klu(task, lock)
+            finally:
+                task.stockapi_cls.do_close()
+        else:
+            klu_lst = read_lv_klu(task, lock)
+        conn.send(("ts", None if klu_lst is None else np.array([klu.time.ts for klu in klu_lst], dtype=np.int64)))
+        cnt = conn.recv()
+        if cnt is None:
+            return
+        result = cal_lv(task, klu_lst, *cnt)  # type: ignore
+        conn.send(("result", dump_result(result, task.conf, cnt[0]) if is_process else result))
+    except BaseException as e:
+        tb = traceback.format_exc()
+        try:
+            conn.send(("error", e, tb))
+        except Exception:
+            # 异常本身无法 pickle
+            conn.send(("error", CChanException(repr(e), ErrCode.COMMON_ERROR), tb))
+    finally:
+        conn.close()
+
+
+def cal_load_cnt(ts_lst: List[np.ndarray]) -> List[Tuple[int, int]]:
+    '''
+    按串行 load_iterator 的规则计算每个级别 (参与计算的K线数, 取到的K线数)：
+    次级别的K线挂到时间不早于它的第一根父级别K线下，晚于父级别最后一根的K线不再加载，其中第一根会被取出放进 klu_cache
+    父级别一根K线都没有加载时，次级别不会取任何K线
+    '''
+    res: List[Tuple[int, int]] = []
+    for lv_idx, ts in enumerate(ts_lst):
+        if lv_idx == 0:
+            res.append((len(ts), len(ts)))
+            continue
+        parent_cnt = res[-1][0]
+        if parent_cnt == 0:
+            res.append((0, 0))
+            continue
+        over = np.flatnonzero(ts > ts_lst[lv_idx-1][parent_cnt-1])
+        load_cnt = int(over[0]) if len(over) else len(ts)
+        res.append((load_cnt, min(load_cnt+1, len(ts))))
+    return res
+
+
+class CRemoteTraceback(Exception):
+    def __init__(self, tb: str):
+        super().__init__(tb)
+        self.tb = tb
+
+    def __str__(self):
+        return f'\n"""\n{self.tb}"""'
+
+
+def raise_worker_error(msg):
+    _, exc, tb = msg
+    raise exc from CRemoteTraceback(tb)
+
+
+def link_lv_klu(chan: CChan, klu_lst: List[List[CKLine_Unit]]):
+    '''
+    按串行 load_iterator 的处理顺序补上父子级别K线关系并检查对齐，告警输出、异常触发位置与串行一致
+    '''
+    last_lv_idx = len(chan.lv_list) - 1
+    pos = [0] * len(chan.lv_list)
+    open_klu: List[Optional[CKLine_Unit]] = [None] * len(chan.lv_list)
+    cur_idx = 0
+    while True:
+        cur_parent = open_klu[cur_idx-1] if cur_idx > 0 else None
+        kline_unit = klu_lst[cur_idx][pos[cur_idx]] if pos[cur_idx] < len(klu_lst[cur_idx]) else None
+        if kline_unit is None or (cur_parent and kline_unit.time > cur_parent.time):
+            if cur_idx == 0:
+                break
+            cur_idx -= 1
+            chan.check_kl_align(open_klu[cur_idx], cur_idx)
+            continue
+        pos[cur_idx] += 1
+        if cur_parent:
+            chan.set_klu_parent_relation(cur_parent, kline_unit, chan.lv_list[cur_idx], cur_idx)
+        if cur_idx != last_lv_idx:
+            open_klu[cur_idx] = kline_unit
+            cur_idx += 1
+
+
+def parallel_load(chan: CChan):
+    '''
+    非回放模式下的多级别并行计算，CChan.load 在 parallel_lv 开启时调用，完成后 chan 的状态与串行 load 一致
+    - 每个级别一个 worker（进程或线程）：读取本级别全部K线，把时间戳发回主进程
+    - 主进程按串行 load_iterator 的规则算出每个级别实际会加载的K线数（次级别只加载到父级别最后一根K线为止），发给各 worker
+    - worker 计算本级别的笔/线段/中枢/买卖点，进程模式下 pickle 后发回
+    - 主进程按串行时的顺序补上父子级别K线关系、检查对齐
+    '''
+    is_process = check_backend(chan.conf.parallel_lv_backend) == "process"
+    stockapi_cls = chan.GetStockAPI()
+    task_lst = [CLvTask(chan.code, chan.begin_time, chan.end_time, stockapi_cls, chan.autype, lv, chan.conf) for lv in chan.lv_list]
+    conn_lst = []
+    worker_lst: list = []
+    if not is_process:
+        stockapi_cls.do_init()
+    try:
+        lock = None if is_process or stockapi_cls.thread_safe else threading.Lock()
+        ctx = multiprocessing.get_context() if is_process else None
+        for task in task_lst:
+            if is_process:
+                conn, worker_conn = ctx.Pipe()  # type: ignore
+                worker = ctx.Process(target=lv_worker, args=(worker_conn, task, True), daemon=True)  # type: ignore
+            else:
+                conn, worker_conn = queue_pipe()
+                worker = threading.Thread(target=lv_worker, args=(worker_conn, task, False, lock), daemon=True)
+            worker.start()
+            if is_process:
+                worker_conn.close()
+            conn_lst.append(conn)
+            worker_lst.append(worker)
+
+        ts_msg_lst = [conn.recv() for conn in conn_lst]
+        for msg in ts_msg_lst:
+            if msg[0] == "error":
+                raise_worker_error(msg)
+        # 跳过取不到数据的级别，与 CChan.init_lv_klu_iter 一致
+        valid_lv_list, ts_lst, valid_conn_lst = [], [], []
+        for lv, msg, conn in zip(chan.lv_list, ts_msg_lst, conn_lst):
+            if msg[1] is None:
+                if chan.conf.print_warning:
+                    print(f"[WARNING-{chan.code}]{lv}级别获取数据失败，跳过")
+                del chan.kl_datas[lv]
+                conn.send(None)
+                continue
+            valid_lv_list.append(lv)
+            ts_lst.append(msg[1])
+            valid_conn_lst.append(conn)
+        chan.lv_list = valid_lv_list
+        cnt_lst = cal_load_cnt(ts_lst)
+        for conn, cnt in zip(valid_conn_lst, cnt_lst):
+            conn.send(cnt)
+
+        chan.init_klu_cache()
+        klu_lst: List[List[CKLine_Unit]] = []
+        for lv_idx, (lv, conn) in enumerate(zip(chan.lv_list, valid_conn_lst)):
+            msg = conn.recv()
+            if msg[0] == "error":
+                raise_worker_error(msg)
+            kl_list, fetched_klu = load_result(msg[1], chan.conf) if is_process else msg[1]
+            chan.kl_datas[lv] = kl_list
+            lv_klu_lst = list(kl_list.klu_iter())
+            klu_lst.append(lv_klu_lst)
+            if fetched_klu:
+                chan.klu_cache[lv_idx] = fetched_klu[0]
+                chan.klu_last_t[lv_idx] = fetched_klu[0].time
+            elif lv_klu_lst:
+                chan.klu_last_t[lv_idx] = lv_klu_lst[-1].time
+        link_lv_klu(chan, klu_lst)
+    finally:
+        for conn in conn_lst:
+            if not is_process:
+                # 出错提前返回时还在等待 (load_cnt, fetch_cnt) 的线程直接结束，多余的消息不会被读取
+                conn.send(None)
+            conn.close()
+        for worker in worker_lst:
+            if is_process and worker.is_alive():
+                worker.terminate()
+            worker.join()
+        if not is_process:
+            stockapi_cls.do_close()
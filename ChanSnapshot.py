@@ -0,0 +1,568 @@
+import importlib
+import json
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from Bi.Bi import CBi
+from BuySellPoint.BSPointList import CBSPointList
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import AUTYPE, BI_DIR, BSP_TYPE, DATA_SRC, FX_TYPE, KL_TYPE, KLINE_DIR, TREND_TYPE
+from Common.ChanException import CChanException, ErrCode
+from Common.ColumnFile import CColumnFile, write_column_file
+from Common.CTime import CTime
+from DataAPI.BulkLoader import CBarFrame
+from DataAPI.CommonStockAPI import CCommonStockApi
+from DataAPI.Resample import CKLineResampler
+from KLine.KLine import CKLine
+from KLine.KLine_List import CKLine_List
+from KLine.KLine_Store import BOLL_COLUMNS, KDJ_COLUMNS, MACD_COLUMNS, CKLine_Store, key2time, time2key
+from KLine.KLine_Unit import CKLine_Unit
+from Math.BOLL import BOLL_Metric
+from Math.Demark import C_KL, CDemarkCountdown, CDemarkEngine, CDemarkSetup
+from Math.KDJ import KDJ_Item
+from Math.MACD import CMACD_item
+
+SNAPSHOT_MAGIC = b"CHANSNAP"
+SNAPSHOT_VERSION = 4  # 3: 均线/布林线的滑动窗口状态改为分段前缀和；4: 合成K线按区间边界标记时间
+
+BSP_TYPE_LST = list(BSP_TYPE)
+DEMARK_TYPE_LST = ["setup", "countdown"]
+LINE_TABLES = ["seg", "segseg"]
+ZS_TABLES = ["zs", "segzs"]
+BSP_TABLES = ["bsp", "segbsp"]
+
+
+def line_table(lines: Iterable) -> Dict[str, np.ndarray]:
+    # 笔/线段表
+    lines = list(lines)
+    return {
+        "idx": np.array([line.idx for line in lines], dtype=np.int64),
+        "dir": np.array([line.dir.value for line in lines], dtype=np.int8),
+        "is_sure": np.array([line.is_sure for line in lines], dtype=np.bool_),
+        "begin_klu_idx": np.array([line.get_begin_klu().idx for line in lines], dtype=np.int64),
+        "end_klu_idx": np.array([line.get_end_klu().idx for line in lines], dtype=np.int64),
+        "begin_val": np.array([line.get_begin_val() for line in lines], dtype=np.float64),
+        "end_val": np.array([line.get_end_val() for line in lines], dtype=np.float64),
+    }
+
+
+def zs_table(zs_lst: Iterable) -> Dict[str, np.ndarray]:
+    zs_lst = list(zs_lst)
+    return {
+        "begin_klu_idx": np.array([zs.begin.idx for zs in zs_lst], dtype=np.int64),
+        "end_klu_idx": np.array([zs.end.idx for zs in zs_lst], dtype=np.int64),
+        "begin_bi_idx": np.array([zs.begin_bi.idx for zs in zs_lst], dtype=np.int64),
+        "end_bi_idx": np.array([zs.end_bi.idx for zs in zs_lst], dtype=np.int64),
+        "low": np.array([zs.low for zs in zs_lst], dtype=np.float64),
+        "high": np.array([zs.high for zs in zs_lst], dtype=np.float64),
+        "peak_low": np.array([zs.peak_low for zs in zs_lst], dtype=np.float64),
+        "peak_high": np.array([zs.peak_high for zs in zs_lst], dtype=np.float64),
+        "is_sure": np.array([zs.is_sure for zs in zs_lst], dtype=np.bool_),
+    }
+
+
+def bsp_table(bsp_list: CBSPointList, with_feat: bool = False) -> Dict[str, np.ndarray]:
+    # type 按 BSP_TYPE 定义顺序存成位掩码；with_feat 时每个特征一列 feat:特征名，没有该特征（或为 None）时为 NaN
+    bsp_lst = bsp_list.getSortedBspList()
+    res = {
+        "klu_idx": np.array([bsp.klu.idx for bsp in bsp_lst], dtype=np.int64),
+        "bi_idx": np.array([bsp.bi.idx for bsp in bsp_lst], dtype=np.int64),
+        "is_buy": np.array([bsp.is_buy for bsp in bsp_lst], dtype=np.bool_),
+        "type": np.array([sum(1 << BSP_TYPE_LST.index(t) for t in bsp.type) for bsp in bsp_lst], dtype=np.uint32),
+    }
+    if with_feat:
+        feat_lst = [dict(bsp.features.items()) for bsp in bsp_lst]
+        for name in sorted({name for feat in feat_lst for name in feat}):
+            res[f"feat:{name}"] = np.array([np.nan if feat.get(name) is None else feat[name] for feat in feat_lst], dtype=np.float64)
+    return res
+
+
+def bsp_type_from_mask(mask: int) -> List[BSP_TYPE]:
+    return [t for i, t in enumerate(BSP_TYPE_LST) if mask >> i & 1]
+
+
+def level_store(kl_list: CKLine_List) -> CKLine_Store:
+    store = CKLine_Store()
+    for klc in kl_list.lst:
+        for klu in klc.lst:
+            store.append(klu)
+    return store
+
+
+def encode_data_src(data_src) -> Optional[dict]:
+    '''
+    数据源存成 json：DATA_SRC 枚举、字符串（"custom:..."/"store:..."）或者可以按 模块名+类名 找回的数据源类
+    预取/批量加载生成的数据源记录原数据源；动态生成、无法找回的类存成 None，恢复后需要自行设置
+    '''
+    data_src = getattr(data_src, "origin_data_src", None) or data_src
+    if isinstance(data_src, DATA_SRC):
+        return {"DATA_SRC": data_src.name}
+    if isinstance(data_src, str):
+        return {"str": data_src}
+    if isinstance(data_src, type) and decode_data_src({"module": data_src.__module__, "class": data_src.__qualname__}) is data_src:
+        return {"module": data_src.__module__, "class": data_src.__qualname__}
+    return None
+
+
+def decode_data_src(info: Optional[dict]):
+    if info is None:
+        return None
+    if "DATA_SRC" in info:
+        return DATA_SRC[info["DATA_SRC"]]
+    if "str" in info:
+        return info["str"]
+    try:
+        obj = importlib.import_module(info["module"])
+        for name in info["class"].split("."):
+            obj = getattr(obj, name)
+    except (ImportError, AttributeError):
+        return None
+    return obj
+
+
+def conf_data(conf: CChanConfig) -> dict:
+    # 配置按构造时传入的原始 dict 保存，必须能存成 json
+    for key, value in conf.conf_dict.items():
+        try:
+            json.dumps(value, allow_nan=True)
+        except (TypeError, ValueError) as e:
+            raise CChanException(f"config {key}={value!r} can not be saved in snapshot", ErrCode.SNAPSHOT_ERR) from e
+    return conf.conf_dict
+
+
+def time_data(t: CTime) -> list:
+    return [time2key(t), t.auto]
+
+
+def chan_meta(chan: CChan, klu_pos: List[Dict[int, int]]) -> dict:
+    orphan_lst = getattr(chan, "feed_orphan_klu", [[] for _ in chan.lv_list])
+    return {
+        "code": chan.code,
+        "begin_time": chan.begin_time,
+        "end_time": chan.end_time,
+        "autype": None if chan.autype is None else chan.autype.name,
+        "data_src": encode_data_src(chan.data_src),
+        "kl_misalign_cnt": chan.kl_misalign_cnt,
+        "kl_inconsistent_detail": {k: [time_data(t) for t in v] for k, v in chan.kl_inconsistent_detail.items()},
+        "feed_orphan_klu": [[klu_pos[lv_idx][id(klu)] for klu in orphan_lst[lv_idx]] for lv_idx in range(len(chan.lv_list))],
+        "resampler": None if chan.resampler is None else chan.resampler.get_state(),
+    }
+
+
+def demark_arrays(klu_lst: List[CKLine_Unit], engine: Optional[CDemarkEngine]):
+    '''
+    K线上的 demark 信息和 demark 序列，序列被多根K线以及 demark 引擎共同引用，按编号保存
+    序列及其 countdown 中的 C_KL 依次存在 demark_kl 表中：pre_kl、kl_list、countdown.kl_list
+    '''
+    series_id: Dict[int, int] = {}
+    series_lst: List[CDemarkSetup] = []
+
+    def get_series_id(series: CDemarkSetup) -> int:
+        if id(series) not in series_id:
+            series_id[id(series)] = len(series_lst)
+            series_lst.append(series)
+        return series_id[id(series)]
+
+    entry = defaultdict(list)
+    for pos, klu in enumerate(klu_lst):
+        for item in klu.demark.data:
+            entry["klu_pos"].append(pos)
+            entry["type"].append(DEMARK_TYPE_LST.index(item["type"]))
+            entry["dir"].append(item["dir"].value)
+            entry["idx"].append(item["idx"])
+            entry["series"].append(get_series_id(item["series"]))
+    state = None
+    if engine is not None:
+        for series in engine.series:
+            get_series_id(series)
+        state = engine.get_state(series_id)
+
+    kl_rows: List[C_KL] = []
+    series_tbl = defaultdict(list)
+    for series in series_lst:
+        series_tbl["kl_begin"].append(len(kl_rows))
+        series_tbl["kl_cnt"].append(len(series.kl_list))
+        kl_rows.append(series.pre_kl)
+        kl_rows.extend(series.kl_list)
+        countdown = series.countdown
+        series_tbl["cd_kl_cnt"].append(-1 if countdown is None else len(countdown.kl_list))
+        if countdown is not None:
+            kl_rows.extend(countdown.kl_list)
+        series_tbl["dir"].append(series.dir.value)
+        series_tbl["setup_finished"].append(series.setup_finished)
+        series_tbl["idx"].append(series.idx)
+        series_tbl["tdst_peak"].append(np.nan if series.TDST_peak is None else series.TDST_peak)
+        series_tbl["cd_idx"].append(0 if countdown is None else countdown.idx)
+        series_tbl["cd_tdst_peak"].append(np.nan if countdown is None else countdown.TDST_peak)
+        series_tbl["cd_finish"].append(False if countdown is None else countdown.finish)
+
+    arrays = {
+        "demark/klu_pos": np.array(entry["klu_pos"], dtype=np.int64),
+        "demark/type": np.array(entry["type"], dtype=np.int8),
+        "demark/dir": np.array(entry["dir"], dtype=np.int8),
+        "demark/idx": np.array(entry["idx"], dtype=np.int64),
+        "demark/series": np.array(entry["series"], dtype=np.int64),
+        "demark_kl/idx": np.array([kl.idx for kl in kl_rows], dtype=np.int64),
+        "demark_kl/close": np.array([kl.close for kl in kl_rows], dtype=np.float64),
+        "demark_kl/high": np.array([kl.high for kl in kl_rows], dtype=np.float64),
+        "demark_kl/low": np.array([kl.low for kl in kl_rows], dtype=np.float64),
+    }
+    for name, dtype in [
+        ("kl_begin", np.int64), ("kl_cnt", np.int64), ("cd_kl_cnt", np.int64), ("dir", np.int8), ("setup_finished", np.bool_),
+        ("idx", np.int64), ("tdst_peak", np.float64), ("cd_idx", np.int64), ("cd_tdst_peak", np.float64), ("cd_finish", np.bool_),
+    ]:
+        arrays[f"demark_series/{name}"] = np.array(series_tbl[name], dtype=dtype)
+    return arrays, state
+
+
+def save_chan_snapshot(chan: CChan, filepath: str) -> None:
+    '''
+    文件结构见 Common/ColumnFile.py，全部是 numpy 数组和 json，不使用 pickle：
+    - 每个级别的K线列（时间、OHLC、成交量等以及单根K线指标）、父级别K线位置、K线上的 demark 信息
+    - 每个级别的合并K线、笔（含虚笔的 sure_end）、线段、中枢、买卖点（含特征）表
+    - 继续计算所需的状态：各指标模型的滑动窗口等、笔列表的尾部、feed 时的孤儿K线、K线合成器
+    - CChan 构造参数和原始配置 dict（json）
+    '''
+    header = {
+        "lv_list": [lv.name for lv in chan.lv_list],
+        "conf": conf_data(chan.conf),
+        "levels": {},
+    }
+    arrays: Dict[str, np.ndarray] = {}
+    klu_pos: List[Dict[int, int]] = []
+    for lv_idx, lv in enumerate(chan.lv_list):
+        kl_list = chan[lv]
+        kl_list.flush_combine()
+        kl_list.cal_metric_batch()
+        klu_lst = [klu for klc in kl_list.lst for klu in klc.lst]
+        klu_pos.append({id(klu): pos for pos, klu in enumerate(klu_lst)})
+        level_arrays: Dict[str, np.ndarray] = {}
+        store = level_store(kl_list)
+        for name in store.columns:
+            level_arrays[f"bar/{name}"] = store[name]
+        if lv_idx > 0:
+            sup_pos = klu_pos[lv_idx-1]
+            level_arrays["klu/sup_pos"] = np.array([-1 if klu.sup_kl is None else sup_pos[id(klu.sup_kl)] for klu in klu_lst], dtype=np.int64)
+
+        level_arrays["klc/klu_cnt"] = np.array([len(klc.lst) for klc in kl_list.lst], dtype=np.int64)
+        level_arrays["klc/high"] = np.array([klc.high for klc in kl_list.lst], dtype=np.float64)
+        level_arrays["klc/low"] = np.array([klc.low for klc in kl_list.lst], dtype=np.float64)
+        level_arrays["klc/dir"] = np.array([klc.dir.value for klc in kl_list.lst], dtype=np.int8)
+        level_arrays["klc/fx"] = np.array([klc.fx.value for klc in kl_list.lst], dtype=np.int8)
+
+        bi_list = kl_list.bi_list
+        bi_tbl = line_table(bi_list)
+        bi_tbl["begin_klc"] = np.array([bi.begin_klc.idx for bi in bi_list], dtype=np.int64)
+        bi_tbl["end_klc"] = np.array([bi.end_klc.idx for bi in bi_list], dtype=np.int64)
+        bi_tbl["sure_end_cnt"] = np.array([len(bi.sure_end) for bi in bi_list], dtype=np.int64)
+        level_arrays["bi_sure_end/klc"] = np.array([klc.idx for bi in bi_list for klc in bi.sure_end], dtype=np.int64)
+        for table_name, table in [
+            ("bi", bi_tbl),
+            ("seg", line_table(kl_list.seg_list)),
+            ("segseg", line_table(kl_list.segseg_list)),
+            ("zs", zs_table(kl_list.zs_list)),
+            ("segzs", zs_table(kl_list.segzs_list)),
+            ("bsp", bsp_table(kl_list.bs_point_lst, with_feat=True)),
+            ("segbsp", bsp_table(kl_list.seg_bs_point_lst, with_feat=True)),
+        ]:
+            for name, arr in table.items():
+                level_arrays[f"{table_name}/{name}"] = arr
+
+        engine = next((model for model in kl_list.metric_model_lst if isinstance(model, CDemarkEngine)), None)
+        demark, demark_state = demark_arrays(klu_lst, engine)
+        level_arrays.update(demark)
+        header["levels"][lv.name] = {
+            "models": [
+                {"type": type(model).__name__, "state": demark_state if model is engine else model.get_state()}
+                for model in kl_list.metric_model_lst
+            ],
+            "bi_list": {
+                "last_end": None if bi_list.last_end is None else bi_list.last_end.idx,
+                "free_klc": [klc.idx for klc in bi_list.free_klc_lst],
+            },
+        }
+        for name, arr in level_arrays.items():
+            arrays[f"{lv.name}/{name}"] = arr
+    header["chan"] = chan_meta(chan, klu_pos)
+
+    write_column_file(filepath, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, arrays, header)
+
+
+class CSnapshotStockApi(CCommonStockApi):
+    '''
+    从快照的K线列读取数据的数据源，用于 CChanSnapshot.to_chan 按新配置重算
+    '''
+    thread_safe = True
+    snapshot: 'CChanSnapshot' = None  # type: ignore
+
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        yield from CBarFrame(self.snapshot.bars(self.k_type)).klu_iter()
+
+    def SetBasciInfo(self):
+        pass
+
+    @classmethod
+    def do_init(cls):
+        pass
+
+    @classmethod
+    def do_close(cls):
+        pass
+
+
+def same_table(a: Dict[str, np.ndarray], b: Dict[str, np.ndarray]) -> bool:
+    return a.keys() <= b.keys() and all(np.array_equal(arr, b[name], equal_nan=arr.dtype.kind == "f") for name, arr in a.items())
+
+
+class CChanSnapshot:
+    '''
+    快照读取：文件以 mmap 方式打开，K线列和笔/线段/中枢/买卖点表直接返回只读 numpy 视图，不做任何拷贝
+    需要继续计算（feed/trigger_load）时调用 to_chan() 恢复成 CChan
+    meta 为 CChan 构造参数、原始配置等 json 信息
+    '''
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.__file = CColumnFile(filepath, SNAPSHOT_MAGIC, SNAPSHOT_VERSION)
+        header = self.__file.header
+        self.lv_list: List[KL_TYPE] = [KL_TYPE[name] for name in header["lv_list"]]
+        self.meta: dict = {**header["chan"], "lv_list": header["lv_list"], "conf": header["conf"]}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        # 关闭后之前返回的数组视图不可再使用
+        self.__file.close()
+
+    def array(self, name: str) -> np.ndarray:
+        return self.__file.array(name)
+
+    def bars(self, lv: KL_TYPE) -> Dict[str, np.ndarray]:
+        '''
+        K线列，列名与 CKLine_Store 一致
+        '''
+        return self.__file.group(f"{lv.name}/bar/")
+
+    def table(self, lv: KL_TYPE, name: str) -> Dict[str, np.ndarray]:
+        '''
+        name: bi/seg/segseg/zs/segzs/bsp/segbsp
+        '''
+        return self.__file.group(f"{lv.name}/{name}/")
+
+    def to_chan(self, config: Optional[CChanConfig] = None) -> CChan:
+        '''
+        config 为 None 时按快照直接恢复：K线、合并K线、笔从保存的表重建，指标模型等继续计算所需的状态从快照恢复，
+        线段、中枢、买卖点由笔一次算出后与保存的表核对，不重放K线；结果与保存时完全一致，可以继续 feed/trigger_load
+        传入 config 时用快照中的K线按新配置重新计算（回放模式逐根计算）
+        '''
+        if config is not None:
+            return self.recal_chan(config)
+        meta = self.meta
+        chan: CChan = CChan.__new__(CChan)
+        chan.code = meta["code"]
+        chan.begin_time = meta["begin_time"]
+        chan.end_time = meta["end_time"]
+        chan.autype = None if meta["autype"] is None else AUTYPE[meta["autype"]]
+        chan.data_src = decode_data_src(meta["data_src"])
+        chan.lv_list = list(self.lv_list)
+        chan.conf = CChanConfig(json.loads(json.dumps(meta["conf"])))
+        chan.kl_misalign_cnt = meta["kl_misalign_cnt"]
+        chan.kl_inconsistent_detail = defaultdict(list, {k: [key2time(*t) for t in v] for k, v in meta["kl_inconsistent_detail"].items()})
+        chan.g_kl_iter = defaultdict(list)
+        chan.prefetch_iter_lst = []
+        chan.resampler = None
+        if meta["resampler"] is not None:
+            chan.resampler = CKLineResampler(chan.lv_list, chan.conf.kl_session)
+            chan.resampler.set_state(meta["resampler"])
+        chan.do_init()
+        chan.init_klu_cache()
+
+        klu_lst_by_lv: List[List[CKLine_Unit]] = []
+        for lv_idx, lv in enumerate(chan.lv_list):
+            klu_lst = self.restore_level(chan[lv], lv, None if lv_idx == 0 else klu_lst_by_lv[-1])
+            klu_lst_by_lv.append(klu_lst)
+            if klu_lst:
+                chan.klu_last_t[lv_idx] = klu_lst[-1].time
+            chan.feed_orphan_klu[lv_idx] = [klu_lst[pos] for pos in meta["feed_orphan_klu"][lv_idx]]
+        return chan
+
+    def recal_chan(self, config: CChanConfig) -> CChan:
+        meta = self.meta
+        stockapi_cls = type("CSnapshotStockApi", (CSnapshotStockApi,), {"snapshot": self})
+        chan = CChan(
+            code=meta["code"],
+            begin_time=meta["begin_time"],
+            end_time=meta["end_time"],
+            data_src=stockapi_cls,
+            lv_list=list(self.lv_list),
+            config=config,
+            autype=None if meta["autype"] is None else AUTYPE[meta["autype"]],
+        )
+        if config.trigger_step:
+            for _ in chan.step_load():
+                pass
+        chan.data_src = decode_data_src(meta["data_src"])
+        return chan
+
+    def restore_level(self, kl_list: CKLine_List, lv: KL_TYPE, sup_klu_lst: Optional[List[CKLine_Unit]]) -> List[CKLine_Unit]:
+        level_state = self.__file.header["levels"][lv.name]
+        bars = self.bars(lv)
+        klu_lst = restore_klu_lst(bars, lv)
+        series_lst = restore_demark_series(self.__file.group(f"{lv.name}/demark_kl/"), self.__file.group(f"{lv.name}/demark_series/"))
+        restore_demark(klu_lst, self.__file.group(f"{lv.name}/demark/"), series_lst)
+        restore_metric_model(kl_list, level_state["models"], series_lst)
+        if sup_klu_lst is not None:
+            for klu, pos in zip(klu_lst, self.array(f"{lv.name}/klu/sup_pos").tolist()):
+                if pos >= 0:
+                    sup_klu_lst[pos].add_children(klu)
+                    klu.set_parent(sup_klu_lst[pos])
+        if not klu_lst:
+            return klu_lst
+
+        if kl_list.klu_lst is not None and bars["idx"][0] == 0 and bars["idx"][-1] == len(klu_lst) - 1 and np.all(np.diff(bars["idx"]) == 1):
+            kl_list.klu_lst.extend(klu_lst)
+        else:
+            kl_list.klu_lst = None
+            kl_list.bi_list.klu_lst = None
+        if kl_list.metric_index is not None:
+            kl_list.metric_index.extend(klu_lst)
+
+        restore_klc(kl_list, klu_lst, self.__file.group(f"{lv.name}/klc/"))
+        restore_bi(kl_list, self.table(lv, "bi"), self.array(f"{lv.name}/bi_sure_end/klc"), level_state["bi_list"])
+
+        # 线段、中枢、买卖点只由笔决定，一次算出后与保存的表核对
+        kl_list.cal_seg_zs_bsp()
+        for name in LINE_TABLES:
+            if not same_table(line_table(getattr(kl_list, f"{name}_list")), self.table(lv, name)):
+                raise CChanException(f"snapshot {self.filepath} {lv.name} {name} mismatch", ErrCode.SNAPSHOT_ERR)
+        for name in ZS_TABLES:
+            if not same_table(zs_table(getattr(kl_list, f"{name}_list")), self.table(lv, name)):
+                raise CChanException(f"snapshot {self.filepath} {lv.name} {name} mismatch", ErrCode.SNAPSHOT_ERR)
+        for name, bsp_list in zip(BSP_TABLES, (kl_list.bs_point_lst, kl_list.seg_bs_point_lst)):
+            saved = self.table(lv, name)
+            if not same_table(bsp_table(bsp_list), saved):
+                raise CChanException(f"snapshot {self.filepath} {lv.name} {name} mismatch", ErrCode.SNAPSHOT_ERR)
+            restore_bsp_feat(bsp_list, saved)
+        return klu_lst
+
+
+def restore_klu_lst(bars: Dict[str, np.ndarray], lv: KL_TYPE) -> List[CKLine_Unit]:
+    # 用K线列生成K线，idx、前后链接以及单根K线指标直接从列中恢复
+    klu_lst = list(CBarFrame(bars).klu_iter())
+    for klu, idx in zip(klu_lst, bars["idx"].tolist()):
+        klu.set_idx(idx)
+        klu.kl_type = lv
+    for pre_klu, klu in zip(klu_lst, klu_lst[1:]):
+        klu.set_pre_klu(pre_klu)
+    if "macd" in bars:
+        for klu, item in zip(klu_lst, zip(*(bars[name].tolist() for name in MACD_COLUMNS[:4]))):
+            klu.macd = CMACD_item(*item)
+    if "boll_mid" in bars:
+        for klu, (theta, up, down, mid) in zip(klu_lst, zip(*(bars[name].tolist() for name in BOLL_COLUMNS))):
+            boll = BOLL_Metric(mid, theta)
+            boll.UP, boll.DOWN = up, down
+            klu.boll = boll
+    if "rsi" in bars:
+        for klu, rsi in zip(klu_lst, bars["rsi"].tolist()):
+            klu.rsi = rsi
+    if "kdj_k" in bars:
+        for klu, item in zip(klu_lst, zip(*(bars[name].tolist() for name in KDJ_COLUMNS))):
+            klu.kdj = KDJ_Item(*item)
+    for trend_type in TREND_TYPE:
+        prefix = f"trend_{trend_type.value}_"
+        for name in bars:
+            if name.startswith(prefix):
+                T = int(name[len(prefix):])
+                for klu, value in zip(klu_lst, bars[name].tolist()):
+                    klu.trend.setdefault(trend_type, {})[T] = value
+    return klu_lst
+
+
+def restore_demark_series(kl_tbl: Dict[str, np.ndarray], series_tbl: Dict[str, np.ndarray]) -> List[CDemarkSetup]:
+    kl_rows = [C_KL(*kl) for kl in zip(*(kl_tbl[name].tolist() for name in ("idx", "close", "high", "low")))]
+    series_lst: List[CDemarkSetup] = []
+    for kl_begin, kl_cnt, cd_kl_cnt, _dir, setup_finished, idx, tdst_peak, cd_idx, cd_tdst_peak, cd_finish in zip(*(series_tbl[name].tolist() for name in (
+        "kl_begin", "kl_cnt", "cd_kl_cnt", "dir", "setup_finished", "idx", "tdst_peak", "cd_idx", "cd_tdst_peak", "cd_finish",
+    ))):
+        countdown = None
+        cd_begin = kl_begin + 1 + kl_cnt
+        if cd_kl_cnt >= 0:
+            countdown = CDemarkCountdown.restore(BI_DIR(_dir), kl_rows[cd_begin:cd_begin+cd_kl_cnt], cd_idx, cd_tdst_peak, cd_finish)
+        series_lst.append(CDemarkSetup.restore(
+            BI_DIR(_dir),
+            kl_rows[kl_begin+1:cd_begin],
+            kl_rows[kl_begin],
+            setup_finished,
+            idx,
+            None if tdst_peak != tdst_peak else tdst_peak,
+            countdown,
+        ))
+    return series_lst
+
+
+def restore_metric_model(kl_list: CKLine_List, model_state_lst: List[dict], series_lst: List[CDemarkSetup]):
+    if [type(model).__name__ for model in kl_list.metric_model_lst] != [state["type"] for state in model_state_lst]:
+        raise CChanException("snapshot metric models mismatch with config", ErrCode.SNAPSHOT_ERR)
+    for model, state in zip(kl_list.metric_model_lst, model_state_lst):
+        if isinstance(model, CDemarkEngine):
+            model.set_state(state["state"], series_lst)
+        else:
+            model.set_state(state["state"])
+
+
+def restore_klc(kl_list: CKLine_List, klu_lst: List[CKLine_Unit], klc_tbl: Dict[str, np.ndarray]):
+    # 链接方式与逐根合并一致：只有中间的合并K线调用过 update_fx
+    pos = 0
+    for idx, (klu_cnt, high, low, _dir, fx) in enumerate(zip(*(klc_tbl[name].tolist() for name in ("klu_cnt", "high", "low", "dir", "fx")))):
+        klc = CKLine(klu_lst[pos], idx=idx, _dir=KLINE_DIR(_dir))
+        klc.extend_combined(klu_lst[pos+1:pos+klu_cnt], high, low)
+        klc.set_fx(FX_TYPE(fx))
+        kl_list.lst.append(klc)
+        pos += klu_cnt
+    klc_lst = kl_list.lst
+    for idx in range(1, len(klc_lst) - 1):
+        klc_lst[idx].link_fx(klc_lst[idx-1], klc_lst[idx+1], klc_lst[idx].fx)
+
+
+def restore_bi(kl_list: CKLine_List, bi_tbl: Dict[str, np.ndarray], sure_end: np.ndarray, bi_list_state: dict):
+    klc_lst = kl_list.lst
+    bi_list = kl_list.bi_list
+    sure_end_lst = sure_end.tolist()
+    pos = 0
+    for idx, (begin_klc, end_klc, is_sure, sure_end_cnt, _dir) in enumerate(zip(*(bi_tbl[name].tolist() for name in ("begin_klc", "end_klc", "is_sure", "sure_end_cnt", "dir")))):
+        bi = CBi(klc_lst[begin_klc], klc_lst[end_klc], idx=idx, is_sure=is_sure)
+        if bi.dir.value != _dir:
+            raise CChanException(f"snapshot bi {idx} direction mismatch", ErrCode.SNAPSHOT_ERR)
+        for klc_idx in sure_end_lst[pos:pos+sure_end_cnt]:
+            bi.append_sure_end(klc_lst[klc_idx])
+        pos += sure_end_cnt
+        bi.metric_index = bi_list.metric_index
+        bi.klu_lst = bi_list.klu_lst
+        if bi_list.bi_list:
+            bi_list.bi_list[-1].next = bi
+            bi.pre = bi_list.bi_list[-1]
+        bi_list.bi_list.append(bi)
+    bi_list.last_end = None if bi_list_state["last_end"] is None else klc_lst[bi_list_state["last_end"]]
+    bi_list.free_klc_lst = [klc_lst[idx] for idx in bi_list_state["free_klc"]]
+
+
+def restore_demark(klu_lst: List[CKLine_Unit], demark_tbl: Dict[str, np.ndarray], series_lst: List[CDemarkSetup]):
+    for pos, _type, _dir, idx, series in zip(*(demark_tbl[name].tolist() for name in ("klu_pos", "type", "dir", "idx", "series"))):
+        klu_lst[pos].demark.add(BI_DIR(_dir), DEMARK_TYPE_LST[_type], idx, series_lst[series])
+
+
+def restore_bsp_feat(bsp_list: CBSPointList, saved: Dict[str, np.ndarray]):
+    feat_lst = [(name[len("feat:"):], arr.tolist()) for name, arr in saved.items() if name.startswith("feat:")]
+    for pos, bsp in enumerate(bsp_list.getSortedBspList()):
+        bsp.features = type(bsp.features)({name: arr[pos] for name, arr in feat_lst if arr[pos] == arr[pos]})
+
+
+def load_chan_snapshot(filepath: str) -> CChan:
+    with CChanSnapshot(filepath) as snapshot:
+        return snapshot.to_chan()
@@ -0,0 +1,126 @@
+from typing import List, Optional
+
+import numpy as np
+
+from Common.CEnum import FX_TYPE, KLINE_DIR
+from Common.ChanException import CChanException, ErrCode
+
+
+class CCombineScanResult:
+    '''
+    combine_scan 的结果，按合并K线分组：
+    第 0 组是接在传入的当前合并K线后面的单位K线（可能为空），之后每组是一根新的合并K线
+    - begin: 每组第一根单位K线在输入中的下标，end 为下一组的 begin（最后一组到输入末尾）
+    - dir/high/low: 每组合并K线的方向以及合并完之后的最高最低价（第 0 组为当前合并K线的最终状态）
+    - fx: 第 g 组的分型，在第 g+1 组出现时确定；没有后一组或者没有前一根合并K线的为 None
+    '''
+    def __init__(self, begin: np.ndarray, end: np.ndarray, dir_lst: List[KLINE_DIR], high: List[float], low: List[float], fx: List[Optional[FX_TYPE]]):
+        self.begin = begin
+        self.end = end
+        self.dir = dir_lst
+        self.high = high
+        self.low = low
+        self.fx = fx
+
+    def __len__(self):
+        return len(self.dir)
+
+
+def combine_scan(
+    high,
+    low,
+    cur_high: float,
+    cur_low: float,
+    cur_dir: KLINE_DIR,
+    pre_high: Optional[float] = None,
+    pre_low: Optional[float] = None,
+    exclude_included=False,
+    allow_top_equal=None,
+) -> CCombineScanResult:
+    '''
+    批量K线合并：与逐根调用 CKLine_Combiner.try_add/update_fx 的结果完全一致（含 exclude_included/allow_top_equal）
+    high/low: 待合并的单位K线高低点
+    cur_high/cur_low/cur_dir: 当前（最后一根）合并K线的状态；pre_high/pre_low: 它前一根合并K线，没有时为 None
+    包含关系依赖合并之后的高低点，是一个顺序递推，这里只在 python float 上做一遍紧凑的比较；
+    分型只依赖相邻合并K线，合并完成后用 numpy 一次算出
+    '''
+    high_lst = np.asarray(high, dtype=np.float64).tolist()
+    low_lst = np.asarray(low, dtype=np.float64).tolist()
+    begin = [0]
+    dir_lst = [cur_dir]
+    klc_high = []
+    klc_low = []
+    for idx, (h, l) in enumerate(zip(high_lst, low_lst)):
+        # 与 CKLine_Combiner.test_combine 相同的判断顺序
+        if cur_high >= h and cur_low <= l:
+            _dir = KLINE_DIR.COMBINE
+        elif cur_high <= h and cur_low >= l:
+            if allow_top_equal == 1 and cur_high == h and cur_low > l:
+                _dir = KLINE_DIR.DOWN
+            elif allow_top_equal == -1 and cur_low == l and cur_high < h:
+                _dir = KLINE_DIR.UP
+            else:
+                _dir = KLINE_DIR.INCLUDED if exclude_included else KLINE_DIR.COMBINE
+        elif cur_high > h and cur_low > l:
+            _dir = KLINE_DIR.DOWN
+        elif cur_high < h and cur_low < l:
+            _dir = KLINE_DIR.UP
+        else:
+            raise CChanException("combine type unknown", ErrCode.COMBINER_ERR)
+
+        if _dir == KLINE_DIR.COMBINE:
+            if cur_dir == KLINE_DIR.UP:
+                if h != l or h != cur_high:
+                    cur_high = max(h, cur_high)
+                    cur_low = max(l, cur_low)
+            elif cur_dir == KLINE_DIR.DOWN:
+                if h != l or l != cur_low:
+                    cur_high = min(h, cur_high)
+                    cur_low = min(l, cur_low)
+            else:
+                raise CChanException(f"KLINE_DIR = {cur_dir} err!!! must be {KLINE_DIR.UP}/{KLINE_DIR.DOWN}", ErrCode.COMBINER_ERR)
+        else:
+            klc_high.append(cur_high)
+            klc_low.append(cur_low)
+            begin.append(idx)
+            dir_lst.append(_dir)
+            cur_high, cur_low, cur_dir = h, l, _dir
+    klc_high.append(cur_high)
+    klc_low.append(cur_low)
+
+    begin_arr = np.array(begin, dtype=np.int64)
+    end_arr = np.append(begin_arr[1:], len(high_lst))
+    fx = fx_scan(klc_high, klc_low, high_lst, low_lst, begin_arr, pre_high, pre_low, exclude_included, allow_top_equal)
+    return CCombineScanResult(begin_arr, end_arr, dir_lst, klc_high, klc_low, fx)
+
+
+def fx_scan(klc_high, klc_low, high_lst, low_lst, begin: np.ndarray, pre_high, pre_low, exclude_included, allow_top_equal) -> List[Optional[FX_TYPE]]:
+    # 第 g 组的分型由 前一组最终状态、本组最终状态、后一组第一根单位K线 决定，与 update_fx 被调用时看到的状态一致
+    fx: List[Optional[FX_TYPE]] = [None] * len(klc_high)
+    if len(klc_high) < 2:
+        return fx
+    h = np.asarray(klc_high, dtype=np.float64)
+    l = np.asarray(klc_low, dtype=np.float64)
+    ph = np.concatenate([[np.nan if pre_high is None else pre_high], h[:-2]])
+    pl = np.concatenate([[np.nan if pre_low is None else pre_low], l[:-2]])
+    nh = np.asarray(high_lst, dtype=np.float64)[begin[1:]]
+    nl = np.asarray(low_lst, dtype=np.float64)[begin[1:]]
+    h, l = h[:-1], l[:-1]
+    if exclude_included:
+        top_cond = (ph < h) & (nh <= h) & (nl < l)
+        bottom_cond = ~top_cond & (nh > h) & (pl > l) & (nl >= l)
+        is_top = top_cond & ((allow_top_equal == 1) | (nh < h))
+        is_bottom = bottom_cond & ((allow_top_equal == -1) | (nl > l))
+        unhandled = np.zeros(len(h), dtype=bool)
+    else:
+        is_top = (ph < h) & (nh < h) & (pl < l) & (nl < l)
+        is_bottom = (ph > h) & (nh > h) & (pl > l) & (nl > l)
+        is_up = (ph < h) & (pl < l) & (h < nh) & (l < nl)
+        is_down = (ph > h) & (pl > l) & (h > nh) & (l > nl)
+        unhandled = ~(is_top | is_bottom | is_up | is_down)
+    first = 0 if pre_high is not None else 1  # 第 0 组没有前一根合并K线时不会计算分型
+    if unhandled[first:].any():
+        raise CChanException("Unhandled FX case detected", ErrCode.COMBINER_ERR)
+    for g in range(first, len(h)):
+        fx[g] = FX_TYPE.TOP if is_top[g] else (FX_TYPE.BOTTOM if is_bottom[g] else FX_TYPE.UNKNOWN)
+    return fx
@@ -3,23 +3,29 @@ from typing import TypeVar, Generic, Iterable, List, Optional, Union, overload
 
 Self = TypeVar('T', bound='CKLine_Combiner')
 
-from Common.cache import make_cache
+from Common.cache import init_cache, make_cache
 from Common.CEnum import FX_TYPE, KLINE_DIR
 from Common.ChanException import CChanException, ErrCode
+from Common.func_util import copy_slots
 from KLine.KLine_Unit import CKLine_Unit
 
 from .Combine_Item import CCombine_Item
-from Common.func_util import logger
+from Common.trace import get_tracer
 from Common.CTime import CTime
+
+TRACE = get_tracer("Combiner.KLine_Combiner")
 T = TypeVar('T')
 
 
 # 合并后的K线类
 class CKLine_Combiner(Generic[T]):
+    __slots__ = ("__time_begin", "__time_end", "__high", "__low", "__lst", "__dir", "__fx", "__pre", "__next", "_memoize_cache", "_memoize_gen")
+
     def __init__(self, kl_unit: T, _dir):
         '''
         初始化合并后的K线类
         '''
+        init_cache(self)
         item = CCombine_Item(kl_unit)
         # 合并K线的开始时间
         self.__time_begin = item.time_begin
@@ -44,7 +50,7 @@ class CKLine_Combiner(Generic[T]):
         '''
         清除缓存
         '''
-        self._memoize_cache = {}
+        self._memoize_gen += 1
 
     @property
     def time_begin(self): return self.__time_begin
@@ -87,30 +93,36 @@ class CKLine_Combiner(Generic[T]):
         # 左侧包含关系
         if (self.high >= item.high and self.low <= item.low):
             # 如果合并K线的最高价大于等于单位K线的最高价，并且合并K线的最低价小于等于单位K线的最低价，则是 左侧包含关系
-            logger.info("[Check Combine] Left-side inclusion: Combined K-line({},{}) includes Unit K-line({},{}), It's Combine".format(self.high, self.low, item.high, item.low))
+            if TRACE.on:
+                TRACE.info("[Check Combine] Left-side inclusion: Combined K-line({},{}) includes Unit K-line({},{}), It's Combine".format(self.high, self.low, item.high, item.low))
             return KLINE_DIR.COMBINE
         # 右侧包含关系
         elif (self.high <= item.high and self.low >= item.low):
             # 如果合并K线的最高价小于等于单位K线的最高价，并且合并K线的最低价大于等于单位K线的最低价，则是 右侧包含关系
             if allow_top_equal == 1 and self.high == item.high and self.low > item.low:
                 # 如果允许顶部相等，并且合并K线的最高价等于单位K线的最高价，并且合并K线的最低价大于单位K线的最低价，则返回 向下合并
-                logger.info("[Check Combine] Right-side inclusion (equal tops): Unit K-line({},{}) includes Combined K-line({},{}), It's Down".format(item.high, item.low, self.high, self.low))
+                if TRACE.on:
+                    TRACE.info("[Check Combine] Right-side inclusion (equal tops): Unit K-line({},{}) includes Combined K-line({},{}), It's Down".format(item.high, item.low, self.high, self.low))
                 return KLINE_DIR.DOWN
             elif allow_top_equal == -1 and self.low == item.low and self.high < item.high:
                 # 如果允许底部相等，并且合并K线的最低价等于单位K线的最低价，并且合并K线的最高价小于单位K线的最高价，则返回 向上合并
-                logger.info("[Check Combine] Right-side inclusion (equal bottoms): Unit K-line({},{}) includes Combined K-line({},{}), It's Up".format(item.high, item.low, self.high, self.low))
+                if TRACE.on:
+                    TRACE.info("[Check Combine] Right-side inclusion (equal bottoms): Unit K-line({},{}) includes Combined K-line({},{}), It's Up".format(item.high, item.low, self.high, self.low))
                 return KLINE_DIR.UP
             # 如果 exclude_included 为 True，则返回 包含关系 否则返回合并
             result = KLINE_DIR.INCLUDED if exclude_included else KLINE_DIR.COMBINE
-            logger.info("[Check Combine] Right-side inclusion: Unit K-line({},{}) includes Combined K-line({},{}), exclude_included={}, returning {}".format(item.high, item.low, self.high, self.low, exclude_included, result))
+            if TRACE.on:
+                TRACE.info("[Check Combine] Right-side inclusion: Unit K-line({},{}) includes Combined K-line({},{}), exclude_included={}, returning {}".format(item.high, item.low, self.high, self.low, exclude_included, result))
             return result
         elif (self.high > item.high and self.low > item.low):
             # 如果合并K线的最高价大于单位K线的最高价，并且合并K线的最低价大于单位K线的最低价，则返回 向下 非合并
-            logger.info("[Check Combine] Down Trend: Combined K-line({},{}) high point higher than Unit K-line({},{}) and low point higher than Unit K-line, It's Down".format(self.high, self.low, item.high, item.low))
+            if TRACE.on:
+                TRACE.info("[Check Combine] Down Trend: Combined K-line({},{}) high point higher than Unit K-line({},{}) and low point higher than Unit K-line, It's Down".format(self.high, self.low, item.high, item.low))
             return KLINE_DIR.DOWN
         elif (self.high < item.high and self.low < item.low):
             # 如果合并K线的最高价小于单位K线的最高价，并且合并K线的最低价小于单位K线的最低价，则返回 向上 非合并
-            logger.info("[Check Combine] Up Trend: Combined K-line({},{}) high point lower than Unit K-line({},{}) and low point lower than Unit K-line, It's Up".format(self.high, self.low, item.high, item.low))
+            if TRACE.on:
+                TRACE.info("[Check Combine] Up Trend: Combined K-line({},{}) high point lower than Unit K-line({},{}) and low point lower than Unit K-line, It's Up".format(self.high, self.low, item.high, item.low))
             return KLINE_DIR.UP
         else:
             # 如果合并K线的最高价和最低价都不大于或小于单位K线的最高价和最低价，则抛出异常
@@ -125,6 +137,46 @@ class CKLine_Combiner(Generic[T]):
         # only for deepcopy
         self.__fx = fx
 
+    def extend_combined(self, unit_kl_lst: List[T], high, low):
+        '''
+        批量合并：unit_kl_lst 全部并入当前合并K线，高低点直接设为 combine_scan 算好的最终值
+        '''
+        if not unit_kl_lst:
+            return
+        self.__lst.extend(unit_kl_lst)
+        if isinstance(unit_kl_lst[-1], CKLine_Unit):
+            for unit_kl in unit_kl_lst:
+                unit_kl.set_klc(self)
+            self.__time_end = unit_kl_lst[-1].time
+        else:
+            self.__time_end = CCombine_Item(unit_kl_lst[-1]).time_end
+        self.__high = high
+        self.__low = low
+        self.clean_cache()
+
+    def link_fx(self, _pre: Self, _next: Self, fx: FX_TYPE):
+        '''
+        批量合并：分型已由 combine_scan 算好，只建立前后链接，等价于 update_fx
+        '''
+        self.set_next(_next)
+        self.set_pre(_pre)
+        _next.set_pre(self)
+        if fx != FX_TYPE.UNKNOWN:
+            self.__fx = fx
+        self.clean_cache()
+
+    def clone(self, lst: List[T]) -> Self:
+        '''
+        浅拷贝当前合并K线，单位K线列表换成 lst；前后链接置空、缓存清空，由调用方重新链接（only for deepcopy）
+        '''
+        obj = self.__class__.__new__(self.__class__)
+        copy_slots(self, obj)
+        obj.__lst = lst
+        obj.__pre = None
+        obj.__next = None
+        init_cache(obj)
+        return obj
+
     # K线合并算法
     def try_add(self, unit_kl: T, exclude_included=False, allow_top_equal=None):
         # allow_top_equal = None普通模式
@@ -132,9 +184,11 @@ class CKLine_Combiner(Generic[T]):
         # allow_top_equal = -1 被包含，底部相等不合并
         combine_item = CCombine_Item(unit_kl)
         if isinstance(unit_kl, CKLine_Unit):    
-            logger.info(f"\n[Try_Add_KLU Processing type: CKLine_Unit, time_begin={combine_item.time_begin}, time_end={combine_item.time_end}")
+            if TRACE.on:
+                TRACE.info(f"\n[Try_Add_KLU Processing type: CKLine_Unit, time_begin={combine_item.time_begin}, time_end={combine_item.time_end}")
         else:
-            logger.info(f"[Try_Add_Bi_Seg] Processing type: {type(unit_kl)}, time_begin={combine_item.time_begin}, time_end={combine_item.time_end}")
+            if TRACE.on:
+                TRACE.info(f"[Try_Add_Bi_Seg] Processing type: {type(unit_kl)}, time_begin={combine_item.time_begin}, time_end={combine_item.time_end}")
 
         # 检测 当前合并K和 unit_kl 的 合并关系
         _dir = self.test_combine(combine_item, exclude_included, allow_top_equal)
@@ -165,16 +219,20 @@ class CKLine_Combiner(Generic[T]):
             # 更新 当前合并K 的结束时间
             self.__time_end = combine_item.time_end
             if isinstance(unit_kl, CKLine_Unit):
-                logger.info(f"[Try_Add_KLU Combine Done - Updated time_end: {self.__time_end}")
+                if TRACE.on:
+                    TRACE.info(f"[Try_Add_KLU Combine Done - Updated time_end: {self.__time_end}")
             else:
-                logger.info(f"[Try_Add_Bi_Seg] Combine Done - Updated time_end: {self.__time_end}")
+                if TRACE.on:
+                    TRACE.info(f"[Try_Add_Bi_Seg] Combine Done - Updated time_end: {self.__time_end}")
             # 清除缓存
             self.clean_cache()
         # 返回UP/DOWN/COMBINE给KL_LIST，设置下一个的方向
         if isinstance(unit_kl, CKLine_Unit):
-            logger.info(f"[Try_Add_KLU Try add result: {_dir} {combine_item.time_begin}~{combine_item.time_end}")
+            if TRACE.on:
+                TRACE.info(f"[Try_Add_KLU Try add result: {_dir} {combine_item.time_begin}~{combine_item.time_end}")
         else:
-            logger.info(f"[Try_Add_Bi_Seg] Try add result: {_dir} {combine_item.time_begin}~{combine_item.time_end}")
+            if TRACE.on:
+                TRACE.info(f"[Try_Add_Bi_Seg] Try add result: {_dir} {combine_item.time_begin}~{combine_item.time_end}")
         return _dir
 
     def get_peak_klu(self, is_high) -> T:
@@ -212,70 +270,85 @@ class CKLine_Combiner(Generic[T]):
             # 如果 上一个合并K线的最高价小于当前合并K线的最高价
             # 并且 下一个合并K线的最高价小于等于当前合并K线的最高价
             # 并且 下一个合并K线的最低价小于当前合并K线的最低价
-            logger.info(f"[Update FX] FX Update: {_pre.time_begin}~{_pre.time_end} -> {self.time_begin}~{self.time_end} -> {_next.time_begin}~{_next.time_end}")
-            logger.info(f"[Update FX] Pre: {_pre.low}->{_pre.high}, Current: {self.low}->{self.high}, Next: {_next.low}->{_next.high}")
-            logger.info(f"[Update FX] Params: exclude_included={exclude_included}, allow_top_equal={allow_top_equal}")
+            if TRACE.on:
+                TRACE.info(f"[Update FX] FX Update: {_pre.time_begin}~{_pre.time_end} -> {self.time_begin}~{self.time_end} -> {_next.time_begin}~{_next.time_end}")
+                TRACE.info(f"[Update FX] Pre: {_pre.low}->{_pre.high}, Current: {self.low}->{self.high}, Next: {_next.low}->{_next.high}")
+                TRACE.info(f"[Update FX] Params: exclude_included={exclude_included}, allow_top_equal={allow_top_equal}")
             
             if _pre.high < self.high and _next.high <= self.high and _next.low < self.low:
                 # 如果 allow_top_equal 为 1，则允许顶部相等，否则不允许
-                logger.info(f"[Update FX] Exclude mode - TOP condition: Pre.high({_pre.high}) < Self.high({self.high}) and Next.high({_next.high}) <= Self.high({self.high}) and Next.low({_next.low}) < Self.low({self.low})")
+                if TRACE.on:
+                    TRACE.info(f"[Update FX] Exclude mode - TOP condition: Pre.high({_pre.high}) < Self.high({self.high}) and Next.high({_next.high}) <= Self.high({self.high}) and Next.low({_next.low}) < Self.low({self.low})")
                 if allow_top_equal == 1 or _next.high < self.high:
-                    logger.info(f"[Update FX] TOP confirmed: allow_top_equal={allow_top_equal} or Next.high({_next.high}) < Self.high({self.high})")
+                    if TRACE.on:
+                        TRACE.info(f"[Update FX] TOP confirmed: allow_top_equal={allow_top_equal} or Next.high({_next.high}) < Self.high({self.high})")
                     self.__fx = FX_TYPE.TOP
                 else:
-                    logger.info(f"[Update FX] TOP rejected: allow_top_equal={allow_top_equal} and Next.high({_next.high}) == Self.high({self.high})")
+                    if TRACE.on:
+                        TRACE.info(f"[Update FX] TOP rejected: allow_top_equal={allow_top_equal} and Next.high({_next.high}) == Self.high({self.high})")
             # 如果 下一个合并K线的最高价大于当前合并K线的最高价，
             # 并且 上一个合并K线的最低价大于当前合并K线的最低价，
             # 并且 下一个合并K线的最低价大于等于当前合并K线的最低价
             elif _next.high > self.high and _pre.low > self.low and _next.low >= self.low:
                 # 如果 allow_top_equal 为 -1，则允许底部相等，否则不允许
-                logger.info(f"[Update FX] Exclude mode - BOTTOM condition: Next.high({_next.high}) > Self.high({self.high}) and Pre.low({_pre.low}) > Self.low({self.low}) and Next.low({_next.low}) >= Self.low({self.low})")
+                if TRACE.on:
+                    TRACE.info(f"[Update FX] Exclude mode - BOTTOM condition: Next.high({_next.high}) > Self.high({self.high}) and Pre.low({_pre.low}) > Self.low({self.low}) and Next.low({_next.low}) >= Self.low({self.low})")
                 if allow_top_equal == -1 or _next.low > self.low:
-                    logger.info(f"[Update FX] BOTTOM confirmed: allow_top_equal={allow_top_equal} or Next.low({_next.low}) > Self.low({self.low})")
+                    if TRACE.on:
+                        TRACE.info(f"[Update FX] BOTTOM confirmed: allow_top_equal={allow_top_equal} or Next.low({_next.low}) > Self.low({self.low})")
                     self.__fx = FX_TYPE.BOTTOM
                 else:
-                    logger.info(f"[Update FX] BOTTOM rejected: allow_top_equal={allow_top_equal} and Next.low({_next.low}) == Self.low({self.low})")
+                    if TRACE.on:
+                        TRACE.info(f"[Update FX] BOTTOM rejected: allow_top_equal={allow_top_equal} and Next.low({_next.low}) == Self.low({self.low})")
             else:
-                logger.info(f"[Update FX] Exclude mode - No FX condition met")
+                if TRACE.on:
+                    TRACE.info(f"[Update FX] Exclude mode - No FX condition met")
         # 如果 上一个合并K线的最高价小于当前合并K线的最高价
         # 并且 下一个合并K线的最高价小于等于当前合并K线的最高价
         # 并且 下一个合并K线的最低价小于当前合并K线的最低价
         elif _pre.high < self.high and _next.high < self.high and _pre.low < self.low and _next.low < self.low:
-            logger.info(f"[Update FX] Normal mode - TOP condition: {_pre.high < self.high and _next.high < self.high and _pre.low < self.low and _next.low < self.low}"
-                            f"| Pre: {_pre.time_begin}~{_pre.time_end}, Self: {self.time_begin}~{self.time_end}, Next: {_next.time_begin}~{_next.time_end}")
+            if TRACE.on:
+                TRACE.info(f"[Update FX] Normal mode - TOP condition: {_pre.high < self.high and _next.high < self.high and _pre.low < self.low and _next.low < self.low}"
+                                f"| Pre: {_pre.time_begin}~{_pre.time_end}, Self: {self.time_begin}~{self.time_end}, Next: {_next.time_begin}~{_next.time_end}")
             self.__fx = FX_TYPE.TOP
         # 如果 上一个合并K线的最高价大于当前合并K线的最高价
         # 并且 下一个合并K线的最高价大于等于当前合并K线的最高价
         # 并且 下一个合并K线的最低价大于当前合并K线的最低价
         elif _pre.high > self.high and _next.high > self.high and _pre.low > self.low and _next.low > self.low:
-            logger.info(f"[Update FX] Normal mode - BOTTOM condition: {_pre.high > self.high and _next.high > self.high and _pre.low > self.low and _next.low > self.low}"
-                              f"| Pre: {_pre.time_begin}~{_pre.time_end}, Self: {self.time_begin}~{self.time_end}, Next: {_next.time_begin}~{_next.time_end}")
+            if TRACE.on:
+                TRACE.info(f"[Update FX] Normal mode - BOTTOM condition: {_pre.high > self.high and _next.high > self.high and _pre.low > self.low and _next.low > self.low}"
+                                  f"| Pre: {_pre.time_begin}~{_pre.time_end}, Self: {self.time_begin}~{self.time_end}, Next: {_next.time_begin}~{_next.time_end}")
             self.__fx = FX_TYPE.BOTTOM
 
         # Check if previous K-line is in a downtrend compared to current K-line
         # This is indicated by prev high < self high AND prev low < self low
         elif _pre.high < self.high and _pre.low < self.low and self.high < _next.high and self.low < _next.low:
-            logger.info(f"[Update FX] Detected uptrend pattern: Pre({_pre.low}->{_pre.high}) -> Self({self.low}->{self.high}) -> Next({_next.low}->{_next.high})"
-                              f" | Pre: {_pre.time_begin}~{_pre.time_end}, Self: {self.time_begin}~{self.time_end}, Next: {_next.time_begin}~{_next.time_end}")
+            if TRACE.on:
+                TRACE.info(f"[Update FX] Detected uptrend pattern: Pre({_pre.low}->{_pre.high}) -> Self({self.low}->{self.high}) -> Next({_next.low}->{_next.high})"
+                                  f" | Pre: {_pre.time_begin}~{_pre.time_end}, Self: {self.time_begin}~{self.time_end}, Next: {_next.time_begin}~{_next.time_end}")
             # This indicates an uptrend from previous to current, followed by downtrend to next K-line
             # Additional logic can be added here if needed for this pattern handling
         elif _pre.high > self.high and _pre.low > self.low and self.high > _next.high and self.low > _next.low:
-            logger.info(f"[Update FX] Detected downtrend pattern: Pre({_pre.low}->{_pre.high}) -> Self({self.low}->{self.high}) -> Next({_next.low}->{_next.high})"
-                              f"| Pre: {_pre.time_begin}~{_pre.time_end}, Self: {self.time_begin}~{self.time_end}, Next: {_next.time_begin}~{_next.time_end}")
+            if TRACE.on:
+                TRACE.info(f"[Update FX] Detected downtrend pattern: Pre({_pre.low}->{_pre.high}) -> Self({self.low}->{self.high}) -> Next({_next.low}->{_next.high})"
+                                  f"| Pre: {_pre.time_begin}~{_pre.time_end}, Self: {self.time_begin}~{self.time_end}, Next: {_next.time_begin}~{_next.time_end}")
             # This indicates a downtrend from previous to current, followed by uptrend to next K-line
             # Additional logic can be added here if needed for this pattern handling
         else:
             # Raise exception for unhandled cases
             # This ensures all possible conditions are explicitly handled
-            logger.warning(f"[Update FX] Unhandled FX case detected with values: Pre({_pre.low}->{_pre.high}), Self({self.low}->{self.high}), Next({_next.low}->{_next.high})"
-                                f"| Pre: {_pre.time_begin}~{_pre.time_end}, Self: {self.time_begin}~{self.time_end}, Next: {_next.time_begin}~{_next.time_end}")
-            logger.warning(f"[Update FX] Conditions: exclude_included={exclude_included}, allow_top_equal={allow_top_equal}")
+            if TRACE.on:
+                TRACE.warning(f"[Update FX] Unhandled FX case detected with values: Pre({_pre.low}->{_pre.high}), Self({self.low}->{self.high}), Next({_next.low}->{_next.high})"
+                                    f"| Pre: {_pre.time_begin}~{_pre.time_end}, Self: {self.time_begin}~{self.time_end}, Next: {_next.time_begin}~{_next.time_end}")
+                TRACE.warning(f"[Update FX] Conditions: exclude_included={exclude_included}, allow_top_equal={allow_top_equal}")
             # We don't raise an exception here as it would disrupt normal operation
             raise CChanException("Unhandled FX case detected", ErrCode.COMBINER_ERR)
             # Instead, we log a warning for debugging purposes
             
         # 清除缓存
         self.clean_cache()
+        if TRACE.on and self.__fx != FX_TYPE.UNKNOWN:
+            TRACE.event("fx", fx=self.__fx, time_begin=self.time_begin, time_end=self.time_end, high=self.high, low=self.low)
 
     def __str__(self):
         return f"{self.time_begin}~{self.time_end} {self.low}->{self.high}"
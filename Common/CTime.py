@@ -1,8 +1,73 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+
+# YYYYMMDDHH -> 该整点的本地时间戳；小时内时区偏移有变化（非整点切换夏令时）时为 None，逐个用 datetime 计算
+_HOUR_TS: Dict[int, Optional[int]] = {}
+
+
+def local_ts(year, month, day, hour, minute, second=0) -> int:
+    '''
+    本地时间转换为时间戳，与 datetime(...).timestamp() 一致，整点的时间戳按小时缓存
+    '''
+    hour_ts = hour_ts_of(((year * 100 + month) * 100 + day) * 100 + hour)
+    if hour_ts is None or not (0 <= minute < 60 and 0 <= second < 60):
+        return int(datetime(year, month, day, hour, minute, second).timestamp())
+    return hour_ts + minute * 60 + second
+
+
+def hour_ts_of(hour_key: int) -> Optional[int]:
+    hour_ts = _HOUR_TS.get(hour_key, 0)
+    if hour_ts == 0 and hour_key not in _HOUR_TS:
+        rest, hour = divmod(hour_key, 100)
+        rest, day = divmod(rest, 100)
+        year, month = divmod(rest, 100)
+        begin = datetime(year, month, day, hour)  # 非法日期在这里报错
+        hour_ts = int(begin.timestamp())
+        if int((begin + timedelta(seconds=3599)).timestamp()) != hour_ts + 3599:
+            hour_ts = None
+        _HOUR_TS[hour_key] = hour_ts
+    return hour_ts
+
+
+def time_key2ts(time_key: np.ndarray, auto: np.ndarray) -> np.ndarray:
+    '''
+    YYYYMMDDHHMMSS 整数批量转换为与 CTime.ts 一致的时间戳，auto 为每根K线生成 CTime 时的 auto 参数
+    '''
+    rest, second = np.divmod(np.asarray(time_key, dtype=np.int64), 100)
+    hour_key, minute = np.divmod(rest, 100)
+    auto_day = np.asarray(auto, dtype=np.bool_) & (hour_key % 100 == 0) & (minute == 0)
+    hour_key = np.where(auto_day, hour_key + 23, hour_key)
+    minute = np.where(auto_day, 59, minute)
+    if ((minute > 59) | (second > 59)).any():
+        raise ValueError("minute/second out of range")
+    uniq, inverse = np.unique(hour_key, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    hour_ts_lst = [hour_ts_of(key) for key in uniq.tolist()]
+    hour_ts = np.array([0 if hour_ts is None else hour_ts for hour_ts in hour_ts_lst], dtype=np.int64)
+    ts = hour_ts[inverse] + minute * 60 + second
+    mixed = np.array([hour_ts is None for hour_ts in hour_ts_lst], dtype=np.bool_)
+    for pos in np.nonzero(mixed[inverse])[0].tolist():
+        rest, hour = divmod(int(hour_key[pos]), 100)
+        rest, day = divmod(rest, 100)
+        year, month = divmod(rest, 100)
+        ts[pos] = local_ts(year, month, day, hour, int(minute[pos]), int(second[pos]))
+    return ts
+
+
+def minute_key(time_str: str) -> int:
+    '''
+    to_str() 格式（或其他按 年月日时分 顺序的格式）的时间字符串转换为 YYYYMMDDHHMM 整数
+    '''
+    digits = "".join(ch for ch in time_str if ch.isdigit())
+    return int(digits[:12].ljust(12, "0"))
 
 
 class CTime:
-    def __init__(self, year, month, day, hour, minute, second=0, auto=True):
+    __slots__ = ("year", "month", "day", "hour", "minute", "second", "auto", "ts", "__str_cache")
+
+    def __init__(self, year, month, day, hour, minute, second=0, auto=True, ts=None):
         self.year = year
         self.month = month
         self.day = day
@@ -10,19 +75,26 @@ class CTime:
         self.minute = minute
         self.second = second
         self.auto = auto  # 自适应对天的理解
-        self.set_timestamp()  # set self.ts
+        self.__str_cache = None
+        if ts is None:
+            self.set_timestamp()  # set self.ts
+        else:
+            self.ts: int = ts  # 批量生成时已经算好
 
     def __str__(self):
-        if self.hour == 0 and self.minute == 0:
-            return f"{self.year:04}/{self.month:02}/{self.day:02}"
-        else:
-            return f"{self.year:04}/{self.month:02}/{self.day:02} {self.hour:02}:{self.minute:02}"
+        return self.to_str()
 
     def to_str(self):
-        if self.hour == 0 and self.minute == 0:
-            return f"{self.year:04}/{self.month:02}/{self.day:02}"
-        else:
-            return f"{self.year:04}/{self.month:02}/{self.day:02} {self.hour:02}:{self.minute:02}"
+        if self.__str_cache is None:
+            if self.hour == 0 and self.minute == 0:
+                self.__str_cache = f"{self.year:04}/{self.month:02}/{self.day:02}"
+            else:
+                self.__str_cache = f"{self.year:04}/{self.month:02}/{self.day:02} {self.hour:02}:{self.minute:02}"
+        return self.__str_cache
+
+    def to_minute_key(self) -> int:
+        # YYYYMMDDHHMM，与 to_str() 一一对应
+        return (((self.year * 100 + self.month) * 100 + self.day) * 100 + self.hour) * 100 + self.minute
 
     def toDateStr(self, splt=''):
         return f"{self.year:04}{splt}{self.month:02}{splt}{self.day:02}"
@@ -32,28 +104,39 @@ class CTime:
 
     def set_timestamp(self):
         if self.hour == 0 and self.minute == 0 and self.auto:
-            date = datetime(self.year, self.month, self.day, 23, 59, self.second)
+            self.ts: int = local_ts(self.year, self.month, self.day, 23, 59, self.second)
         else:
-            date = datetime(self.year, self.month, self.day, self.hour, self.minute, self.second)
-        self.ts = date.timestamp()
+            self.ts = local_ts(self.year, self.month, self.day, self.hour, self.minute, self.second)
 
     def __gt__(self, t2):
         return self.ts > t2.ts
 
     def __ge__(self, t2):
         return self.ts >= t2.ts
-    
-    # def __hash__(self):
-    #     return hash(self.ts)
-    
-    # def __eq__(self, t2):
-    #     return self.ts == t2.ts
-    
+
+    def __hash__(self):
+        return hash(self.ts)
+
+    def __eq__(self, t2):
+        if not isinstance(t2, CTime):
+            return NotImplemented
+        return self.ts == t2.ts
+
     def __ne__(self, t2):
+        if not isinstance(t2, CTime):
+            return NotImplemented
         return self.ts != t2.ts
-    
+
     def __lt__(self, t2):
         return self.ts < t2.ts
-    
+
     def __le__(self, t2):
         return self.ts <= t2.ts
+
+
+def minute_key2time(key: int, auto: bool = False) -> CTime:
+    key, minute = divmod(key, 100)
+    key, hour = divmod(key, 100)
+    key, day = divmod(key, 100)
+    year, month = divmod(key, 100)
+    return CTime(year, month, day, hour, minute, auto=auto)
@@ -67,6 +67,10 @@ class CChanException(Exception):
         self.msg = message
         Exception.__init__(self, message)
 
+    def __reduce__(self):
+        # 跨进程传递时保留错误码
+        return (self.__class__, (self.msg, self.errcode))
+
     def is_kldata_err(self):
         return ErrCode._KL_ERR_BEGIN < self.errcode < ErrCode._KL_ERR_END
 
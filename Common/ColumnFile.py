@@ -0,0 +1,95 @@
+import json
+import mmap
+import os
+import struct
+from typing import Dict, List
+
+import numpy as np
+
+from Common.ChanException import CChanException, ErrCode
+
+ALIGN = 64
+
+# 固定头：magic + 版本号 + 目录(json)长度
+HEAD_FMT = "<8sII"
+HEAD_SIZE = struct.calcsize(HEAD_FMT)
+
+
+def write_column_file(filepath: str, magic: bytes, version: int, arrays: Dict[str, np.ndarray], header: dict) -> None:
+    '''
+    文件结构：固定头 | 目录(json) | 按 ALIGN 对齐的 numpy 数组
+    header 为额外需要保存的 json 信息
+    先写临时文件再 rename，写到一半中断不会破坏已有文件
+    '''
+    toc = {}
+    offset = 0
+    for name, arr in arrays.items():
+        toc[name] = {"offset": offset, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        offset += (arr.nbytes + ALIGN - 1) // ALIGN * ALIGN
+    toc_bytes = json.dumps({**header, "arrays": toc}).encode("utf-8")
+    data_begin = (HEAD_SIZE + len(toc_bytes) + ALIGN - 1) // ALIGN * ALIGN
+
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack(HEAD_FMT, magic, version, len(toc_bytes)))
+        f.write(toc_bytes)
+        for name, arr in arrays.items():
+            f.seek(data_begin + toc[name]["offset"])
+            f.write(np.ascontiguousarray(arr).tobytes())
+        f.truncate(data_begin + offset)
+    os.replace(tmp_path, filepath)
+
+
+class CColumnFile:
+    '''
+    write_column_file 生成的文件的读取类：以 mmap 方式打开，array() 直接返回只读 numpy 视图，不做任何拷贝
+    同一个文件被多个进程打开时共享物理内存页
+    '''
+    def __init__(self, filepath: str, magic: bytes, version: int):
+        self.filepath = filepath
+        with open(filepath, "rb") as f:
+            self.__mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            file_magic, file_version, toc_len = struct.unpack_from(HEAD_FMT, self.__mm, 0)
+            if file_magic != magic:
+                raise CChanException(f"{filepath} is not a {magic.decode()} file", ErrCode.SNAPSHOT_ERR)
+            if file_version != version:
+                raise CChanException(f"unsupport {magic.decode()} version={file_version}, expect {version}", ErrCode.SNAPSHOT_ERR)
+            self.header: dict = json.loads(bytes(self.__mm[HEAD_SIZE:HEAD_SIZE+toc_len]).decode("utf-8"))
+        except Exception:
+            self.__mm.close()
+            raise
+        self.__data_begin = (HEAD_SIZE + toc_len + ALIGN - 1) // ALIGN * ALIGN
+        self.__toc: Dict[str, dict] = self.header.pop("arrays")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        # 关闭后之前返回的数组视图不可再使用
+        try:
+            self.__mm.close()
+        except BufferError:
+            pass  # 仍有数组视图引用着 mmap，等视图释放后由 GC 关闭
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.__toc.keys())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__toc
+
+    def array(self, name: str) -> np.ndarray:
+        if name not in self.__toc:
+            raise CChanException(f"array {name} not found in {self.filepath}", ErrCode.SNAPSHOT_ERR)
+        info = self.__toc[name]
+        dtype = np.dtype(info["dtype"])
+        cnt = int(np.prod(info["shape"], dtype=np.int64))
+        return np.frombuffer(self.__mm, dtype=dtype, count=cnt, offset=self.__data_begin+info["offset"]).reshape(info["shape"])
+
+    def group(self, prefix: str) -> Dict[str, np.ndarray]:
+        # 名字以 prefix 开头的所有数组，返回的 key 去掉 prefix
+        return {name[len(prefix):]: self.array(name) for name in self.__toc if name.startswith(prefix)}
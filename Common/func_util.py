@@ -1,3 +1,5 @@
+from typing import Dict, Tuple
+
 from .CEnum import BI_DIR, KL_TYPE
 
 # Need to import inspect for the frame inspection
@@ -64,23 +66,8 @@ def _parse_inf(v):
     return v
 
 
-import logging
-# Initialize global logger
-logger = logging.getLogger('ChanMaLogger')
-logger.setLevel(logging.DEBUG)
-# Configure logging to file by default
-log_to_file = True
-# Set up logging handler based on the flag
-if log_to_file:
-    handler = logging.FileHandler('cchan.log')
-else:
-    handler = logging.StreamHandler()
-# Set logging format
-# formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-formatter = logging.Formatter('%(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-# Add handler to the logger
-logger.addHandler(handler)
+# 兼容旧的导入方式，追踪请使用 Common.trace
+from .trace import logger  # noqa: F401
 
 def tabs(n):
     """
@@ -92,3 +79,27 @@ def tabs(n):
     return "\t" * n
 
 
+_SLOT_NAMES: Dict[type, Tuple[str, ...]] = {}
+
+
+def slot_names(cls: type) -> Tuple[str, ...]:
+    '''
+    类及其父类 __slots__ 中声明的全部属性名（双下划线私有属性为改名后的名字），按类缓存
+    '''
+    if cls not in _SLOT_NAMES:
+        names = []
+        for klass in cls.__mro__:
+            for name in klass.__dict__.get("__slots__", ()):
+                if name.startswith("__") and not name.endswith("__"):
+                    name = f"_{klass.__name__.lstrip('_')}{name}"
+                names.append(name)
+        _SLOT_NAMES[cls] = tuple(names)
+    return _SLOT_NAMES[cls]
+
+
+def copy_slots(src, dst) -> None:
+    # 浅拷贝 __slots__ 对象的全部已赋值属性
+    for name in slot_names(type(src)):
+        value = getattr(src, name, copy_slots)
+        if value is not copy_slots:
+            setattr(dst, name, value)
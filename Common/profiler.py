@@ -0,0 +1,104 @@
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class CProfiler:
+    '''
+    全局的分阶段计时/计数器，默认关闭
+    热路径调用方式（关闭时只有属性判断，不调用任何函数）：
+        begin = time.perf_counter() if PROFILER.on else 0.0
+        ...
+        if PROFILER.on:
+            PROFILER.add_time("bi.update_bi", begin)
+    各阶段之间可能嵌套（如回放模式下 kline.combine 之后的笔更新会触发 kline.cal_seg_and_zs），耗时不能直接相加
+    '''
+    def __init__(self):
+        self.on = False
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_calls: Dict[str, int] = {}
+        self.counter: Dict[str, int] = {}
+        self.cache_hit: Dict[str, int] = {}
+        self.cache_miss: Dict[str, int] = {}
+
+    def reset(self):
+        self.stage_seconds = {}
+        self.stage_calls = {}
+        self.counter = {}
+        self.cache_hit = {}
+        self.cache_miss = {}
+
+    def add_time(self, stage: str, begin: float):
+        if not begin:
+            return  # 阶段开始时还没有打开
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + time.perf_counter() - begin
+        self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+
+    @contextmanager
+    def stage(self, stage: str):
+        # 非热路径使用
+        begin = time.perf_counter() if self.on else 0.0
+        try:
+            yield
+        finally:
+            if self.on:
+                self.add_time(stage, begin)
+
+    def incr(self, name: str, cnt: int = 1):
+        self.counter[name] = self.counter.get(name, 0) + cnt
+
+    def cache_access(self, name: str, hit: bool):
+        if hit:
+            self.cache_hit[name] = self.cache_hit.get(name, 0) + 1
+        else:
+            self.cache_miss[name] = self.cache_miss.get(name, 0) + 1
+
+    def to_dict(self) -> dict:
+        cache = {}
+        for name in sorted(set(self.cache_hit) | set(self.cache_miss)):
+            hit, miss = self.cache_hit.get(name, 0), self.cache_miss.get(name, 0)
+            cache[name] = {"hit": hit, "miss": miss, "hit_rate": hit / (hit + miss)}
+        return {
+            "stages": {stage: {"calls": self.stage_calls[stage], "seconds": self.stage_seconds[stage]} for stage in sorted(self.stage_seconds)},
+            "counters": dict(sorted(self.counter.items())),
+            "cache": cache,
+        }
+
+    def to_prometheus(self, prefix: str = "chan") -> str:
+        '''
+        Prometheus 文本格式，均为 counter 类型
+        '''
+        lines = []
+
+        def add_metric(name, help_str, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_str}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for labels, value in samples:
+                label_str = ",".join(f'{k}="{prometheus_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_str}}} {value}")
+
+        data = self.to_dict()
+        add_metric("stage_seconds_total", "wall time spent in each stage", [({"stage": k}, v["seconds"]) for k, v in data["stages"].items()])
+        add_metric("stage_calls_total", "number of calls of each stage", [({"stage": k}, v["calls"]) for k, v in data["stages"].items()])
+        add_metric("events_total", "number of events", [({"event": k}, v) for k, v in data["counters"].items()])
+        add_metric("cache_requests_total", "memoize cache lookups", [
+            ({"cache": k, "result": result}, v[result]) for k, v in data["cache"].items() for result in ("hit", "miss")
+        ])
+        return "\n".join(lines) + "\n"
+
+
+def prometheus_escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+PROFILER = CProfiler()
+
+
+def enable_profile(reset: bool = True):
+    if reset:
+        PROFILER.reset()
+    PROFILER.on = True
+
+
+def disable_profile():
+    PROFILER.on = False
@@ -0,0 +1,116 @@
+from collections import deque
+from enum import Enum
+from typing import Callable, List, Tuple
+
+from Common.func_util import slot_names
+
+_MISSING = object()
+CONTAINER_TYPES = (list, dict, set, deque)
+
+
+def has_state(value) -> bool:
+    # 有自己属性的普通对象（类、枚举、容器、数值字符串等除外）
+    if isinstance(value, (type, Enum)) or isinstance(value, CONTAINER_TYPES):
+        return False
+    return hasattr(value, "__dict__") or bool(slot_names(type(value)))
+
+
+class CRollback:
+    '''
+    记录一批对象、容器的当前状态，restore 时原地恢复：对象和容器本身不替换，外部持有的引用恢复后依然有效
+    - save(obj)：对象的全部属性（__slots__ 和 __dict__），属性值是 list/dict/set/deque 时连同内容（含嵌套的容器）一起保存；
+      属性引用的其他对象只记录引用，deep=True 时也一并保存，遇到 stop_types 的对象停止展开
+    - save_tail(lst, begin)：长列表只保存 begin 之后的部分，restore 时截断再接回，要求 begin 之前的元素不会被替换
+    - save_dict_tail(d, is_tail)：字典从第一个 is_tail(key) 的键开始（按插入顺序）保存，restore 时删掉之后插入的键再接回，
+      要求之前的键不会被删除
+    同一个对象/容器只记录第一次保存时的状态，所以要在修改之前保存；需要截断保存的长列表要先于持有它的对象保存
+    '''
+    def __init__(self, stop_types: Tuple[type, ...] = ()):
+        self.stop_types = stop_types
+        self.saved = set()
+        self.restore_lst: List[Callable[[], None]] = []
+
+    def __len__(self):
+        return len(self.restore_lst)
+
+    def __mark(self, obj) -> bool:
+        if id(obj) in self.saved:
+            return False
+        self.saved.add(id(obj))
+        return True
+
+    def __save_value(self, value, deep: bool):
+        if isinstance(value, CONTAINER_TYPES):
+            self.save_container(value, deep)
+        elif deep and has_state(value) and not isinstance(value, self.stop_types):
+            self.save(value, deep)
+
+    def save(self, obj, deep: bool = False):
+        if obj is None or not self.__mark(obj):
+            return
+        slot_state = [(name, getattr(obj, name, _MISSING)) for name in slot_names(type(obj))]
+        dict_state = dict(obj.__dict__) if hasattr(obj, "__dict__") else None
+        for _, value in slot_state:
+            self.__save_value(value, deep)
+        if dict_state is not None:
+            for value in dict_state.values():
+                self.__save_value(value, deep)
+
+        def restore():
+            for name, value in slot_state:
+                if value is not _MISSING:
+                    setattr(obj, name, value)
+                elif hasattr(obj, name):
+                    delattr(obj, name)
+            if dict_state is not None:
+                obj.__dict__.clear()
+                obj.__dict__.update(dict_state)
+        self.restore_lst.append(restore)
+
+    def save_container(self, container, deep: bool = False):
+        if not self.__mark(container):
+            return
+        items = list(container.items()) if isinstance(container, dict) else list(container)
+        for value in (container.values() if isinstance(container, dict) else items):
+            self.__save_value(value, deep)
+
+        def restore():
+            if isinstance(container, list):
+                container[:] = items
+                return
+            container.clear()
+            if isinstance(container, deque):
+                container.extend(items)
+            else:
+                container.update(items)
+        self.restore_lst.append(restore)
+
+    def save_tail(self, lst: list, begin: int):
+        if not self.__mark(lst):
+            return
+        begin = max(0, min(begin, len(lst)))
+        tail = lst[begin:]
+
+        def restore():
+            del lst[begin:]
+            lst.extend(tail)
+        self.restore_lst.append(restore)
+
+    def save_dict_tail(self, d: dict, is_tail: Callable[[object], bool]):
+        if not self.__mark(d):
+            return
+        keys = list(d)
+        begin = next((pos for pos, key in enumerate(keys) if is_tail(key)), len(keys))
+        tail = [(key, d[key]) for key in keys[begin:]]
+
+        def restore():
+            for key in list(d)[begin:]:
+                del d[key]
+            d.update(tail)
+        self.restore_lst.append(restore)
+
+    def restore(self):
+        for restore in reversed(self.restore_lst):
+            restore()
+        self.restore_lst = []
+        self.saved = set()
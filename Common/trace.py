@@ -0,0 +1,103 @@
+import logging
+from typing import Dict, Optional, Set
+
+# 全局 logger，import 时只挂 NullHandler，不会写任何文件
+logger = logging.getLogger('ChanMaLogger')
+logger.addHandler(logging.NullHandler())
+
+TRACE_FORMAT = '%(levelname)s - %(message)s'
+
+
+class CTraceFields:
+    '''
+    结构化事件的字段，只有在 handler 真正格式化时才拼接字符串
+    '''
+    __slots__ = ("fields",)
+
+    def __init__(self, fields: Dict[str, object]):
+        self.fields = fields
+
+    def __str__(self):
+        return " ".join(f"{k}={v}" for k, v in self.fields.items())
+
+
+class CTracer:
+    '''
+    按模块开关的追踪器，默认关闭
+    热路径调用方式：
+        if TRACE.on:
+            TRACE.info(f"...")
+    关闭时只有一次属性判断，消息字符串与参数都不会被计算
+    '''
+    def __init__(self, module: str):
+        self.module = module
+        self.on = False
+
+    def log(self, level: int, msg: str, *args):
+        logger.log(level, msg, *args, extra={"trace_module": self.module, "trace_event": None, "trace_fields": None})
+
+    def debug(self, msg: str, *args):
+        self.log(logging.DEBUG, msg, *args)
+
+    def info(self, msg: str, *args):
+        self.log(logging.INFO, msg, *args)
+
+    def warning(self, msg: str, *args):
+        self.log(logging.WARNING, msg, *args)
+
+    def event(self, name: str, level: int = logging.INFO, **fields):
+        '''
+        结构化事件：LogRecord 上带有 trace_module/trace_event/trace_fields 属性，便于自定义 handler 直接消费
+        '''
+        logger.log(level, "[%s] %s %s", self.module, name, CTraceFields(fields), extra={"trace_module": self.module, "trace_event": name, "trace_fields": fields})
+
+
+_TRACERS: Dict[str, CTracer] = {}
+_ENABLED_MODULES: Set[str] = set()
+_file_handler: Optional[logging.Handler] = None
+
+
+def _match(module: str, pattern: str) -> bool:
+    # pattern 为空表示全部模块；否则按包前缀匹配，如 "Bi" 匹配 "Bi.BiList"
+    return pattern == "" or module == pattern or module.startswith(pattern + ".")
+
+
+def get_tracer(module: str) -> CTracer:
+    if module not in _TRACERS:
+        tracer = CTracer(module)
+        tracer.on = any(_match(module, pattern) for pattern in _ENABLED_MODULES)
+        _TRACERS[module] = tracer
+    return _TRACERS[module]
+
+
+def enable_trace(*modules: str, log_file: Optional[str] = None, level: int = logging.DEBUG):
+    '''
+    打开指定模块（不传表示全部）的追踪
+    log_file 不为 None 时额外挂一个 FileHandler；否则由调用方自行配置 logging
+    '''
+    global _file_handler
+    _ENABLED_MODULES.update(modules or ("",))
+    for tracer in _TRACERS.values():
+        tracer.on = any(_match(tracer.module, pattern) for pattern in _ENABLED_MODULES)
+    logger.setLevel(level)
+    if log_file is not None and _file_handler is None:
+        _file_handler = logging.FileHandler(log_file)
+        _file_handler.setFormatter(logging.Formatter(TRACE_FORMAT))
+        logger.addHandler(_file_handler)
+
+
+def disable_trace(*modules: str):
+    '''
+    关闭指定模块（不传表示全部）的追踪，全部关闭时同时移除 enable_trace 挂上的 FileHandler
+    '''
+    global _file_handler
+    if modules:
+        _ENABLED_MODULES.difference_update(modules)
+    else:
+        _ENABLED_MODULES.clear()
+    for tracer in _TRACERS.values():
+        tracer.on = any(_match(tracer.module, pattern) for pattern in _ENABLED_MODULES)
+    if not _ENABLED_MODULES and _file_handler is not None:
+        logger.removeHandler(_file_handler)
+        _file_handler.close()
+        _file_handler = None
@@ -3,8 +3,8 @@ import baostock as bs
 from Common.CEnum import AUTYPE, DATA_FIELD, KL_TYPE
 from Common.CTime import CTime
 from Common.func_util import kltype_lt_day, str2float
-from KLine.KLine_Unit import CKLine_Unit
 
+from .BulkLoader import str_rows_to_frame
 from .CommonStockAPI import CCommonStockApi
 
 
@@ -79,8 +79,11 @@ class CBaoStock(CCommonStockApi):
         )
         if rs.error_code != '0':
             raise Exception(rs.error_msg)
+        rows = []
         while rs.error_code == '0' and rs.next():
-            yield CKLine_Unit(create_item_dict(rs.get_row_data(), GetColumnNameFromFieldList(fields)))
+            rows.append(rs.get_row_data())
+        # 全部记录一次按列解析时间和数值，与 parse_time_column 一样忽略秒
+        yield from str_rows_to_frame(rows, GetColumnNameFromFieldList(fields), time_auto=True, keep_second=False).klu_iter()
 
     def SetBasciInfo(self):
         rs = bs.query_stock_basic(code=self.code)
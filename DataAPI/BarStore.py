@@ -0,0 +1,129 @@
+import os
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+from Common.CEnum import AUTYPE, KL_TYPE
+from Common.ChanException import CChanException, ErrCode
+from KLine.KLine_Unit import CKLine_Unit
+
+from .BulkLoader import CBarFrame, read_bar_file, save_bar_file
+from .CommonStockAPI import CCommonStockApi
+
+# 进程内已经打开的文件：路径 -> ((mtime, inode), CBarFrame)，同一进程内多个 CChan 共用同一份映射
+_OPENED_FRAME: Dict[str, Tuple[Tuple[float, int], CBarFrame]] = {}
+
+
+class CBarStore:
+    '''
+    只读共享K线库：每个 (code, 级别) 一个 bars 文件（Common/ColumnFile.py 格式）
+    由一个进程 put/build 写入一次，其余进程 get 时以 mmap 方式打开，各列是只读视图，
+    同一台机器上所有进程共享操作系统的物理页，不会各自复制一份
+    文件写入是先写临时文件再 rename，已打开的读者继续看到旧版本，不会读到写了一半的数据
+    '''
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+
+    def get_path(self, code: str, kl_type: KL_TYPE) -> str:
+        return os.path.join(self.store_dir, str(code).replace("/", "-"), f"{kl_type.name}.bars")
+
+    def has(self, code: str, kl_type: KL_TYPE) -> bool:
+        return os.path.exists(self.get_path(code, kl_type))
+
+    def put(self, code: str, kl_type: KL_TYPE, frame: CBarFrame) -> None:
+        path = self.get_path(code, kl_type)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        save_bar_file(frame, path)
+
+    def get(self, code: str, kl_type: KL_TYPE) -> CBarFrame:
+        path = self.get_path(code, kl_type)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            raise CChanException(f"{code} {kl_type} not in bar store: {path}", ErrCode.SRC_DATA_NOT_FOUND)
+        version = (stat.st_mtime, stat.st_ino)
+        if path not in _OPENED_FRAME or _OPENED_FRAME[path][0] != version:
+            _OPENED_FRAME[path] = (version, read_bar_file(path))
+        return _OPENED_FRAME[path][1]
+
+    def codes(self) -> List[str]:
+        if not os.path.isdir(self.store_dir):
+            return []
+        return sorted(name for name in os.listdir(self.store_dir) if os.path.isdir(os.path.join(self.store_dir, name)))
+
+    def levels(self, code: str) -> List[KL_TYPE]:
+        code_dir = os.path.dirname(self.get_path(code, KL_TYPE.K_DAY))
+        if not os.path.isdir(code_dir):
+            return []
+        return [KL_TYPE[name[:-len(".bars")]] for name in sorted(os.listdir(code_dir)) if name.endswith(".bars")]
+
+    def build(
+        self,
+        stockapi_cls: Type[CCommonStockApi],
+        code_list: Iterable[str],
+        lv_list: List[KL_TYPE],
+        begin_time=None,
+        end_time=None,
+        autype: AUTYPE = AUTYPE.QFQ,
+        skip_not_found: bool = True,
+    ) -> List[Tuple[str, KL_TYPE]]:
+        '''
+        从数据源一次性拉取并写入所有 (code, 级别)，返回写入成功的列表
+        skip_not_found: 数据源中不存在的 (code, 级别) 跳过，否则抛出异常
+        '''
+        done = []
+        stockapi_cls.do_init()
+        try:
+            for code in code_list:
+                for lv in lv_list:
+                    try:
+                        stockapi = stockapi_cls(code=code, k_type=lv, begin_date=begin_time, end_date=end_time, autype=autype)
+                        frame = CBarFrame.from_klu_lst(list(stockapi.get_kl_data()))
+                    except CChanException as e:
+                        if e.errcode == ErrCode.SRC_DATA_NOT_FOUND and skip_not_found:
+                            continue
+                        raise
+                    self.put(code, lv, frame)
+                    done.append((code, lv))
+        finally:
+            stockapi_cls.do_close()
+        return done
+
+
+class CBarStoreApi(CCommonStockApi):
+    '''
+    从 CBarStore 读取K线的数据源，store_dir 默认取环境变量 CHAN_BAR_STORE，没有设置时为 ./Data/bar_store
+    CChan 的 data_src 可以传 DATA_SRC.BAR_STORE，或者 "store:目录" 指定其他目录
+    '''
+    thread_safe = True
+    store_dir: str = os.environ.get("CHAN_BAR_STORE", os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "Data", "bar_store"))
+
+    def __init__(self, code, k_type=KL_TYPE.K_DAY, begin_date=None, end_date=None, autype=None):
+        super(CBarStoreApi, self).__init__(code, k_type, begin_date, end_date, autype)
+        self.store = CBarStore(self.store_dir)
+        # 构造时就检查，CChan 的 auto_skip_illegal_sub_lv 才能生效
+        if not self.store.has(code, k_type):
+            raise CChanException(f"{code} {k_type} not in bar store: {self.store.get_path(code, k_type)}", ErrCode.SRC_DATA_NOT_FOUND)
+
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        yield from self.store.get(self.code, self.k_type).slice_time(self.begin_date, self.end_date).klu_iter()
+
+    def SetBasciInfo(self):
+        pass
+
+    @classmethod
+    def do_init(cls):
+        pass
+
+    @classmethod
+    def do_close(cls):
+        pass
+
+
+_STORE_API_CLS: Dict[str, Type[CBarStoreApi]] = {}
+
+
+def get_bar_store_api_cls(store_dir: Optional[str] = None) -> Type[CBarStoreApi]:
+    if store_dir is None:
+        return CBarStoreApi
+    if store_dir not in _STORE_API_CLS:
+        _STORE_API_CLS[store_dir] = type("CBarStoreApi", (CBarStoreApi,), {"store_dir": store_dir})
+    return _STORE_API_CLS[store_dir]
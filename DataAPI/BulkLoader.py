@@ -0,0 +1,381 @@
+import os
+import warnings
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from Common.CEnum import DATA_FIELD, TRADE_INFO_LST
+from Common.ChanException import CChanException, ErrCode
+from Common.ColumnFile import CColumnFile, write_column_file
+from Common.CTime import CTime, time_key2ts
+from Common.func_util import str2float
+from KLine.KLine_Store import time2key
+from KLine.KLine_Unit import CKLine_Unit
+
+from .CommonStockAPI import CCommonStockApi
+
+BARS_MAGIC = b"CHANBARS"
+BARS_VERSION = 1
+
+PRICE_FIELDS = [DATA_FIELD.FIELD_OPEN, DATA_FIELD.FIELD_HIGH, DATA_FIELD.FIELD_LOW, DATA_FIELD.FIELD_CLOSE]
+BAR_FIELDS = PRICE_FIELDS + TRADE_INFO_LST
+
+
+def time_str2key(time_str_lst, keep_second=True) -> np.ndarray:
+    '''
+    时间字符串批量转换为 YYYYMMDDHHMMSS 整数，支持 2021-09-13 / 20210902113000000 / 2021-09-13 11:30:00 等格式
+    按字符串中数字出现的顺序依次取 年月日时分秒，不足的补 0；同一长度的字符串数字位置必须一致
+    各字段必须补零（与原 CSV_API 逐行解析一致）：2021-9-3、2021-10-13 9:30 这类不补零的写法数字位数为奇数或者同一长度下位置不一致，
+    会报 SRC_DATA_FORMAT_ERROR，而不是按位置错读成别的时间；不同长度的格式（如日期和日期时间）可以混在一起
+    '''
+    try:
+        arr = np.asarray(time_str_lst, dtype=np.bytes_)
+    except UnicodeEncodeError as e:
+        raise CChanException(f"unknown time column: {e}", ErrCode.SRC_DATA_FORMAT_ERROR) from e
+    keys = np.zeros(len(arr), dtype=np.int64)
+    lens = np.char.str_len(arr)
+    for str_len in np.unique(lens):
+        pos = np.nonzero(lens == str_len)[0]
+        # 非数字字符减去 '0' 后会溢出成大于 9 的值
+        chars = arr[pos].astype(f"S{str_len}").view(np.uint8).reshape(len(pos), str_len) - np.uint8(ord("0"))
+        digit_mask = chars[0] <= 9
+        digit_pos = np.nonzero(digit_mask)[0][:14]
+        bad_row = np.nonzero(((chars <= 9) != digit_mask).any(axis=1))[0]
+        if len(digit_pos) < 8 or len(digit_pos) % 2 or len(bad_row):
+            raise CChanException(f"unknown time column: {arr[pos[bad_row[0] if len(bad_row) else 0]].decode()}", ErrCode.SRC_DATA_FORMAT_ERROR)
+        keys[pos] = chars[:, digit_pos].astype(np.int64) @ 10 ** np.arange(len(digit_pos)-1, -1, -1, dtype=np.int64)
+        keys[pos] *= 10 ** (14 - len(digit_pos))
+    if not keep_second:
+        keys -= keys % 100
+    return keys
+
+
+def int_time2key(arr: np.ndarray) -> np.ndarray:
+    # YYYYMMDD / YYYYMMDDHHMM / YYYYMMDDHHMMSS 整数
+    arr = np.asarray(arr, dtype=np.int64)
+    if len(arr) == 0:
+        return arr
+    digit_cnt = len(str(int(arr[0])))
+    if digit_cnt not in (8, 12, 14):
+        raise CChanException(f"unknown time column: {arr[0]}", ErrCode.SRC_DATA_FORMAT_ERROR)
+    return arr * 10 ** (14 - digit_cnt)
+
+
+def datetime2key(arr: np.ndarray) -> np.ndarray:
+    dt = np.asarray(arr).astype("datetime64[s]")
+    year = dt.astype("datetime64[Y]")
+    month = dt.astype("datetime64[M]")
+    day = dt.astype("datetime64[D]")
+    seconds = (dt - day).astype(np.int64)
+    date_key = ((year.astype(np.int64) + 1970) * 100 + (month - year).astype(np.int64) + 1) * 100 + (day - month).astype(np.int64) + 1
+    return ((date_key * 100 + seconds // 3600) * 100 + seconds // 60 % 60) * 100 + seconds % 60
+
+
+def to_time_key(arr) -> np.ndarray:
+    arr = np.asarray(arr)
+    if np.issubdtype(arr.dtype, np.datetime64):
+        return datetime2key(arr)
+    if np.issubdtype(arr.dtype, np.integer):
+        return int_time2key(arr)
+    return time_str2key(arr)
+
+
+def to_float_array(values) -> np.ndarray:
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except ValueError:
+        # 与 str2float 一致，无法解析的值记为 0
+        return np.array([str2float(v) for v in values], dtype=np.float64)
+
+
+def klu_lst_to_columns(klu_lst: List[CKLine_Unit]) -> Dict[str, np.ndarray]:
+    columns = {
+        DATA_FIELD.FIELD_TIME: np.array([time2key(klu.time) for klu in klu_lst], dtype=np.int64),
+        "time_auto": np.array([klu.time.auto for klu in klu_lst], dtype=np.bool_),
+        DATA_FIELD.FIELD_OPEN: np.array([klu.open for klu in klu_lst], dtype=np.float64),
+        DATA_FIELD.FIELD_HIGH: np.array([klu.high for klu in klu_lst], dtype=np.float64),
+        DATA_FIELD.FIELD_LOW: np.array([klu.low for klu in klu_lst], dtype=np.float64),
+        DATA_FIELD.FIELD_CLOSE: np.array([klu.close for klu in klu_lst], dtype=np.float64),
+    }
+    for metric in TRADE_INFO_LST:
+        columns[metric] = np.array([np.nan if klu.trade_info.metric[metric] is None else klu.trade_info.metric[metric] for klu in klu_lst], dtype=np.float64)
+    return columns
+
+
+class CBarFrame:
+    '''
+    一个级别全部K线的列式数据：
+    - time_key: YYYYMMDDHHMMSS 整数，time_auto: 生成 CTime 时的 auto 参数
+    - open/high/low/close，以及 volume/turnover/turnover_rate（缺失为 NaN）
+    列名与 CKLine_Store 一致；时间升序时按起止时间过滤使用二分查找
+    '''
+    def __init__(self, columns: Dict[str, np.ndarray], time_auto: bool = False):
+        if DATA_FIELD.FIELD_TIME not in columns:
+            raise CChanException("bar frame need time_key column", ErrCode.SRC_DATA_FORMAT_ERROR)
+        self.time_key: np.ndarray = np.asarray(columns[DATA_FIELD.FIELD_TIME], dtype=np.int64)
+        size = len(self.time_key)
+        self.time_auto: np.ndarray = np.asarray(columns["time_auto"], dtype=np.bool_) if "time_auto" in columns else np.full(size, time_auto)
+        self.columns: Dict[str, np.ndarray] = {}
+        for field in BAR_FIELDS:
+            if field in columns:
+                self.columns[field] = np.asarray(columns[field], dtype=np.float64)
+            elif field in PRICE_FIELDS:
+                raise CChanException(f"bar frame need {field} column", ErrCode.SRC_DATA_FORMAT_ERROR)
+            else:
+                self.columns[field] = np.full(size, np.nan)
+
+    @classmethod
+    def from_klu_lst(cls, klu_lst: List[CKLine_Unit]) -> 'CBarFrame':
+        return cls(klu_lst_to_columns(klu_lst))
+
+    def __len__(self):
+        return len(self.time_key)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name == DATA_FIELD.FIELD_TIME:
+            return self.time_key
+        if name == "time_auto":
+            return self.time_auto
+        return self.columns[name]
+
+    def take(self, index) -> 'CBarFrame':
+        # index 为 slice 或下标/布尔数组
+        columns = {name: col[index] for name, col in self.columns.items()}
+        columns[DATA_FIELD.FIELD_TIME] = self.time_key[index]
+        columns["time_auto"] = self.time_auto[index]
+        return CBarFrame(columns)
+
+    def is_sorted(self) -> bool:
+        return bool((self.time_key[1:] > self.time_key[:-1]).all())
+
+    def slice_time(self, begin: Optional[Union[str, int]] = None, end: Optional[Union[str, int]] = None) -> 'CBarFrame':
+        '''
+        保留 begin <= 时间 <= end 的K线，begin/end 可以是时间字符串或 YYYYMMDDHHMMSS 整数，None 表示不限
+        '''
+        if begin is None and end is None:
+            return self
+        begin_key = None if begin is None else int(to_time_key([begin])[0])
+        end_key = None if end is None else int(to_time_key([end])[0])
+        if self.is_sorted():
+            begin_pos = 0 if begin_key is None else int(np.searchsorted(self.time_key, begin_key, side="left"))
+            end_pos = len(self) if end_key is None else int(np.searchsorted(self.time_key, end_key, side="right"))
+            return self.take(slice(begin_pos, max(begin_pos, end_pos)))
+        # 乱序数据保持原有顺序，交给 CChan 报时间不单调的错误
+        mask = np.ones(len(self), dtype=np.bool_)
+        if begin_key is not None:
+            mask &= self.time_key >= begin_key
+        if end_key is not None:
+            mask &= self.time_key <= end_key
+        return self.take(mask)
+
+    def klu_iter(self, chunk_size: int = 8192) -> Iterable[CKLine_Unit]:
+        '''
+        按块把列数据转换为 python 对象后逐根生成 CKLine_Unit
+        '''
+        metric_lst = [metric for metric in TRADE_INFO_LST if not np.isnan(self.columns[metric]).all()]
+        for begin in range(0, len(self), chunk_size):
+            key = self.time_key[begin:begin+chunk_size]
+            rest, second = np.divmod(key, 100)
+            rest, minute = np.divmod(rest, 100)
+            rest, hour = np.divmod(rest, 100)
+            rest, day = np.divmod(rest, 100)
+            year, month = np.divmod(rest, 100)
+            auto = self.time_auto[begin:begin+chunk_size]
+            time_lst = zip(year.tolist(), month.tolist(), day.tolist(), hour.tolist(), minute.tolist(), second.tolist(), auto.tolist(), time_key2ts(key, auto).tolist())
+            price_lst = zip(*(self.columns[field][begin:begin+chunk_size].tolist() for field in PRICE_FIELDS))
+            metric_cols = [(metric, self.columns[metric][begin:begin+chunk_size].tolist()) for metric in metric_lst]
+            for pos, ((y, mon, d, h, mi, s, auto, ts), (_open, _high, _low, _close)) in enumerate(zip(time_lst, price_lst)):
+                kl_dict = {
+                    DATA_FIELD.FIELD_TIME: CTime(y, mon, d, h, mi, s, auto=auto, ts=ts),
+                    DATA_FIELD.FIELD_OPEN: _open,
+                    DATA_FIELD.FIELD_HIGH: _high,
+                    DATA_FIELD.FIELD_LOW: _low,
+                    DATA_FIELD.FIELD_CLOSE: _close,
+                }
+                for metric, col in metric_cols:
+                    if col[pos] == col[pos]:  # 非 NaN
+                        kl_dict[metric] = col[pos]
+                yield CKLine_Unit(kl_dict)
+
+
+def read_csv_bars(file_path: str, columns: Optional[List[str]] = None, headers_exist: bool = True, keep_second: bool = True) -> CBarFrame:
+    '''
+    一次读入整个 csv 文件并按列转换
+    columns: 每一列对应的字段名，为 None 时使用标题行；不认识的列（如 symbol）会被忽略
+    '''
+    if columns is None:
+        if not headers_exist:
+            raise CChanException(f"csv columns unknown: {file_path}", ErrCode.PARA_ERROR)
+        with open(file_path, "r") as f:
+            columns = [name.strip() for name in f.readline().split(",")]
+    try:
+        frame_cols = csv_columns_fast(file_path, columns, headers_exist)
+    except ValueError:
+        # 有无法解析的数值或列数不一致，退回逐行解析，与原实现的报错/容错方式一致
+        frame_cols = csv_columns_slow(file_path, columns, headers_exist)
+    if DATA_FIELD.FIELD_TIME in frame_cols:
+        frame_cols[DATA_FIELD.FIELD_TIME] = time_str2key(frame_cols[DATA_FIELD.FIELD_TIME], keep_second)
+    return CBarFrame(frame_cols)
+
+
+def csv_columns_fast(file_path: str, columns: List[str], headers_exist: bool) -> Dict[str, np.ndarray]:
+    # numpy 的 C 解析器一次读出所有需要的列
+    use_idx = [idx for idx, name in enumerate(columns) if name == DATA_FIELD.FIELD_TIME or name in BAR_FIELDS]
+    dtype = np.dtype([(columns[idx], "S32" if columns[idx] == DATA_FIELD.FIELD_TIME else np.float64) for idx in use_idx])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # 空文件
+        data = np.loadtxt(file_path, delimiter=",", skiprows=1 if headers_exist else 0, usecols=use_idx, dtype=dtype, comments=None, ndmin=1)
+    # usecols 不会检查多余的列，用逗号总数校验每行列数
+    with open(file_path, "rb") as f:
+        if headers_exist:
+            f.readline()
+        if f.read().count(b",") != len(data) * (len(columns) - 1):
+            raise ValueError("column count mismatch")
+    return {name: data[name] for name in dtype.names}
+
+
+def csv_columns_slow(file_path: str, columns: List[str], headers_exist: bool) -> Dict[str, np.ndarray]:
+    with open(file_path, "r") as f:
+        lines = f.read().split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    if headers_exist and lines:
+        lines.pop(0)
+    rows = [line.split(",") for line in lines]
+    if any(len(row) != len(columns) for row in rows):
+        raise CChanException(f"file format error: {file_path}", ErrCode.SRC_DATA_FORMAT_ERROR)
+    col_data = list(zip(*rows)) if rows else [()] * len(columns)
+    frame_cols: Dict[str, np.ndarray] = {}
+    for name, values in zip(columns, col_data):
+        if name == DATA_FIELD.FIELD_TIME:
+            frame_cols[name] = np.array(values, dtype=np.str_)
+        elif name in BAR_FIELDS:
+            frame_cols[name] = to_float_array(values)
+    return frame_cols
+
+
+def str_rows_to_frame(rows: List[List[str]], columns: List[str], time_auto: bool = False, keep_second: bool = True) -> CBarFrame:
+    '''
+    数据源逐行返回的字符串记录（如 baostock 的 get_row_data）一次按列转换，不认识的列会被忽略
+    '''
+    col_data = list(zip(*rows)) if rows else [()] * len(columns)
+    frame_cols: Dict[str, np.ndarray] = {}
+    for name, values in zip(columns, col_data):
+        if name == DATA_FIELD.FIELD_TIME:
+            frame_cols[name] = time_str2key(values, keep_second)
+        elif name in BAR_FIELDS:
+            frame_cols[name] = to_float_array(values)
+    return CBarFrame(frame_cols, time_auto=time_auto)
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise CChanException("parquet/arrow file need pyarrow, try: pip install pyarrow", ErrCode.ENV_CONF_ERR) from e
+    return pyarrow
+
+
+def arrow_table_bars(table) -> CBarFrame:
+    '''
+    pyarrow.Table 转换为 CBarFrame，时间列可以是 timestamp/date、字符串或整数
+    '''
+    pa = import_pyarrow()
+    frame_cols: Dict[str, np.ndarray] = {}
+    for name in table.column_names:
+        col = table.column(name)
+        if name == DATA_FIELD.FIELD_TIME:
+            if pa.types.is_timestamp(col.type) or pa.types.is_date(col.type):
+                frame_cols[name] = datetime2key(col.cast(pa.timestamp("s")).to_numpy())
+            else:
+                frame_cols[name] = to_time_key(col.to_numpy())
+        elif name == "time_auto":
+            frame_cols[name] = col.to_numpy().astype(np.bool_)
+        elif name in BAR_FIELDS:
+            frame_cols[name] = col.cast(pa.float64()).to_numpy()
+    return CBarFrame(frame_cols)
+
+
+def read_parquet_bars(file_path: str) -> CBarFrame:
+    import_pyarrow()
+    import pyarrow.parquet as pq
+    return arrow_table_bars(pq.read_table(file_path, memory_map=True))
+
+
+def read_arrow_bars(file_path: str) -> CBarFrame:
+    # Arrow IPC 文件（feather v2）
+    import_pyarrow()
+    import pyarrow.feather as feather
+    return arrow_table_bars(feather.read_table(file_path, memory_map=True))
+
+
+def save_bar_file(frame: CBarFrame, file_path: str) -> None:
+    '''
+    保存为本框架的列式二进制格式（Common/ColumnFile.py），读取时无需任何解析
+    '''
+    arrays = {DATA_FIELD.FIELD_TIME: frame.time_key, "time_auto": frame.time_auto, **frame.columns}
+    write_column_file(file_path, BARS_MAGIC, BARS_VERSION, arrays, {})
+
+
+def read_bar_file(file_path: str) -> CBarFrame:
+    # 各列为 mmap 只读视图，不做拷贝
+    bar_file = CColumnFile(file_path, BARS_MAGIC, BARS_VERSION)
+    return CBarFrame({name: bar_file.array(name) for name in bar_file.names})
+
+
+BAR_READER = {
+    "csv": read_csv_bars,
+    "parquet": read_parquet_bars,
+    "arrow": read_arrow_bars,
+    "feather": read_arrow_bars,
+    "bars": read_bar_file,
+}
+
+
+def read_bars(file_path: str) -> CBarFrame:
+    '''
+    按文件后缀选择读取方式：csv/parquet/arrow/feather/bars
+    '''
+    ext = os.path.splitext(file_path)[1][1:].lower()
+    if ext not in BAR_READER:
+        raise CChanException(f"unknown bar file type: {file_path}", ErrCode.SRC_DATA_TYPE_ERR)
+    return BAR_READER[ext](file_path)
+
+
+class CBulkStockApi(CCommonStockApi):
+    '''
+    批量读取本地K线文件：{data_dir}/{code}_{级别}.{后缀}，级别如 day/60m，后缀按 file_ext_lst 顺序查找
+    整个文件一次读成列数据，起止时间用二分查找过滤后再逐根生成 CKLine_Unit
+    修改 data_dir/file_ext_lst 可以继承该类或直接修改类属性
+    '''
+    thread_safe = True
+    data_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "Data")
+    file_ext_lst = ["bars", "parquet", "arrow", "feather", "csv"]
+
+    def __init__(self, code, k_type, begin_date=None, end_date=None, autype=None):
+        super(CBulkStockApi, self).__init__(code, k_type, begin_date, end_date, autype)
+
+    def get_file_path(self) -> str:
+        k_type = self.k_type.name[2:].lower()
+        for ext in self.file_ext_lst:
+            file_path = os.path.join(self.data_dir, f"{self.code}_{k_type}.{ext}")
+            if os.path.exists(file_path):
+                return file_path
+        raise CChanException(f"file not exist: {self.data_dir}/{self.code}_{k_type}.[{'/'.join(self.file_ext_lst)}]", ErrCode.SRC_DATA_NOT_FOUND)
+
+    def get_bar_frame(self) -> CBarFrame:
+        return read_bars(self.get_file_path()).slice_time(self.begin_date, self.end_date)
+
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        yield from self.get_bar_frame().klu_iter()
+
+    def SetBasciInfo(self):
+        pass
+
+    @classmethod
+    def do_init(cls):
+        pass
+
+    @classmethod
+    def do_close(cls):
+        pass
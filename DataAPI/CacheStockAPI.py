@@ -0,0 +1,245 @@
+import datetime
+import json
+import os
+from typing import Iterable, List, Optional, Set, Tuple, Type
+
+import numpy as np
+
+from Common.CEnum import DATA_FIELD
+from Common.ChanException import CChanException, ErrCode
+from KLine.KLine_Unit import CKLine_Unit
+
+from .BulkLoader import BAR_FIELDS, CBarFrame, klu_lst_to_columns, to_time_key
+from .CommonStockAPI import CCommonStockApi
+
+CACHE_MAGIC = b"CHANBREC"
+CACHE_VERSION = 1
+CACHE_HEAD_SIZE = 16  # magic + 版本号 + 保留
+
+# 定长记录，追加写入只需要在文件末尾写字节
+BAR_RECORD_DTYPE = np.dtype([(DATA_FIELD.FIELD_TIME, "<i8"), ("time_auto", "?")] + [(field, "<f8") for field in BAR_FIELDS])
+
+
+def klu_lst_to_records(klu_lst: List[CKLine_Unit]) -> np.ndarray:
+    records = np.zeros(len(klu_lst), dtype=BAR_RECORD_DTYPE)
+    for name, col in klu_lst_to_columns(klu_lst).items():
+        records[name] = col
+    return records
+
+
+def records_to_frame(records: np.ndarray) -> CBarFrame:
+    return CBarFrame({name: records[name] for name in BAR_RECORD_DTYPE.names})
+
+
+def range_key(date_str: str, is_end: bool) -> int:
+    # 只有日期的结束时间包含当天所有K线，与 baostock 等数据源的 end_date 含义一致
+    key = int(to_time_key([date_str])[0])
+    if is_end and sum(c.isdigit() for c in date_str) <= 8:
+        key += 235959
+    return key
+
+
+# 已经 do_init 的上游数据源类，按类记录而不是记在子类属性上，ChanBatch 等再派生子类时也能正确关闭
+_INITED_UPSTREAM: Set[Type[CCommonStockApi]] = set()
+
+
+def key2date_str(key: int) -> str:
+    date = int(key) // 1000000
+    return f"{date // 10000:04}-{date // 100 % 100:02}-{date % 100:02}"
+
+
+class CCacheStockApi(CCommonStockApi):
+    '''
+    本地K线缓存数据源：按 (code, 级别, 复权方式) 缓存 upstream_cls 返回的K线
+    - 请求的起始时间已被缓存覆盖时（缓存的起始时间为 None 表示全部历史，覆盖任何起始时间），只向上游请求最后一根缓存K线所在日期之后的数据（最后一天可能是未走完的K线，会被替换）
+    - 请求的起始时间早于缓存时，只补拉缓存第一根K线之前的数据；缓存的时间范围只会扩大，不会因为请求的范围更小而缩小
+    - 请求的结束时间早于今天且已经缓存过时，完全不访问上游，也不会调用上游的 do_init
+    - offline=True 时从不访问上游，只返回已缓存的数据
+    使用方式：继承该类并设置 upstream_cls/cache_dir/offline
+    '''
+    upstream_cls: Type[CCommonStockApi] = None  # type: ignore
+    cache_dir: str = os.path.join(os.path.expanduser("~"), ".chan_kl_cache")
+    offline: bool = False
+
+    def __init__(self, code, k_type, begin_date=None, end_date=None, autype=None):
+        if self.upstream_cls is None:
+            raise CChanException(f"{type(self).__name__}.upstream_cls not set", ErrCode.PARA_ERROR)
+        super(CCacheStockApi, self).__init__(code, k_type, begin_date, end_date, autype)
+
+    @classmethod
+    def upstream_dir(cls) -> str:
+        return os.path.join(cls.cache_dir, cls.upstream_cls.__name__)
+
+    @property
+    def cache_path(self) -> str:
+        code = str(self.code).replace("/", "-")
+        autype = getattr(self.autype, "name", self.autype)
+        return os.path.join(self.upstream_dir(), f"{code}_{self.k_type.name}_{autype}.rec")
+
+    @property
+    def meta_path(self) -> str:
+        return f"{self.cache_path}.json"
+
+    def read_meta(self) -> dict:
+        try:
+            with open(self.meta_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_meta(self, meta: dict):
+        meta["last_access"] = datetime.datetime.now().timestamp()
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def read_records(self) -> Optional[np.ndarray]:
+        if not os.path.exists(self.cache_path):
+            return None
+        with open(self.cache_path, "rb") as f:
+            head = f.read(CACHE_HEAD_SIZE)
+            if head[:8] != CACHE_MAGIC or int.from_bytes(head[8:12], "little") != CACHE_VERSION:
+                return None  # 不认识的文件当作没有缓存，重新拉取后覆盖
+            return np.fromfile(f, dtype=BAR_RECORD_DTYPE)
+
+    def write_records(self, records: np.ndarray):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(CACHE_MAGIC + CACHE_VERSION.to_bytes(4, "little") + bytes(4))
+            f.write(records.tobytes())
+        os.replace(tmp_path, self.cache_path)
+
+    def append_records(self, keep_cnt: int, records: np.ndarray):
+        # 保留前 keep_cnt 条记录，之后的用 records 替换
+        with open(self.cache_path, "r+b") as f:
+            f.truncate(CACHE_HEAD_SIZE + keep_cnt * BAR_RECORD_DTYPE.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(records.tobytes())
+
+    @classmethod
+    def init_upstream(cls):
+        if cls.upstream_cls not in _INITED_UPSTREAM:
+            cls.upstream_cls.do_init()
+            _INITED_UPSTREAM.add(cls.upstream_cls)
+
+    def fetch(self, begin_date, end_date, meta: dict) -> np.ndarray:
+        self.init_upstream()
+        upstream = self.upstream_cls(code=self.code, k_type=self.k_type, begin_date=begin_date, end_date=end_date, autype=self.autype)
+        meta["name"], meta["is_stock"] = upstream.name, upstream.is_stock
+        self.name, self.is_stock = upstream.name, upstream.is_stock
+        return klu_lst_to_records(list(upstream.get_kl_data()))
+
+    def begin_covered(self, meta: dict) -> bool:
+        if "begin" not in meta:
+            return False
+        if meta["begin"] is None:
+            return True  # 缓存的是全部历史
+        if self.begin_date is None:
+            return False
+        return range_key(meta["begin"], is_end=False) <= range_key(self.begin_date, is_end=False)
+
+    def end_covered(self, meta: dict) -> bool:
+        return self.end_date is not None and range_key(self.end_date, is_end=True) <= meta.get("covered_end", -1)
+
+    def update_covered_end(self, meta: dict, records: np.ndarray):
+        # 今天之前的K线认为已经走完，之后不会再变化
+        covered_end = int(datetime.date.today().strftime("%Y%m%d")) * 1000000 - 1
+        if self.end_date is not None:
+            covered_end = min(covered_end, range_key(self.end_date, is_end=True))
+        elif len(records):
+            covered_end = min(covered_end, int(records[DATA_FIELD.FIELD_TIME][-1]))
+        meta["covered_end"] = max(covered_end, meta.get("covered_end", -1))
+
+    def sync(self) -> Tuple[np.ndarray, dict]:
+        meta = self.read_meta()
+        records = self.read_records()
+        if self.offline:
+            if records is None:
+                raise CChanException(f"{self.code} {self.k_type} not in cache: {self.cache_path}", ErrCode.SRC_DATA_NOT_FOUND)
+            return records, meta
+        if records is None or "begin" not in meta or (not len(records) and not self.begin_covered(meta)):
+            meta = {"begin": self.begin_date}
+            records = self.fetch(self.begin_date, self.end_date, meta)
+            self.write_records(records)
+            self.update_covered_end(meta, records)
+            return records, meta
+        if not self.begin_covered(meta):
+            # 只补拉缓存开始之前的部分，已缓存的范围不会缩小
+            head = self.fetch(self.begin_date, key2date_str(records[DATA_FIELD.FIELD_TIME][0]), meta)
+            head = head[head[DATA_FIELD.FIELD_TIME] < records[DATA_FIELD.FIELD_TIME][0]]
+            records = np.concatenate([head, records])
+            self.write_records(records)
+            meta["begin"] = self.begin_date
+        if not self.end_covered(meta):
+            # 从最后一根缓存K线所在日期开始补拉
+            tail_begin = key2date_str(records[DATA_FIELD.FIELD_TIME][-1]) if len(records) else meta["begin"]
+            tail = self.fetch(tail_begin, self.end_date, meta)
+            if len(tail):
+                keep_cnt = 0 if tail_begin is None else int(np.searchsorted(records[DATA_FIELD.FIELD_TIME], range_key(tail_begin, is_end=False)))
+                self.append_records(keep_cnt, tail)
+                records = np.concatenate([records[:keep_cnt], tail])
+            self.update_covered_end(meta, records)
+        return records, meta
+
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        records, meta = self.sync()
+        self.write_meta(meta)
+        frame = records_to_frame(records).slice_time(
+            None if self.begin_date is None else range_key(self.begin_date, is_end=False),
+            None if self.end_date is None else range_key(self.end_date, is_end=True),
+        )
+        yield from frame.klu_iter()
+
+    def SetBasciInfo(self):
+        # 上游的 SetBasciInfo 可能需要联网，这里使用缓存的信息，真正拉取数据时再更新
+        meta = self.read_meta()
+        self.name = meta.get("name")
+        self.is_stock = meta.get("is_stock")
+
+    @classmethod
+    def do_init(cls):
+        # 上游延迟到第一次需要拉取数据时再初始化
+        pass
+
+    @classmethod
+    def do_close(cls):
+        if cls.upstream_cls in _INITED_UPSTREAM:
+            cls.upstream_cls.do_close()
+            _INITED_UPSTREAM.discard(cls.upstream_cls)
+
+    @classmethod
+    def evict(cls, max_bytes: Optional[int] = None, max_idle_days: Optional[float] = None) -> List[str]:
+        '''
+        淘汰缓存：先删除超过 max_idle_days 天未被读取的，再按最近读取时间从旧到新删除直到总大小不超过 max_bytes
+        返回被删除的缓存文件
+        '''
+        entries = []
+        cache_root = cls.upstream_dir()
+        if not os.path.isdir(cache_root):
+            return []
+        for file_name in os.listdir(cache_root):
+            if not file_name.endswith(".rec"):
+                continue
+            path = os.path.join(cache_root, file_name)
+            try:
+                with open(f"{path}.json", "r") as f:
+                    last_access = json.load(f).get("last_access", 0)
+            except (OSError, ValueError):
+                last_access = os.path.getmtime(path)
+            entries.append((last_access, path, os.path.getsize(path)))
+        entries.sort()
+        now = datetime.datetime.now().timestamp()
+        total = sum(size for _, _, size in entries)
+        removed = []
+        for last_access, path, size in entries:
+            idle_expired = max_idle_days is not None and now - last_access > max_idle_days * 86400
+            if not idle_expired and (max_bytes is None or total <= max_bytes):
+                continue
+            for remove_path in (path, f"{path}.json"):
+                if os.path.exists(remove_path):
+                    os.remove(remove_path)
+            total -= size
+            removed.append(path)
+        return removed
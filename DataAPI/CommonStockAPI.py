@@ -5,6 +5,9 @@ from KLine.KLine_Unit import CKLine_Unit
 
 
 class CCommonStockApi:
+    # 多个级别的K线迭代器能否在不同线程中同时读取（开启 kl_prefetch 时使用），共用一个连接的网络数据源应为 False
+    thread_safe = False
+
     def __init__(self, code, k_type, begin_date, end_date, autype):
         self.code = code
         self.name = None
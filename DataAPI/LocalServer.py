@@ -0,0 +1,201 @@
+import asyncio
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, List, Optional, Tuple, Type
+
+from Common.CEnum import AUTYPE, KL_TYPE
+from Common.ChanException import CChanException, ErrCode
+from KLine.KLine_Unit import CKLine_Unit
+
+from .BulkLoader import CBarFrame, klu_lst_to_columns
+from .CommonStockAPI import CCommonStockApi
+from .Prefetch import CAsyncStockApi
+
+
+class CLocalKLineServer:
+    '''
+    本地替身行情服务：在后台线程用 http.server 提供 upstream_cls 的K线，用于在没有真实网络数据源时测试/压测网络数据源、预取和 iter_chan
+    - GET /kl?code=&k_type=K_DAY&begin=&end=&autype=QFQ，返回 JSON {"name", "is_stock", "columns": {列名: [...]}}，列与 CBarFrame 一致
+    - upstream_cls 抛出 SRC_DATA_NOT_FOUND 时返回 404，其他异常返回 500
+    - latency: 每个请求返回前等待的秒数，模拟网络延迟
+    - request_log: 收到的请求 [(code, k_type, begin, end)]，可以用来检查数据源被访问了几次
+    客户端见 CHttpStockApi/CAsyncHttpStockApi，用 client_cls() 生成指向本服务的数据源类
+    '''
+    def __init__(self, upstream_cls: Type[CCommonStockApi], latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.upstream_cls = upstream_cls
+        self.latency = latency
+        self.request_log: List[Tuple[str, str, Optional[str], Optional[str]]] = []
+        self.__lock = threading.Lock()
+        self.__httpd = ThreadingHTTPServer((host, port), self.__handler_cls())
+        self.__httpd.daemon_threads = True
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.__httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'CLocalKLineServer':
+        self.upstream_cls.do_init()
+        self.__thread = threading.Thread(target=self.__httpd.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def close(self):
+        if self.__thread is not None:
+            self.__httpd.shutdown()
+            self.__thread.join()
+            self.__thread = None
+            self.upstream_cls.do_close()
+        self.__httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def client_cls(self, use_async: bool = False) -> Type[CCommonStockApi]:
+        base_cls = CAsyncHttpStockApi if use_async else CHttpStockApi
+        return type(base_cls.__name__, (base_cls,), {"server_url": self.url})
+
+    def query(self, code: str, k_type: str, begin: Optional[str], end: Optional[str], autype: Optional[str]) -> bytes:
+        with self.__lock:
+            self.request_log.append((code, k_type, begin, end))
+        upstream = self.upstream_cls(
+            code=code,
+            k_type=KL_TYPE[k_type],
+            begin_date=begin,
+            end_date=end,
+            autype=None if autype is None else AUTYPE[autype],
+        )
+        columns = klu_lst_to_columns(list(upstream.get_kl_data()))
+        return json.dumps({
+            "name": upstream.name,
+            "is_stock": upstream.is_stock,
+            "columns": {name: col.tolist() for name, col in columns.items()},
+        }).encode()
+
+    def __handler_cls(self):
+        server = self
+
+        class CHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                param = {k: v[0] for k, v in urllib.parse.parse_qs(url.query).items()}
+                time.sleep(server.latency)
+                try:
+                    if url.path != "/kl":
+                        raise CChanException(f"unknown path {url.path}", ErrCode.SRC_DATA_NOT_FOUND)
+                    body = server.query(param["code"], param["k_type"], param.get("begin"), param.get("end"), param.get("autype"))
+                    status = 200
+                except CChanException as e:
+                    status, body = (404 if e.errcode == ErrCode.SRC_DATA_NOT_FOUND else 500), str(e).encode()
+                except Exception as e:
+                    status, body = 500, repr(e).encode()
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return CHandler
+
+
+def kl_request_path(stockapi: CCommonStockApi) -> str:
+    param = {"code": stockapi.code, "k_type": stockapi.k_type.name}
+    if stockapi.begin_date is not None:
+        param["begin"] = stockapi.begin_date
+    if stockapi.end_date is not None:
+        param["end"] = stockapi.end_date
+    if stockapi.autype is not None:
+        param["autype"] = stockapi.autype.name
+    return f"/kl?{urllib.parse.urlencode(param)}"
+
+
+def parse_kl_response(stockapi: CCommonStockApi, status: int, body: bytes) -> CBarFrame:
+    if status == 404:
+        raise CChanException(body.decode(errors="replace"), ErrCode.SRC_DATA_NOT_FOUND)
+    if status != 200:
+        raise CChanException(f"kline server error {status}: {body.decode(errors='replace')}", ErrCode.COMMON_ERROR)
+    res = json.loads(body)
+    stockapi.name, stockapi.is_stock = res["name"], res["is_stock"]
+    return CBarFrame(res["columns"])
+
+
+class CHttpStockApi(CCommonStockApi):
+    '''
+    CLocalKLineServer 协议的同步 HTTP 数据源（urllib），server_url 由子类设置
+    '''
+    thread_safe = True
+    server_url = "http://127.0.0.1:8000"
+    timeout = 30
+
+    def __init__(self, code, k_type=KL_TYPE.K_DAY, begin_date=None, end_date=None, autype=None):
+        super(CHttpStockApi, self).__init__(code, k_type, begin_date, end_date, autype)
+
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        try:
+            with urllib.request.urlopen(self.server_url + kl_request_path(self), timeout=self.timeout) as resp:
+                status, body = resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        yield from parse_kl_response(self, status, body).klu_iter()
+
+    def SetBasciInfo(self):
+        # 名称等在拉取数据时由服务返回
+        pass
+
+    @classmethod
+    def do_init(cls):
+        pass
+
+    @classmethod
+    def do_close(cls):
+        pass
+
+
+class CAsyncHttpStockApi(CAsyncStockApi):
+    '''
+    CLocalKLineServer 协议的 asyncio 数据源（asyncio 原生连接，HTTP/1.0），server_url 由子类设置
+    '''
+    server_url = "http://127.0.0.1:8000"
+    timeout = 30
+
+    def __init__(self, code, k_type=KL_TYPE.K_DAY, begin_date=None, end_date=None, autype=None):
+        super(CAsyncHttpStockApi, self).__init__(code, k_type, begin_date, end_date, autype)
+
+    async def request(self) -> Tuple[int, bytes]:
+        url = urllib.parse.urlparse(self.server_url)
+        reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+        try:
+            writer.write(f"GET {kl_request_path(self)} HTTP/1.0\r\nHost: {url.netloc}\r\n\r\n".encode())
+            await writer.drain()
+            resp = await reader.read()
+        finally:
+            writer.close()
+        head, _, body = resp.partition(b"\r\n\r\n")
+        return int(head.split(b" ", 2)[1]), body
+
+    async def aget_kl_data(self):
+        status, body = await asyncio.wait_for(self.request(), self.timeout)
+        for klu in parse_kl_response(self, status, body).klu_iter():
+            yield klu
+
+    def SetBasciInfo(self):
+        pass
+
+    @classmethod
+    def do_init(cls):
+        pass
+
+    @classmethod
+    def do_close(cls):
+        pass
@@ -0,0 +1,150 @@
+import abc
+import asyncio
+import queue
+import threading
+from contextlib import nullcontext
+from typing import Dict, Iterable, List, Optional
+
+from Common.CEnum import KL_TYPE
+from Common.ChanException import CChanException, ErrCode
+from KLine.KLine_Unit import CKLine_Unit
+
+from .CommonStockAPI import CCommonStockApi
+
+_END = object()
+
+
+class CPrefetchError:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+class CPrefetchIter:
+    '''
+    后台线程预取：生产线程从 source（普通迭代器或异步迭代器）取数据放入有界队列，消费方按原顺序取出
+    数据源的网络等待与缠论计算可以重叠；source 抛出的异常会在消费方取到对应位置时原样抛出
+    lock 不为 None 时生产线程每次取数据都持有该锁，用于多个预取线程共用一个非线程安全的数据源
+    '''
+    def __init__(self, source, maxsize: int = 256, lock: Optional[threading.Lock] = None):
+        self.__queue: queue.Queue = queue.Queue(maxsize)
+        self.__stop = threading.Event()
+        self.__lock = lock
+        self.__done = False
+        self.__thread = threading.Thread(target=self.__run, args=(source,), daemon=True)
+        self.__thread.start()
+
+    def __put(self, item) -> bool:
+        while not self.__stop.is_set():
+            try:
+                self.__queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __run(self, source):
+        try:
+            if hasattr(source, "__aiter__"):
+                asyncio.run(self.__run_async(source))
+            else:
+                self.__run_sync(iter(source))
+        except BaseException as e:
+            self.__put(CPrefetchError(e))
+            return
+        self.__put(_END)
+
+    def __run_sync(self, it):
+        try:
+            while True:
+                with self.__lock or nullcontext():
+                    item = next(it, _END)
+                if item is _END or not self.__put(item):
+                    return
+        finally:
+            if hasattr(it, "close"):
+                it.close()
+
+    async def __run_async(self, source):
+        async for item in source:
+            # 队列满时阻塞的是本线程自己的事件循环，不影响计算线程
+            if not self.__put(item):
+                return
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.__done:
+            raise StopIteration
+        item = self.__queue.get()
+        if item is _END:
+            self.__done = True
+            raise StopIteration
+        if isinstance(item, CPrefetchError):
+            self.__done = True
+            raise item.exc
+        return item
+
+    def close(self):
+        # 停止预取并等待生产线程退出，之后才可以关闭数据源
+        self.__stop.set()
+        self.__done = True
+        self.__thread.join()
+
+
+class CAsyncStockApi(CCommonStockApi):
+    '''
+    asyncio 数据源：子类实现异步生成器 aget_kl_data，逐根 yield CKLine_Unit
+    get_kl_data 在后台线程的事件循环里运行它，因此可以和普通数据源一样直接用于 CChan
+    '''
+    thread_safe = True
+    prefetch_size = 256
+
+    @abc.abstractmethod
+    async def aget_kl_data(self):
+        pass
+
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        prefetch_iter = CPrefetchIter(self.aget_kl_data(), maxsize=self.prefetch_size)
+        try:
+            yield from prefetch_iter
+        finally:
+            prefetch_iter.close()
+
+
+class CPreloadedStockApi(CCommonStockApi):
+    '''
+    已经在内存中的各级别K线，用于预先拉取好数据后再构造 CChan
+    kl_data: {级别: [CKLine_Unit, ...]}，由 preloaded_stockapi_cls 生成子类时设置
+    origin_data_src: 数据原本的数据源，供快照等需要记录数据来源的地方使用
+    kl_error: {级别: 拉取时原数据源抛出的异常}，构造该级别时原样抛出，与直接读取原数据源一致
+    '''
+    thread_safe = True
+    kl_data: Dict[KL_TYPE, List[CKLine_Unit]] = {}
+    origin_data_src = None
+    kl_error: Dict[KL_TYPE, Exception] = {}
+
+    def __init__(self, code, k_type=KL_TYPE.K_DAY, begin_date=None, end_date=None, autype=None):
+        super(CPreloadedStockApi, self).__init__(code, k_type, begin_date, end_date, autype)
+        if k_type in self.kl_error:
+            raise self.kl_error[k_type]
+        if k_type not in self.kl_data:
+            raise CChanException(f"{code} {k_type} not preloaded", ErrCode.SRC_DATA_NOT_FOUND)
+
+    def get_kl_data(self) -> Iterable[CKLine_Unit]:
+        yield from self.kl_data[self.k_type]
+
+    def SetBasciInfo(self):
+        pass
+
+    @classmethod
+    def do_init(cls):
+        pass
+
+    @classmethod
+    def do_close(cls):
+        pass
+
+
+def preloaded_stockapi_cls(kl_data: Dict[KL_TYPE, List[CKLine_Unit]], origin_data_src=None, kl_error: Optional[Dict[KL_TYPE, Exception]] = None):
+    return type("CPreloadedStockApi", (CPreloadedStockApi,), {"kl_data": kl_data, "origin_data_src": origin_data_src, "kl_error": kl_error or {}})
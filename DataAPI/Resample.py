@@ -0,0 +1,300 @@
+import datetime
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+from Common.CEnum import DATA_FIELD, KL_TYPE
+from Common.ChanException import CChanException, ErrCode
+from Common.CTime import CTime
+from KLine.KLine_Store import key2time, time2key
+from KLine.KLine_Unit import CKLine_Unit
+
+# 分钟级别对应的分钟数
+KL_MINUTE: Dict[KL_TYPE, int] = {
+    KL_TYPE.K_1M: 1,
+    KL_TYPE.K_3M: 3,
+    KL_TYPE.K_5M: 5,
+    KL_TYPE.K_15M: 15,
+    KL_TYPE.K_30M: 30,
+    KL_TYPE.K_60M: 60,
+}
+
+# 日线及以上级别从小到大
+DAY_ABOVE_LV = [KL_TYPE.K_DAY, KL_TYPE.K_WEEK, KL_TYPE.K_MON, KL_TYPE.K_QUARTER, KL_TYPE.K_YEAR]
+
+
+class CSessionCalendar:
+    '''
+    交易时段日历：决定最小级别的一根K线属于更大级别的哪一根，以及它是不是那根K线的最后一根
+    session_lst: 每天的交易时段 [(开始分钟, 结束分钟)]，分钟为从 0 点开始的分钟数，按时间排列
+    label_end: 分钟K线的时间是结束时间（A股数据源，如 10:30 的60分钟K线是 9:30~10:30）还是开始时间（ccxt 等数字货币数据源）
+    分钟级别按每个交易时段的开始时间切分（A股60分钟K线为 10:30/11:30/14:00/15:00），不跨越交易时段；周线按自然周，月/季/年线按自然月/季/年
+    '''
+    def __init__(self, session_lst: List[Tuple[int, int]], label_end: bool = True):
+        self.session_lst = session_lst
+        self.label_end = label_end
+
+    def bar_minute(self, time: CTime, base_minute: int) -> Tuple[int, int]:
+        # 一根分钟K线覆盖的 [开始分钟, 结束分钟)
+        minute = time.hour * 60 + time.minute
+        return (minute - base_minute, minute) if self.label_end else (minute, minute + base_minute)
+
+    def session_of(self, begin_minute: int) -> int:
+        # K线开始时间所在的交易时段，早于第一个时段的算第一个时段，两个时段之间的算前一个时段
+        session_idx = 0
+        for idx, (session_begin, _) in enumerate(self.session_lst):
+            if begin_minute >= session_begin:
+                session_idx = idx
+        return session_idx
+
+    def bucket(self, time: CTime, base_lv: KL_TYPE, lv: KL_TYPE) -> Tuple[tuple, bool]:
+        '''
+        最小级别 base_lv 的一根K线（时间为 time）在 lv 级别所属K线的 key，以及这根K线结束时 lv 级别的这根K线是否已经走完
+        周/月/季/年线无法确定最后一个交易日（节假日），只在下一根K线出现时才算走完
+        '''
+        base_minute = KL_MINUTE.get(base_lv, 0)
+        if lv in KL_MINUTE:
+            return self.minute_bucket(time, base_minute, KL_MINUTE[lv])
+        return self.period_bucket(time, base_minute, lv)
+
+    def minute_bucket(self, time: CTime, base_minute: int, lv_minute: int) -> Tuple[tuple, bool]:
+        begin, end = self.bar_minute(time, base_minute)
+        session_idx = self.session_of(begin)
+        session_begin, session_end = self.session_lst[session_idx]
+        idx = max(begin - session_begin, 0) // lv_minute
+        return ((time.year, time.month, time.day), session_idx, idx), end >= min(session_begin + (idx + 1) * lv_minute, session_end)
+
+    def period_bucket(self, time: CTime, base_minute: int, lv: KL_TYPE) -> Tuple[tuple, bool]:
+        # base_minute 为 0 表示最小级别是日线及以上
+        if lv == KL_TYPE.K_DAY:
+            closed = base_minute > 0 and self.bar_minute(time, base_minute)[1] >= self.session_lst[-1][1]
+            return (time.year, time.month, time.day), closed
+        if lv == KL_TYPE.K_WEEK:
+            return tuple(datetime.date(time.year, time.month, time.day).isocalendar()[:2]), False
+        if lv == KL_TYPE.K_MON:
+            return (time.year, time.month), False
+        if lv == KL_TYPE.K_QUARTER:
+            return (time.year, (time.month - 1) // 3), False
+        return (time.year,), False
+
+    def label(self, key, lv: KL_TYPE) -> Optional[CTime]:
+        '''
+        lv 级别 key 对应K线的时间，取区间边界，缺少最小级别K线时也不变
+        - 分钟级别：label_end 时为区间结束时间（不超过交易时段结束），否则为开始时间，与数据源一致
+        - 日线：当天日期
+        - 周/月/季/年线：label_end 时返回 None，由调用方取最后一根K线的日期（A股数据源标记为最后一个交易日，节假日无法预知）；否则为区间第一天
+        '''
+        if lv in KL_MINUTE:
+            (year, month, day), session_idx, idx = key
+            session_begin, session_end = self.session_lst[session_idx]
+            if self.label_end:
+                minute = min(session_begin + (idx + 1) * KL_MINUTE[lv], session_end)
+            else:
+                minute = session_begin + idx * KL_MINUTE[lv]
+            t = datetime.datetime(year, month, day) + datetime.timedelta(minutes=minute)
+            return CTime(t.year, t.month, t.day, t.hour, t.minute, auto=False)
+        if lv == KL_TYPE.K_DAY:
+            return CTime(*key, 0, 0)
+        if self.label_end:
+            return None
+        if lv == KL_TYPE.K_WEEK:
+            date = datetime.date.fromisocalendar(key[0], key[1], 1)
+        elif lv == KL_TYPE.K_MON:
+            date = datetime.date(key[0], key[1], 1)
+        elif lv == KL_TYPE.K_QUARTER:
+            date = datetime.date(key[0], key[1] * 3 + 1, 1)
+        else:
+            date = datetime.date(key[0], 1, 1)
+        return CTime(date.year, date.month, date.day, 0, 0)
+
+    def after_bucket(self, time: CTime, lv: KL_TYPE, parent_time: CTime, parent_lv: KL_TYPE) -> bool:
+        '''
+        lv 级别时间为 time 的K线是否属于 parent_lv 级别时间为 parent_time 的K线之后的K线
+        K线时间为开始时间时不能直接比较时间（父级别K线包含的K线时间都不早于它），改为比较所属区间
+        '''
+        return self.bucket(time, lv, parent_lv)[0] > self.bucket(parent_time, parent_lv, parent_lv)[0]
+
+
+SESSION_CALENDAR: Dict[str, CSessionCalendar] = {
+    # 9:30~11:30, 13:00~15:00，分钟K线时间为结束时间
+    "a_share": CSessionCalendar([(9*60+30, 11*60+30), (13*60, 15*60)], label_end=True),
+    # 全天交易，按本地时间 0 点切日，分钟K线时间为开始时间
+    "crypto": CSessionCalendar([(0, 24*60)], label_end=False),
+}
+
+
+def list_to_tuple(key):
+    # json 会把 key 中的 tuple 存成 list，比较 key 时需要还原
+    return tuple(list_to_tuple(item) for item in key) if isinstance(key, list) else key
+
+
+def get_session_calendar(session: Union[str, CSessionCalendar]) -> CSessionCalendar:
+    if isinstance(session, CSessionCalendar):
+        return session
+    if session not in SESSION_CALENDAR:
+        raise CChanException(f"unknown kl_session={session}, should be one of {'/'.join(SESSION_CALENDAR)} or a CSessionCalendar", ErrCode.PARA_ERROR)
+    return SESSION_CALENDAR[session]
+
+
+def check_resample_lv(lv_list: List[KL_TYPE]):
+    base_lv = lv_list[-1]
+    for lv in lv_list[:-1]:
+        if lv in KL_MINUTE and (base_lv not in KL_MINUTE or KL_MINUTE[lv] % KL_MINUTE[base_lv] != 0):
+            raise CChanException(f"can not resample {lv} from {base_lv}", ErrCode.PARA_ERROR)
+        if lv in DAY_ABOVE_LV and base_lv in DAY_ABOVE_LV and DAY_ABOVE_LV.index(lv) <= DAY_ABOVE_LV.index(base_lv):
+            raise CChanException(f"can not resample {lv} from {base_lv}", ErrCode.PARA_ERROR)
+
+
+class CBarBuilder:
+    '''
+    正在合成的一根K线
+    时间为 CSessionCalendar.label 给出的区间边界，与数据源原生的K线一致；label 为 None 时（label_end 的周/月/季/年线）取最后一根的日期
+    label_end 时父级别K线的时间不早于它包含的K线，而早于之后的K线，直接比较时间即可对齐父子级别；
+    开始时间的日历由 CChan 通过 CSessionCalendar.after_bucket 对齐
+    '''
+    def __init__(self, key, lv: KL_TYPE, time: Optional[CTime] = None):
+        self.key = key
+        self.lv = lv
+        self.time = time
+        # 最后一根最小级别K线的时间
+        self.last_time: Optional[CTime] = None
+        self.open = self.high = self.low = self.close = 0.0
+        self.trade_info: Dict[str, float] = {}
+
+    def add(self, klu: CKLine_Unit):
+        if self.last_time is None:
+            self.open, self.high, self.low = klu.open, klu.high, klu.low
+        else:
+            if klu.high > self.high:
+                self.high = klu.high
+            if klu.low < self.low:
+                self.low = klu.low
+        self.close = klu.close
+        self.last_time = klu.time
+        trade_info = self.trade_info
+        for metric_name, value in klu.trade_info.metric.items():
+            if value is not None:
+                trade_info[metric_name] = trade_info.get(metric_name, 0.0) + value
+
+    def get_state(self) -> dict:
+        # 快照用，只包含 json 可以保存的基本类型
+        return {
+            "key": self.key, "lv": self.lv.name,
+            "time": None if self.time is None else [time2key(self.time), self.time.auto],
+            "last_time": None if self.last_time is None else [time2key(self.last_time), self.last_time.auto],
+            "ohlc": [self.open, self.high, self.low, self.close], "trade_info": self.trade_info,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'CBarBuilder':
+        builder = cls(list_to_tuple(state["key"]), KL_TYPE[state["lv"]], None if state["time"] is None else key2time(*state["time"]))
+        builder.last_time = None if state["last_time"] is None else key2time(*state["last_time"])
+        builder.open, builder.high, builder.low, builder.close = state["ohlc"]
+        builder.trade_info = dict(state["trade_info"])
+        return builder
+
+    def to_klu(self) -> CKLine_Unit:
+        assert self.last_time is not None
+        _time = self.time if self.time is not None else CTime(self.last_time.year, self.last_time.month, self.last_time.day, 0, 0)
+        klu = CKLine_Unit({
+            DATA_FIELD.FIELD_TIME: _time,
+            DATA_FIELD.FIELD_OPEN: self.open,
+            DATA_FIELD.FIELD_HIGH: self.high,
+            DATA_FIELD.FIELD_LOW: self.low,
+            DATA_FIELD.FIELD_CLOSE: self.close,
+            **self.trade_info,
+        })
+        klu.kl_type = self.lv
+        return klu
+
+
+class CKLineResampler:
+    '''
+    由最小级别（lv_list 最后一个）K线流式合成更大级别的K线
+    - update(klu): 喂入一根最小级别K线，返回因此走完的更大级别K线
+    - forming(): 各级别尚未走完的K线（每次调用生成新的对象，不影响之后的合成）
+    - flush(): 数据结束时把尚未走完的K线当作已经走完返回
+    返回的都是 [(级别, K线)]，按级别从高到低排列
+    '''
+    def __init__(self, lv_list: List[KL_TYPE], session: Union[str, CSessionCalendar] = "a_share"):
+        check_resample_lv(lv_list)
+        self.base_lv = lv_list[-1]
+        self.sup_lv_list = lv_list[:-1]
+        self.calendar = get_session_calendar(session)
+        self.base_minute = KL_MINUTE.get(self.base_lv, 0)
+        # 分钟级别为分钟数，日线及以上为 None
+        self.lv_minute = [KL_MINUTE.get(lv) for lv in self.sup_lv_list]
+        self.builder: List[Optional[CBarBuilder]] = [None] * len(self.sup_lv_list)
+
+    def update(self, klu: CKLine_Unit) -> List[Tuple[KL_TYPE, CKLine_Unit]]:
+        res: List[Tuple[KL_TYPE, CKLine_Unit]] = []
+        calendar = self.calendar
+        for idx, lv in enumerate(self.sup_lv_list):
+            lv_minute = self.lv_minute[idx]
+            if lv_minute is None:
+                key, closed = calendar.period_bucket(klu.time, self.base_minute, lv)
+            else:
+                key, closed = calendar.minute_bucket(klu.time, self.base_minute, lv_minute)
+            builder = self.builder[idx]
+            if builder is not None and builder.key != key:
+                res.append((lv, builder.to_klu()))
+                builder = None
+            if builder is None:
+                builder = CBarBuilder(key, lv, calendar.label(key, lv))
+            builder.add(klu)
+            if closed:
+                res.append((lv, builder.to_klu()))
+                builder = None
+            self.builder[idx] = builder
+        return res
+
+    def get_state(self) -> List[Optional[dict]]:
+        return [None if builder is None else builder.get_state() for builder in self.builder]
+
+    def set_state(self, state: List[Optional[dict]]):
+        self.builder = [None if builder is None else CBarBuilder.from_state(builder) for builder in state]
+
+    def forming(self) -> List[Tuple[KL_TYPE, CKLine_Unit]]:
+        return [(builder.lv, builder.to_klu()) for builder in self.builder if builder is not None]
+
+    def flush(self) -> List[Tuple[KL_TYPE, CKLine_Unit]]:
+        res = self.forming()
+        self.builder = [None] * len(self.sup_lv_list)
+        return res
+
+
+class CResampleFeed:
+    '''
+    批量加载用：只读取最小级别的K线，合成各级别K线后拆成每个级别一个迭代器，供 CChan.load_iterator 按级别读取
+    某个级别的迭代器没有K线时才继续读取最小级别，其他级别已经合成好的K线先缓存起来（最多约一根最高级别K线的量）
+    '''
+    def __init__(self, base_iter: Iterable[CKLine_Unit], lv_list: List[KL_TYPE], session: Union[str, CSessionCalendar] = "a_share"):
+        self.lv_list = lv_list
+        self.resampler = CKLineResampler(lv_list, session)
+        self.base_iter = iter(base_iter)
+        self.klu_queue: List[Deque[CKLine_Unit]] = [deque() for _ in lv_list]
+        self.finished = False
+
+    def put(self, klu_lst: List[Tuple[KL_TYPE, CKLine_Unit]]):
+        for lv, klu in klu_lst:
+            self.klu_queue[self.lv_list.index(lv)].append(klu)
+
+    def pull(self) -> bool:
+        if self.finished:
+            return False
+        klu = next(self.base_iter, None)
+        if klu is None:
+            # 数据结束，最后一根未走完的K线也加入（与数据源提供当天未收盘的K线一致）
+            self.put(self.resampler.flush())
+            self.finished = True
+            return True
+        self.put(self.resampler.update(klu))
+        self.klu_queue[-1].append(klu)
+        return True
+
+    def lv_iter(self, lv_idx: int) -> Iterable[CKLine_Unit]:
+        klu_queue = self.klu_queue[lv_idx]
+        while True:
+            while not klu_queue:
+                if not self.pull():
+                    return
+            yield klu_queue.popleft()
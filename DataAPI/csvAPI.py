@@ -4,8 +4,8 @@ from Common.CEnum import DATA_FIELD, KL_TYPE
 from Common.ChanException import CChanException, ErrCode
 from Common.CTime import CTime
 from Common.func_util import str2float
-from KLine.KLine_Unit import CKLine_Unit
 
+from .BulkLoader import read_csv_bars
 from .CommonStockAPI import CCommonStockApi
 
 
@@ -41,6 +41,8 @@ def parse_time_column(inp):
 
 
 class CSV_API(CCommonStockApi):
+    thread_safe = True
+
     def __init__(self, code, k_type=KL_TYPE.K_DAY, begin_date=None, end_date=None, autype=None):
         self.headers_exist = True  # 第一行是否是标题，如果是数据，设置为False
         self.columns = [
@@ -64,18 +66,9 @@ class CSV_API(CCommonStockApi):
         if not os.path.exists(file_path):
             raise CChanException(f"file not exist: {file_path}", ErrCode.SRC_DATA_NOT_FOUND)
 
-        for line_number, line in enumerate(open(file_path, 'r')):
-            if self.headers_exist and line_number == 0:
-                continue
-            data = line.strip("\n").split(",")
-            if len(data) != len(self.columns):
-                raise CChanException(f"file format error: {file_path}", ErrCode.SRC_DATA_FORMAT_ERROR)
-            if self.begin_date is not None and data[self.time_column_idx] < self.begin_date:
-                continue
-            if self.end_date is not None and data[self.time_column_idx] > self.end_date:
-                continue
-
-            yield CKLine_Unit(create_item_dict(data, self.columns))
+        # 整个文件一次按列解析，与原逐行解析一致忽略秒
+        frame = read_csv_bars(file_path, self.columns, self.headers_exist, keep_second=False)
+        yield from frame.slice_time(self.begin_date, self.end_date).klu_iter()
 
     def SetBasciInfo(self):
         pass
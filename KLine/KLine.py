@@ -7,6 +7,8 @@ from KLine.KLine_Unit import CKLine_Unit
 
 # 合并后的K线
 class CKLine(CKLine_Combiner[CKLine_Unit]):
+    __slots__ = ("idx", "kl_type")
+
     def __init__(self, kl_unit: CKLine_Unit, idx, _dir=KLINE_DIR.UP):
         super(CKLine, self).__init__(kl_unit, _dir)
         self.idx: int = idx
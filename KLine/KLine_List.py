@@ -1,5 +1,6 @@
 import copy
-from typing import List, Union, overload
+import time
+from typing import List, Optional, Union, overload
 
 from Bi.Bi import CBi
 from Bi.BiList import CBiList
@@ -11,10 +12,16 @@ from Seg.Seg import CSeg
 from Seg.SegConfig import CSegConfig
 from Seg.SegListComm import CSegListComm
 from ZS.ZSList import CZSList
-from Common.func_util import logger
+from Common.profiler import PROFILER
+from Common.trace import get_tracer
+from Combiner.Combine_Scan import combine_scan
+from Combiner.KLine_Combiner import TRACE as COMBINER_TRACE
 
 from .KLine import CKLine
-from .KLine_Unit import CKLine_Unit
+from .KLine_MetricIndex import CKLine_MetricIndex
+from .KLine_Unit import CKLine_Unit, set_metric_batch
+
+TRACE = get_tracer("KLine.KLine_List")
 
 
 def get_seglist_instance(seg_config: CSegConfig, lv) -> CSegListComm:
@@ -61,15 +68,33 @@ class CKLine_List:
 
         # 是否需要按步计算中枢和线段
         self.step_calculation = self.need_cal_step_by_step()
+        # 指标区间索引，笔的 MACD 等背驰指标用区间查询代替逐根遍历
+        self.metric_index: Optional[CKLine_MetricIndex] = CKLine_MetricIndex() if conf.bi_metric_index else None
+        self.bi_list.metric_index = self.metric_index
+        # 按 idx 排列的单位K线，klu.idx 从 0 开始连续时维护，笔/线段的K线区间直接切片；不连续时置为 None
+        self.klu_lst: Optional[List[CKLine_Unit]] = []
+        self.bi_list.klu_lst = self.klu_lst
+        # 非回放模式下，支持 add_batch 的指标延迟到计算线段中枢前批量计算
+        self.metric_batch = conf.vectorize_metric and not self.step_calculation
+        self.split_metric_model()
+        # 等待批量计算指标的K线
+        self.metric_pending_klu: List[CKLine_Unit] = []
+        # 非回放模式下K线合并延迟到访问合并K线时用 combine_scan 批量计算
+        self.combine_batch = conf.kl_batch_combine and not self.step_calculation
+        # 等待批量合并的K线
+        self.combine_pending_klu: List[CKLine_Unit] = []
         # 最后一根确定的线段开始笔索引
         self.last_sure_seg_start_bi_idx = -1
         # 最后一根确定的线段线段开始笔索引
         self.last_sure_segseg_start_bi_idx = -1
+        # 上一次线段的线段、线段中枢、线段买卖点计算前后的增量状态是否一致，一致且线段无变化时可以跳过
+        self.segseg_stable = False
 
     def __deepcopy__(self, memo):
         '''
         深拷贝
         '''
+        self.flush_combine()
         new_obj = CKLine_List(self.kl_type, self.config)
         memo[id(self)] = new_obj
         # 深拷贝 每个K线
@@ -81,20 +106,22 @@ class CKLine_List:
                 if klu.pre is not None:
                     new_klu.set_pre_klu(memo[id(klu.pre)])
                 klus_new.append(new_klu)
-            #
-            new_klc = CKLine(klus_new[0], idx=klc.idx, _dir=klc.dir)
-            new_klc.set_fx(klc.fx)
-            new_klc.kl_type = klc.kl_type
-            for idx, klu in enumerate(klus_new):
+            # 合并K线的高低点、方向、分形等状态直接沿用，只替换单位K线列表
+            new_klc = klc.clone(klus_new)
+            for klu in klus_new:
                 klu.set_klc(new_klc)
-                if idx != 0:
-                    new_klc.add(klu)
             memo[id(klc)] = new_klc
             if new_obj.lst:
                 new_obj.lst[-1].set_next(new_klc)
                 new_klc.set_pre(new_obj.lst[-1])
             new_obj.lst.append(new_klc)
         
+        if self.klu_lst is None:
+            new_obj.klu_lst = None
+        else:
+            # 笔列表和每一笔共用这个列表，登记到 memo 中保证复制后仍是同一个对象
+            new_obj.klu_lst = [memo[id(klu)] for klu in self.klu_lst]
+            memo[id(self.klu_lst)] = new_obj.klu_lst
         # 深拷贝 笔列表、线段列表、线段线段列表、中枢列表、买卖点列表、指标模型列表、是否需要按步计算中枢和线段、线段买卖点列表
         new_obj.bi_list = copy.deepcopy(self.bi_list, memo)
         new_obj.seg_list = copy.deepcopy(self.seg_list, memo)
@@ -105,6 +132,9 @@ class CKLine_List:
         new_obj.metric_model_lst = copy.deepcopy(self.metric_model_lst, memo)
         new_obj.step_calculation = copy.deepcopy(self.step_calculation, memo)
         new_obj.seg_bs_point_lst = copy.deepcopy(self.seg_bs_point_lst, memo)
+        new_obj.metric_index = copy.deepcopy(self.metric_index, memo)
+        new_obj.split_metric_model()
+        new_obj.metric_pending_klu = [memo[id(klu)] for klu in self.metric_pending_klu]
         return new_obj
 
     @overload
@@ -114,27 +144,85 @@ class CKLine_List:
     def __getitem__(self, index: slice) -> List[CKLine]: ...
 
     def __getitem__(self, index: Union[slice, int]) -> Union[List[CKLine], CKLine]:
+        self.flush_combine()
         return self.lst[index]
 
     def __len__(self):
+        self.flush_combine()
         return len(self.lst)
 
+    def last_klu(self) -> Optional[CKLine_Unit]:
+        # 最后一根单位K线，不会触发批量合并
+        if self.combine_pending_klu:
+            return self.combine_pending_klu[-1]
+        return self.lst[-1][-1] if self.lst and len(self.lst[-1]) > 0 else None
+
+    def split_metric_model(self):
+        # 拆分为 批量计算的指标模型 和 逐根计算的指标模型（如 demark）
+        if self.metric_batch:
+            self.batch_metric_model_lst = [model for model in self.metric_model_lst if hasattr(model, "add_batch")]
+            self.step_metric_model_lst = [model for model in self.metric_model_lst if not hasattr(model, "add_batch")]
+        else:
+            self.batch_metric_model_lst = []
+            self.step_metric_model_lst = self.metric_model_lst
+
+    def cal_metric_batch(self):
+        # 批量计算等待中的K线指标
+        if not self.metric_pending_klu:
+            return
+        begin = time.perf_counter() if PROFILER.on else 0.0
+        set_metric_batch(self.metric_pending_klu, self.batch_metric_model_lst)
+        if self.metric_index is not None:
+            self.metric_index.extend(self.metric_pending_klu)
+        self.metric_pending_klu = []
+        if PROFILER.on:
+            PROFILER.add_time("kline.metric_batch", begin)
+
     def cal_seg_and_zs(self):
+        self.flush_combine()
+        self.cal_metric_batch()
+        begin = time.perf_counter() if PROFILER.on else 0.0
         if not self.step_calculation:
             self.bi_list.try_add_virtual_bi(self.lst[-1])
+        self.cal_seg_zs_bsp()
+        if PROFILER.on:
+            PROFILER.add_time("kline.cal_seg_and_zs", begin)
+
+    def cal_seg_zs_bsp(self):
+        # 根据当前的笔列表更新线段、中枢、线段的线段以及买卖点
+        begin = time.perf_counter() if PROFILER.on else 0.0
         self.last_sure_seg_start_bi_idx = cal_seg(self.bi_list, self.seg_list, self.last_sure_seg_start_bi_idx)
-        '''
+        if PROFILER.on:
+            PROFILER.add_time("seg.cal_seg", begin)
         self.zs_list.cal_bi_zs(self.bi_list, self.seg_list)
         update_zs_in_seg(self.bi_list, self.seg_list, self.zs_list)  # 计算seg的zs_lst，以及中枢的bi_in, bi_out
 
-        self.last_sure_segseg_start_bi_idx = cal_seg(self.seg_list, self.segseg_list, self.last_sure_segseg_start_bi_idx)
-        self.segzs_list.cal_bi_zs(self.seg_list, self.segseg_list)
-        update_zs_in_seg(self.seg_list, self.segseg_list, self.segzs_list)  # 计算segseg的zs_lst，以及中枢的bi_in, bi_out
+        # 线段没有任何变化（回放模式下大部分新K线只改变了最后一笔）时，线段的线段、线段中枢、线段买卖点的结果不会变
+        # 这几步各自会根据上一次的结果更新起算位置，起算位置也没变时重算才是幂等的
+        if self.seg_list.dirty_idx is not None or not self.segseg_stable:
+            state = self.segseg_state()
+            begin = time.perf_counter() if PROFILER.on else 0.0
+            self.last_sure_segseg_start_bi_idx = cal_seg(self.seg_list, self.segseg_list, self.last_sure_segseg_start_bi_idx)
+            if PROFILER.on:
+                PROFILER.add_time("segseg.cal_seg", begin)
+            self.segzs_list.cal_bi_zs(self.seg_list, self.segseg_list)
+            update_zs_in_seg(self.seg_list, self.segseg_list, self.segzs_list)  # 计算segseg的zs_lst，以及中枢的bi_in, bi_out
+            self.seg_bs_point_lst.cal(self.seg_list, self.segseg_list)  # 线段线段买卖点
+            self.segseg_stable = self.segseg_list.dirty_idx is None and state == self.segseg_state()
+        elif PROFILER.on:
+            PROFILER.incr("segseg.skip")
 
-        # 计算买卖点
-        self.seg_bs_point_lst.cal(self.seg_list, self.segseg_list)  # 线段线段买卖点
-        self.bs_point_lst.cal(self.bi_list, self.seg_list)  # 再算笔买卖点
-        '''
+        # 计算笔买卖点
+        self.bs_point_lst.cal(self.bi_list, self.seg_list)
+
+    def segseg_state(self):
+        return (
+            self.last_sure_segseg_start_bi_idx,
+            self.segzs_list.last_sure_pos,
+            self.segzs_list.last_seg_idx,
+            self.seg_bs_point_lst.last_sure_pos,
+            self.seg_bs_point_lst.last_sure_seg_idx,
+        )
 
     def need_cal_step_by_step(self):
         return self.config.trigger_step
@@ -143,12 +231,36 @@ class CKLine_List:
     def add_single_klu(self, klu: CKLine_Unit):
         # 这个函数只能计算当前K线 以及 当前K线之前的历史K线的 指标
         # 如 单根K线对应的 MACD, KDJ, RSI, BOLL, MA, 等
-        klu.set_metric(self.metric_model_lst)
+        begin = time.perf_counter() if PROFILER.on else 0.0
+        klu.set_metric(self.step_metric_model_lst)
+        if PROFILER.on:
+            PROFILER.add_time("kline.set_metric", begin)
+        if self.klu_lst is not None:
+            if klu.idx == len(self.klu_lst):
+                self.klu_lst.append(klu)
+            else:
+                self.klu_lst = None
+                self.bi_list.klu_lst = None
+        if self.metric_batch:
+            self.metric_pending_klu.append(klu)
+        else:
+            if self.metric_index is not None:
+                self.metric_index.append(klu)
+        if self.combine_batch:
+            self.combine_pending_klu.append(klu)
+        else:
+            self.combine_klu(klu)
+
+    def combine_klu(self, klu: CKLine_Unit):
+        # 逐根K线合并，并在产生新合并K线时更新分型和笔
         # 如果lst为空，则添加当前 合并K线到 lst
         if len(self.lst) == 0:
             self.lst.append(CKLine(klu, idx=0))
         else:
+            begin = time.perf_counter() if PROFILER.on else 0.0
             _dir = self.lst[-1].try_add(klu) # 做K线合并， 返回合并方向
+            if PROFILER.on:
+                PROFILER.add_time("kline.combine", begin)
             # 不需要合并K线, _dir 包含 向上合并，向下合并，包含关系
             if _dir != KLINE_DIR.COMBINE:
                 # 添加新K线到列表
@@ -168,25 +280,83 @@ class CKLine_List:
                 self.cal_seg_and_zs()
                 pass
 
+    def flush_combine(self):
+        '''
+        批量合并等待中的K线，合并K线、分型、笔的结果与逐根 combine_klu 完全一致：
+        combine_scan 一次算出每根合并K线包含哪些单位K线、方向、最终高低点和分型，
+        这里只在每根新合并K线出现时按原顺序建立链接并更新笔，不再逐根 try_add
+        '''
+        if not self.combine_pending_klu:
+            return
+        klu_lst = self.combine_pending_klu
+        self.combine_pending_klu = []
+        if COMBINER_TRACE.on:
+            # 需要逐根输出合并过程的追踪信息
+            for klu in klu_lst:
+                self.combine_klu(klu)
+            return
+        if len(self.lst) == 0:
+            self.lst.append(CKLine(klu_lst[0], idx=0))
+            klu_lst = klu_lst[1:]
+            if not klu_lst:
+                return
+        cur_klc = self.lst[-1]
+        pre_klc = self.lst[-2] if len(self.lst) >= 2 else None
+        begin = time.perf_counter() if PROFILER.on else 0.0
+        scan = combine_scan(
+            [klu.high for klu in klu_lst],
+            [klu.low for klu in klu_lst],
+            cur_klc.high,
+            cur_klc.low,
+            cur_klc.dir,
+            pre_high=None if pre_klc is None else pre_klc.high,
+            pre_low=None if pre_klc is None else pre_klc.low,
+        )
+        if PROFILER.on:
+            PROFILER.add_time("kline.combine", begin)
+        for g in range(len(scan)):
+            begin, end = int(scan.begin[g]), int(scan.end[g])
+            if g > 0:
+                # 新合并K线只带第一根单位K线时更新前一根的分型和笔，与逐根合并时看到的状态相同
+                cur_klc = CKLine(klu_lst[begin], idx=len(self.lst), _dir=scan.dir[g])
+                self.lst.append(cur_klc)
+                if len(self.lst) >= 3:
+                    fx = scan.fx[g-1]
+                    assert fx is not None
+                    self.lst[-2].link_fx(self.lst[-3], self.lst[-1], fx)
+                self.bi_list.update_bi(self.lst[-2], self.lst[-1], self.step_calculation)
+                begin += 1
+            cur_klc.extend_combined(klu_lst[begin:end], scan.high[g], scan.low[g])
+
     def klu_iter(self, klc_begin_idx=0):
+        self.flush_combine()
         for klc in self.lst[klc_begin_idx:]:
             yield from klc.lst
 
 
 def cal_seg(bi_list, seg_list: CSegListComm, last_sure_seg_start_bi_idx) -> int:
-    logger.info(f"\t" * 10 + f"[KLine_List] <<<0.0_cal_seg>>>: bi_list_len={len(bi_list)}, seg_list_len={len(seg_list)}")
-    seg_list.update(bi_list)
-    logger.info(f"\t" * 10 + f"[KLine_List] <<<0.1_cal_seg>>>: seg_list_len={len(seg_list)}")
+    if TRACE.on:
+        TRACE.info(f"\t" * 10 + f"[KLine_List] <<<0.0_cal_seg>>>: bi_list_len={len(bi_list)}, seg_list_len={len(seg_list)}")
+    begin = time.perf_counter() if PROFILER.on else 0.0
+    dirty_idx = seg_list.incremental_update(bi_list)
+    if PROFILER.on:
+        PROFILER.add_time("seg.update" if seg_list.lv == SEG_TYPE.BI else "segseg.update", begin)
+    if TRACE.on:
+        TRACE.info(f"\t" * 10 + f"[KLine_List] <<<0.1_cal_seg>>>: seg_list_len={len(seg_list)}")
     if len(seg_list) == 0:
         for bi in bi_list:
             bi.set_seg_idx(0)
         return -1
     cur_seg: CSeg = seg_list[-1]
-    logger.info(f"\t" * 10 + f"[KLine_List] <<<0.2_cal_seg>>>: cur_seg={cur_seg}")
+    if TRACE.on:
+        TRACE.info(f"\t" * 10 + f"[KLine_List] <<<0.2_cal_seg>>>: cur_seg={cur_seg}")
+    # 变化的线段之前的笔所属线段不变，只需要从变化的线段（没有变化时为最后一个线段之后）开始重新设置
+    dirty_bi_idx = seg_list[dirty_idx].start_bi.idx if dirty_idx is not None and dirty_idx < len(seg_list) else cur_seg.end_bi.idx + 1
+    stop_bi_idx = max(last_sure_seg_start_bi_idx, dirty_bi_idx)
     bi_idx = len(bi_list) - 1
     while bi_idx >= 0:
         bi = bi_list[bi_idx]
-        if bi.seg_idx is not None and bi.idx < last_sure_seg_start_bi_idx:
+        if bi.seg_idx is not None and bi.idx < stop_bi_idx:
             break
         if bi.idx > cur_seg.end_bi.idx:
             bi.set_seg_idx(cur_seg.idx+1)
@@ -197,7 +367,8 @@ def cal_seg(bi_list, seg_list: CSegListComm, last_sure_seg_start_bi_idx) -> int:
             cur_seg = cur_seg.pre
         bi.set_seg_idx(cur_seg.idx)
         bi_idx -= 1
-    logger.info(f"\t" * 10 + f"[KLine_List] <<<0.3_cal_seg>>>: last_sure_seg_start_bi_idx={last_sure_seg_start_bi_idx}")
+    if TRACE.on:
+        TRACE.info(f"\t" * 10 + f"[KLine_List] <<<0.3_cal_seg>>>: last_sure_seg_start_bi_idx={last_sure_seg_start_bi_idx}")
     last_sure_seg_start_bi_idx = -1
     seg = seg_list[-1]
     while seg:
@@ -205,7 +376,8 @@ def cal_seg(bi_list, seg_list: CSegListComm, last_sure_seg_start_bi_idx) -> int:
             last_sure_seg_start_bi_idx = seg.start_bi.idx
             break
         seg = seg.pre
-    logger.info(f"\t" * 10 + f"[KLine_List] <<<0.4_cal_seg>>>: last_sure_seg_start_bi_idx={last_sure_seg_start_bi_idx}\n\n")
+    if TRACE.on:
+        TRACE.info(f"\t" * 10 + f"[KLine_List] <<<0.4_cal_seg>>>: last_sure_seg_start_bi_idx={last_sure_seg_start_bi_idx}\n\n")
 
     return last_sure_seg_start_bi_idx
 
@@ -213,6 +385,7 @@ def cal_seg(bi_list, seg_list: CSegListComm, last_sure_seg_start_bi_idx) -> int:
 def update_zs_in_seg(bi_list, seg_list, zs_list):
     sure_seg_cnt = 0
     seg_idx = len(seg_list) - 1
+    updated_zs_idx = len(zs_list)  # zs_list[updated_zs_idx:] 的 bi_in, bi_out, bi_lst 已经更新过
     while seg_idx >= 0:
         seg = seg_list[seg_idx]
         if seg.ele_inside_is_sure:
@@ -220,21 +393,31 @@ def update_zs_in_seg(bi_list, seg_list, zs_list):
         if seg.is_sure:
             sure_seg_cnt += 1
         seg.clear_zs_lst()
+        seg_begin_klu_idx = seg.start_bi.get_begin_klu().idx
         _zs_idx = len(zs_list) - 1
         while _zs_idx >= 0:
             zs = zs_list[_zs_idx]
-            if zs.end.idx < seg.start_bi.get_begin_klu().idx:
+            if zs.end.idx < seg_begin_klu_idx:
                 break
             if zs.is_inside(seg):
                 seg.add_zs(zs)
-            assert zs.begin_bi.idx > 0
-            zs.set_bi_in(bi_list[zs.begin_bi.idx-1])
-            if zs.end_bi.idx+1 < len(bi_list):
-                zs.set_bi_out(bi_list[zs.end_bi.idx+1])
-            zs.set_bi_lst(list(bi_list[zs.begin_bi.idx:zs.end_bi.idx+1]))
+            if _zs_idx < updated_zs_idx:
+                update_zs_bi(bi_list, zs)
             _zs_idx -= 1
+        updated_zs_idx = min(updated_zs_idx, _zs_idx + 1)
 
         if sure_seg_cnt > 2:
             if not seg.ele_inside_is_sure:
                 seg.ele_inside_is_sure = True
         seg_idx -= 1
+
+
+def update_zs_bi(bi_list, zs):
+    assert zs.begin_bi.idx > 0
+    zs.set_bi_in(bi_list[zs.begin_bi.idx-1])
+    if zs.end_bi.idx+1 < len(bi_list):
+        zs.set_bi_out(bi_list[zs.end_bi.idx+1])
+    zs_bi_lst = zs.bi_lst
+    # 首尾笔对象和长度都没变时笔列表不变（笔只会在尾部被替换），不用重新切片
+    if len(zs_bi_lst) != zs.end_bi.idx - zs.begin_bi.idx + 1 or zs_bi_lst[0] is not bi_list[zs.begin_bi.idx] or zs_bi_lst[-1] is not bi_list[zs.end_bi.idx]:
+        zs.set_bi_lst(list(bi_list[zs.begin_bi.idx:zs.end_bi.idx+1]))
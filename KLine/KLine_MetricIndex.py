@@ -0,0 +1,110 @@
+from typing import Dict, List
+
+import numpy as np
+
+from Common.CEnum import TRADE_INFO_LST
+from Math.RangeQuery import CPrefixSum, CRangeExtreme, CSignRun
+
+from .KLine_Unit import CKLine_Unit
+
+
+class CKLine_MetricIndex:
+    '''
+    单个级别按 klu.idx 建立的指标区间索引，供笔的 MACD 背驰指标做区间查询：
+    - MACD 红柱/绿柱面积、|MACD|、成交量/额/换手率 前缀和
+    - MACD、RSI 区间最大/最小值（分块 ST 表）
+    - MACD 同号连续区间（半面积）
+    要求 klu.idx 从 0 开始连续递增，否则置为失效，调用方退回逐根遍历
+    '''
+    def __init__(self):
+        self.valid = True
+        self.has_rsi = None
+        self.macd_pos = CPrefixSum()
+        self.macd_neg = CPrefixSum()
+        self.macd_abs = CPrefixSum()
+        self.macd_max = CRangeExtreme(is_max=True)
+        self.macd_min = CRangeExtreme(is_max=False)
+        self.macd_run = CSignRun()
+        self.rsi_max = CRangeExtreme(is_max=True)
+        self.rsi_min = CRangeExtreme(is_max=False)
+        self.trade_sum: Dict[str, CPrefixSum] = {metric: CPrefixSum() for metric in TRADE_INFO_LST}
+        self.trade_none_cnt: Dict[str, CPrefixSum] = {metric: CPrefixSum() for metric in TRADE_INFO_LST}
+
+    def __len__(self):
+        return len(self.macd_abs)
+
+    def covers(self, end_idx: int) -> bool:
+        return self.valid and end_idx < len(self)
+
+    def append(self, klu: CKLine_Unit):
+        if not self.valid:
+            return
+        if klu.idx != len(self):
+            self.valid = False
+            return
+        macd = klu.macd.macd
+        self.macd_pos.append(macd if macd > 0 else 0.0)
+        self.macd_neg.append(-macd if macd < 0 else 0.0)
+        self.macd_abs.append(abs(macd))
+        self.macd_max.append(macd)
+        self.macd_min.append(macd)
+        self.macd_run.append(macd)
+        if self.has_rsi is None:
+            self.has_rsi = hasattr(klu, "rsi")
+        if self.has_rsi:
+            self.rsi_max.append(klu.rsi)
+            self.rsi_min.append(klu.rsi)
+        for metric in TRADE_INFO_LST:
+            value = klu.trade_info.metric[metric]
+            self.trade_none_cnt[metric].append(1.0 if value is None else 0.0)
+            self.trade_sum[metric].append(0.0 if value is None else value)
+
+    def extend(self, klu_lst: List[CKLine_Unit]):
+        if not self.valid or not klu_lst:
+            return
+        if klu_lst[0].idx != len(self) or klu_lst[-1].idx != len(self) + len(klu_lst) - 1:
+            self.valid = False
+            return
+        macd = np.array([klu.macd.macd for klu in klu_lst], dtype=np.float64)
+        self.macd_pos.extend(np.where(macd > 0, macd, 0.0))
+        self.macd_neg.extend(np.where(macd < 0, -macd, 0.0))
+        self.macd_abs.extend(np.abs(macd))
+        self.macd_max.extend(macd)
+        self.macd_min.extend(macd)
+        self.macd_run.extend(macd)
+        if self.has_rsi is None:
+            self.has_rsi = hasattr(klu_lst[0], "rsi")
+        if self.has_rsi:
+            rsi = np.array([klu.rsi for klu in klu_lst], dtype=np.float64)
+            self.rsi_max.extend(rsi)
+            self.rsi_min.extend(rsi)
+        for metric in TRADE_INFO_LST:
+            values = [klu.trade_info.metric[metric] for klu in klu_lst]
+            self.trade_none_cnt[metric].extend(np.array([value is None for value in values], dtype=np.float64))
+            self.trade_sum[metric].extend(np.array([0.0 if value is None else value for value in values], dtype=np.float64))
+
+    def macd_area(self, begin: int, end: int, is_up: bool) -> float:
+        # 与笔方向同号的 MACD 柱面积
+        return (self.macd_pos if is_up else self.macd_neg).query(begin, end)
+
+    def macd_peak(self, begin: int, end: int, is_up: bool) -> float:
+        # 与笔方向同号的 MACD 柱最大绝对值，不存在时为 0
+        return max(self.macd_max.query(begin, end), 0.0) if is_up else max(-self.macd_min.query(begin, end), 0.0)
+
+    def macd_diff(self, begin: int, end: int) -> float:
+        return self.macd_max.query(begin, end) - self.macd_min.query(begin, end)
+
+    def macd_run_sum(self, idx: int, begin: int, end: int, forward: bool) -> float:
+        # 从 idx 开始向前/向后，与 idx 同号的连续 MACD 柱面积，限定在 [begin, end] 内
+        if forward:
+            return self.macd_abs.query(idx, min(self.macd_run.run_end(idx), end))
+        return self.macd_abs.query(max(self.macd_run.run_begin(idx), begin), idx)
+
+    def rsi_extreme(self, begin: int, end: int, is_max: bool) -> float:
+        return (self.rsi_max if is_max else self.rsi_min).query(begin, end)
+
+    def trade_metric_sum(self, metric: str, begin: int, end: int):
+        # 区间内有缺失值时返回 None
+        if self.trade_none_cnt[metric].query(begin, end) > 0:
+            return None
+        return self.trade_sum[metric].query(begin, end)
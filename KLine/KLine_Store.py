@@ -0,0 +1,285 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from Common.CEnum import DATA_FIELD, TRADE_INFO_LST, TREND_TYPE
+from Common.ChanException import CChanException, ErrCode
+from Common.CTime import CTime
+from Math.BOLL import BOLL_Metric
+from Math.KDJ import KDJ_Item
+from Math.MACD import CMACD_item
+
+from .KLine_Unit import CKLine_Unit
+from .TradeInfo import CTradeInfo
+
+# 基础列：每根K线都会写入
+BASE_COLUMNS = {
+    "idx": np.int64,
+    "time_key": np.int64,  # YYYYMMDDHHMMSS
+    "time_auto": np.bool_,
+    "ts": np.float64,
+    DATA_FIELD.FIELD_OPEN: np.float64,
+    DATA_FIELD.FIELD_HIGH: np.float64,
+    DATA_FIELD.FIELD_LOW: np.float64,
+    DATA_FIELD.FIELD_CLOSE: np.float64,
+    **{metric: np.float64 for metric in TRADE_INFO_LST},  # 缺失值为 NaN
+}
+
+MACD_COLUMNS = ["macd_fast_ema", "macd_slow_ema", "macd_dif", "macd_dea", "macd"]
+BOLL_COLUMNS = ["boll_theta", "boll_up", "boll_down", "boll_mid"]
+KDJ_COLUMNS = ["kdj_k", "kdj_d", "kdj_j"]
+
+
+def time2key(t: CTime) -> int:
+    return ((((t.year * 100 + t.month) * 100 + t.day) * 100 + t.hour) * 100 + t.minute) * 100 + t.second
+
+
+def key2time(key: int, auto: bool, ts: Optional[int] = None) -> CTime:
+    key, second = divmod(int(key), 100)
+    key, minute = divmod(key, 100)
+    key, hour = divmod(key, 100)
+    key, day = divmod(key, 100)
+    year, month = divmod(key, 100)
+    return CTime(year, month, day, hour, minute, second, auto=auto, ts=ts)
+
+
+# extend 每次转换的K线根数
+EXTEND_CHUNK = 256
+
+TREND_PREFIX = "trend_"
+
+
+def trend_column(trend_type: TREND_TYPE, T: int) -> str:
+    return f"{TREND_PREFIX}{trend_type.value}_{T}"
+
+
+def parse_trend_column(name: str):
+    # trend_column 的逆操作，返回 (TREND_TYPE, T)
+    type_value, T = name[len(TREND_PREFIX):].rsplit("_", 1)
+    return TREND_TYPE(type_value), int(T)
+
+
+class CKLine_Store:
+    '''
+    列式K线存储：OHLCV、时间、idx 以及单根K线指标保存在连续的 numpy 数组中，快照按这些列保存、恢复K线
+    整列数值直接用 store[name]，单根K线按需用 get_klu 生成
+    容量按倍数扩展，append 均摊 O(1)；指标列在第一次出现时才创建
+    '''
+    def __init__(self, capacity: int = 1024):
+        self.__size = 0
+        self.__capacity = max(capacity, 16)
+        self.__columns: Dict[str, np.ndarray] = {
+            name: self.__new_column(dtype) for name, dtype in BASE_COLUMNS.items()
+        }
+        # 均线等 trend 指标的列名索引，trend_at 不用按前缀扫描全部列
+        self.__trend_columns: Dict[TREND_TYPE, Dict[int, str]] = {}
+
+    def __index_trend(self, name: str):
+        if name.startswith(TREND_PREFIX):
+            trend_type, T = parse_trend_column(name)
+            self.__trend_columns.setdefault(trend_type, {})[T] = name
+
+    def __new_column(self, dtype) -> np.ndarray:
+        if dtype == np.float64:
+            return np.full(self.__capacity, np.nan, dtype=dtype)
+        return np.zeros(self.__capacity, dtype=dtype)
+
+    def __grow(self):
+        self.__capacity *= 2
+        for name, col in self.__columns.items():
+            new_col = self.__new_column(col.dtype)
+            new_col[:self.__size] = col[:self.__size]
+            self.__columns[name] = new_col
+
+    def __len__(self):
+        return self.__size
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__columns
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        # 返回只读视图，避免外部改写底层数组
+        if name not in self.__columns:
+            raise CChanException(f"column {name} not found in kline store", ErrCode.PARA_ERROR)
+        view = self.__columns[name][:self.__size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.__columns.keys())
+
+    @property
+    def nbytes(self) -> int:
+        return sum(col[:self.__size].nbytes for col in self.__columns.values())
+
+    @staticmethod
+    def __row(klu: CKLine_Unit) -> Dict[str, float]:
+        # 一根K线各列的值，缺失的成交量等为 NaN，没有配置的指标不出现
+        time = klu.time
+        row = {
+            "idx": klu.idx, "time_key": time2key(time), "time_auto": time.auto, "ts": time.ts,
+            DATA_FIELD.FIELD_OPEN: klu.open,
+            DATA_FIELD.FIELD_HIGH: klu.high,
+            DATA_FIELD.FIELD_LOW: klu.low,
+            DATA_FIELD.FIELD_CLOSE: klu.close,
+        }
+        metric_dict = klu.trade_info.metric
+        for metric in TRADE_INFO_LST:
+            value = metric_dict.get(metric)
+            row[metric] = np.nan if value is None else value
+        macd: Optional[CMACD_item] = getattr(klu, "macd", None)
+        if macd is not None:
+            row.update(zip(MACD_COLUMNS, (macd.fast_ema, macd.slow_ema, macd.DIF, macd.DEA, macd.macd)))
+        boll: Optional[BOLL_Metric] = getattr(klu, "boll", None)
+        if boll is not None:
+            row.update(zip(BOLL_COLUMNS, (boll.theta, boll.UP, boll.DOWN, boll.MID)))
+        if hasattr(klu, "rsi"):
+            row["rsi"] = klu.rsi
+        kdj: Optional[KDJ_Item] = getattr(klu, "kdj", None)
+        if kdj is not None:
+            row.update(zip(KDJ_COLUMNS, (kdj.k, kdj.d, kdj.j)))
+        for trend_type, trend_dict in klu.trend.items():
+            for T, value in trend_dict.items():
+                row[trend_column(trend_type, T)] = value
+        return row
+
+    def append(self, klu: CKLine_Unit) -> int:
+        '''
+        在 klu.set_metric 之后调用，把K线及其指标写入列，返回所在行号
+        '''
+        return self.extend([klu])
+
+    def extend(self, klu_lst: List[CKLine_Unit]) -> int:
+        '''
+        批量写入一批已经算好指标的K线，每列一次切片赋值，返回第一根所在的行号
+        '''
+        first_pos = self.__size
+        while first_pos + len(klu_lst) > self.__capacity:
+            self.__grow()
+        # 分块转换，避免一次为全部K线建临时字典
+        for begin in range(0, len(klu_lst), EXTEND_CHUNK):
+            row_lst = [self.__row(klu) for klu in klu_lst[begin:begin+EXTEND_CHUNK]]
+            pos = self.__size
+            name_dict = {}  # 按出现顺序合并各行的列名，保证 trend 等字典的键序稳定
+            for row in row_lst:
+                name_dict.update(row)
+            for name in name_dict:
+                if name not in self.__columns:
+                    self.__columns[name] = self.__new_column(np.float64)
+                    self.__index_trend(name)
+                self.__columns[name][pos:pos+len(row_lst)] = [row.get(name, np.nan) for row in row_lst]
+            self.__size += len(row_lst)
+        return first_pos
+
+    def value(self, name: str, pos: int) -> float:
+        return float(self.__columns[name][pos])
+
+    def values(self, name: str, begin: int, end: int) -> List[Optional[float]]:
+        '''
+        第 [begin, end] 行的值，成交量等缺失值（NaN）返回 None，与 CTradeInfo.metric 一致
+        '''
+        res = self.__columns[name][begin:end+1].tolist()
+        if name in TRADE_INFO_LST:
+            return [None if value != value else value for value in res]
+        return res
+
+    def time_at(self, pos: int) -> CTime:
+        cols = self.__columns
+        return key2time(cols["time_key"][pos], bool(cols["time_auto"][pos]), int(cols["ts"][pos]))
+
+    def trade_info_at(self, pos: int) -> CTradeInfo:
+        cols = self.__columns
+        return CTradeInfo({metric: float(cols[metric][pos]) for metric in TRADE_INFO_LST if not np.isnan(cols[metric][pos])})
+
+    def macd_at(self, pos: int) -> CMACD_item:
+        fast_ema, slow_ema, dif, dea = (float(self.__columns[name][pos]) for name in MACD_COLUMNS[:4])
+        return CMACD_item(fast_ema=fast_ema, slow_ema=slow_ema, DIF=dif, DEA=dea)
+
+    def boll_at(self, pos: int) -> BOLL_Metric:
+        cols = self.__columns
+        boll = BOLL_Metric(float(cols["boll_mid"][pos]), float(cols["boll_theta"][pos]))
+        boll.UP = float(cols["boll_up"][pos])
+        boll.DOWN = float(cols["boll_down"][pos])
+        return boll
+
+    def kdj_at(self, pos: int) -> KDJ_Item:
+        return KDJ_Item(*(float(self.__columns[name][pos]) for name in KDJ_COLUMNS))
+
+    def trend_at(self, pos: int) -> Dict[TREND_TYPE, Dict[int, float]]:
+        cols = self.__columns
+        return {
+            trend_type: {T: float(cols[name][pos]) for T, name in name_dict.items()}
+            for trend_type, name_dict in self.__trend_columns.items()
+        }
+
+    def get_klu(self, pos: int) -> CKLine_Unit:
+        '''
+        按位置生成一个独立的 CKLine_Unit，属性与原始K线一致
+        不包含 klc/pre/next/父子级别关系以及 demark 信息
+        '''
+        if pos < 0:
+            pos += self.__size
+        if not 0 <= pos < self.__size:
+            raise CChanException(f"kline store index {pos} out of range", ErrCode.PARA_ERROR)
+        cols = self.__columns
+        kl_dict = {
+            DATA_FIELD.FIELD_TIME: self.time_at(pos),
+            DATA_FIELD.FIELD_OPEN: float(cols[DATA_FIELD.FIELD_OPEN][pos]),
+            DATA_FIELD.FIELD_HIGH: float(cols[DATA_FIELD.FIELD_HIGH][pos]),
+            DATA_FIELD.FIELD_LOW: float(cols[DATA_FIELD.FIELD_LOW][pos]),
+            DATA_FIELD.FIELD_CLOSE: float(cols[DATA_FIELD.FIELD_CLOSE][pos]),
+        }
+        for metric in TRADE_INFO_LST:
+            value = cols[metric][pos]
+            if not np.isnan(value):
+                kl_dict[metric] = float(value)
+        klu = CKLine_Unit(kl_dict)
+        klu.set_idx(int(cols["idx"][pos]))
+
+        if "macd" in cols:
+            klu.macd = self.macd_at(pos)
+        if "boll_mid" in cols:
+            klu.boll = self.boll_at(pos)
+        if "rsi" in cols:
+            klu.rsi = float(cols["rsi"][pos])
+        if "kdj_k" in cols:
+            klu.kdj = self.kdj_at(pos)
+        klu.trend = self.trend_at(pos)
+        return klu
+
+    def klu_iter(self, begin: int = 0) -> Iterable[CKLine_Unit]:
+        for pos in range(begin, self.__size):
+            yield self.get_klu(pos)
+
+    def searchsorted(self, t: CTime, side="left") -> int:
+        # 按时间定位K线位置（时间戳单调递增）
+        return int(np.searchsorted(self["ts"], t.ts, side=side))
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray]) -> 'CKLine_Store':
+        '''
+        由已有的列（如快照中保存的 columns）生成，数据会复制一份
+        '''
+        size = len(columns["idx"])
+        new_obj = cls(size)
+        new_obj.__size = size
+        for name, col in columns.items():
+            new_col = new_obj.__new_column(col.dtype)
+            new_col[:size] = col
+            new_obj.__columns[name] = new_col
+            new_obj.__index_trend(name)
+        return new_obj
+
+    def copy(self) -> 'CKLine_Store':
+        new_obj = CKLine_Store(self.__capacity)
+        new_obj.__size = self.__size
+        new_obj.__columns = {name: col.copy() for name, col in self.__columns.items()}
+        new_obj.__trend_columns = {trend_type: dict(name_dict) for trend_type, name_dict in self.__trend_columns.items()}
+        return new_obj
+
+    def __deepcopy__(self, memo):
+        new_obj = self.copy()
+        memo[id(self)] = new_obj
+        return new_obj
+
@@ -1,9 +1,12 @@
 import copy
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple, Union
 
-from Common.CEnum import DATA_FIELD, TRADE_INFO_LST, TREND_TYPE
+import numpy as np
+
+from Common.CEnum import DATA_FIELD, TREND_TYPE
 from Common.ChanException import CChanException, ErrCode
-from Common.CTime import CTime
+from Common.CTime import CTime, minute_key
+from Common.func_util import copy_slots
 from Math.BOLL import BOLL_Metric, BollModel
 from Math.Demark import CDemarkEngine, CDemarkIndex
 from Math.KDJ import KDJ
@@ -15,6 +18,12 @@ from .TradeInfo import CTradeInfo
 
 
 class CKLine_Unit:
+    # macd/boll/rsi/kdj 为可选指标，只有配置了对应指标时才会赋值
+    __slots__ = (
+        "kl_type", "time", "close", "open", "high", "low", "trade_info", "demark", "sub_kl_list", "sup_kl", "__klc",
+        "trend", "limit_flag", "pre", "next", "__idx", "macd", "boll", "rsi", "kdj",
+    )
+
     def __init__(self, kl_dict, autofix=False):
         # _time, _close, _open, _high, _low, _extra_info={}
         self.kl_type = None
@@ -47,28 +56,18 @@ class CKLine_Unit:
         self.set_idx(-1)
 
     def __deepcopy__(self, memo):
-        _dict = {
-            DATA_FIELD.FIELD_TIME: self.time,
-            DATA_FIELD.FIELD_CLOSE: self.close,
-            DATA_FIELD.FIELD_OPEN: self.open,
-            DATA_FIELD.FIELD_HIGH: self.high,
-            DATA_FIELD.FIELD_LOW: self.low,
-        }
-        for metric in TRADE_INFO_LST:
-            if metric in self.trade_info.metric:
-                _dict[metric] = self.trade_info.metric[metric]
-        obj = CKLine_Unit(_dict)
-        obj.demark = copy.deepcopy(self.demark, memo)
-        obj.trend = copy.deepcopy(self.trend, memo)
-        obj.limit_flag = self.limit_flag
-        obj.macd = copy.deepcopy(self.macd, memo)
-        obj.boll = copy.deepcopy(self.boll, memo)
-        if hasattr(self, "rsi"):
-            obj.rsi = copy.deepcopy(self.rsi, memo)
-        if hasattr(self, "kdj"):
-            obj.kdj = copy.deepcopy(self.kdj, memo)
-        obj.set_idx(self.idx)
+        # time/macd/boll/rsi/kdj/trade_info 生成后不会再被修改，直接共享；只复制之后还会变化的部分
+        obj = CKLine_Unit.__new__(CKLine_Unit)
         memo[id(self)] = obj
+        copy_slots(self, obj)
+        obj.demark = copy.deepcopy(self.demark, memo) if self.demark.data else CDemarkIndex()
+        obj.trend = {trend_type: dict(trend_dict) for trend_type, trend_dict in self.trend.items()}
+        # K线之间以及与合并K线、父子级别的链接由 CKLine_List/CChan 的 __deepcopy__ 重新设置
+        obj.sub_kl_list = []
+        obj.sup_kl = None
+        obj.pre = None
+        obj.next = None
+        obj.__klc = None
         return obj
 
     @property
@@ -121,6 +120,14 @@ class CKLine_Unit:
         '''
         self.sup_kl = parent
 
+    def sub_klu_idx_range(self) -> Optional[Tuple[int, int]]:
+        '''
+        子K线在次级别中的 idx 闭区间（子K线按时间连续挂在父K线下），没有子K线时为 None
+        '''
+        if not self.sub_kl_list:
+            return None
+        return self.sub_kl_list[0].idx, self.sub_kl_list[-1].idx
+
     def get_children(self):
         '''
         获取子K线列表
@@ -166,18 +173,16 @@ class CKLine_Unit:
         assert self.sup_kl is not None
         return self.sup_kl.klc
 
-    def include_sub_lv_time(self, sub_lv_t: str) -> bool:
+    def include_sub_lv_time(self, sub_lv_t: Union[str, CTime]) -> bool:
         '''
-        判断当前K线是否包含子级别K线
+        判断当前K线是否包含子级别K线，sub_lv_t 为 CTime 或 to_str() 格式的时间，按 年月日时分 整数比较
         '''
-        if self.time.to_str() == sub_lv_t:
+        return self.include_minute_key(sub_lv_t.to_minute_key() if isinstance(sub_lv_t, CTime) else minute_key(sub_lv_t))
+
+    def include_minute_key(self, key: int) -> bool:
+        if self.time.to_minute_key() == key:
             return True
-        for sub_klu in self.sub_kl_list:
-            if sub_klu.time.to_str() == sub_lv_t:
-                return True
-            if sub_klu.include_sub_lv_time(sub_lv_t):
-                return True
-        return False
+        return any(sub_klu.include_minute_key(key) for sub_klu in self.sub_kl_list)
 
     def set_pre_klu(self, pre_klu: Optional['CKLine_Unit']):
         # 设置当前K线的前一个K线
@@ -189,4 +194,38 @@ class CKLine_Unit:
     def Info(self):
         # 获取当前K线的信息
         str = (f"{self.kl_type} - kid:{self.idx:05d}:{self.time} open={self.open:.2f} close={self.close:.2f} high={self.high:.2f} low={self.low:.2f}")
-        return str
\ No newline at end of file
+        return str
+
+
+def set_metric_batch(klu_lst: List[CKLine_Unit], metric_model_lst: list) -> None:
+    '''
+    一次性计算一批K线的指标，结果与逐根调用 set_metric 一致
+    metric_model_lst 中的模型都需要支持 add_batch
+    '''
+    if not klu_lst:
+        return
+    if len(klu_lst) == 1:
+        # CChan.feed 每次只有一根，整段计算的固定开销比逐根递推大
+        klu_lst[0].set_metric(metric_model_lst)
+        return
+    close = np.array([klu.close for klu in klu_lst], dtype=np.float64)
+    for metric_model in metric_model_lst:
+        if isinstance(metric_model, CMACD):
+            for klu, macd in zip(klu_lst, metric_model.add_batch(close)):
+                klu.macd = macd
+        elif isinstance(metric_model, CTrendModel):
+            for klu, value in zip(klu_lst, metric_model.add_batch(close)):
+                klu.trend.setdefault(metric_model.type, {})[metric_model.T] = value
+        elif isinstance(metric_model, BollModel):
+            for klu, boll in zip(klu_lst, metric_model.add_batch(close)):
+                klu.boll = boll
+        elif isinstance(metric_model, RSI):
+            for klu, rsi in zip(klu_lst, metric_model.add_batch(close)):
+                klu.rsi = rsi
+        elif isinstance(metric_model, KDJ):
+            high = np.array([klu.high for klu in klu_lst], dtype=np.float64)
+            low = np.array([klu.low for klu in klu_lst], dtype=np.float64)
+            for klu, kdj in zip(klu_lst, metric_model.add_batch(high, low, close)):
+                klu.kdj = kdj
+        else:
+            raise CChanException(f"metric model {type(metric_model)} not support batch calculation", ErrCode.PARA_ERROR)
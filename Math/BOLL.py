@@ -1,4 +1,9 @@
 import math
+from typing import List
+
+import numpy as np
+
+from .Rolling import CRollingSum
 
 
 def _truncate(x):
@@ -17,12 +22,21 @@ class BollModel:
     def __init__(self, N=20):
         assert N > 1
         self.N = N
-        self.arr = []
+        self.rolling = CRollingSum(N)  # 滑动窗口均值/方差，O(1)
+
+    def get_state(self) -> dict:
+        return self.rolling.get_state()
+
+    def set_state(self, state: dict):
+        self.rolling.set_state(state)
 
     def add(self, value) -> BOLL_Metric:
-        self.arr.append(value)
-        if len(self.arr) > self.N:
-            self.arr = self.arr[-self.N:]
-        ma = sum(self.arr)/len(self.arr)
-        theta = math.sqrt(sum((x-ma)**2 for x in self.arr) / len(self.arr))
-        return BOLL_Metric(ma, theta)
+        ma, var = self.rolling.add(value)
+        return BOLL_Metric(ma, math.sqrt(var))
+
+    def add_batch(self, values: np.ndarray) -> List[BOLL_Metric]:
+        '''
+        批量计算，结果与逐根 add 完全一致
+        '''
+        ma, var = self.rolling.add_batch(values)
+        return [BOLL_Metric(_ma, _theta) for _ma, _theta in zip(ma.tolist(), np.sqrt(var).tolist())]
@@ -1,6 +1,6 @@
 import copy
 from dataclasses import dataclass
-from typing import List, Literal, Optional, TypedDict
+from typing import Dict, List, Literal, Optional, TypedDict
 
 from Common.CEnum import BI_DIR
 
@@ -53,10 +53,19 @@ class CDemarkCountdown:
         self.TDST_peak = TDST_peak
         self.finish = False
 
+    @classmethod
+    def restore(cls, _dir: BI_DIR, kl_list: List[C_KL], idx: int, TDST_peak: float, finish: bool) -> 'CDemarkCountdown':
+        # 快照恢复用：直接设置状态
+        obj = cls.__new__(cls)
+        obj.dir, obj.kl_list, obj.idx, obj.TDST_peak, obj.finish = _dir, kl_list, idx, TDST_peak, finish
+        return obj
+
     def update(self, kl: C_KL) -> bool:
         if self.finish:
             return False
         self.kl_list.append(kl)
+        # 只需要最近 COUNTDOWN_BIAS+1 根用于比较
+        del self.kl_list[:-CDemarkEngine.COUNTDOWN_BIAS-1]
         if len(self.kl_list) <= CDemarkEngine.COUNTDOWN_BIAS:
             return False
         if self.idx == CDemarkEngine.MAX_COUNTDOWN:
@@ -87,6 +96,24 @@ class CDemarkSetup:
 
         self.last_demark_index = CDemarkIndex()  # 缓存用
 
+    @classmethod
+    def restore(
+        cls,
+        _dir: BI_DIR,
+        kl_list: List[C_KL],
+        pre_kl: C_KL,
+        setup_finished: bool,
+        idx: int,
+        TDST_peak: Optional[float],
+        countdown: Optional[CDemarkCountdown],
+    ) -> 'CDemarkSetup':
+        # 快照恢复用：直接设置状态，不做 __init__ 中的检查和拷贝；last_demark_index 每次 update 都会重置，不需要恢复
+        obj = cls.__new__(cls)
+        obj.dir, obj.kl_list, obj.pre_kl = _dir, kl_list, pre_kl
+        obj.countdown, obj.setup_finished, obj.idx, obj.TDST_peak = countdown, setup_finished, idx, TDST_peak
+        obj.last_demark_index = CDemarkIndex()
+        return obj
+
     def update(self, kl: C_KL) -> CDemarkIndex:
         self.last_demark_index = CDemarkIndex()
         if not self.setup_finished:
@@ -156,8 +183,22 @@ class CDemarkEngine:
         self.kl_lst: List[C_KL] = []
         self.series: List[CDemarkSetup] = []
 
+    def get_state(self, series_id: Dict[int, int]) -> dict:
+        # series_id: id(序列) -> 编号，序列本身由调用方和K线上的 demark 信息一起保存
+        return {
+            "kl_lst": [[kl.idx, kl.close, kl.high, kl.low] for kl in self.kl_lst],
+            "series": [series_id[id(series)] for series in self.series],
+        }
+
+    def set_state(self, state: dict, series_lst: List[CDemarkSetup]):
+        self.kl_lst = [C_KL(*kl) for kl in state["kl_lst"]]
+        self.series = [series_lst[i] for i in state["series"]]
+
     def update(self, idx: int, close: float, high: float, low: float) -> CDemarkIndex:
         self.kl_lst.append(C_KL(idx, close, high, low))
+        if len(self.kl_lst) > CDemarkEngine.SETUP_BIAS+2:
+            # 只需要最近 SETUP_BIAS+2 根用于 setup 比较
+            del self.kl_lst[0]
         if len(self.kl_lst) <= CDemarkEngine.SETUP_BIAS+1:
             return CDemarkIndex()
 
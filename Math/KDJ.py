@@ -1,3 +1,10 @@
+from typing import List
+
+import numpy as np
+
+from .Rolling import CRollingExtreme
+
+
 class KDJ_Item:
     def __init__(self, k, d, j):
         self.k = k
@@ -8,20 +15,27 @@ class KDJ_Item:
 class KDJ:
     def __init__(self, period: int = 9):
         super(KDJ, self).__init__()
-        self.arr = []
         self.period = period
+        # 窗口内最高价/最低价，单调队列 O(1)
+        self.high_max = CRollingExtreme(period, is_max=True)
+        self.low_min = CRollingExtreme(period, is_max=False)
         self.pre_kdj = KDJ_Item(50, 50, 50)
 
+    def get_state(self) -> dict:
+        return {
+            "pre_kdj": [self.pre_kdj.k, self.pre_kdj.d, self.pre_kdj.j],
+            "high_max": self.high_max.get_state(),
+            "low_min": self.low_min.get_state(),
+        }
+
+    def set_state(self, state: dict):
+        self.pre_kdj = KDJ_Item(*state["pre_kdj"])
+        self.high_max.set_state(state["high_max"])
+        self.low_min.set_state(state["low_min"])
+
     def add(self, high, low, close) -> KDJ_Item:
-        self.arr.append({
-            'high': high,
-            'low': low,
-        })
-        if len(self.arr) > self.period:
-            self.arr.pop(0)
-
-        hn = max([x['high'] for x in self.arr])
-        ln = min([x['low'] for x in self.arr])
+        hn = self.high_max.add(high)
+        ln = self.low_min.add(low)
         cn = close
         rsv = 100 * (cn - ln) / (hn - ln) if hn != ln else 0.0
 
@@ -32,3 +46,21 @@ class KDJ:
         self.pre_kdj = cur_kdj
 
         return cur_kdj
+
+    def add_batch(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> List[KDJ_Item]:
+        '''
+        批量计算，结果与逐根 add 完全一致；窗口最高/最低价用 numpy 计算，K/D 依赖上一根的值，仍逐根递推
+        '''
+        if len(close) == 0:
+            return []
+        hn = self.high_max.add_batch(high)
+        ln = self.low_min.add_batch(low)
+        rsv = np.where(hn != ln, 100 * (close - ln) / np.where(hn != ln, hn - ln, 1.0), 0.0)
+        res: List[KDJ_Item] = []
+        pre_k, pre_d = self.pre_kdj.k, self.pre_kdj.d
+        for _rsv in rsv.tolist():
+            pre_k = 2 / 3 * pre_k + 1 / 3 * _rsv
+            pre_d = 2 / 3 * pre_d + 1 / 3 * pre_k
+            res.append(KDJ_Item(pre_k, pre_d, 3 * pre_k - 2 * pre_d))
+        self.pre_kdj = res[-1]
+        return res
@@ -1,4 +1,7 @@
-from typing import List
+from collections import deque
+from typing import Deque, List, Optional
+
+import numpy as np
 
 
 class CMACD_item:
@@ -9,21 +12,67 @@ class CMACD_item:
         self.DEA = DEA
         self.macd = 2 * (DIF - DEA)
 
+    def to_list(self) -> List[float]:
+        return [self.fast_ema, self.slow_ema, self.DIF, self.DEA]
+
 
 class CMACD:
-    def __init__(self, fastperiod=12, slowperiod=26, signalperiod=9):
-        self.macd_info: List[CMACD_item] = []
+    def __init__(self, fastperiod=12, slowperiod=26, signalperiod=9, history_len: Optional[int] = 0):
+        # 历史 MACD 序列，只用于外部查看，history_len 为 None 时全部保留
+        self.macd_info: Deque[CMACD_item] = deque(maxlen=history_len)
+        # 计算所需的状态：最近一根的 MACD
+        self.last: Optional[CMACD_item] = None
         self.fastperiod = fastperiod
         self.slowperiod = slowperiod
         self.signalperiod = signalperiod
 
+    def get_state(self) -> dict:
+        # 继续计算所需的状态以及历史序列，只包含 json 可以保存的基本类型
+        return {
+            "last": None if self.last is None else self.last.to_list(),
+            "history": [item.to_list() for item in self.macd_info],
+        }
+
+    def set_state(self, state: dict):
+        self.last = None if state["last"] is None else CMACD_item(*state["last"])
+        self.macd_info.clear()
+        self.macd_info.extend(CMACD_item(*item) for item in state["history"])
+
     def add(self, value) -> CMACD_item:
-        if not self.macd_info:
-            self.macd_info.append(CMACD_item(fast_ema=value, slow_ema=value, DIF=0, DEA=0))
+        if self.last is None:
+            self.last = CMACD_item(fast_ema=value, slow_ema=value, DIF=0, DEA=0)
         else:
-            _fast_ema = (2 * value + (self.fastperiod - 1) * self.macd_info[-1].fast_ema) / (self.fastperiod + 1)
-            _slow_ema = (2 * value + (self.slowperiod - 1) * self.macd_info[-1].slow_ema) / (self.slowperiod + 1)
+            _fast_ema = (2 * value + (self.fastperiod - 1) * self.last.fast_ema) / (self.fastperiod + 1)
+            _slow_ema = (2 * value + (self.slowperiod - 1) * self.last.slow_ema) / (self.slowperiod + 1)
             _dif = _fast_ema - _slow_ema
-            _dea = (2 * _dif + (self.signalperiod - 1) * self.macd_info[-1].DEA) / (self.signalperiod + 1)
-            self.macd_info.append(CMACD_item(fast_ema=_fast_ema, slow_ema=_slow_ema, DIF=_dif, DEA=_dea))
-        return self.macd_info[-1]
+            _dea = (2 * _dif + (self.signalperiod - 1) * self.last.DEA) / (self.signalperiod + 1)
+            self.last = CMACD_item(fast_ema=_fast_ema, slow_ema=_slow_ema, DIF=_dif, DEA=_dea)
+        self.macd_info.append(self.last)
+        return self.last
+
+    def add_batch(self, values: np.ndarray) -> List[CMACD_item]:
+        '''
+        批量计算，结果与逐根 add 完全一致；EMA 依赖上一根的值，这里仍逐根递推，只是省去逐根调用 add 的开销
+        '''
+        res: List[CMACD_item] = []
+        if len(values) == 0:
+            return res
+        values = values.tolist()
+        if self.last is None:
+            res.append(CMACD_item(fast_ema=values[0], slow_ema=values[0], DIF=0, DEA=0))
+            values = values[1:]
+        else:
+            res.append(self.last)
+        fast_ema, slow_ema, dea = res[0].fast_ema, res[0].slow_ema, res[0].DEA
+        fastperiod, slowperiod, signalperiod = self.fastperiod, self.slowperiod, self.signalperiod
+        for value in values:
+            fast_ema = (2 * value + (fastperiod - 1) * fast_ema) / (fastperiod + 1)
+            slow_ema = (2 * value + (slowperiod - 1) * slow_ema) / (slowperiod + 1)
+            dif = fast_ema - slow_ema
+            dea = (2 * dif + (signalperiod - 1) * dea) / (signalperiod + 1)
+            res.append(CMACD_item(fast_ema=fast_ema, slow_ema=slow_ema, DIF=dif, DEA=dea))
+        if self.last is res[0]:
+            res = res[1:]
+        self.last = res[-1]
+        self.macd_info.extend(res)
+        return res
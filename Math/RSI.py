@@ -1,29 +1,115 @@
+from collections import deque
+from typing import Deque, List, Optional
+
+import numpy as np
+
+
 class RSI:
-    def __init__(self, period: int = 14):
+    def __init__(self, period: int = 14, history_len: Optional[int] = 0):
         super(RSI, self).__init__()
-        self.close_arr = []
         self.period = period
-        self.diff = []
-        self.up = []
-        self.down = []
+        # 历史序列，只用于外部查看，history_len 为 None 时全部保留
+        self.close_arr: Deque[float] = deque(maxlen=history_len)
+        self.diff: Deque[float] = deque(maxlen=history_len)
+        self.up: Deque[float] = deque(maxlen=history_len)
+        self.down: Deque[float] = deque(maxlen=history_len)
+        # 计算所需的状态
+        self.last_close: Optional[float] = None
+        self.diff_cnt = 0
+        self.up_sum = 0.0  # 前 period-1 个差值中正差值之和
+        self.down_sum = 0.0  # 前 period-1 个差值中负差值绝对值之和
+        self.cur_up = 0.0
+        self.cur_down = 0.0
+
+    def get_state(self) -> dict:
+        # 继续计算所需的状态以及历史序列，只包含 json 可以保存的基本类型
+        return {
+            "last_close": self.last_close, "diff_cnt": self.diff_cnt, "up_sum": self.up_sum, "down_sum": self.down_sum,
+            "cur_up": self.cur_up, "cur_down": self.cur_down,
+            "close_arr": list(self.close_arr), "diff": list(self.diff), "up": list(self.up), "down": list(self.down),
+        }
+
+    def set_state(self, state: dict):
+        self.last_close, self.diff_cnt = state["last_close"], state["diff_cnt"]
+        self.up_sum, self.down_sum = state["up_sum"], state["down_sum"]
+        self.cur_up, self.cur_down = state["cur_up"], state["cur_down"]
+        for name in ("close_arr", "diff", "up", "down"):
+            history: Deque[float] = getattr(self, name)
+            history.clear()
+            history.extend(state[name])
 
     def add(self, close):
         self.close_arr.append(close)
-        if len(self.close_arr) == 1:
+        if self.last_close is None:
+            self.last_close = close
             return 50.0
-        self.diff.append(self.close_arr[-1] - self.close_arr[-2])
-        if len(self.diff) < self.period:
-            self.up.append(sum(x for x in self.diff if x > 0)/self.period)
-            self.down.append(sum(-x for x in self.diff if x < 0)/self.period)
+        diff = close - self.last_close
+        self.last_close = close
+        self.diff.append(diff)
+        self.diff_cnt += 1
+        if self.diff_cnt < self.period:
+            if diff > 0:
+                self.up_sum = self.up_sum + diff
+            elif diff < 0:
+                self.down_sum = self.down_sum + -diff
+            self.cur_up = self.up_sum/self.period
+            self.cur_down = self.down_sum/self.period
         else:
-            if self.diff[-1] > 0:
-                upval = self.diff[-1]
+            if diff > 0:
+                upval = diff
                 downval = 0.0
             else:
                 upval = 0.0
-                downval = -self.diff[-1]
-            self.up.append((self.up[-1] * (self.period - 1) + upval) / self.period)
-            self.down.append((self.down[-1] * (self.period - 1) + downval) / self.period)
-        rs = self.up[-1] / self.down[-1] if self.down[-1] != 0 else 0
+                downval = -diff
+            self.cur_up = (self.cur_up * (self.period - 1) + upval) / self.period
+            self.cur_down = (self.cur_down * (self.period - 1) + downval) / self.period
+        self.up.append(self.cur_up)
+        self.down.append(self.cur_down)
+        rs = self.cur_up / self.cur_down if self.cur_down != 0 else 0
         rsi = 100.0 - 100.0 / (1.0 + rs)
         return rsi
+
+    def add_batch(self, close: np.ndarray) -> List[float]:
+        '''
+        批量计算，结果与逐根 add 完全一致；前 period-1 个差值用 cumsum，之后的平滑依赖上一根的值，仍逐根递推
+        '''
+        res: List[float] = []
+        close_lst = close.tolist()
+        self.close_arr.extend(close_lst)
+        if close_lst and self.last_close is None:
+            self.last_close = close_lst[0]
+            res.append(50.0)
+            close_lst = close_lst[1:]
+        if not close_lst:
+            return res
+        diff = np.diff(np.asarray([self.last_close] + close_lst, dtype=np.float64))
+        self.last_close = close_lst[-1]
+        self.diff.extend(diff.tolist())
+        # 前 period-1 个差值：正/负差值累加后除以 period，cumsum 与逐根累加顺序一致
+        warm_cnt = min(max(self.period - 1 - self.diff_cnt, 0), len(diff))
+        self.diff_cnt += len(diff)
+        up_lst: List[float] = []
+        down_lst: List[float] = []
+        if warm_cnt:
+            warm = diff[:warm_cnt]
+            up_sum = np.cumsum(np.concatenate([[self.up_sum], np.where(warm > 0, warm, 0.0)]))[1:]
+            down_sum = np.cumsum(np.concatenate([[self.down_sum], np.where(warm < 0, -warm, 0.0)]))[1:]
+            self.up_sum, self.down_sum = float(up_sum[-1]), float(down_sum[-1])
+            up_lst = (up_sum / self.period).tolist()
+            down_lst = (down_sum / self.period).tolist()
+            self.cur_up, self.cur_down = up_lst[-1], down_lst[-1]
+        period = self.period
+        cur_up, cur_down = self.cur_up, self.cur_down
+        for d in diff[warm_cnt:].tolist():
+            upval, downval = (d, 0.0) if d > 0 else (0.0, -d)
+            cur_up = (cur_up * (period - 1) + upval) / period
+            cur_down = (cur_down * (period - 1) + downval) / period
+            up_lst.append(cur_up)
+            down_lst.append(cur_down)
+        self.cur_up, self.cur_down = cur_up, cur_down
+        self.up.extend(up_lst)
+        self.down.extend(down_lst)
+        for up, down in zip(up_lst, down_lst):
+            rs = up / down if down != 0 else 0
+            res.append(100.0 - 100.0 / (1.0 + rs))
+        return res
@@ -0,0 +1,157 @@
+from typing import List
+
+import numpy as np
+
+
+class CGrowArray:
+    '''
+    可追加的 numpy 数组，容量按倍数扩展
+    '''
+    def __init__(self, dtype=np.float64, capacity: int = 1024):
+        self.__size = 0
+        self.__buf = np.zeros(max(capacity, 16), dtype=dtype)
+
+    def __len__(self):
+        return self.__size
+
+    def __reserve(self, size: int):
+        if size <= len(self.__buf):
+            return
+        new_buf = np.zeros(max(size, 2*len(self.__buf)), dtype=self.__buf.dtype)
+        new_buf[:self.__size] = self.__buf[:self.__size]
+        self.__buf = new_buf
+
+    def append(self, value):
+        self.__reserve(self.__size+1)
+        self.__buf[self.__size] = value
+        self.__size += 1
+
+    def extend(self, values: np.ndarray):
+        self.__reserve(self.__size+len(values))
+        self.__buf[self.__size:self.__size+len(values)] = values
+        self.__size += len(values)
+
+    def __getitem__(self, idx):
+        return self.__buf[:self.__size][idx]
+
+    @property
+    def array(self) -> np.ndarray:
+        return self.__buf[:self.__size]
+
+
+class CPrefixSum:
+    '''
+    前缀和，区间和查询 O(1)
+    '''
+    def __init__(self):
+        self.prefix = CGrowArray()
+        self.prefix.append(0.0)
+
+    def __len__(self):
+        return len(self.prefix) - 1
+
+    def append(self, value: float):
+        self.prefix.append(self.prefix[-1] + value)
+
+    def extend(self, values: np.ndarray):
+        if len(values):
+            self.prefix.extend(np.cumsum(np.concatenate([[self.prefix[-1]], values]))[1:])
+
+    def query(self, begin: int, end: int) -> float:
+        # [begin, end] 闭区间
+        return float(self.prefix[end+1] - self.prefix[begin])
+
+
+class CRangeExtreme:
+    '''
+    区间最大/最小值查询
+    每 BLOCK 个元素一块，块极值之上建稀疏表（ST 表）；
+    查询 = 首尾不完整块直接扫描 + 中间完整块 ST 表 O(1)，追加均摊 O(1)，内存 O(n + n/BLOCK*log n)
+    '''
+    BLOCK = 64
+
+    def __init__(self, is_max: bool):
+        self.is_max = is_max
+        self.op = max if is_max else min
+        self.values = CGrowArray()
+        self.sparse: List[List[float]] = [[]]  # sparse[k][i]: 第 i~i+2^k-1 块的极值
+
+    def __len__(self):
+        return len(self.values)
+
+    def __add_block(self):
+        # 最后一个完整块加入 ST 表
+        blk = len(self.values) // self.BLOCK - 1
+        arr = self.values.array[blk*self.BLOCK:(blk+1)*self.BLOCK]
+        self.sparse[0].append(float(arr.max() if self.is_max else arr.min()))
+        k = 1
+        while (1 << k) <= blk+1:
+            if len(self.sparse) == k:
+                self.sparse.append([])
+            lv = self.sparse[k-1]
+            self.sparse[k].append(self.op(lv[blk-(1 << k)+1], lv[blk-(1 << (k-1))+1]))
+            k += 1
+
+    def append(self, value: float):
+        self.values.append(value)
+        if len(self.values) % self.BLOCK == 0:
+            self.__add_block()
+
+    def extend(self, values: np.ndarray):
+        while len(values):
+            n = self.BLOCK - len(self.values) % self.BLOCK
+            self.values.extend(values[:n])
+            if len(self.values) % self.BLOCK == 0:
+                self.__add_block()
+            values = values[n:]
+
+    def __scan(self, begin: int, end: int) -> float:
+        arr = self.values.array[begin:end+1]
+        return float(arr.max() if self.is_max else arr.min())
+
+    def query(self, begin: int, end: int) -> float:
+        # [begin, end] 闭区间
+        blk_begin, blk_end = begin // self.BLOCK + 1, end // self.BLOCK - 1
+        if blk_begin > blk_end:
+            return self.__scan(begin, end)
+        k = (blk_end - blk_begin + 1).bit_length() - 1
+        lv = self.sparse[k]
+        return self.op(
+            self.__scan(begin, blk_begin*self.BLOCK-1),
+            lv[blk_begin],
+            lv[blk_end-(1 << k)+1],
+            self.__scan((blk_end+1)*self.BLOCK, end),
+        )
+
+
+class CSignRun:
+    '''
+    记录每个位置所在的同号连续区间起点（0 单独成段），用于 MACD 半面积计算
+    run_start 单调不减，可二分找到区间终点
+    '''
+    def __init__(self):
+        self.run_start = CGrowArray(dtype=np.int64)
+        self.last_sign = 0
+
+    def __len__(self):
+        return len(self.run_start)
+
+    def append(self, value: float):
+        sign = (value > 0) - (value < 0)
+        n = len(self.run_start)
+        if n and sign != 0 and sign == self.last_sign:
+            self.run_start.append(self.run_start[-1])
+        else:
+            self.run_start.append(n)
+        self.last_sign = sign
+
+    def extend(self, values: np.ndarray):
+        for value in values.tolist():
+            self.append(value)
+
+    def run_begin(self, idx: int) -> int:
+        return int(self.run_start[idx])
+
+    def run_end(self, idx: int) -> int:
+        arr = self.run_start.array
+        return int(np.searchsorted(arr, arr[idx], side="right")) - 1
@@ -0,0 +1,182 @@
+from collections import deque
+from typing import Deque, List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def rolling_window(hist: List[float], values: np.ndarray, T: int, fill: float) -> np.ndarray:
+    '''
+    返回 shape=(len(values), T) 的滑动窗口视图，第 i 行最后一个元素为 values[i]
+    hist 为已经 add 过的历史值，窗口不足 T 时左侧用 fill 补齐
+    '''
+    n_hist = min(len(hist), T-1)
+    pad = np.full(T-1-n_hist, fill, dtype=np.float64)
+    ext = np.concatenate([pad, np.asarray(hist[len(hist)-n_hist:], dtype=np.float64), values])
+    return sliding_window_view(ext, T)
+
+
+class CRollingSum:
+    '''
+    定长窗口的滑动均值/方差，逐根 add 均摊 O(1)，add_batch 用 numpy 整段计算，两者结果完全一致
+    - 以参考值 K 平移 d = x - K，分段维护 d 与 d² 的前缀和（段内依次累加，与 np.cumsum 的累加顺序相同）
+      窗口和 = 两个前缀和之差，均值 = K + 窗口和 / 个数，M2 = 窗口平方和 - 窗口和² / 个数
+    - 新的一段以当前值为 K，用窗口内之前的 T-1 个值重新计算前缀和：
+        - 每段最多 resync_period（不小于 2T，均摊仍为 O(1)）个值，舍入误差不随时间累积
+        - M2 比段内出现过的最大 d² 小 CANCEL_RATIO 倍以上时（窗口相对 K 变平，做差会损失精度），从当前值开始新的一段；窗口内的值完全相同时方差为 0
+    - add_batch 对每一段用 cumsum 一次算出所有窗口，再找出第一个需要新开一段的位置，逐根 add 在同样的位置新开一段
+    '''
+    RESYNC = 256
+    CANCEL_RATIO = 1e-3
+
+    def __init__(self, T: int):
+        self.T = T
+        self.window: Deque[float] = deque(maxlen=T-1)  # 最近 T-1 个值，新开一段时使用
+        self.pre_sum: Deque[float] = deque(maxlen=T)  # 当前段 d 的前缀和，最近 T 个
+        self.pre_sqr: Deque[float] = deque(maxlen=T)  # 当前段 d² 的前缀和，最近 T 个
+        self.K = 0.0
+        self.peak = 0.0  # 当前段出现过的最大 d²
+        self.block_len = 0  # 当前段已经 add 的个数（不含重新计算的窗口内历史值）
+        self.cnt = 0  # 窗口内的个数
+        self.resync_period = max(2*T, self.RESYNC)
+
+    def __new_block(self, value: float):
+        self.K = value
+        d = np.asarray(self.window, dtype=np.float64) - value
+        sqr = d * d
+        self.pre_sum = deque(np.cumsum(np.concatenate([[0.0], d])).tolist(), maxlen=self.T)
+        self.pre_sqr = deque(np.cumsum(np.concatenate([[0.0], sqr])).tolist(), maxlen=self.T)
+        self.peak = float(sqr.max()) if len(sqr) else 0.0
+        self.block_len = 0
+
+    def add(self, value: float) -> Tuple[float, float]:
+        '''
+        返回 (均值, 方差)
+        '''
+        if not self.pre_sum or self.block_len == self.resync_period:
+            self.__new_block(value)
+        n = min(self.cnt + 1, self.T)
+        while True:
+            d = value - self.K
+            sqr = d * d
+            cur_sum = self.pre_sum[-1] + d
+            cur_sqr = self.pre_sqr[-1] + sqr
+            w_sum = cur_sum - self.pre_sum[-n]
+            m2 = cur_sqr - self.pre_sqr[-n] - w_sum * w_sum / n
+            peak = max(self.peak, sqr)
+            if self.block_len == 0 or not m2 < self.CANCEL_RATIO * peak:
+                break
+            self.__new_block(value)
+        self.pre_sum.append(cur_sum)
+        self.pre_sqr.append(cur_sqr)
+        self.peak = peak
+        self.block_len += 1
+        self.cnt = n
+        self.window.append(value)
+        var = m2 / n
+        return self.K + w_sum / n, (var if var > 0 else 0.0)
+
+    def add_batch(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        返回 (均值数组, 方差数组)
+        '''
+        values = np.asarray(values, dtype=np.float64)
+        mean = np.empty(len(values))
+        var = np.empty(len(values))
+        pos = 0
+        while pos < len(values):
+            if not self.pre_sum or self.block_len == self.resync_period:
+                self.__new_block(float(values[pos]))
+            chunk = values[pos:pos+self.resync_period-self.block_len]
+            d = chunk - self.K
+            sqr = d * d
+            cur_sum = np.cumsum(np.concatenate([[self.pre_sum[-1]], d]))[1:]
+            cur_sqr = np.cumsum(np.concatenate([[self.pre_sqr[-1]], sqr]))[1:]
+            # 第 i 个值的窗口从段内前缀和的第 len(pre_sum)+i-n 项开始
+            n = np.minimum(self.cnt + 1 + np.arange(len(chunk)), self.T)
+            lag = len(self.pre_sum) + np.arange(len(chunk)) - n
+            w_sum = cur_sum - np.concatenate([self.pre_sum, cur_sum])[lag]
+            m2 = cur_sqr - np.concatenate([self.pre_sqr, cur_sqr])[lag] - w_sum * w_sum / n
+            peak = np.maximum.accumulate(np.concatenate([[self.peak], sqr]))[1:]
+            cancel = m2 < self.CANCEL_RATIO * peak
+            if self.block_len == 0:
+                cancel[0] = False
+            cut = int(np.argmax(cancel)) if cancel.any() else len(chunk)
+            if cut:
+                mean[pos:pos+cut] = self.K + w_sum[:cut] / n[:cut]
+                _var = m2[:cut] / n[:cut]
+                var[pos:pos+cut] = np.where(_var > 0, _var, 0.0)
+                self.pre_sum.extend(cur_sum[:cut].tolist())
+                self.pre_sqr.extend(cur_sqr[:cut].tolist())
+                self.peak = float(peak[cut-1])
+                self.block_len += cut
+                self.cnt = int(n[cut-1])
+                self.window.extend(chunk[:cut].tolist())
+            pos += cut
+            if cut < len(chunk):
+                self.__new_block(float(values[pos]))
+        return mean, var
+
+    def get_state(self) -> dict:
+        # 继续计算所需的全部状态，只包含 json 可以保存的基本类型
+        return {
+            "window": list(self.window), "pre_sum": list(self.pre_sum), "pre_sqr": list(self.pre_sqr),
+            "K": self.K, "peak": self.peak, "block_len": self.block_len, "cnt": self.cnt,
+        }
+
+    def set_state(self, state: dict):
+        self.window = deque(state["window"], maxlen=self.T-1)
+        self.pre_sum = deque(state["pre_sum"], maxlen=self.T)
+        self.pre_sqr = deque(state["pre_sqr"], maxlen=self.T)
+        self.K, self.peak = state["K"], state["peak"]
+        self.block_len, self.cnt = state["block_len"], state["cnt"]
+
+
+class CRollingExtreme:
+    '''
+    定长窗口的滑动最大/最小值，单调队列实现，每次 add 均摊 O(1)
+    '''
+    def __init__(self, T: int, is_max: bool):
+        self.T = T
+        self.is_max = is_max
+        self.arr: Deque[float] = deque(maxlen=T)  # 原始窗口值
+        self.queue: Deque[Tuple[int, float]] = deque()  # (序号, 值)，值单调
+        self.add_cnt = 0
+
+    def __push(self, value: float):
+        self.add_cnt += 1
+        if self.is_max:
+            while self.queue and self.queue[-1][1] <= value:
+                self.queue.pop()
+        else:
+            while self.queue and self.queue[-1][1] >= value:
+                self.queue.pop()
+        self.queue.append((self.add_cnt, value))
+        if self.queue[0][0] <= self.add_cnt - self.T:
+            self.queue.popleft()
+
+    def get_state(self) -> dict:
+        return {"arr": list(self.arr), "queue": [list(item) for item in self.queue], "add_cnt": self.add_cnt}
+
+    def set_state(self, state: dict):
+        self.arr = deque(state["arr"], maxlen=self.T)
+        self.queue = deque((cnt, value) for cnt, value in state["queue"])
+        self.add_cnt = state["add_cnt"]
+
+    def add(self, value: float) -> float:
+        self.arr.append(value)
+        self.__push(value)
+        return self.queue[0][1]
+
+    def add_batch(self, values: np.ndarray) -> np.ndarray:
+        if len(values) == 0:
+            return np.zeros(0)
+        window = rolling_window(list(self.arr), values, self.T, -np.inf if self.is_max else np.inf)
+        res = window.max(axis=1) if self.is_max else window.min(axis=1)
+        # 用最后 T 个值重建单调队列
+        self.arr.extend(values.tolist())
+        self.queue.clear()
+        self.add_cnt += len(values) - len(self.arr)
+        for value in self.arr:
+            self.__push(value)
+        return res
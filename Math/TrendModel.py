@@ -1,22 +1,40 @@
+from typing import List
+
+import numpy as np
+
 from Common.CEnum import TREND_TYPE
 from Common.ChanException import CChanException, ErrCode
 
+from .Rolling import CRollingExtreme, CRollingSum
+
 
 class CTrendModel:
     def __init__(self, trend_type: TREND_TYPE, T: int):
         self.T = T
-        self.arr = []
         self.type = trend_type
-
-    def add(self, value) -> float:
-        self.arr.append(value)
-        if len(self.arr) > self.T:
-            self.arr = self.arr[-self.T:]
+        # 滑动窗口计算，每根K线 O(1)
         if self.type == TREND_TYPE.MEAN:
-            return sum(self.arr)/len(self.arr)
-        elif self.type == TREND_TYPE.MAX:
-            return max(self.arr)
-        elif self.type == TREND_TYPE.MIN:
-            return min(self.arr)
+            self.rolling = CRollingSum(T)
+        elif self.type in (TREND_TYPE.MAX, TREND_TYPE.MIN):
+            self.rolling = CRollingExtreme(T, is_max=self.type == TREND_TYPE.MAX)
         else:
             raise CChanException(f"Unknown trendModel Type = {self.type}", ErrCode.PARA_ERROR)
+
+    def get_state(self) -> dict:
+        return self.rolling.get_state()
+
+    def set_state(self, state: dict):
+        self.rolling.set_state(state)
+
+    def add(self, value) -> float:
+        if self.type == TREND_TYPE.MEAN:
+            return self.rolling.add(value)[0]
+        return self.rolling.add(value)
+
+    def add_batch(self, values: np.ndarray) -> List[float]:
+        '''
+        批量计算，结果与逐根 add 完全一致
+        '''
+        if self.type == TREND_TYPE.MEAN:
+            return self.rolling.add_batch(values)[0].tolist()
+        return self.rolling.add_batch(values).tolist()
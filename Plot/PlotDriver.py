@@ -1,4 +1,5 @@
 import inspect
+from bisect import bisect_left
 from typing import Dict, List, Literal, Optional, Tuple, Union
 
 import matplotlib.pyplot as plt
@@ -9,7 +10,7 @@ from matplotlib.patches import Rectangle
 from Chan import CChan
 from Common.CEnum import BI_DIR, FX_TYPE, KL_TYPE, KLINE_DIR, TREND_TYPE
 from Common.ChanException import CChanException, ErrCode
-from Common.CTime import CTime
+from Common.CTime import CTime, minute_key, minute_key2time
 from Math.Demark import T_DEMARK_INDEX, CDemarkEngine
 
 from .PlotMeta import CBi_meta, CChanPlotMeta, CZS_meta
@@ -678,15 +679,21 @@ class CPlotDriver:
         x_begin, x_end = ax.get_xlim()
         datetick_dict = {date: idx for idx, date in enumerate(meta.datetick)}
 
+        kl_dict = dict(enumerate(meta.klu_iter()))
+        ts_lst = [klu.time.ts for klu in kl_dict.values()]
         new_marker = {}
-        for klu in meta.klu_iter():
-            for date, marker in markers.items():
-                date_str = date.to_str() if isinstance(date, CTime) else date
-                if klu.include_sub_lv_time(date_str) and klu.time.to_str() != date_str:
+        for date, marker in markers.items():
+            key = date.to_minute_key() if isinstance(date, CTime) else minute_key(date)
+            # 次级别K线时间不晚于所属K线、晚于前一根K线，当天内的时间只可能落在 [当天, 次日] 之后第一根K线以内（留出夏令时余量）
+            begin_ts = minute_key2time(key).ts - 3600
+            for x in range(bisect_left(ts_lst, begin_ts), len(ts_lst)):
+                klu = kl_dict[x]
+                if klu.include_minute_key(key) and klu.time.to_minute_key() != key:
                     new_marker[klu.time.to_str()] = marker
+                if ts_lst[x] > begin_ts + 86400 + 7200:
+                    break
         new_marker.update(markers)
 
-        kl_dict = dict(enumerate(meta.klu_iter()))
         y_range = self.y_max-self.y_min
         arror_len = arrow_l*y_range
         arrow_h = arror_len*arrow_h_r
@@ -4,10 +4,13 @@ from Bi.Bi import CBi
 from Bi.BiList import CBiList
 from Common.CEnum import BI_DIR, FX_TYPE, KLINE_DIR, SEG_TYPE
 from Common.ChanException import CChanException, ErrCode
-from Common.func_util import revert_bi_dir, logger
+from Common.func_util import revert_bi_dir
+from Common.trace import get_tracer
 
 from .Eigen import CEigen
 
+TRACE = get_tracer("Seg.EigenFX")
+
 
 class CEigenFX:
     def __init__(self, _dir: BI_DIR, exclude_included=True, lv=SEG_TYPE.BI):
@@ -21,15 +24,18 @@ class CEigenFX:
         self.which_ele = -1
 
     def treat_first_ele(self, bi: CBi) -> bool:
-        logger.info(f"[EigenFX] treat_first_ele --->: which_ele: {self.which_ele}\n{bi}")
+        if TRACE.on:
+            TRACE.info(f"[EigenFX] treat_first_ele --->: which_ele: {self.which_ele}\n{bi}")
         self.ele[0] = CEigen(bi, self.kl_dir)
         self.which_ele = 0
-        logger.info(f"[EigenFX] treat_first_ele <---: which_ele: {self.which_ele}\n{bi}")
+        if TRACE.on:
+            TRACE.info(f"[EigenFX] treat_first_ele <---: which_ele: {self.which_ele}\n{bi}")
         return False
 
     def treat_second_ele(self, bi: CBi) -> bool:
         assert self.ele[0] is not None
-        logger.info(f"[EigenFX] treat_second_ele --->: which_ele: {self.which_ele}\n{bi}")
+        if TRACE.on:
+            TRACE.info(f"[EigenFX] treat_second_ele --->: which_ele: {self.which_ele}\n{bi}")
         # 处理特征序列分型是否需要合并
         combine_dir = self.ele[0].try_add(bi, exclude_included=self.exclude_included)
         if combine_dir != KLINE_DIR.COMBINE:  # 不能合并
@@ -39,18 +45,21 @@ class CEigenFX:
             if (self.is_up() and self.ele[1].high < self.ele[0].high) or \
                (self.is_down() and self.ele[1].low > self.ele[0].low):  # 前两元素不可能成为分形
                 return self.reset()
-        logger.info(f"[EigenFX] treat_second_ele <---: which_ele: {self.which_ele}\n{bi}")
+        if TRACE.on:
+            TRACE.info(f"[EigenFX] treat_second_ele <---: which_ele: {self.which_ele}\n{bi}")
         return False
 
     def treat_third_ele(self, bi: CBi) -> bool:
         assert self.ele[0] is not None
         assert self.ele[1] is not None
-        logger.info(f"[EigenFX] treat_third_ele --->: which_ele: {self.which_ele}\n{bi}")
+        if TRACE.on:
+            TRACE.info(f"[EigenFX] treat_third_ele --->: which_ele: {self.which_ele}\n{bi}")
         self.last_evidence_bi = bi
         allow_top_equal = (1 if bi.is_down() else -1) if self.exclude_included else None
         combine_dir = self.ele[1].try_add(bi, allow_top_equal=allow_top_equal)
         if combine_dir == KLINE_DIR.COMBINE:
-            logger.info(f"[EigenFX] treat_third_ele combine_dir == KLINE_DIR.COMBINE <---: which_ele: {self.which_ele}\n{bi}")
+            if TRACE.on:
+                TRACE.info(f"[EigenFX] treat_third_ele combine_dir == KLINE_DIR.COMBINE <---: which_ele: {self.which_ele}\n{bi}")
             return False
         self.ele[2] = CEigen(bi, combine_dir)
         self.which_ele = 2
@@ -61,7 +70,8 @@ class CEigenFX:
         is_fx = (self.is_up() and fx == FX_TYPE.TOP) or (self.is_down() and fx == FX_TYPE.BOTTOM)
 
         if is_fx:
-            logger.info(f"[EigenFX] treat_third_ele <---: which_ele: {self.which_ele}\n{bi}, is_fx: {is_fx}")
+            if TRACE.on:
+                TRACE.info(f"[EigenFX] treat_third_ele <---: which_ele: {self.which_ele}\n{bi}, is_fx: {is_fx}")
             return True
         else:
             self.reset()
@@ -71,7 +81,8 @@ class CEigenFX:
         assert bi.dir != self.dir
         ret = False
         self.lst.append(bi)
-        logger.info(f"[EigenFX] dir: {self.dir} , which_ele: {self.which_ele} add --->: {bi}")
+        if TRACE.on:
+            TRACE.info(f"[EigenFX] dir: {self.dir} , which_ele: {self.which_ele} add --->: {bi}")
         if self.ele[0] is None:  # 第一元素
             ret = self.treat_first_ele(bi)
         elif self.ele[1] is None:  # 第二元素
@@ -81,11 +92,13 @@ class CEigenFX:
         else:
             raise CChanException(f"特征序列3个都找齐了还没处理!! 当前笔:{bi.idx},当前:{str(self)}", ErrCode.SEG_EIGEN_ERR)
         
-        logger.info(f"[EigenFX] dir: {self.dir} , which_ele: {self.which_ele} add <---: ret: {ret}")
+        if TRACE.on:
+            TRACE.info(f"[EigenFX] dir: {self.dir} , which_ele: {self.which_ele} add <---: ret: {ret}")
         return ret
 
     def reset(self):
-        logger.info(f"[EigenFX] reset --->: which_ele: {self.which_ele}")
+        if TRACE.on:
+            TRACE.info(f"[EigenFX] reset --->: which_ele: {self.which_ele}")
         # 重置特征序列分型
         self.which_ele = -1
         # 从线段的第二笔开始
@@ -96,7 +109,8 @@ class CEigenFX:
             for bi in bi_tmp_list:
                 # 逐笔处理分型，直到处理完成或者出现分型
                 if self.add(bi):
-                    logger.info(f"[EigenFX] reset <---: which_ele: {self.which_ele}")
+                    if TRACE.on:
+                        TRACE.info(f"[EigenFX] reset <---: which_ele: {self.which_ele}")
                     return True
         else:
             # 不需要处理 笔包含关系
@@ -106,7 +120,8 @@ class CEigenFX:
             self.ele[0], self.ele[1], self.ele[2] = self.ele[1], self.ele[2], None
             # 从第二元素开始
             self.lst = [bi for bi in bi_tmp_list if bi.idx >= ele2_begin_idx]  # 从第二元素开始
-        logger.info(f"[EigenFX] reset <---: which_ele: {self.which_ele}")
+        if TRACE.on:
+            TRACE.info(f"[EigenFX] reset <---: which_ele: {self.which_ele}")
         return False
 
     def can_be_end(self, bi_lst: CBiList):
@@ -9,12 +9,19 @@ from KLine.KLine_Unit import CKLine_Unit
 from Math.TrendLine import CTrendLine
 from Common.CTime import CTime
 from .EigenFX import CEigenFX
-from Common.func_util import logger
+from Common.trace import get_tracer
 from Common.CEnum import LineStatus
+
+TRACE = get_tracer("Seg.Seg")
 LINE_TYPE = TypeVar('LINE_TYPE', CBi, "CSeg")
 
 
 class CSeg(Generic[LINE_TYPE]):
+    __slots__ = (
+        "idx", "start_bi", "end_bi", "is_sure", "dir", "status", "zs_lst", "eigen_fx", "seg_idx", "parent_seg", "pre", "next",
+        "bsp", "bi_list", "reason", "support_trend_line", "resistance_trend_line", "ele_inside_is_sure",
+    )
+
     def __init__(self, idx: int, start_bi: LINE_TYPE, end_bi: LINE_TYPE, status=LineStatus.Unknown, is_sure=True, seg_dir=None, reason="normal"):
         assert start_bi.idx == 0 or start_bi.dir == end_bi.dir or not is_sure, f"{start_bi.idx} {end_bi.idx} {start_bi.dir} {end_bi.dir}"
         self.idx = idx
@@ -45,7 +52,8 @@ class CSeg(Generic[LINE_TYPE]):
         self.check()
 
         self.ele_inside_is_sure = False
-        logger.info(f"[Seg] __init__ <---: {self}")
+        if TRACE.on:
+            TRACE.info(f"[Seg] __init__ <---: {self}")
 
     def set_seg_idx(self, idx):
         self.seg_idx = idx
@@ -110,6 +118,16 @@ class CSeg(Generic[LINE_TYPE]):
     def get_klu_cnt(self):
         return self.get_end_klu().idx - self.get_begin_klu().idx + 1
 
+    def klu_idx_range(self):
+        # 第一笔覆盖的第一根K线 ~ 最后一笔覆盖的最后一根K线的 idx
+        return self.start_bi.klu_idx_range()[0], self.end_bi.klu_idx_range()[1]
+
+    def klu_slice(self, begin: int, end: int) -> List[CKLine_Unit]:
+        return self.start_bi.klu_slice(begin, end)
+
+    def get_klu_lst(self) -> List[CKLine_Unit]:
+        return self.klu_slice(*self.klu_idx_range())
+
     def cal_macd_metric(self, macd_algo, is_reverse):
         if macd_algo == MACD_ALGO.SLOPE:
             return self.Cal_MACD_slope()
@@ -135,15 +153,18 @@ class CSeg(Generic[LINE_TYPE]):
             return (end_klu.high-begin_klu.low)/begin_klu.low
 
     def update_bi_list(self, bi_lst, idx1, idx2):
-        logger.info(f"[Seg] update_bi_list --->: bi1={idx1}, end_bi={idx2}")
+        if TRACE.on:
+            TRACE.info(f"[Seg] update_bi_list --->: bi1={idx1}, end_bi={idx2}")
         for bi_idx in range(idx1, idx2+1):
             bi_lst[bi_idx].parent_seg = self
-            logger.info(f"[Seg] update_bi_list --->: bi_lst[{bi_idx}]={bi_lst[bi_idx]}")
+            if TRACE.on:
+                TRACE.info(f"[Seg] update_bi_list --->: bi_lst[{bi_idx}]={bi_lst[bi_idx]}")
             self.bi_list.append(bi_lst[bi_idx])
         if len(self.bi_list) >= 3:
             self.support_trend_line = CTrendLine(self.bi_list, TREND_LINE_SIDE.INSIDE)
             self.resistance_trend_line = CTrendLine(self.bi_list, TREND_LINE_SIDE.OUTSIDE)
-        logger.info(f"[Seg] update_bi_list <---")
+        if TRACE.on:
+            TRACE.info(f"[Seg] update_bi_list <---")
 
     def get_first_multi_bi_zs(self):
         return next((zs for zs in self.zs_lst if not zs.is_one_bi_zs()), None)
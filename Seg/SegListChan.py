@@ -5,7 +5,9 @@ from Common.CEnum import BI_DIR, SEG_TYPE
 from .EigenFX import CEigenFX
 from .SegConfig import CSegConfig
 from .SegListComm import CSegListComm
-from Common.func_util import logger
+from Common.trace import get_tracer
+
+TRACE = get_tracer("Seg.SegListChan")
 
 class CSegListChan(CSegListComm):
     def __init__(self, seg_config=CSegConfig(), lv=SEG_TYPE.BI):
@@ -19,37 +21,47 @@ class CSegListChan(CSegListComm):
                 bi.parent_seg = None
             if _seg.pre:
                 _seg.pre.next = None
-            logger.info(f"[SegListChan] do_init_u0 --->: pop un-sure seg_u0: {_seg}")
+            if TRACE.on:
+                TRACE.info(f"[SegListChan] do_init_u0 --->: pop un-sure seg_u0: {_seg}")
             self.lst.pop()
         if len(self):
             assert self.lst[-1].eigen_fx and self.lst[-1].eigen_fx.ele[-1]
             if not self.lst[-1].eigen_fx.ele[-1].lst[-1].is_sure:
                 # 如果确定线段的分形的第三元素包含不确定笔，也需要重新算，不然线段分形元素的高低点可能不对
-                logger.info(f"[SegListChan] do_init_u1 --->: pop un-sure seg_u1: {self.lst[-1]}")
+                if TRACE.on:
+                    TRACE.info(f"[SegListChan] do_init_u1 --->: pop un-sure seg_u1: {self.lst[-1]}")
                 self.lst.pop()
 
     def update(self, bi_lst: CBiList):
-        logger.info(f"[SegListChan] 1.0-update do_init --->")
+        if TRACE.on:
+            TRACE.info(f"[SegListChan] 1.0-update do_init --->")
         self.do_init()
-        logger.info(f"[SegListChan] 1.1-update do_init <---")
+        if TRACE.on:
+            TRACE.info(f"[SegListChan] 1.1-update do_init <---")
         if len(self) == 0:
-            logger.info(f"[SegListChan] 1.2.0-update --->: begin_idx=0")
+            if TRACE.on:
+                TRACE.info(f"[SegListChan] 1.2.0-update --->: begin_idx=0")
             self.cal_seg_sure(bi_lst, begin_idx=0)
         else:
-            logger.info(f"[SegListChan] 1.2.1-update --->: begin_idx={self[-1].end_bi.idx+1}")
+            if TRACE.on:
+                TRACE.info(f"[SegListChan] 1.2.1-update --->: begin_idx={self[-1].end_bi.idx+1}")
             self.cal_seg_sure(bi_lst, begin_idx=self[-1].end_bi.idx+1)
 
-        logger.info(f"[SegListChan] 1.3-update --->: collect_left_seg")
+        if TRACE.on:
+            TRACE.info(f"[SegListChan] 1.3-update --->: collect_left_seg")
         self.collect_left_seg(bi_lst)
-        logger.info(f"[SegListChan] 1.4-update <---: seg_cnt={len(self.lst)}")
+        if TRACE.on:
+            TRACE.info(f"[SegListChan] 1.4-update <---: seg_cnt={len(self.lst)}")
 
     def cal_seg_sure(self, bi_lst: CBiList, begin_idx: int):
-        logger.info(f"[SegListChan] 1.0-cal_seg_sure --->begin_idx: {begin_idx}\n{bi_lst}")
+        if TRACE.on:
+            TRACE.info(f"[SegListChan] 1.0-cal_seg_sure --->begin_idx: {begin_idx}\n{bi_lst}")
         up_eigen = CEigenFX(BI_DIR.UP, lv=self.lv)  # 上升线段下降笔
         down_eigen = CEigenFX(BI_DIR.DOWN, lv=self.lv)  # 下降线段上升笔
         last_seg_dir = None if len(self) == 0 else self[-1].dir
         for bi in bi_lst[begin_idx:]:
-            logger.info(f"[SegListChan] 1.1-cal_seg_sure preocess bi for eigen --->: {bi}")
+            if TRACE.on:
+                TRACE.info(f"[SegListChan] 1.1-cal_seg_sure preocess bi for eigen --->: {bi}")
             fx_eigen = None
             if bi.is_down() and last_seg_dir != BI_DIR.UP:
                 if up_eigen.add(bi):
@@ -72,23 +84,28 @@ class CSegListChan(CSegListComm):
             if fx_eigen:
                 self.treat_fx_eigen(fx_eigen, bi_lst)
                 break
-            logger.info(f"[SegListChan] 1.1-cal_seg_sure preocess bi for eigen <---\n")
+            if TRACE.on:
+                TRACE.info(f"[SegListChan] 1.1-cal_seg_sure preocess bi for eigen <---\n")
 
-        logger.info(f"[SegListChan] 1.2-cal_seg_sure <---: seg_cnt={len(self.lst)}")
+        if TRACE.on:
+            TRACE.info(f"[SegListChan] 1.2-cal_seg_sure <---: seg_cnt={len(self.lst)}")
 
     def treat_fx_eigen(self, fx_eigen, bi_lst: CBiList):
-        logger.info(f"[SegListChan] 1.0-treat_fx_eigen --->: {fx_eigen}")
+        if TRACE.on:
+            TRACE.info(f"[SegListChan] 1.0-treat_fx_eigen --->: {fx_eigen}")
         _test = fx_eigen.can_be_end(bi_lst)
         end_bi_idx = fx_eigen.GetPeakBiIdx()
         if _test in [True, None]:  # None表示反向分型找到尾部也没找到
             is_true = _test is not None  # 如果是正常结束
             if not self.add_new_seg(bi_lst, end_bi_idx, is_sure=is_true and fx_eigen.all_bi_is_sure()):  # 防止第一根线段的方向与首尾值异常
                 self.cal_seg_sure(bi_lst, end_bi_idx+1)
-                logger.info(f"[SegListChan] 1.1-treat_fx_eigen add_new_seg <---: {self.lst}")
+                if TRACE.on:
+                    TRACE.info(f"[SegListChan] 1.1-treat_fx_eigen add_new_seg <---: {self.lst}")
                 return
             self.lst[-1].eigen_fx = fx_eigen
             if is_true:
                 self.cal_seg_sure(bi_lst, end_bi_idx + 1)
         else:
             self.cal_seg_sure(bi_lst, fx_eigen.lst[1].idx)
-        logger.info(f"[SegListChan] 1.2-treat_fx_eigen <---: {self.lst}")
+        if TRACE.on:
+            TRACE.info(f"[SegListChan] 1.2-treat_fx_eigen <---: {self.lst}")
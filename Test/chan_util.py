@@ -0,0 +1,166 @@
+from Benchmark.BenchData import CRandomWalkApi, random_walk_frames
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import DATA_SRC, KL_TYPE, MACD_ALGO
+from Common.ChanException import CChanException, ErrCode
+from DataAPI.csvAPI import CSV_API
+
+# 测试用配置：打开所有单根K线指标
+TEST_CONF = {
+    "print_warning": False,
+    "cal_rsi": True,
+    "cal_kdj": True,
+    "cal_demark": True,
+    "mean_metrics": [5, 20],
+    "trend_metrics": [10, 30],
+    "boll_n": 20,
+}
+
+MULTI_LV = [KL_TYPE.K_DAY, KL_TYPE.K_30M, KL_TYPE.K_5M]
+# 多级别随机游走数据
+SEED, N_DAYS = 5, 40
+
+
+def random_walk_cls(seed: int, n_days: int):
+    return type("CTestRandomWalkApi", (CRandomWalkApi,), {"seed": seed, "n_days": n_days})
+
+
+class CSymbolRandomWalkApi(CRandomWalkApi):
+    '''
+    多 symbol 测试用的数据源（定义在模块中，进程池可以按名字导入）：
+    code 为 "s<数字>" 时以该数字为 seed；"missing" 各级别都没有数据；"no_sub" 最小级别（5分钟）没有数据
+    '''
+    n_days = N_DAYS
+
+    def __init__(self, code, k_type=KL_TYPE.K_DAY, begin_date=None, end_date=None, autype=None):
+        if code == "missing" or (code == "no_sub" and k_type == KL_TYPE.K_5M):
+            raise CChanException(f"{code} {k_type} not found", ErrCode.SRC_DATA_NOT_FOUND)
+        super(CSymbolRandomWalkApi, self).__init__(code, k_type, begin_date, end_date, autype)
+        self.seed = int(code[1:]) if code.startswith("s") else SEED
+
+
+def make_chan(data_src, lv_list, step=False, **conf) -> CChan:
+    config = CChanConfig({**TEST_CONF, "trigger_step": step, **conf})
+    chan = CChan("test", data_src=data_src, lv_list=list(lv_list), config=config)
+    if step:
+        for _ in chan.step_load():
+            pass
+    return chan
+
+
+def csv_chan(step=False, **conf) -> CChan:
+    # 自带的上证指数日线
+    config = CChanConfig({**TEST_CONF, "trigger_step": step, **conf})
+    chan = CChan("sh.000001", data_src=DATA_SRC.CSV, lv_list=[KL_TYPE.K_DAY], config=config)
+    if step:
+        for _ in chan.step_load():
+            pass
+    return chan
+
+
+def csv_klu_lst(begin_date=None):
+    return list(CSV_API("sh.000001", begin_date=begin_date).get_kl_data())
+
+
+def lv_klu_lst():
+    frames = random_walk_frames(SEED, N_DAYS)
+    return [list(frames[lv].klu_iter()) for lv in MULTI_LV]
+
+
+def feed_order(klu_lst_lst, child_first: bool):
+    '''
+    多级别K线按 load 的顺序排列：父级别K线之后是它包含的次级别K线（child_first 时次级别在前）
+    返回 [(级别下标, K线)]
+    '''
+    pos = [0] * len(klu_lst_lst)
+    res = []
+
+    def add(lv_idx, parent_time):
+        klu_lst = klu_lst_lst[lv_idx]
+        while pos[lv_idx] < len(klu_lst) and (parent_time is None or not klu_lst[pos[lv_idx]].time > parent_time):
+            klu = klu_lst[pos[lv_idx]]
+            pos[lv_idx] += 1
+            if not child_first:
+                res.append((lv_idx, klu))
+            if lv_idx + 1 < len(klu_lst_lst):
+                add(lv_idx + 1, klu.time)
+            if child_first:
+                res.append((lv_idx, klu))
+    add(0, None)
+    return res
+
+
+def klu_digest(klu):
+    return (
+        klu.idx, str(klu.time), klu.open, klu.high, klu.low, klu.close,
+        tuple(sorted(klu.trade_info.metric.items())),
+        (klu.macd.DIF, klu.macd.DEA, klu.macd.macd),
+        (klu.boll.MID, klu.boll.UP, klu.boll.DOWN),
+        klu.rsi, (klu.kdj.k, klu.kdj.d, klu.kdj.j),
+        tuple(sorted((str(t), tuple(sorted(d.items()))) for t, d in klu.trend.items())),
+        tuple((item['type'], str(item['dir']), item['idx']) for item in klu.demark.data),
+        tuple(sub.idx for sub in klu.sub_kl_list), None if klu.sup_kl is None else klu.sup_kl.idx,
+    )
+
+
+def all_klu(chan: CChan):
+    return [klu for lv in chan.lv_list for klc in chan[lv].lst for klu in klc.lst]
+
+
+def line_digest(line_lst):
+    return [(line.idx, str(line.dir), line.is_sure, line.get_begin_klu().idx, line.get_end_klu().idx, line.get_begin_val(), line.get_end_val()) for line in line_lst]
+
+
+def zs_digest(zs_lst):
+    return [(zs.begin.idx, zs.end.idx, zs.begin_bi.idx, zs.end_bi.idx, zs.low, zs.high, zs.peak_low, zs.peak_high, zs.is_sure) for zs in zs_lst]
+
+
+def bsp_digest(bsp_list):
+    return sorted((bsp.klu.idx, bsp.bi.idx, bsp.is_buy, bsp.type2str()) for bsp in bsp_list.bsp_iter())
+
+
+def chan_digest(chan: CChan, with_klu: bool = True):
+    '''
+    各级别K线、指标、父子关系、笔/线段/中枢/买卖点，以及笔的 MACD 背驰指标，用于比较两个 CChan 的计算结果
+    '''
+    res = {}
+    for lv in chan.lv_list:
+        kl_list = chan[lv]
+        klu_lst = [klu for klc in kl_list.lst for klu in klc.lst]
+        res[lv.name] = {
+            "klu": [klu_digest(klu) for klu in klu_lst] if with_klu else len(klu_lst),
+            "klc": [(klc.idx, klc.high, klc.low, str(klc.fx), str(klc.dir), len(klc.lst)) for klc in kl_list.lst],
+            "bi": line_digest(kl_list.bi_list),
+            "bi_metric": [tuple(bi.cal_macd_metric(algo, False) for algo in (MACD_ALGO.AREA, MACD_ALGO.PEAK, MACD_ALGO.SLOPE, MACD_ALGO.VOLUMN)) for bi in kl_list.bi_list],
+            "seg": line_digest(kl_list.seg_list),
+            "segseg": line_digest(kl_list.segseg_list),
+            "zs": zs_digest(kl_list.zs_list),
+            "segzs": zs_digest(kl_list.segzs_list),
+            "bsp": bsp_digest(kl_list.bs_point_lst),
+            "segbsp": bsp_digest(kl_list.seg_bs_point_lst),
+        }
+    return res
+
+
+def first_diff(a, b, path=""):
+    # 返回第一处不一致的位置，方便定位
+    if isinstance(a, dict) and isinstance(b, dict):
+        for key in a.keys() | b.keys():
+            diff = first_diff(a.get(key), b.get(key), f"{path}/{key}")
+            if diff:
+                return diff
+        return None
+    if isinstance(a, list) and isinstance(b, list):
+        if len(a) != len(b):
+            return f"{path}: len {len(a)} != {len(b)}"
+        for i, (x, y) in enumerate(zip(a, b)):
+            diff = first_diff(x, y, f"{path}[{i}]")
+            if diff:
+                return diff
+        return None
+    return None if a == b else f"{path}: {a} != {b}"
+
+
+def assert_same(a, b):
+    diff = first_diff(a, b)
+    assert diff is None, diff
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试文件通过 Common.xxx、Test.chan_util 等方式导入，把仓库根目录加入 sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
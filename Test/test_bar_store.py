@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import DATA_SRC, KL_TYPE
+from Common.ChanException import CChanException, ErrCode
+from DataAPI.BarStore import CBarStore
+from Test.chan_util import MULTI_LV, TEST_CONF, CSymbolRandomWalkApi, assert_same, chan_digest
+from Test.test_bulk_loader import bar_digest
+
+CODE_LIST = ["s1", "s2", "missing", "no_sub"]
+
+
+def read_store(store_dir, code):
+    '''
+    在另一个进程中运行：以 mmap 方式打开库中的K线，并以库为数据源计算 CChan
+    返回进程号、各级别K线摘要、列是否只读，以及 CChan 的结果（或异常）
+    '''
+    store = CBarStore(store_dir)
+    bars = {lv.name: [bar_digest(klu) for klu in store.get(code, lv).klu_iter()] for lv in store.levels(code)}
+    read_only = all(not store.get(code, lv)[name].flags.writeable for lv in store.levels(code) for name in ("time_key", "close"))
+    res = {}
+    for data_src in (f"store:{store_dir}", DATA_SRC.BAR_STORE):
+        try:
+            res[str(data_src)] = chan_digest(CChan(code, data_src=data_src, lv_list=list(MULTI_LV), config=CChanConfig(dict(TEST_CONF))))
+        except CChanException as e:
+            res[str(data_src)] = e.errcode
+    return os.getpid(), bars, read_only, res
+
+
+def test_bar_store_multi_process(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store_dir = os.path.join(tmp_dir, "bar_store")
+        done = CBarStore(store_dir).build(CSymbolRandomWalkApi, CODE_LIST, MULTI_LV)
+        # 数据源中不存在的 symbol/级别跳过
+        assert done == [(code, lv) for code in ("s1", "s2") for lv in MULTI_LV] + [("no_sub", lv) for lv in MULTI_LV[:2]]
+        assert CBarStore(store_dir).codes() == ["no_sub", "s1", "s2"]
+        # DATA_SRC.BAR_STORE 的目录取环境变量，spawn 出的进程重新导入时读取
+        monkeypatch.setenv("CHAN_BAR_STORE", store_dir)
+        with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as executor:
+            result = dict(zip(CODE_LIST, executor.map(read_store, [store_dir] * len(CODE_LIST), CODE_LIST)))
+    for code in CODE_LIST:
+        pid, bars, read_only, res = result[code]
+        assert pid != os.getpid() and read_only
+        expect_bars = {}
+        for lv in MULTI_LV:
+            try:
+                expect_bars[lv.name] = [bar_digest(klu) for klu in CSymbolRandomWalkApi(code, lv).get_kl_data()]
+            except CChanException:
+                continue
+        assert bars == expect_bars, code
+        assert set(res) == {f"store:{store_dir}", str(DATA_SRC.BAR_STORE)}
+        for digest in res.values():
+            if code in ("s1", "s2"):
+                assert_same(digest, chan_digest(CChan(code, data_src=CSymbolRandomWalkApi, lv_list=list(MULTI_LV), config=CChanConfig(dict(TEST_CONF)))))
+            else:
+                # 与原数据源一样：没有数据的 symbol 和缺失最小级别都报 SRC_DATA_NOT_FOUND
+                assert digest == ErrCode.SRC_DATA_NOT_FOUND, code
+    assert KL_TYPE.K_5M.name not in result["no_sub"][1]
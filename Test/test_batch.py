@@ -0,0 +1,46 @@
+from Chan import CChan
+from ChanBatch import CChanBatch, iter_chan, summarize_chan
+from ChanConfig import CChanConfig
+from Common.ChanException import CChanException, ErrCode
+from Test.chan_util import MULTI_LV, TEST_CONF, CSymbolRandomWalkApi, assert_same, chan_digest
+
+CODE_LIST = ["s1", "s2", "missing", "s3", "no_sub"]
+
+
+def direct_load(code, **conf):
+    # 直接用原数据源构造 CChan 的结果：(CChan, None) 或 (None, 异常)
+    try:
+        return CChan(code, data_src=CSymbolRandomWalkApi, lv_list=list(MULTI_LV), config=CChanConfig({**TEST_CONF, **conf})), None
+    except Exception as e:
+        return None, e
+
+
+def test_chan_batch():
+    expect = {code: direct_load(code) for code in CODE_LIST}
+    for max_workers in (0, 2):
+        res = CChanBatch(CODE_LIST, data_src=CSymbolRandomWalkApi, lv_list=MULTI_LV, config=CChanConfig(dict(TEST_CONF)), max_workers=max_workers, chunk_size=2).run()
+        assert [result.code for result in res] == CODE_LIST
+        for result in res:
+            chan, err = expect[result.code]
+            if err is None:
+                assert result.ok and result.levels == summarize_chan(chan), (max_workers, result.code)
+            else:
+                assert not result.ok and result.error == repr(err), (max_workers, result.code)
+    # 两个没有数据的 symbol 都是 SRC_DATA_NOT_FOUND
+    assert all(isinstance(expect[code][1], CChanException) and expect[code][1].errcode == ErrCode.SRC_DATA_NOT_FOUND for code in ("missing", "no_sub"))
+
+
+def test_iter_chan_error():
+    for auto_skip in (False, True):
+        conf = {**TEST_CONF, "auto_skip_illegal_sub_lv": auto_skip}
+        res = list(iter_chan(CODE_LIST, data_src=CSymbolRandomWalkApi, lv_list=MULTI_LV, config=CChanConfig(conf), prefetch_cnt=2))
+        assert [code for code, _ in res] == CODE_LIST
+        for code, chan in res:
+            expect_chan, err = direct_load(code, auto_skip_illegal_sub_lv=auto_skip)
+            if err is None:
+                # 跳过缺失的子级别后与直接读取一致
+                assert isinstance(chan, CChan) and chan.lv_list == expect_chan.lv_list, code
+                assert_same(chan_digest(chan), chan_digest(expect_chan))
+            else:
+                # 原数据源的异常原样抛出，而不是预取数据里缺少该级别
+                assert type(chan) is type(err) and str(chan) == str(err), code
@@ -0,0 +1,83 @@
+import os
+import tempfile
+
+import numpy as np
+
+from Common.CEnum import DATA_FIELD
+from Common.ChanException import CChanException, ErrCode
+from DataAPI.BulkLoader import read_bar_file, read_csv_bars, save_bar_file, time_str2key
+from DataAPI.csvAPI import CSV_API, create_item_dict
+from KLine.KLine_Unit import CKLine_Unit
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "Data")
+
+
+def bar_digest(klu):
+    return (str(klu.time), klu.time.ts, klu.time.auto, klu.open, klu.high, klu.low, klu.close, tuple(sorted(klu.trade_info.metric.items())))
+
+
+def line_klu_lst(file_path, columns, begin_date=None, end_date=None):
+    # 原 CSV_API 的逐行解析：时间按字符串比较过滤
+    res = []
+    with open(file_path, "r") as f:
+        for line_number, line in enumerate(f):
+            if line_number == 0:
+                continue
+            data = line.strip("\n").split(",")
+            if begin_date is not None and data[columns.index(DATA_FIELD.FIELD_TIME)] < begin_date:
+                continue
+            if end_date is not None and data[columns.index(DATA_FIELD.FIELD_TIME)] > end_date:
+                continue
+            res.append(CKLine_Unit(create_item_dict(data, columns)))
+    return res
+
+
+def assert_format_error(func):
+    try:
+        func()
+    except CChanException as e:
+        assert e.errcode == ErrCode.SRC_DATA_FORMAT_ERROR
+    else:
+        raise AssertionError("should raise SRC_DATA_FORMAT_ERROR")
+
+
+def test_time_str2key():
+    time_lst = ["2021-09-13", "20210902113000000", "2021-09-13 11:30:00", "2021/09/14 13:05"]
+    assert time_str2key(time_lst).tolist() == [20210913000000, 20210902113000, 20210913113000, 20210914130500]
+    assert time_str2key(["2021-09-13 11:30:45"], keep_second=False).tolist() == [20210913113000]
+    # 不补零的写法不支持，报错而不是错读
+    for time_lst in (["2021-9-3", "2021-10-13"], ["2021-9-13", "2021-10-3"], ["2021-10-03", "2021-9-13"], ["2021-10-13 9:30"]):
+        assert_format_error(lambda: time_str2key(time_lst))
+
+
+def test_read_csv_unpadded_date():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "bars.csv")
+        with open(file_path, "w") as f:
+            f.write("time_key,open,high,low,close\n2021-10-13,1,2,0.5,1.5\n2021-9-3,1,2,0.5,1.5\n")
+        assert_format_error(lambda: read_csv_bars(file_path))
+
+
+def test_csv_same_as_line_parse():
+    csv_api = CSV_API("sh.000001")
+    file_path = os.path.join(DATA_DIR, "sh.000001_day.csv")
+    frame = read_csv_bars(file_path, csv_api.columns, keep_second=False)
+    expect = [bar_digest(klu) for klu in line_klu_lst(file_path, csv_api.columns)]
+    assert [bar_digest(klu) for klu in frame.klu_iter(chunk_size=1000)] == expect
+    assert [bar_digest(klu) for klu in CSV_API("sh.000001").get_kl_data()] == expect
+    # 起止时间过滤与原来的字符串比较一致
+    for begin_date, end_date in (("2015-01-01", None), (None, "2018-06-30"), ("2010-05-04", "2010-05-20"), ("2030-01-01", None)):
+        expect = [bar_digest(klu) for klu in line_klu_lst(file_path, csv_api.columns, begin_date, end_date)]
+        assert [bar_digest(klu) for klu in CSV_API("sh.000001", begin_date=begin_date, end_date=end_date).get_kl_data()] == expect
+        assert [bar_digest(klu) for klu in frame.slice_time(begin_date, end_date).klu_iter()] == expect
+
+
+def test_bar_file_round_trip():
+    frame = read_csv_bars(os.path.join(DATA_DIR, "sh.000001_day.csv"), CSV_API("sh.000001").columns, keep_second=False)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "sh.000001_day.bars")
+        save_bar_file(frame, file_path)
+        restored = read_bar_file(file_path)
+        assert np.array_equal(restored.time_key, frame.time_key)
+        assert [bar_digest(klu) for klu in restored.klu_iter()] == [bar_digest(klu) for klu in frame.klu_iter()]
+
@@ -0,0 +1,70 @@
+import copy
+import gc
+import pickle
+import weakref
+
+from Common.cache import init_cache, make_cache
+
+
+class CDemo:
+    __slots__ = ("val", "call_cnt", "_memoize_cache", "_memoize_gen", "__weakref__")
+
+    def __init__(self, val):
+        self.val = val
+        self.call_cnt = 0
+        init_cache(self)
+
+    @make_cache
+    def get_val(self):
+        self.call_cnt += 1
+        return self.val
+
+    def set_val(self, val):
+        self.val = val
+        self._memoize_gen += 1
+
+
+def test_lazy():
+    obj = CDemo(1)
+    f = obj.get_val
+    assert obj.call_cnt == 0
+    assert f() == 1 and f() == 1 and obj.get_val() == 1
+    assert obj.call_cnt == 1
+
+
+def test_bound_getter_not_stale():
+    obj = CDemo(1)
+    f = obj.get_val
+    assert f() == 1
+    obj.set_val(2)
+    assert f() == 2
+    assert obj.get_val() == 2
+    assert obj.call_cnt == 2
+
+
+def test_per_instance():
+    a, b = CDemo(1), CDemo(2)
+    assert a.get_val() == 1 and b.get_val() == 2
+
+
+def test_copy():
+    obj = CDemo(1)
+    obj.get_val()
+    for cp in (copy.deepcopy(obj), pickle.loads(pickle.dumps(obj))):
+        cp.val = 3
+        assert cp.get_val() == 3
+        assert obj.get_val() == 1
+
+
+
+def test_no_reference_cycle():
+    # 缓存不引用实例，关闭循环垃圾回收时实例也能随引用计数释放
+    gc.disable()
+    try:
+        obj = CDemo(1)
+        obj.get_val()
+        ref = weakref.ref(obj)
+        del obj
+        assert ref() is None
+    finally:
+        gc.enable()
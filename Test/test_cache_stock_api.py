@@ -0,0 +1,64 @@
+import tempfile
+
+from Benchmark.BenchData import CRandomWalkApi
+from Common.CEnum import KL_TYPE
+from DataAPI.CacheStockAPI import CCacheStockApi
+
+
+class CCountApi(CRandomWalkApi):
+    n_days = 2600  # 2010-01 ~ 2019-12
+    request_lst = []
+
+    def get_kl_data(self):
+        CCountApi.request_lst.append((self.begin_date, self.end_date))
+        yield from super(CCountApi, self).get_kl_data()
+
+
+def make_cache_api(cache_dir):
+    return type("CCachedCountApi", (CCacheStockApi,), {"upstream_cls": CCountApi, "cache_dir": cache_dir})
+
+
+def load(api_cls, begin, end):
+    return [str(klu.time) for klu in api_cls("rw", KL_TYPE.K_DAY, begin, end).get_kl_data()]
+
+
+def direct(begin, end):
+    # 不经过缓存、不计数
+    return [str(klu.time) for klu in CRandomWalkApi.get_kl_data(CCountApi("rw", KL_TYPE.K_DAY, begin, end))]
+
+
+def test_full_history_covers_any_begin():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        api_cls = make_cache_api(cache_dir)
+        CCountApi.request_lst = []
+        assert load(api_cls, None, "2019-06-30") == direct(None, "2019-06-30")
+        assert len(CCountApi.request_lst) == 1
+        assert load(api_cls, "2015-01-01", "2018-12-31") == direct("2015-01-01", "2018-12-31")
+        assert load(api_cls, None, "2018-12-31") == direct(None, "2018-12-31")
+        assert len(CCountApi.request_lst) == 1
+
+
+def test_earlier_begin_only_fetch_head():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        api_cls = make_cache_api(cache_dir)
+        CCountApi.request_lst = []
+        assert load(api_cls, "2015-01-01", "2019-06-30") == direct("2015-01-01", "2019-06-30")
+        assert load(api_cls, "2012-01-01", "2016-12-31") == direct("2012-01-01", "2016-12-31")
+        assert CCountApi.request_lst[1][0] == "2012-01-01" and CCountApi.request_lst[1][1] < "2015-01-10"
+        # 之前缓存的范围没有缩小
+        assert load(api_cls, "2012-01-01", "2019-06-30") == direct("2012-01-01", "2019-06-30")
+        assert load(api_cls, None, "2019-06-30") == direct(None, "2019-06-30")
+        assert len(CCountApi.request_lst) == 3
+        assert load(api_cls, "2011-01-01", "2019-06-30") == direct("2011-01-01", "2019-06-30")
+        assert len(CCountApi.request_lst) == 3
+
+
+def test_extend_end():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        api_cls = make_cache_api(cache_dir)
+        CCountApi.request_lst = []
+        assert load(api_cls, None, "2015-06-30") == direct(None, "2015-06-30")
+        assert load(api_cls, "2014-01-01", "2019-06-30") == direct("2014-01-01", "2019-06-30")
+        assert load(api_cls, None, "2019-06-30") == direct(None, "2019-06-30")
+        assert len(CCountApi.request_lst) == 2
+
@@ -0,0 +1,139 @@
+import random
+
+import numpy as np
+
+from Benchmark.BenchData import business_dates
+from Combiner.Combine_Scan import combine_scan
+from Common.CEnum import DATA_FIELD, FX_TYPE, KL_TYPE, KLINE_DIR
+from Common.ChanException import CChanException, ErrCode
+from DataAPI.BulkLoader import CBarFrame
+from DataAPI.CommonStockAPI import CCommonStockApi
+from KLine.KLine import CKLine
+from Test.chan_util import assert_same, chan_digest, make_chan, random_walk_cls
+
+FLAG_LST = [(exclude_included, allow_top_equal) for exclude_included in (False, True) for allow_top_equal in (None, 1, -1)]
+
+
+def int_bars(rng: np.random.Generator, size: int, spread: int = 2):
+    # 整数价格、小幅波动的随机游走，高低点大量相等，也会出现一字K线
+    close = 100 + np.cumsum(rng.integers(-1, 2, size))
+    _open = np.concatenate([[100], close[:-1]])
+    high = np.maximum(_open, close) + rng.integers(0, spread, size)
+    low = np.minimum(_open, close) - rng.integers(0, spread, size)
+    return _open.astype(np.float64), high.astype(np.float64), low.astype(np.float64), close.astype(np.float64)
+
+
+def bar_frame(rng: np.random.Generator, size: int) -> CBarFrame:
+    _open, high, low, close = int_bars(rng, size)
+    return CBarFrame({
+        DATA_FIELD.FIELD_TIME: business_dates(size) * 1000000,
+        DATA_FIELD.FIELD_OPEN: _open,
+        DATA_FIELD.FIELD_HIGH: high,
+        DATA_FIELD.FIELD_LOW: low,
+        DATA_FIELD.FIELD_CLOSE: close,
+    }, time_auto=True)
+
+
+def int_walk_cls(seed: int, size: int):
+    # 日线整数价格数据源
+    class CIntWalkApi(CCommonStockApi):
+        def get_kl_data(self):
+            yield from bar_frame(np.random.default_rng(seed), size).klu_iter()
+
+        def SetBasciInfo(self):
+            self.name = f"int_walk_{seed}"
+            self.is_stock = False
+
+        @classmethod
+        def do_init(cls):
+            pass
+
+        @classmethod
+        def do_close(cls):
+            pass
+    return CIntWalkApi
+
+
+def step_combine(klu_lst, exclude_included=False, allow_top_equal=None, klc_lst=None):
+    '''
+    逐根 try_add/update_fx 合并，与 CKLine_List.combine_klu 的流程相同，klc_lst 不为空时接着合并
+    '''
+    klc_lst = [] if klc_lst is None else klc_lst
+    for klu in klu_lst:
+        if not klc_lst:
+            klc_lst.append(CKLine(klu, idx=0))
+            continue
+        _dir = klc_lst[-1].try_add(klu, exclude_included, allow_top_equal)
+        if _dir != KLINE_DIR.COMBINE:
+            klc_lst.append(CKLine(klu, idx=len(klc_lst), _dir=_dir))
+            if len(klc_lst) >= 3:
+                klc_lst[-2].update_fx(klc_lst[-3], klc_lst[-1], exclude_included, allow_top_equal)
+    return klc_lst
+
+
+def combiner_error(func):
+    try:
+        return func()
+    except CChanException as e:
+        assert e.errcode == ErrCode.COMBINER_ERR
+        return None
+
+
+def test_combine_scan_same_as_step():
+    # 直接调用 combine_scan（含 exclude_included/allow_top_equal），从任意位置接着合并，与逐根合并一致
+    rng = np.random.default_rng(0)
+    random.seed(0)
+    compared = {flag: 0 for flag in FLAG_LST}
+    fx_seen = set()
+    for _ in range(300):
+        size = random.randint(3, 40)
+        klu_lst = list(bar_frame(rng, size).klu_iter())
+        cut = random.randint(1, size - 1)
+        for exclude_included, allow_top_equal in FLAG_LST:
+            expect = combiner_error(lambda: step_combine(klu_lst, exclude_included, allow_top_equal))
+            prefix = combiner_error(lambda: step_combine(klu_lst[:cut], exclude_included, allow_top_equal))
+            if prefix is None:
+                assert expect is None
+                continue
+            cur_klc, pre_klc = prefix[-1], prefix[-2] if len(prefix) >= 2 else None
+            rest = klu_lst[cut:]
+            scan = combiner_error(lambda: combine_scan(
+                [klu.high for klu in rest],
+                [klu.low for klu in rest],
+                cur_klc.high,
+                cur_klc.low,
+                cur_klc.dir,
+                pre_high=None if pre_klc is None else pre_klc.high,
+                pre_low=None if pre_klc is None else pre_klc.low,
+                exclude_included=exclude_included,
+                allow_top_equal=allow_top_equal,
+            ))
+            if expect is None:
+                assert scan is None
+                continue
+            assert scan is not None
+            compared[(exclude_included, allow_top_equal)] += 1
+            # 第 0 组接在前缀最后一根合并K线后面
+            expect = expect[len(prefix)-1:]
+            size_lst = [int(end - begin) for begin, end in zip(scan.begin, scan.end)]
+            size_lst[0] += len(cur_klc.lst)
+            assert size_lst == [len(klc.lst) for klc in expect]
+            assert scan.dir == [klc.dir for klc in expect]
+            assert scan.high == [klc.high for klc in expect]
+            assert scan.low == [klc.low for klc in expect]
+            # 分型在后一根合并K线出现时确定，没有前一根或者后一根的不会计算
+            fx_lst = [FX_TYPE.UNKNOWN if fx is None else fx for fx in scan.fx]
+            assert fx_lst == [klc.fx for klc in expect]
+            fx_seen.update((exclude_included, fx) for fx in fx_lst)
+    # 每种参数组合都实际比较过，且各模式下顶底分型都出现过
+    assert all(cnt >= 30 for cnt in compared.values()), compared
+    assert {(flag, fx) for flag in (False, True) for fx in (FX_TYPE.TOP, FX_TYPE.BOTTOM)} <= fx_seen
+
+
+def test_batch_combine_same_as_step():
+    # kl_batch_combine 开关下合并K线边界、高低点、方向、分型以及之后的笔、线段等完全一致
+    for seed in range(5):
+        for api_cls in (int_walk_cls(seed, 600), random_walk_cls(seed, 10)):
+            lv_list = [KL_TYPE.K_DAY] if api_cls.__name__ == "CIntWalkApi" else [KL_TYPE.K_5M]
+            expect = chan_digest(make_chan(api_cls, lv_list, kl_batch_combine=False), with_klu=False)
+            assert_same(chan_digest(make_chan(api_cls, lv_list, kl_batch_combine=True), with_klu=False), expect)
@@ -0,0 +1,117 @@
+import datetime
+import itertools
+import random
+import time
+
+import numpy as np
+import pytest
+
+import Common.CTime as CTimeModule
+from Common.CTime import CTime, local_ts, minute_key2time, time_key2ts
+from KLine.KLine_Store import key2time, time2key
+
+# 时区 -> 夏令时切换的日期；Lord_Howe 切换半小时，切换所在的小时内偏移不一致，不能按整点缓存
+DST_DAYS = {
+    "Asia/Shanghai": [(2021, 3, 14)],
+    "America/New_York": [(2021, 3, 14), (2021, 11, 7)],
+    "Europe/London": [(2021, 3, 28), (2021, 10, 31)],
+    "Australia/Lord_Howe": [(2021, 4, 4), (2021, 10, 3)],
+}
+
+
+@pytest.fixture(params=list(DST_DAYS))
+def zone(request, monkeypatch):
+    # 切换本地时区；整点时间戳缓存与时区有关，前后都要清空
+    monkeypatch.setenv("TZ", request.param)
+    time.tzset()
+    CTimeModule._HOUR_TS.clear()
+    yield request.param
+    monkeypatch.undo()
+    time.tzset()
+    CTimeModule._HOUR_TS.clear()
+
+
+def ref_ts(year, month, day, hour, minute, second=0, auto=False) -> int:
+    if auto and hour == 0 and minute == 0:
+        hour, minute = 23, 59
+    return int(datetime.datetime(year, month, day, hour, minute, second).timestamp())
+
+
+def day_fields(zone):
+    # 切换日及前后一天每个小时的整点、半点附近和小时末尾
+    for year, month, day in DST_DAYS[zone]:
+        for delta in (-1, 0, 1):
+            date = datetime.date(year, month, day) + datetime.timedelta(days=delta)
+            for hour, minute, second in itertools.product(range(24), (0, 1, 29, 30, 31, 59), (0, 59)):
+                yield date.year, date.month, date.day, hour, minute, second
+
+
+def test_local_ts_across_dst(zone):
+    fields_lst = list(day_fields(zone))
+    # 第一遍填充整点缓存，第二遍命中缓存，都与 datetime 一致
+    for _ in range(2):
+        for fields in fields_lst:
+            assert local_ts(*fields) == ref_ts(*fields), (zone, fields)
+            assert CTime(*fields, auto=False).ts == ref_ts(*fields)
+            assert CTime(*fields, auto=True).ts == ref_ts(*fields, auto=True)
+    if zone == "Australia/Lord_Howe":
+        assert CTimeModule._HOUR_TS[2021100302] is None
+        assert CTimeModule._HOUR_TS[2021100301] is not None
+
+
+def test_time_key2ts_round_trip(zone):
+    rng = random.Random(0)
+    fields_lst = list(day_fields(zone))
+    rng.shuffle(fields_lst)
+    auto = np.array([rng.random() < 0.5 for _ in fields_lst])
+    time_lst = [CTime(*fields, auto=bool(a)) for fields, a in zip(fields_lst, auto)]
+    key = np.array([time2key(t) for t in time_lst], dtype=np.int64)
+    CTimeModule._HOUR_TS.clear()
+    ts = time_key2ts(key, auto)
+    assert ts.tolist() == [t.ts for t in time_lst]
+    for k, a, t_ts, t in zip(key.tolist(), auto.tolist(), ts.tolist(), time_lst):
+        restored = key2time(k, a, t_ts)
+        assert time2key(restored) == k and restored.auto == a
+        assert restored == t and hash(restored) == hash(t) and restored.to_str() == t.to_str()
+        # 不传 ts 时按字段计算，结果相同
+        assert key2time(k, a).ts == t_ts
+        if t.second == 0:
+            assert minute_key2time(t.to_minute_key(), a).ts == t_ts
+    with pytest.raises(ValueError):
+        time_key2ts(np.array([20210314026000]), np.array([False]))
+
+
+def test_ctime_order_matches_timestamp(zone):
+    '''
+    由字段构造与由整数（time_key2ts 批量算好的 ts）构造的 CTime 混合比较，大小、相等与 datetime 的时间戳一致
+    '''
+    rng = random.Random(1)
+    fields_lst = rng.sample(list(day_fields(zone)), 300)
+    auto_lst = [rng.random() < 0.5 for _ in fields_lst]
+    from_fields = [CTime(*fields, auto=a) for fields, a in zip(fields_lst, auto_lst)]
+    key = np.array([time2key(t) for t in from_fields], dtype=np.int64)
+    from_int = [key2time(k, a, t_ts) for k, a, t_ts in zip(key.tolist(), auto_lst, time_key2ts(key, np.array(auto_lst)).tolist())]
+    ref = [ref_ts(*fields, auto=a) for fields, a in zip(fields_lst, auto_lst)]
+    for (i, a), (j, b) in itertools.product(enumerate(from_fields), enumerate(from_int)):
+        assert (a < b) == (ref[i] < ref[j]) and (a > b) == (ref[i] > ref[j])
+        assert (a <= b) == (ref[i] <= ref[j]) and (a >= b) == (ref[i] >= ref[j])
+        assert (a == b) == (ref[i] == ref[j]) and (a != b) == (ref[i] != ref[j])
+    assert [t.ts for t in sorted(from_int)] == sorted(ref)
+    # 相同时刻的 CTime 可以作为字典的 key 互相查找
+    lookup = {t: pos for pos, t in enumerate(from_fields)}
+    assert all(ref[lookup[t]] == ref[pos] for pos, t in enumerate(from_int))
+    assert CTime(2021, 3, 14, 0, 0) != "2021/03/14"
+
+
+def test_hour_boundary_order(zone):
+    # 连续的时间戳换算成本地时间再构造 CTime：除了夏令时结束时重复的一段，时间戳与 datetime 一致且随时间递增
+    year, month, day = DST_DAYS[zone][-1]
+    begin = int(datetime.datetime(year, month, day).timestamp())
+    pre = None
+    for ts in range(begin, begin + 2 * 86400, 60):
+        dt = datetime.datetime.fromtimestamp(ts)
+        t = CTime(dt.year, dt.month, dt.day, dt.hour, dt.minute, auto=False)
+        assert t.ts == ref_ts(dt.year, dt.month, dt.day, dt.hour, dt.minute)
+        if t.ts == ts:
+            assert pre is None or pre < t
+            pre = t
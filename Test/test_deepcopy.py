@@ -0,0 +1,28 @@
+import copy
+
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import DATA_SRC, KL_TYPE
+from Test.chan_util import TEST_CONF, assert_same, chan_digest, csv_chan, csv_klu_lst
+
+
+def test_deepcopy_independent():
+    expect = chan_digest(csv_chan())
+    for step in (False, True):
+        chan = CChan("sh.000001", end_time="2015-01-01", data_src=DATA_SRC.CSV, lv_list=[KL_TYPE.K_DAY], config=CChanConfig({**TEST_CONF, "trigger_step": step}))
+        if step:
+            for _ in chan.step_load():
+                pass
+        before = chan_digest(chan)
+        branch = copy.deepcopy(chan)
+        assert_same(chan_digest(branch), before)
+        # 分支上喂完剩余K线，结果与一次性计算一致，原对象不变
+        for klu in csv_klu_lst("2015-01-01"):
+            branch.feed(klu)
+        assert_same(chan_digest(branch), expect)
+        assert_same(chan_digest(chan), before)
+        # 原对象继续喂，同样与一次性计算一致
+        for klu in csv_klu_lst("2015-01-01"):
+            chan.feed(klu)
+        assert_same(chan_digest(chan), expect)
+
@@ -0,0 +1,46 @@
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import DATA_SRC, KL_TYPE
+from DataAPI.Prefetch import preloaded_stockapi_cls
+from Test.chan_util import MULTI_LV, N_DAYS, SEED, TEST_CONF, assert_same, chan_digest, csv_chan, csv_klu_lst, feed_order, lv_klu_lst, make_chan, random_walk_cls
+
+
+def test_csv_feed_from_scratch():
+    expect = chan_digest(csv_chan())
+    chan = CChan("sh.000001", data_src=DATA_SRC.CSV, lv_list=[KL_TYPE.K_DAY], config=CChanConfig({**TEST_CONF, "trigger_step": True}))
+    for klu in csv_klu_lst():
+        chan.feed(klu)
+    assert_same(chan_digest(chan), expect)
+
+
+def test_csv_batch_then_feed():
+    expect = chan_digest(csv_chan())
+    chan = CChan("sh.000001", end_time="2015-01-01", data_src=DATA_SRC.CSV, lv_list=[KL_TYPE.K_DAY], config=CChanConfig(dict(TEST_CONF)))
+    for klu in csv_klu_lst("2015-01-01"):
+        chan.feed(klu)
+    assert_same(chan_digest(chan), expect)
+
+
+def test_multi_lv_feed():
+    api_cls = random_walk_cls(SEED, N_DAYS)
+    expect = chan_digest(make_chan(api_cls, MULTI_LV))
+    assert_same(chan_digest(make_chan(api_cls, MULTI_LV, step=True)), expect)
+    for child_first in (False, True):
+        chan = CChan("test", data_src=api_cls, lv_list=list(MULTI_LV), config=CChanConfig({**TEST_CONF, "trigger_step": True}))
+        for lv_idx, klu in feed_order(lv_klu_lst(), child_first):
+            chan.feed(klu, lv_idx)
+        assert_same(chan_digest(chan), expect)
+
+
+def test_multi_lv_batch_then_feed():
+    api_cls = random_walk_cls(SEED, N_DAYS)
+    expect = chan_digest(make_chan(api_cls, MULTI_LV))
+    order = feed_order(lv_klu_lst(), child_first=False)
+    # 在一根最高级别K线处切开：之前的批量 load，之后的逐根 feed
+    cut = [i for i, (lv_idx, _) in enumerate(order) if lv_idx == 0][N_DAYS // 2]
+    history = {lv: [klu for lv_idx, klu in order[:cut] if lv_idx == i] for i, lv in enumerate(MULTI_LV)}
+    chan = CChan("test", data_src=preloaded_stockapi_cls(history), lv_list=list(MULTI_LV), config=CChanConfig(dict(TEST_CONF)))
+    for lv_idx, klu in order[cut:]:
+        chan.feed(klu, lv_idx)
+    assert_same(chan_digest(chan), expect)
+
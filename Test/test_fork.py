@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import DATA_FIELD, DATA_SRC, KL_TYPE
+from Common.ChanException import CChanException
+from DataAPI.Prefetch import preloaded_stockapi_cls
+from KLine.KLine_Unit import CKLine_Unit
+from Test.chan_util import MULTI_LV, N_DAYS, SEED, TEST_CONF, assert_same, chan_digest, csv_chan, csv_klu_lst, feed_order, lv_klu_lst, make_chan, random_walk_cls
+
+
+def hypothetical_klu(klu: CKLine_Unit, rng: random.Random) -> CKLine_Unit:
+    # 与真实K线同一时刻、价格随机扰动的假设K线
+    scale = rng.choice([0.002, 0.01, 0.05])
+    open_ = klu.open * (1 + rng.uniform(-scale, scale))
+    close = klu.close * (1 + rng.uniform(-scale, scale))
+    return CKLine_Unit({
+        DATA_FIELD.FIELD_TIME: klu.time,
+        DATA_FIELD.FIELD_OPEN: open_,
+        DATA_FIELD.FIELD_HIGH: max(open_, close) * (1 + rng.uniform(0, 0.01)),
+        DATA_FIELD.FIELD_LOW: min(open_, close) * (1 - rng.uniform(0, 0.01)),
+        DATA_FIELD.FIELD_CLOSE: close,
+    })
+
+
+def object_ids(chan: CChan):
+    # 各级别的K线、笔、线段、中枢、买卖点对象，撤销后应当还是原来那些对象
+    res = []
+    for lv in chan.lv_list:
+        kl_list = chan[lv]
+        res.append([id(klc) for klc in kl_list.lst])
+        res.append([id(bi) for bi in kl_list.bi_list])
+        res.append([id(seg) for seg in kl_list.seg_list])
+        res.append([id(zs) for zs in kl_list.zs_list])
+        res.append(sorted(id(bsp) for bsp in kl_list.bs_point_lst.bsp_iter()))
+    return res
+
+
+def test_fork_discard_restores():
+    expect = chan_digest(CChan("sh.000001", data_src=DATA_SRC.CSV, lv_list=[KL_TYPE.K_DAY], config=CChanConfig(dict(TEST_CONF))))
+    rng = random.Random(SEED)
+    chan = CChan("sh.000001", end_time="2015-01-01", data_src=DATA_SRC.CSV, lv_list=[KL_TYPE.K_DAY], config=CChanConfig(dict(TEST_CONF)))
+    klu_lst = csv_klu_lst("2015-01-01")
+    before, before_ids = chan_digest(chan), object_ids(chan)
+    with chan.fork() as branch:
+        assert branch is chan
+        for klu in klu_lst[:200]:
+            chan.feed(hypothetical_klu(klu, rng))
+        assert len(chan[0].lst) > len(before["K_DAY"]["klc"])
+    assert_same(chan_digest(chan), before)
+    assert object_ids(chan) == before_ids
+    # 撤销之后喂真实K线，与一次性计算一致
+    for klu in klu_lst:
+        chan.feed(klu)
+    assert_same(chan_digest(chan), expect)
+
+
+@pytest.mark.parametrize("step", [False, True])
+def test_fork_every_bar_multi_lv(step):
+    '''
+    逐根喂入的过程中每隔几根K线就 fork 一次、喂几根假设K线再撤销，最终结果与不 fork 时一致
+    '''
+    api_cls = random_walk_cls(SEED, N_DAYS)
+    expect = chan_digest(make_chan(api_cls, MULTI_LV))
+    rng = random.Random(SEED)
+    for child_first in ([False, True] if step else [False]):
+        order = feed_order(lv_klu_lst(), child_first)
+        if step:
+            chan = CChan("test", data_src=api_cls, lv_list=list(MULTI_LV), config=CChanConfig({**TEST_CONF, "trigger_step": True}))
+        else:
+            cut = [i for i, (lv_idx, _) in enumerate(order) if lv_idx == 0][N_DAYS // 2]
+            history = {lv: [klu for lv_idx, klu in order[:cut] if lv_idx == i] for i, lv in enumerate(MULTI_LV)}
+            chan = CChan("test", data_src=preloaded_stockapi_cls(history), lv_list=list(MULTI_LV), config=CChanConfig(dict(TEST_CONF)))
+            order = order[cut:]
+        for pos, (lv_idx, klu) in enumerate(order):
+            if pos % 7 == 0:
+                with chan.fork():
+                    for branch_lv_idx, branch_klu in order[pos:pos+rng.randint(1, 20)]:
+                        chan.feed(hypothetical_klu(branch_klu, rng), branch_lv_idx)
+            chan.feed(klu, lv_idx)
+        assert_same(chan_digest(chan), expect)
+
+
+def test_fork_restores_on_exception():
+    chan = CChan("sh.000001", end_time="2015-01-01", data_src=DATA_SRC.CSV, lv_list=[KL_TYPE.K_DAY], config=CChanConfig(dict(TEST_CONF)))
+    before = chan_digest(chan)
+    klu_lst = csv_klu_lst("2015-01-01")
+    with pytest.raises(CChanException):
+        with chan.fork():
+            chan.feed(klu_lst[1])
+            chan.feed(klu_lst[0])  # 时间倒退
+    assert_same(chan_digest(chan), before)
+
+
+def test_fork_saves_tail_only():
+    # 已经确定的前缀不保存：只有最后3根合并K线、最后一根K线，笔只保存最后一个确定线段附近开始的部分
+    chan = csv_chan()
+    kl_list = chan[0]
+    fork = chan.fork()
+    saved = fork.rollback.saved
+    klu_lst = [klu for klc in kl_list.lst for klu in klc.lst]
+    assert [id(klc) in saved for klc in kl_list.lst[-4:]] == [False, True, True, True]
+    assert not any(id(klc) in saved for klc in kl_list.lst[:-3])
+    assert [id(klu) in saved for klu in klu_lst[-2:]] == [False, True]
+    saved_bi_cnt = sum(id(bi) in saved for bi in kl_list.bi_list)
+    assert 0 < saved_bi_cnt < len(kl_list.bi_list) // 2
+    assert id(kl_list.bi_list[0]) not in saved
+    assert len(fork.rollback) < len(klu_lst) // 2
+    fork.discard()
+
+
+def test_fork_discard_twice():
+    chan = make_chan(random_walk_cls(SEED, 5), [KL_TYPE.K_DAY])
+    fork = chan.fork()
+    fork.discard()
+    with pytest.raises(CChanException):
+        fork.discard()
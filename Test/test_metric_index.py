@@ -0,0 +1,32 @@
+import math
+
+from Common.CEnum import MACD_ALGO
+from Test.chan_util import MULTI_LV, N_DAYS, SEED, csv_chan, make_chan, random_walk_cls
+
+# 前缀和相减与逐根累加的允许误差
+REL_TOL = 1e-9
+
+
+def check_same_metric(chan, index_chan):
+    for lv in chan.lv_list:
+        assert chan[lv].metric_index is None
+        assert index_chan[lv].metric_index is not None and index_chan[lv].metric_index.valid
+        assert len(chan[lv].bi_list) == len(index_chan[lv].bi_list)
+        for bi, index_bi in zip(chan[lv].bi_list, index_chan[lv].bi_list):
+            for macd_algo in MACD_ALGO:
+                for is_reverse in (False, True):
+                    expect = bi.cal_macd_metric(macd_algo, is_reverse)
+                    value = index_bi.cal_macd_metric(macd_algo, is_reverse)
+                    assert math.isclose(value, expect, rel_tol=REL_TOL, abs_tol=REL_TOL), (lv, bi.idx, macd_algo, is_reverse, value, expect)
+
+
+def test_metric_index_same_as_loop():
+    # 默认不建索引，逐根遍历K线；开启后各 MACD_ALGO 的区间查询结果与逐根计算一致（允许浮点末位差异）
+    check_same_metric(csv_chan(), csv_chan(bi_metric_index=True))
+    api_cls = random_walk_cls(SEED, N_DAYS)
+    check_same_metric(make_chan(api_cls, MULTI_LV), make_chan(api_cls, MULTI_LV, bi_metric_index=True))
+
+
+def test_metric_index_step():
+    # 回放模式下索引逐根追加，结果同样一致
+    check_same_metric(csv_chan(step=True), csv_chan(step=True, bi_metric_index=True))
@@ -0,0 +1,84 @@
+import pytest
+
+from Chan import CChan
+from ChanConfig import CChanConfig
+from DataAPI.Prefetch import preloaded_stockapi_cls
+from Test.chan_util import MULTI_LV, N_DAYS, SEED, TEST_CONF, CSymbolRandomWalkApi, all_klu, assert_same, chan_digest, feed_order, lv_klu_lst, make_chan, random_walk_cls
+
+
+class COverrideApiChan(CChan):
+    # 重载 GetStockAPI 决定数据源，data_src 本身不是合法的数据源
+    def GetStockAPI(self):
+        return CSymbolRandomWalkApi
+
+
+def link_digest(chan):
+    '''
+    父子级别K线关系：sup_kl/sub_kl_list 引用的必须是相邻级别中的同一个对象，而不只是下标相同
+    '''
+    res = {}
+    klu_lst_lst = [[klu for klc in chan[lv].lst for klu in klc.lst] for lv in chan.lv_list]
+    for lv_idx, lv in enumerate(chan.lv_list):
+        klu_lst = klu_lst_lst[lv_idx]
+        assert [klu.idx for klu in klu_lst] == list(range(len(klu_lst)))
+        for klu in klu_lst:
+            if klu.sup_kl is not None:
+                assert klu.sup_kl is klu_lst_lst[lv_idx-1][klu.sup_kl.idx]
+                assert any(sub is klu for sub in klu.sup_kl.sub_kl_list)
+            for sub_klu in klu.sub_kl_list:
+                assert sub_klu is klu_lst_lst[lv_idx+1][sub_klu.idx] and sub_klu.sup_kl is klu
+        res[lv.name] = [(None if klu.sup_kl is None else klu.sup_kl.idx, [sub.idx for sub in klu.sub_kl_list]) for klu in klu_lst]
+    return res
+
+
+def level_digest(chan):
+    # 每个级别的笔/线段/中枢/买卖点（含线段的线段一层）
+    digest = chan_digest(chan, with_klu=False)
+    keys = ("bi", "seg", "segseg", "zs", "segzs", "bsp", "segbsp")
+    return {lv: {key: digest[lv][key] for key in keys} for lv in digest}
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_parallel_lv_same_as_serial(backend):
+    api_cls = random_walk_cls(SEED, N_DAYS)
+    serial = make_chan(api_cls, MULTI_LV)
+    chan = make_chan(api_cls, MULTI_LV, parallel_lv=True, parallel_lv_backend=backend)
+    assert_same(level_digest(chan), level_digest(serial))
+    assert_same(link_digest(chan), link_digest(serial))
+    assert_same(chan_digest(chan), chan_digest(serial))
+    assert chan.kl_misalign_cnt == serial.kl_misalign_cnt
+    assert dict(chan.kl_inconsistent_detail) == dict(serial.kl_inconsistent_detail)
+    # 各级别共用 chan.conf，与串行时一样
+    assert all(chan[lv].config is chan.conf for lv in MULTI_LV)
+
+
+def trim_api_cls():
+    # 次级别数据比最高级别多出半天；预加载的K线对象会被 CChan 修改，每次重新生成
+    order = feed_order(lv_klu_lst(), child_first=False)
+    cut = [i for i, (lv_idx, _) in enumerate(order) if lv_idx == 0][N_DAYS // 2]
+    history = {lv: [klu for lv_idx, klu in order[:cut] if lv_idx == i] for i, lv in enumerate(MULTI_LV)}
+    for lv_idx in (1, 2):
+        history[MULTI_LV[lv_idx]] += [klu for i, klu in order[cut:cut+40] if i == lv_idx]
+    return preloaded_stockapi_cls(history)
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_parallel_lv_trim_sub_lv(backend):
+    # 串行 load 只加载到父级别最后一根K线，并行时也一样
+    serial = make_chan(trim_api_cls(), MULTI_LV)
+    chan = make_chan(trim_api_cls(), MULTI_LV, parallel_lv=True, parallel_lv_backend=backend)
+    assert len(all_klu(serial)) < sum(len(klu_lst) for klu_lst in trim_api_cls().kl_data.values())
+    assert_same(level_digest(chan), level_digest(serial))
+    assert_same(link_digest(chan), link_digest(serial))
+    assert_same(chan_digest(chan), chan_digest(serial))
+    assert [klu and str(klu.time) for klu in chan.klu_cache] == [klu and str(klu.time) for klu in serial.klu_cache]
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_parallel_lv_override_stock_api(backend):
+    # 并行时 worker 使用 CChan.GetStockAPI 的结果，与串行一致
+    config = CChanConfig({**TEST_CONF, "parallel_lv": True, "parallel_lv_backend": backend})
+    chan = COverrideApiChan("test", data_src="override", lv_list=list(MULTI_LV), config=config)
+    serial = make_chan(CSymbolRandomWalkApi, MULTI_LV)
+    assert_same(chan_digest(chan), chan_digest(serial))
+    assert_same(link_digest(chan), link_digest(serial))
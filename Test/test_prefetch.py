@@ -0,0 +1,60 @@
+from ChanBatch import iter_chan
+from ChanConfig import CChanConfig
+from Common.CEnum import KL_TYPE
+from Common.ChanException import CChanException, ErrCode
+from DataAPI.LocalServer import CLocalKLineServer
+from Test.chan_util import MULTI_LV, TEST_CONF, assert_same, chan_digest, make_chan, random_walk_cls
+
+UPSTREAM = random_walk_cls(3, 40)
+
+
+def test_http_source():
+    expect = chan_digest(make_chan(UPSTREAM, MULTI_LV))
+    with CLocalKLineServer(UPSTREAM, latency=0.01) as server:
+        for use_async in (False, True):
+            for prefetch in (0, 64):
+                chan = make_chan(server.client_cls(use_async), MULTI_LV, kl_prefetch=prefetch)
+                assert_same(chan_digest(chan), expect)
+        assert len(server.request_log) == 4 * len(MULTI_LV)
+
+
+def test_http_step():
+    expect = chan_digest(make_chan(UPSTREAM, MULTI_LV, step=True))
+    with CLocalKLineServer(UPSTREAM) as server:
+        assert_same(chan_digest(make_chan(server.client_cls(use_async=True), MULTI_LV, step=True, kl_prefetch=16)), expect)
+
+
+def test_http_not_found():
+    with CLocalKLineServer(UPSTREAM) as server:
+        for use_async in (False, True):
+            try:
+                make_chan(server.client_cls(use_async), [KL_TYPE.K_WEEK])
+            except CChanException as e:
+                assert e.errcode == ErrCode.SRC_DATA_NOT_FOUND
+            else:
+                raise AssertionError("should raise SRC_DATA_NOT_FOUND")
+
+
+def test_iter_chan():
+    code_list = ["a", "b", "c", "d"]
+    expect = chan_digest(make_chan(UPSTREAM, MULTI_LV))
+    with CLocalKLineServer(UPSTREAM, latency=0.01) as server:
+        res = list(iter_chan(code_list, data_src=server.client_cls(), lv_list=MULTI_LV, config=CChanConfig(dict(TEST_CONF)), prefetch_cnt=2))
+        assert [code for code, _ in res] == code_list
+        for _, chan in res:
+            assert_same(chan_digest(chan), expect)
+        assert len(server.request_log) == len(code_list) * len(MULTI_LV)
+
+
+def test_iter_chan_step_no_refetch():
+    code_list = ["a", "b"]
+    expect = chan_digest(make_chan(UPSTREAM, MULTI_LV, step=True))
+    with CLocalKLineServer(UPSTREAM) as server:
+        config = CChanConfig({**TEST_CONF, "trigger_step": True})
+        for _, chan in iter_chan(code_list, data_src=server.client_cls(), lv_list=MULTI_LV, config=config):
+            for _ in chan.step_load():
+                pass
+            assert_same(chan_digest(chan), expect)
+        # step_load 用的是预取好的数据，没有再访问服务
+        assert len(server.request_log) == len(code_list) * len(MULTI_LV)
+
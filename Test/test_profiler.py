@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from Common.profiler import PROFILER, disable_profile, enable_profile
+from Test.chan_util import MULTI_LV, N_DAYS, SEED, all_klu, assert_same, chan_digest, make_chan, random_walk_cls
+
+STAGES = [
+    "chan.data_source", "kline.set_metric", "kline.combine", "bi.update_bi", "kline.cal_seg_and_zs",
+    "seg.cal_seg", "segseg.cal_seg", "seg.update", "segseg.update", "zs.cal_bi_zs", "segzs.cal_bi_zs", "bsp.cal", "seg_bsp.cal",
+]
+
+
+@pytest.fixture(autouse=True)
+def profiler_off():
+    # 统计是进程内全局的，每个用例前后都关闭并清空
+    disable_profile()
+    PROFILER.reset()
+    yield
+    disable_profile()
+    PROFILER.reset()
+
+
+def is_empty(data: dict) -> bool:
+    return data == {"stages": {}, "counters": {}, "cache": {}}
+
+
+@pytest.mark.parametrize("step", [False, True])
+def test_profile_on(step):
+    api_cls = random_walk_cls(SEED, N_DAYS)
+    expect = chan_digest(make_chan(api_cls, MULTI_LV, step=step))
+    assert is_empty(PROFILER.to_dict())
+    enable_profile()
+    chan = make_chan(api_cls, MULTI_LV, step=step)
+    disable_profile()
+    # 打开统计不影响计算结果
+    assert_same(chan_digest(chan), expect)
+    data = PROFILER.to_dict()
+    for stage in STAGES + ([] if step else ["kline.metric_batch"]):
+        assert data["stages"][stage]["calls"] > 0 and data["stages"][stage]["seconds"] >= 0, stage
+    for lv in MULTI_LV:
+        assert data["counters"][f"chan.klu.{lv.name}"] == len([klu for klu in all_klu(chan) if klu.kl_type == lv])
+    assert data["counters"]["seg.add_seg"] > 0 and data["counters"]["bi.virtual_bi_add"] > 0
+    if step:
+        # 回放模式每根K线都会补虚笔、尝试计算线段的线段
+        assert data["counters"]["bi.virtual_bi_delete"] > 0 and data["counters"]["segseg.skip"] > 0
+    cache = data["cache"]["CBi._high"]
+    assert cache["hit"] > 0 and cache["miss"] > 0 and cache["hit_rate"] == cache["hit"] / (cache["hit"] + cache["miss"])
+    text = PROFILER.to_prometheus()
+    assert f'chan_events_total{{event="chan.klu.K_DAY"}} {N_DAYS}' in text
+    assert 'chan_cache_requests_total{cache="CBi._high",result="hit"}' in text
+
+
+def test_profile_off():
+    api_cls = random_walk_cls(SEED, N_DAYS)
+    make_chan(api_cls, MULTI_LV, step=True)
+    assert is_empty(PROFILER.to_dict())
+    # 关闭之后之前的统计保持不变，不再累加
+    enable_profile()
+    make_chan(api_cls, MULTI_LV)
+    disable_profile()
+    data = PROFILER.to_dict()
+    make_chan(api_cls, MULTI_LV, step=True)
+    assert PROFILER.to_dict() == data
+    # enable_profile(reset=False) 在之前的统计上累加
+    enable_profile(reset=False)
+    make_chan(api_cls, MULTI_LV)
+    disable_profile()
+    assert PROFILER.to_dict()["counters"] == {name: cnt * 2 for name, cnt in data["counters"].items()}
+
+
+def test_stage_begin_when_off():
+    # 阶段开始时还没有打开的，打开之后结束也不计入
+    begin = time.perf_counter() if PROFILER.on else 0.0
+    enable_profile()
+    PROFILER.add_time("test.stage", begin)
+    assert "test.stage" not in PROFILER.to_dict()["stages"]
+    with PROFILER.stage("test.stage"):
+        pass
+    disable_profile()
+    with PROFILER.stage("test.stage"):
+        pass
+    assert PROFILER.to_dict()["stages"]["test.stage"]["calls"] == 1
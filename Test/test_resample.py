@@ -0,0 +1,212 @@
+import bisect
+import copy
+import datetime
+import math
+
+import pytest
+
+from Benchmark.BenchData import random_walk_base, random_walk_frames
+from Chan import CChan
+from ChanConfig import CChanConfig
+from Common.CEnum import DATA_FIELD, KL_TYPE
+from Common.ChanException import CChanException, ErrCode
+from Common.CTime import CTime
+from DataAPI.Prefetch import preloaded_stockapi_cls
+from DataAPI.Resample import SESSION_CALENDAR, CKLineResampler
+from KLine.KLine_Unit import CKLine_Unit
+from Test.chan_util import MULTI_LV, N_DAYS, SEED, TEST_CONF, all_klu, assert_same, chan_digest, make_chan
+
+A_SHARE_LV = [KL_TYPE.K_DAY, KL_TYPE.K_60M, KL_TYPE.K_30M, KL_TYPE.K_15M, KL_TYPE.K_5M]
+CRYPTO_LV = [KL_TYPE.K_DAY, KL_TYPE.K_60M, KL_TYPE.K_5M]
+
+
+def a_share_base(drop=True):
+    # 随机游走的5分钟K线；drop 时去掉第3天 10:00（30分钟K线的最后一根）和第5天 15:00（当天最后一根）
+    klu_lst = list(random_walk_frames(SEED, N_DAYS)[KL_TYPE.K_5M].klu_iter())
+    return [klu for pos, klu in enumerate(klu_lst) if not drop or pos not in (2*48+5, 4*48+47)]
+
+
+def crypto_base():
+    # 两天全天交易的5分钟K线，时间为开始时间；去掉第一天 10:00（60分钟K线的第一根）和 23:55（当天最后一根）
+    base = random_walk_base(SEED, 12)
+    begin = datetime.datetime(2021, 3, 1)
+    klu_lst = []
+    for pos in range(len(base[DATA_FIELD.FIELD_TIME])):
+        if pos in (120, 287):
+            continue
+        t = begin + datetime.timedelta(minutes=5*pos)
+        klu_lst.append(CKLine_Unit({
+            DATA_FIELD.FIELD_TIME: CTime(t.year, t.month, t.day, t.hour, t.minute, auto=False),
+            **{field: float(base[field][pos]) for field in (DATA_FIELD.FIELD_OPEN, DATA_FIELD.FIELD_HIGH, DATA_FIELD.FIELD_LOW, DATA_FIELD.FIELD_CLOSE, DATA_FIELD.FIELD_VOLUME)},
+        }))
+    return klu_lst
+
+
+def aggregate(klu_lst, group_time):
+    '''
+    数据源原生的合成方式：group_time 给出每根K线所属K线的时间，同一时间的K线合成一根
+    '''
+    res = []
+    for klu in klu_lst:
+        t = group_time(klu.time)
+        if res and str(res[-1][DATA_FIELD.FIELD_TIME]) == str(t):
+            item = res[-1]
+            item[DATA_FIELD.FIELD_HIGH] = max(item[DATA_FIELD.FIELD_HIGH], klu.high)
+            item[DATA_FIELD.FIELD_LOW] = min(item[DATA_FIELD.FIELD_LOW], klu.low)
+            item[DATA_FIELD.FIELD_CLOSE] = klu.close
+        else:
+            item = {DATA_FIELD.FIELD_TIME: t, DATA_FIELD.FIELD_OPEN: klu.open, DATA_FIELD.FIELD_HIGH: klu.high, DATA_FIELD.FIELD_LOW: klu.low, DATA_FIELD.FIELD_CLOSE: klu.close}
+            res.append(item)
+        for metric, value in klu.trade_info.metric.items():
+            if value is not None:
+                item[metric] = item.get(metric, 0.0) + value
+    return res
+
+
+def a_share_native(klu_lst, lv):
+    # 每根5分钟K线归入原生K线中时间不早于它的第一根
+    if lv == KL_TYPE.K_5M:
+        return [dict(bar_item(klu)) for klu in klu_lst]
+    label_lst = [klu.time for klu in random_walk_frames(SEED, N_DAYS)[lv].klu_iter()]
+    label_ts = [t.ts for t in label_lst]
+    return aggregate(klu_lst, lambda t: label_lst[bisect.bisect_left(label_ts, t.ts)])
+
+
+def crypto_native(klu_lst, lv):
+    # ccxt 的K线时间为开始时间：60分钟K线为整点，日线为当天
+    if lv == KL_TYPE.K_5M:
+        return [dict(bar_item(klu)) for klu in klu_lst]
+    if lv == KL_TYPE.K_60M:
+        return aggregate(klu_lst, lambda t: CTime(t.year, t.month, t.day, t.hour, 0, auto=False))
+    return aggregate(klu_lst, lambda t: CTime(t.year, t.month, t.day, 0, 0))
+
+
+def bar_item(klu):
+    return {
+        DATA_FIELD.FIELD_TIME: klu.time, DATA_FIELD.FIELD_OPEN: klu.open, DATA_FIELD.FIELD_HIGH: klu.high,
+        DATA_FIELD.FIELD_LOW: klu.low, DATA_FIELD.FIELD_CLOSE: klu.close,
+        **{metric: value for metric, value in klu.trade_info.metric.items() if value is not None},
+    }
+
+
+def bar_digest(item):
+    t = item[DATA_FIELD.FIELD_TIME]
+    return (str(t), t.ts, t.auto, tuple(sorted((key, value) for key, value in item.items() if key != DATA_FIELD.FIELD_TIME)))
+
+
+def native_klu_data(klu_lst, lv_list, native):
+    return {lv: [CKLine_Unit(item) for item in native(klu_lst, lv)] for lv in lv_list}
+
+
+def resample(klu_lst, lv_list, session):
+    resampler = CKLineResampler(lv_list, session)
+    res = {lv: [] for lv in lv_list}
+    for klu in klu_lst:
+        for lv, sup_klu in resampler.update(klu):
+            res[lv].append(sup_klu)
+        res[lv_list[-1]].append(klu)
+    for lv, sup_klu in resampler.flush():
+        res[lv].append(sup_klu)
+    return res
+
+
+def feed_resample_chan(klu_lst, lv_list, **conf):
+    chan = CChan("test", data_src=preloaded_stockapi_cls({}), lv_list=list(lv_list), config=CChanConfig({**TEST_CONF, "trigger_step": True, **conf}))
+    for klu in klu_lst:
+        chan.feed_resample(klu)
+    return chan
+
+
+def test_session_calendar():
+    a_share, crypto = SESSION_CALENDAR["a_share"], SESSION_CALENDAR["crypto"]
+    # A股：时间为结束时间，分钟K线按交易时段开始切分
+    key, closed = a_share.bucket(CTime(2021, 3, 1, 9, 50, auto=False), KL_TYPE.K_5M, KL_TYPE.K_30M)
+    assert not closed and str(a_share.label(key, KL_TYPE.K_30M)) == "2021/03/01 10:00"
+    key, closed = a_share.bucket(CTime(2021, 3, 1, 11, 30, auto=False), KL_TYPE.K_5M, KL_TYPE.K_60M)
+    assert closed and str(a_share.label(key, KL_TYPE.K_60M)) == "2021/03/01 11:30"
+    key, closed = a_share.bucket(CTime(2021, 3, 1, 13, 5, auto=False), KL_TYPE.K_5M, KL_TYPE.K_60M)
+    assert not closed and str(a_share.label(key, KL_TYPE.K_60M)) == "2021/03/01 14:00"
+    key, _ = a_share.bucket(CTime(2021, 3, 3, 0, 0), KL_TYPE.K_DAY, KL_TYPE.K_WEEK)
+    assert a_share.label(key, KL_TYPE.K_WEEK) is None
+    # 数字货币：时间为开始时间
+    key, closed = crypto.bucket(CTime(2021, 3, 1, 10, 55, auto=False), KL_TYPE.K_5M, KL_TYPE.K_60M)
+    assert closed and str(crypto.label(key, KL_TYPE.K_60M)) == "2021/03/01 10:00"
+    key, closed = crypto.bucket(CTime(2021, 3, 1, 23, 55, auto=False), KL_TYPE.K_5M, KL_TYPE.K_DAY)
+    assert closed and str(crypto.label(key, KL_TYPE.K_DAY)) == "2021/03/01"
+    key, _ = crypto.bucket(CTime(2021, 3, 3, 0, 0), KL_TYPE.K_DAY, KL_TYPE.K_WEEK)
+    assert str(crypto.label(key, KL_TYPE.K_WEEK)) == "2021/03/01"
+    parent_time = CTime(2021, 3, 1, 10, 0, auto=False)
+    assert not crypto.after_bucket(CTime(2021, 3, 1, 10, 55, auto=False), KL_TYPE.K_5M, parent_time, KL_TYPE.K_60M)
+    assert crypto.after_bucket(CTime(2021, 3, 1, 11, 0, auto=False), KL_TYPE.K_5M, parent_time, KL_TYPE.K_60M)
+
+
+def test_resampler_same_as_native():
+    for drop in (False, True):
+        klu_lst = a_share_base(drop)
+        resampled = resample(klu_lst, A_SHARE_LV, "a_share")
+        for lv in A_SHARE_LV:
+            expect = [bar_digest(item) for item in a_share_native(a_share_base(drop), lv)]
+            assert [bar_digest(bar_item(klu)) for klu in resampled[lv]] == expect, lv
+            if not drop:
+                # 没有缺失时就是数据源原生的各级别K线（原生数据的成交额求和顺序不同，只比较到浮点误差）
+                native_lst = list(random_walk_frames(SEED, N_DAYS)[lv].klu_iter())
+                assert len(resampled[lv]) == len(native_lst)
+                for item, native_klu in zip(resampled[lv], native_lst):
+                    assert bar_digest(bar_item(item))[:3] == bar_digest(bar_item(native_klu))[:3]
+                    assert (item.open, item.high, item.low, item.close) == (native_klu.open, native_klu.high, native_klu.low, native_klu.close)
+                    for metric, value in native_klu.trade_info.metric.items():
+                        assert value is None or math.isclose(item.trade_info.metric[metric], value, rel_tol=1e-12)
+    # 缺了最后一根的30分钟K线仍然标记为 10:00
+    day = klu_lst[2*48].time.toDateStr("/")
+    assert f"{day} 10:00" in [str(klu.time) for klu in resampled[KL_TYPE.K_30M]]
+    resampled = resample(crypto_base(), CRYPTO_LV, "crypto")
+    for lv in CRYPTO_LV:
+        assert [bar_digest(bar_item(klu)) for klu in resampled[lv]] == [bar_digest(item) for item in crypto_native(crypto_base(), lv)], lv
+
+
+def test_a_share_resample_chan():
+    lv_list = list(MULTI_LV)
+    # 各级别分别从数据源读取原生K线的结果
+    expect = chan_digest(make_chan(preloaded_stockapi_cls(native_klu_data(a_share_base(), lv_list, a_share_native)), lv_list))
+    assert_same(chan_digest(make_chan(preloaded_stockapi_cls({lv_list[-1]: a_share_base()}), lv_list, kl_resample=True)), expect)
+    assert_same(chan_digest(feed_resample_chan(a_share_base(), lv_list)), expect)
+
+
+def test_a_share_forming_view():
+    lv_list = list(MULTI_LV)
+    klu_lst = a_share_base()
+    # 切在第4天 9:50，当天的日线和 9:30~10:00 的30分钟K线都还没走完
+    cut = 3*48+4
+    chan = feed_resample_chan(klu_lst[:cut], lv_list)
+    before = chan_digest(chan)
+    view = chan.forming_view()
+    assert_same(chan_digest(chan), before)
+    assert str(view[KL_TYPE.K_30M][-1][-1].time) == klu_lst[cut-1].time.toDateStr("/") + " 10:00"
+    expect = make_chan(preloaded_stockapi_cls(native_klu_data(a_share_base()[:cut], lv_list, a_share_native)), lv_list)
+    assert_same(chan_digest(view), chan_digest(expect))
+
+
+def test_crypto_resample_chan():
+    chan = make_chan(preloaded_stockapi_cls({KL_TYPE.K_5M: crypto_base()}), CRYPTO_LV, kl_resample=True, kl_session="crypto")
+    assert chan.kl_misalign_cnt == 0
+    for lv_idx, lv in enumerate(CRYPTO_LV[1:], start=1):
+        # 父级别K线的时间为开始时间，包含的K线都不早于它
+        parent_lv = CRYPTO_LV[lv_idx-1]
+        for klc in chan[lv].lst:
+            for klu in klc.lst:
+                t = klu.time
+                assert str(klu.sup_kl.time) == str(CTime(t.year, t.month, t.day, t.hour if parent_lv == KL_TYPE.K_60M else 0, 0))
+    for lv in CRYPTO_LV:
+        assert [bar_digest(bar_item(klu)) for klu in all_klu(chan) if klu.kl_type == lv] == [bar_digest(item) for item in crypto_native(crypto_base(), lv)], lv
+    feed_chan = feed_resample_chan(crypto_base(), CRYPTO_LV, kl_session="crypto")
+    assert_same(chan_digest(feed_chan), chan_digest(chan))
+    # 交易时段在初始化时解析一次，合成器与 after_parent 用的是同一个对象，deepcopy 之后也是
+    assert feed_chan.session_calendar is SESSION_CALENDAR["crypto"] and feed_chan.resampler.calendar is feed_chan.session_calendar
+    branch = copy.deepcopy(feed_chan)
+    assert branch.resampler.calendar is branch.session_calendar
+
+
+def test_unknown_session():
+    with pytest.raises(CChanException) as exc_info:
+        CChan("test", data_src=preloaded_stockapi_cls({}), lv_list=list(CRYPTO_LV), config=CChanConfig({**TEST_CONF, "kl_session": "nyse"}))
+    assert exc_info.value.errcode == ErrCode.PARA_ERROR
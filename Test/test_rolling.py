@@ -0,0 +1,161 @@
+import json
+import math
+import random
+
+import numpy as np
+
+from Common.CEnum import TREND_TYPE
+from Math.BOLL import BollModel
+from Math.KDJ import KDJ
+from Math.Rolling import CRollingSum
+from Math.TrendModel import CTrendModel
+
+# 均值/布林线允许的相对误差（相对窗口内价格的量级）
+REL_TOL = 1e-12
+
+
+class CLegacyBoll:
+    # 原来每根K线对整个窗口重新计算的实现，作为对照
+    def __init__(self, N):
+        self.N = N
+        self.arr = []
+
+    def add(self, value):
+        self.arr.append(value)
+        self.arr = self.arr[-self.N:]
+        ma = sum(self.arr) / len(self.arr)
+        return ma, math.sqrt(sum((x - ma)**2 for x in self.arr) / len(self.arr))
+
+
+class CLegacyTrend:
+    def __init__(self, trend_type, T):
+        self.T = T
+        self.type = trend_type
+        self.arr = []
+
+    def add(self, value):
+        self.arr.append(value)
+        self.arr = self.arr[-self.T:]
+        if self.type == TREND_TYPE.MEAN:
+            return sum(self.arr) / len(self.arr)
+        return max(self.arr) if self.type == TREND_TYPE.MAX else min(self.arr)
+
+
+class CLegacyKDJ:
+    def __init__(self, period):
+        self.period = period
+        self.arr = []
+        self.pre = (50, 50, 50)
+
+    def add(self, high, low, close):
+        self.arr.append((high, low))
+        self.arr = self.arr[-self.period:]
+        hn = max(x[0] for x in self.arr)
+        ln = min(x[1] for x in self.arr)
+        rsv = 100 * (close - ln) / (hn - ln) if hn != ln else 0.0
+        k = 2 / 3 * self.pre[0] + 1 / 3 * rsv
+        d = 2 / 3 * self.pre[1] + 1 / 3 * k
+        self.pre = (k, d, 3 * k - 2 * d)
+        return self.pre
+
+
+def gen_series(rng: random.Random, n: int) -> np.ndarray:
+    # 普通随机游走、大数值小波动、长时间不变（方差为 0）、整数价格等
+    kind = rng.choice(["walk", "big_base", "flat", "int", "spike"])
+    if kind == "walk":
+        return np.round(3000 * np.exp(np.cumsum(np.array([rng.gauss(0, 0.01) for _ in range(n)]))), 2)
+    if kind == "big_base":
+        return 1e6 + np.array([rng.gauss(0, 1e-3) for _ in range(n)])
+    if kind == "flat":
+        return np.repeat(np.array([rng.choice([1.0, 10.01, 3333.33]) for _ in range(n // 50 + 1)]), 50)[:n]
+    if kind == "int":
+        return np.array([float(rng.randint(1, 20)) for _ in range(n)])
+    return np.array([rng.choice([1.0, 1e4]) if rng.random() < 0.05 else 100.0 + rng.random() for _ in range(n)])
+
+
+def feed(model, values: np.ndarray, rng: random.Random):
+    # 随机混合逐根 add 和 add_batch
+    res = []
+    pos = 0
+    while pos < len(values):
+        step = rng.randint(1, 200)
+        chunk = values[pos:pos+step]
+        if rng.random() < 0.5:
+            res.extend(model.add(float(v)) for v in chunk)
+        else:
+            batch = model.add_batch(chunk)
+            res.extend(zip(*batch) if isinstance(batch, tuple) else batch)
+        pos += step
+    return res
+
+
+def assert_close(got, expect, scale):
+    assert abs(got - expect) <= REL_TOL * scale, (got, expect, scale)
+
+
+def test_boll_and_mean():
+    rng = random.Random(0)
+    for _ in range(120):
+        T = rng.randint(2, 300)
+        values = gen_series(rng, rng.randint(1, 3000))
+        legacy_boll, legacy_mean = CLegacyBoll(T), CLegacyTrend(TREND_TYPE.MEAN, T)
+        boll_res = feed(BollModel(T).rolling, values, rng)
+        mean_res = feed(CTrendModel(TREND_TYPE.MEAN, T), values, rng)
+        for i, v in enumerate(values.tolist()):
+            ma, theta = legacy_boll.add(v)
+            scale = max(abs(x) for x in values[max(0, i-T+1):i+1].tolist()) or 1.0
+            assert_close(boll_res[i][0], ma, scale)
+            assert_close(math.sqrt(boll_res[i][1]), theta, scale)
+            assert_close(mean_res[i], legacy_mean.add(v), scale)
+
+
+def test_max_min():
+    rng = random.Random(1)
+    for _ in range(120):
+        T = rng.randint(1, 300)
+        values = gen_series(rng, rng.randint(1, 3000))
+        for trend_type in (TREND_TYPE.MAX, TREND_TYPE.MIN):
+            legacy = CLegacyTrend(trend_type, T)
+            assert feed(CTrendModel(trend_type, T), values, rng) == [legacy.add(v) for v in values.tolist()]
+
+
+def test_kdj():
+    rng = random.Random(2)
+    for _ in range(60):
+        period = rng.randint(1, 60)
+        close = gen_series(rng, rng.randint(1, 2000))
+        high = close + np.array([rng.random() for _ in close])
+        low = close - np.array([rng.random() for _ in close])
+        legacy, kdj = CLegacyKDJ(period), KDJ(period)
+        for h, l, c in zip(high.tolist(), low.tolist(), close.tolist()):
+            item = kdj.add(h, l, c)
+            assert (item.k, item.d, item.j) == legacy.add(h, l, c)
+
+
+def test_batch_equal_step():
+    rng = random.Random(3)
+    for _ in range(60):
+        T = rng.randint(2, 100)
+        values = gen_series(rng, rng.randint(1, 1000))
+        step_model, batch_model = BollModel(T), BollModel(T)
+        step_res = [(m.MID, m.UP, m.DOWN) for m in (step_model.add(float(v)) for v in values)]
+        batch_res = [(m.MID, m.UP, m.DOWN) for m in batch_model.add_batch(values)]
+        assert step_res == batch_res
+
+
+
+def test_mixed_equal_step():
+    # 随机混合逐根 add / add_batch，中途保存并恢复状态，均值和方差都与全部逐根 add 完全一致
+    rng = random.Random(4)
+    for _ in range(60):
+        T = rng.randint(1, 300)
+        values = gen_series(rng, rng.randint(1, 3000))
+        step_model = CRollingSum(T)
+        expect = [step_model.add(v) for v in values.tolist()]
+        cut = rng.randint(0, len(values))
+        model = CRollingSum(T)
+        res = feed(model, values[:cut], rng)
+        restored = CRollingSum(T)
+        restored.set_state(json.loads(json.dumps(model.get_state())))
+        res.extend(feed(restored, values[cut:], rng))
+        assert [tuple(map(float, item)) for item in res] == expect
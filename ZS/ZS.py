@@ -2,6 +2,7 @@ from typing import Generic, List, Optional, TypeVar
 
 from Bi.Bi import CBi
 from BuySellPoint.BSPointConfig import CPointConfig
+from Common.cache import init_cache
 from Common.ChanException import CChanException, ErrCode
 from Common.func_util import has_overlap
 from KLine.KLine_Unit import CKLine_Unit
@@ -11,10 +12,16 @@ LINE_TYPE = TypeVar('LINE_TYPE', CBi, "CSeg")
 
 
 class CZS(Generic[LINE_TYPE]):
+    __slots__ = (
+        "__is_sure", "__sub_zs_lst", "__begin", "__begin_bi", "__low", "__high", "__mid", "__end", "__end_bi",
+        "__peak_high", "__peak_low", "__bi_in", "__bi_out", "__bi_lst", "_memoize_cache", "_memoize_gen",
+    )
+
     def __init__(self, lst: Optional[List[LINE_TYPE]], is_sure=True):
         # begin/end：永远指向 klu
         # low/high: 中枢的范围
         # peak_low/peak_high: 中枢所涉及到的笔的最大值，最小值
+        init_cache(self)
         self.__is_sure = is_sure
         self.__sub_zs_lst: List[CZS] = []
 
@@ -42,7 +49,7 @@ class CZS(Generic[LINE_TYPE]):
         self.__bi_lst: List[LINE_TYPE] = []  # begin_bi~end_bi之间的笔，在update_zs_in_seg函数中更新
 
     def clean_cache(self):
-        self._memoize_cache = {}
+        self._memoize_gen += 1
 
     @property
     def is_sure(self): return self.__is_sure
@@ -1,8 +1,10 @@
+import time
 from typing import List, Union, overload
 
 from Bi.Bi import CBi
 from Bi.BiList import CBiList
 from Common.func_util import revert_bi_dir
+from Common.profiler import PROFILER
 from Seg.Seg import CSeg
 from Seg.SegListComm import CSegListComm
 from ZS.ZSConfig import CZSConfig
@@ -89,6 +91,7 @@ class CZSList:
         return CZS(lst, is_sure=is_sure) if min_high > max_low else None
 
     def cal_bi_zs(self, bi_lst: Union[CBiList, CSegListComm], seg_lst: CSegListComm):
+        begin = time.perf_counter() if PROFILER.on else 0.0
         while self.zs_lst and self.zs_lst[-1].begin_bi.idx >= self.last_sure_pos:
             self.zs_lst.pop()
         if self.config.zs_algo == "normal":
@@ -128,6 +131,8 @@ class CZSList:
         else:
             raise Exception(f"unknown zs_algo {self.config.zs_algo}")
         self.update_last_pos(seg_lst)
+        if PROFILER.on:
+            PROFILER.add_time("zs.cal_bi_zs" if isinstance(bi_lst, CBiList) else "segzs.cal_bi_zs", begin)
 
     def update_overseg_zs(self, bi: CBi | CSeg):
         if len(self.zs_lst) and len(self.free_item_lst) == 0: